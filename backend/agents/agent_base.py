@@ -6,14 +6,21 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, Callable, Type, Union, List
 import asyncio
 import inspect
+import time
 
 from backend.message.schemas.message_models import Patch
 from .llm_client import DeepSeekClient, DeepSeekReasonerClient, DeepSeekV3Client
-from .retry_wrapper import RetryWrapper
+from .retry_wrapper import RetryWrapper, LLMError, TimeoutError as LLMTimeoutError
+from .model_routing import ModelRoute, shared_model_router
+from .prompts_and_validators.repair_response import build_repair_prompt
 from backend.utils.xml_parser import XMLParser, XMLValidationError
+from backend.utils.stream_xml_parser import StreamingXMLValidator
+from backend.config import settings
 from backend.utils.logger import logger
+from backend.utils.metrics import shared_metrics
 from pydantic import BaseModel
 from backend.database.database_manager import DatabaseManager
+from .environment_context import EnvironmentContextBuilder
 
 class AgentBase(ABC):
     """
@@ -50,7 +57,14 @@ class AgentBase(ABC):
         # 初始化组件
         self.llm_client = llm_client or DeepSeekReasonerClient(publish_callback)
         self.retry_wrapper = retry_wrapper or RetryWrapper()
+        # 模型路由选中与主客户端不同的模型时使用的客户端（按需创建）
+        self.routed_clients: Dict[str, DeepSeekClient] = {}
+        # 格式修复使用快速的v3模型，不向消息发布内容
+        self.repair_client = DeepSeekV3Client()
+        # 按验证器统计格式修复的尝试与成功次数
+        self.repair_stats: Dict[str, Dict[str, int]] = {}
         self.xml_parser = XMLParser()
+        self.environment_builder = EnvironmentContextBuilder.for_database(database_manager) if database_manager else None
         
         # 设置LLM客户端的回调函数
         self.llm_client.set_publish_callback(publish_callback)
@@ -182,7 +196,8 @@ class AgentBase(ABC):
                                    title: str, 
                                    publisher: str,
                                    visible_node_ids: List[str] = [],
-                                   validator: Optional[Type[BaseModel]] = None) -> Union[str, BaseModel]:
+                                   validator: Optional[Type[BaseModel]] = None,
+                                   step: Optional[str] = None) -> Union[str, BaseModel]:
         """
         调用LLM并支持重试，可选地进行XML解析和验证
         
@@ -190,61 +205,179 @@ class AgentBase(ABC):
             prompt: 提示词
             title: 消息标题
             validator: 可选的Pydantic验证器，如果提供则解析XML并验证
-            rollback_message_id: 重试时回溯的消息ID
+            step: 步骤名，用于在模型路由表中选择模型、最大输出token数与超时（未配置时按验证器类名查找）
             
         Returns:
             如果有验证器，返回验证后的BaseModel对象；否则返回原始字符串
         """
+        # 按步骤选择模型与输出配置
+        route_key, route = shared_model_router.resolve(step, validator)
+        llm_client = self._get_llm_client(route.model)
+        
         # 发布LLM消息开始patch
         llm_message_id = await self._publish_llm_start_patch(title, publisher, visible_node_ids)
         
-        if validator:
-            # 有验证器：调用LLM + 解析 + 验证（全部在重试范围内）
-            async def llm_parse_validate():
-                # 调用LLM
-                content = await self.llm_client.stream_generate(prompt, llm_message_id, publish_content=False)
-                
-                # 从内容中提取XML片段
-                xml_fragment = self.xml_parser.extract_xml_from_content(content, "response")
-                if not xml_fragment:
-                    raise XMLValidationError("未找到XML response片段")
-                
-                # 解析XML为字典
-                data_dict = self.xml_parser.xml_to_dict(xml_fragment)
-                
-                # 使用验证器验证
-                validated_data = self.xml_parser.validate_with_pydantic(data_dict, validator)
+        async def generate(stream_validator: Optional[StreamingXMLValidator] = None, publish_content: bool = True) -> str:
+            return await self._generate_with_route(llm_client, route, prompt, llm_message_id, stream_validator, publish_content)
+        
+        start_time = time.monotonic()
+        success = False
+        try:
+            if validator:
+                # 有验证器：调用LLM + 解析 + 验证（全部在重试范围内）
+                async def llm_parse_validate():
+                    # 每次尝试使用新的流式校验器，边生成边检查结构
+                    stream_validator = self._new_stream_validator(validator)
+                    
+                    # 调用LLM
+                    content = await generate(stream_validator, publish_content=False)
+                    
+                    # 解析与验证；完整输出未通过时先用快速模型修复格式，修复失败再整体重新生成
+                    try:
+                        validated_data = self._parse_llm_output(content, stream_validator, validator)
+                    except XMLValidationError as e:
+                        if not settings.XML_REPAIR_ENABLED:
+                            raise
+                        validated_data = await self._repair_llm_output(prompt, content, e, validator, llm_message_id)
 
-                if hasattr(validated_data, "to_content"):
-                    content = validated_data.to_content()
+                    if hasattr(validated_data, "to_content"):
+                        content = validated_data.to_content()
 
-                content_patch = Patch(
-                    message_id=llm_message_id,
-                    content_delta=content
-                )
+                    content_patch = Patch(
+                        message_id=llm_message_id,
+                        content_delta=content
+                    )
 
-                await self.publish_callback(content_patch)
-                return validated_data
-            
-            # 使用重试包装器执行整个流程
-            result = await self.retry_wrapper.execute_with_retry(
-                llm_parse_validate,
-                self.publish_callback,
-                llm_message_id
-            )
-            
+                    await self.publish_callback(content_patch)
+                    return validated_data
+                
+                # 使用重试包装器执行整个流程
+                result = await self.retry_wrapper.execute_with_retry(
+                    llm_parse_validate,
+                    self.publish_callback,
+                    llm_message_id
+                )
+            else:
+                # 无验证器：仅调用LLM（在重试范围内）
+                result = await self.retry_wrapper.execute_with_retry(
+                    generate,
+                    self.publish_callback,
+                    llm_message_id
+                )
+            success = True
             return result
+        finally:
+            shared_model_router.record(route_key, route, time.monotonic() - start_time, success)
+    
+    def _get_llm_client(self, model: str) -> DeepSeekClient:
+        """返回路由指定模型的客户端：与主客户端模型相同时使用主客户端"""
+        if model == getattr(self.llm_client, "model_type", "reasoner"):
+            return self.llm_client
+        if model not in self.routed_clients:
+            client_class = DeepSeekV3Client if model == "v3" else DeepSeekReasonerClient
+            self.routed_clients[model] = client_class(self.publish_callback)
+        return self.routed_clients[model]
+    
+    async def _generate_with_route(self, llm_client: DeepSeekClient, route: ModelRoute, prompt: str, message_id: str,
+                                   stream_validator: Optional[StreamingXMLValidator] = None,
+                                   publish_content: bool = True) -> str:
+        """按路由配置的最大输出token数、温度与超时调用LLM"""
+        generation = llm_client.stream_generate(
+            prompt, message_id,
+            max_tokens=route.max_tokens,
+            temperature=route.temperature,
+            publish_content=publish_content,
+            stream_validator=stream_validator,
+        )
+        if not route.timeout:
+            return await generation
+        try:
+            return await asyncio.wait_for(generation, route.timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM调用超过{route.timeout}秒未完成")
+    
+    def _new_stream_validator(self, validator: Type[BaseModel]) -> Optional[StreamingXMLValidator]:
+        if not settings.XML_STREAM_VALIDATION:
+            return None
+        # 开启格式修复时语法错误不中止生成，读取到根标签闭合后交给修复模型
+        return StreamingXMLValidator(validator, "response", settings.XML_STREAM_MAX_PREAMBLE_CHARS,
+                                     abort_on_syntax_error=not settings.XML_REPAIR_ENABLED)
+    
+    def _parse_llm_output(self, content: str, stream_validator: Optional[StreamingXMLValidator],
+                          validator: Type[BaseModel]) -> BaseModel:
+        """
+        从LLM输出中提取XML片段，解析并验证
+        
+        Raises:
+            XMLValidationError: 未找到片段、解析失败或验证失败
+        """
+        # 流式解析已记录语法错误时直接交给调用方（修复或重试）
+        if stream_validator is not None and stream_validator.syntax_error:
+            raise XMLValidationError(stream_validator.syntax_error)
+        
+        # 从内容中提取XML片段
+        if stream_validator is not None and stream_validator.completed:
+            xml_fragment = stream_validator.fragment
         else:
-            # 无验证器：仅调用LLM（在重试范围内）
-            content = await self.retry_wrapper.execute_with_retry(
-                self.llm_client.stream_generate,
-                self.publish_callback,
-                llm_message_id,
-                prompt,
-                llm_message_id
-            )
+            xml_fragment = self.xml_parser.extract_xml_from_content(content, "response")
+        if not xml_fragment:
+            raise XMLValidationError("未找到XML response片段")
+        
+        # 解析XML为字典
+        data_dict = self.xml_parser.xml_to_dict(xml_fragment)
+        
+        # 使用验证器验证
+        return self.xml_parser.validate_with_pydantic(data_dict, validator)
+    
+    async def _repair_llm_output(self, prompt: str, faulty_output: str, error: XMLValidationError,
+                                 validator: Type[BaseModel], message_id: str) -> BaseModel:
+        """
+        把未通过校验的输出与具体错误交给v3模型修复，只要求输出修正后的<response>
+        
+        Args:
+            prompt: 原始提示词（提取其中的输出格式要求）
+            faulty_output: 未通过校验的完整输出
+            error: 解析器或验证器的错误
+            validator: 验证器
+            message_id: 原消息ID（仅用于日志）
+            
+        Returns:
+            修复后验证通过的对象
             
-            return content
+        Raises:
+            XMLValidationError: 修复失败时抛出原错误，交由重试包装器整体重新生成
+        """
+        validator_name = validator.__name__
+        stats = self.repair_stats.setdefault(validator_name, {"attempts": 0, "successes": 0})
+        stats["attempts"] += 1
+        logger.warning(f"LLM输出未通过校验，尝试修复格式 - 验证器: {validator_name}, 错误: {error}")
+        
+        stream_validator = self._new_stream_validator(validator)
+        try:
+            content = await self.repair_client.stream_generate(
+                build_repair_prompt(prompt, faulty_output, str(error)),
+                message_id,
+                max_tokens=settings.XML_REPAIR_MAX_TOKENS,
+                publish_content=False,
+                stream_validator=stream_validator,
+            )
+            validated_data = self._parse_llm_output(content, stream_validator, validator)
+        except (XMLValidationError, LLMError) as repair_error:
+            shared_metrics.inc("llm_xml_repairs_total", 1, "XML格式修复次数", validator=validator_name, result="failure")
+            logger.warning(f"格式修复失败，将重新生成 - 验证器: {validator_name}, 错误: {repair_error}")
+            raise error
+        
+        stats["successes"] += 1
+        shared_metrics.inc("llm_xml_repairs_total", 1, "XML格式修复次数", validator=validator_name, result="success")
+        logger.info(f"格式修复成功 - 验证器: {validator_name}")
+        return validated_data
+    
+    def get_repair_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按验证器返回格式修复的尝试次数、成功次数与成功率"""
+        return {
+            name: {**stats, "success_rate": stats["successes"] / stats["attempts"] if stats["attempts"] else 0.0}
+            for name, stats in self.repair_stats.items()
+        }
     
     async def _publish_llm_start_patch(self, title: str, publisher: str, visible_node_ids: List[str] = []) -> str:
         """
@@ -315,42 +448,8 @@ class AgentBase(ABC):
             环境信息字典
         """
         try:
-            # 查询研究树全貌
-            tree_result = self.database_manager.get_compact_text_tree_query()
-            tree_text = tree_result.get("data", {}).get("tree_text", "研究树为空") if tree_result["success"] else "研究树为空"
-            
-            # 查询当前问题详情
-            problem_result = self.database_manager.get_problem_detail_query(problem_id)
-            problem_detail = problem_result.get("data", {}).get("detail", "当前研究问题为空") if problem_result["success"] else "当前研究问题为空"
-            
-            # 查询根问题信息
-            root_problem_id = self.database_manager.get_root_problem_id_query(problem_id)["data"]["root_problem_id"]
-            root_problem = self.database_manager.get_problem_detail_query(root_problem_id)["data"]["detail"]
-            
-            related_solutions = self.database_manager.get_related_solutions_query(problem_id)["data"]
-            expert_solutions_of_all_ancestor_problems = "\n".join([
-                self.database_manager.get_solution_detail_query(solution_id)["data"]["detail"] 
-                for solution_id in related_solutions["ancestors"]
-            ]) if related_solutions["ancestors"] else "无上级专家解决方案"
-            other_solutions_of_current_problem = "\n".join([
-                self.database_manager.get_solution_detail_query(solution_id)["data"]["detail"] 
-                for solution_id in related_solutions["siblings"]
-            ]) if related_solutions["siblings"] else "无其他解决方案"
-            expert_solutions_of_all_descendant_problems = "\n".join([
-                self.database_manager.get_solution_detail_query(solution_id)["data"]["detail"] 
-                for solution_id in related_solutions["descendants"]
-            ]) if related_solutions["descendants"] else "无后代解决方案"
-
-
-            return {
-                "current_research_tree_full_text": tree_text,
-                "current_research_problem": problem_detail,
-                "expert_solutions_of_all_ancestor_problems": expert_solutions_of_all_ancestor_problems,
-                "other_solutions_of_current_problem": other_solutions_of_current_problem,
-                "root_problem": root_problem,
-                "expert_solutions_of_all_descendant_problems": expert_solutions_of_all_descendant_problems,
-                "user_prompt": user_requirement or "无要求"
-            }
+            # 渲染片段按 (快照ID, 节点ID) 缓存，未修改的节点在不同问题与快照间复用
+            return self.environment_builder.build(problem_id, user_requirement)
         except Exception as e:
             logger.error(f"获取环境信息失败: {e}")
             raise e
@@ -496,5 +595,9 @@ class AgentBase(ABC):
             "is_processing": self.is_processing(),
             "last_task_result": self.last_task_result,
             "llm_stats": self.llm_client.get_stats(),
-            "retry_stats": self.retry_wrapper.get_retry_stats()
+            "retry_stats": self.retry_wrapper.get_retry_stats(),
+            "repair_stats": self.get_repair_stats(),
+            "repair_llm_stats": self.repair_client.get_stats(),
+            "routed_llm_stats": {model: client.get_stats() for model, client in self.routed_clients.items()},
+            "environment_cache_stats": self.environment_builder.get_stats() if self.environment_builder else None
         }
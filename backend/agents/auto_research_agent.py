@@ -321,7 +321,8 @@ class AutoResearchAgent(AgentBase):
                 title="创建解决方案",
                 validator=CreateSolutionResponse,
                 publisher=problem_id,
-                visible_node_ids=[problem_id]
+                visible_node_ids=[problem_id],
+                step="create_solution"
             )
             
             #from backend.utils.xml_parser import XMLParser
@@ -0,0 +1,235 @@
+"""
+提示词上下文装配器
+按各段Token预算挑选环境信息片段，优先保留相关度高的内容，截断或省略其余部分并记录
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from backend.config import settings
+from backend.utils.token_estimator import estimate_tokens, truncate_to_tokens
+
+# 剩余预算不足该值时不再截断片段，直接省略
+MIN_TRUNCATED_FRAGMENT_TOKENS = 128
+# 省略标记中最多列出的片段标题数，其余只计数
+MAX_LISTED_DROPPED = 5
+
+T = TypeVar("T")
+
+
+@dataclass
+class ContextBudgets:
+    """各提示词段落的Token预算，小于等于0表示不限制"""
+    tree: int
+    ancestors: int
+    siblings: int
+    descendants: int
+
+    @classmethod
+    def from_settings(cls) -> "ContextBudgets":
+        return cls(
+            tree=settings.PROMPT_BUDGET_TREE_TOKENS,
+            ancestors=settings.PROMPT_BUDGET_ANCESTOR_TOKENS,
+            siblings=settings.PROMPT_BUDGET_SIBLING_TOKENS,
+            descendants=settings.PROMPT_BUDGET_DESCENDANT_TOKENS,
+        )
+
+
+@dataclass
+class ContextFragment:
+    """待装配的片段；priority 越小越优先保留"""
+    label: str
+    text: str
+    priority: Tuple
+    tokens: Optional[int] = None
+
+
+@dataclass
+class SectionResult:
+    """单个段落的装配结果"""
+    text: str
+    budget: int
+    used_tokens: int
+    kept: int = 0
+    truncated: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+
+    def to_report(self) -> Dict:
+        return {
+            "budget": self.budget,
+            "used_tokens": self.used_tokens,
+            "kept": self.kept,
+            "truncated": self.truncated,
+            "dropped": self.dropped,
+        }
+
+
+def assemble_fragments(fragments: List[ContextFragment], budget: int, empty_text: str) -> SectionResult:
+    """
+    在预算内装配片段，按优先级挑选，按原顺序输出
+
+    Args:
+        fragments: 按原顺序排列的片段
+        budget: Token预算，小于等于0表示不限制
+        empty_text: 没有片段时使用的文本
+
+    Returns:
+        装配结果
+    """
+    if not fragments:
+        return SectionResult(text=empty_text, budget=budget, used_tokens=estimate_tokens(empty_text))
+
+    for fragment in fragments:
+        if fragment.tokens is None:
+            fragment.tokens = estimate_tokens(fragment.text)
+
+    if budget <= 0:
+        text = "\n".join(f.text for f in fragments)
+        return SectionResult(text=text, budget=budget, used_tokens=sum(f.tokens for f in fragments), kept=len(fragments))
+
+    order = sorted(range(len(fragments)), key=lambda i: (fragments[i].priority, i))
+
+    def select(limit: int) -> SectionResult:
+        # 每个片段额外计入1个Token的换行
+        remaining = limit
+        selected: Dict[int, str] = {}
+        result = SectionResult(text="", budget=budget, used_tokens=0)
+        for i in order:
+            fragment = fragments[i]
+            if fragment.tokens + 1 <= remaining:
+                selected[i] = fragment.text
+                remaining -= fragment.tokens + 1
+            elif remaining >= MIN_TRUNCATED_FRAGMENT_TOKENS:
+                selected[i] = truncate_to_tokens(fragment.text, remaining - 1)
+                remaining -= estimate_tokens(selected[i]) + 1
+                result.truncated.append(fragment.label)
+            else:
+                result.dropped.append(fragment.label)
+
+        parts = [selected[i] for i in range(len(fragments)) if i in selected]
+        if result.dropped:
+            parts.append(_dropped_marker(result.dropped, limit=budget))
+        result.text = "\n".join(parts) if parts else empty_text
+        result.kept = len(selected)
+        result.used_tokens = estimate_tokens(result.text)
+        return result
+
+    # 省略标记也计入预算
+    return _fit_to_budget(select, lambda result: result.used_tokens, budget)
+
+
+def _fit_to_budget(build: Callable[[int], T], tokens: Callable[[T], int], budget: int) -> T:
+    """
+    省略标记的长度取决于挑选结果，无法事先扣除：先按完整预算挑选，超出时二分查找
+    输出（含省略标记）不超过预算的最大挑选额度
+    """
+    best = build(budget)
+    if tokens(best) <= budget:
+        return best
+    best = build(0)
+    low, high = 1, budget - 1
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = build(mid)
+        if tokens(candidate) <= budget:
+            best, low = candidate, mid + 1
+        else:
+            high = mid - 1
+    return best
+
+
+def _dropped_marker(labels: List[str], limit: int) -> str:
+    """省略标记：只列出前几项标题，标题过长或预算极小时只给出数量"""
+    listed = "、".join(truncate_to_tokens(label, 16, marker="…") for label in labels[:MAX_LISTED_DROPPED])
+    more = "等" if len(labels) > MAX_LISTED_DROPPED else ""
+    marker = f"……（因长度限制省略了{len(labels)}项：{listed}{more}）"
+    if estimate_tokens(marker) * 2 > limit:
+        marker = f"……（因长度限制省略了{len(labels)}项）"
+    return marker
+
+
+def assemble_tree(entries: List[Tuple[str, int, str]], focus_id: str, path_ids: Set[str], budget: int) -> SectionResult:
+    """
+    在预算内装配研究树全貌文本
+
+    优先级：根到当前问题的路径 > 当前问题的子树（由浅到深） > 其余节点（由浅到深）。
+    被省略的连续行以一行省略标记代替，保持树的缩进结构。
+
+    Args:
+        entries: 先序排列的 (节点ID, 深度, 文本行)
+        focus_id: 当前问题ID
+        path_ids: 根到当前问题路径上的节点ID
+        budget: Token预算，小于等于0表示不限制
+
+    Returns:
+        装配结果
+    """
+    full_text = "\n".join(line for _, _, line in entries)
+    if budget <= 0 or estimate_tokens(full_text) <= budget:
+        return SectionResult(text=full_text, budget=budget, used_tokens=estimate_tokens(full_text), kept=len(entries))
+
+    # 先序遍历中，当前问题的子树是紧随其后、深度更大的连续区间
+    subtree: Set[int] = set()
+    for i, (node_id, depth, _) in enumerate(entries):
+        if node_id == focus_id:
+            j = i + 1
+            while j < len(entries) and entries[j][1] > depth:
+                subtree.add(j)
+                j += 1
+            break
+
+    def priority(i: int) -> Tuple[int, int, int]:
+        node_id, depth, _ = entries[i]
+        if node_id in path_ids:
+            return (0, depth, i)
+        if i in subtree:
+            return (1, depth, i)
+        return (2, depth, i)
+
+    order = sorted(range(len(entries)), key=priority)
+
+    def select(limit: int) -> Tuple[Set[int], str]:
+        kept = _select_tree_lines(entries, order, limit)
+        return kept, _render_tree(entries, kept)
+
+    # 省略标记行也计入预算
+    kept, text = _fit_to_budget(select, lambda selection: estimate_tokens(selection[1]), budget)
+
+    return SectionResult(
+        text=text,
+        budget=budget,
+        used_tokens=estimate_tokens(text),
+        kept=len(kept),
+        dropped=[f"{len(entries) - len(kept)}个树节点"],
+    )
+
+
+def _select_tree_lines(entries: List[Tuple[str, int, str]], order: List[int], limit: int) -> Set[int]:
+    remaining = limit
+    kept: Set[int] = set()
+    for i in order:
+        tokens = estimate_tokens(entries[i][2]) + 1
+        if tokens > remaining:
+            continue
+        kept.add(i)
+        remaining -= tokens
+    return kept
+
+
+def _render_tree(entries: List[Tuple[str, int, str]], kept: Set[int]) -> str:
+    """按原顺序输出保留的行，连续被省略的行以一行省略标记代替"""
+    lines: List[str] = []
+    omitted = 0
+    omitted_depth = 0
+    for i, (_, depth, line) in enumerate(entries):
+        if i in kept:
+            if omitted:
+                lines.append(f"{'  ' * omitted_depth}- ……（省略{omitted}个节点）")
+                omitted = 0
+            lines.append(line)
+        else:
+            if not omitted:
+                omitted_depth = depth
+            omitted += 1
+    if omitted:
+        lines.append(f"{'  ' * omitted_depth}- ……（省略{omitted}个节点）")
+    return "\n".join(lines)
@@ -0,0 +1,354 @@
+"""
+环境信息构建器
+为智能体提示词组装研究树环境信息，并按 (快照ID, 节点ID) 缓存渲染后的文本片段
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import weakref
+
+from backend.database.database_manager import (
+    DatabaseManager,
+    CommitChange,
+    RelatedSolutions,
+    render_problem_detail,
+    render_solution_detail,
+    render_compact_tree,
+)
+from backend.database.schemas.research_tree import Node, Snapshot, ProblemNode, SolutionNode
+from backend.utils.token_estimator import estimate_tokens
+from backend.utils.logger import logger
+from .context_assembler import ContextBudgets, ContextFragment, assemble_fragments, assemble_tree
+
+# 随节点内容变化而失效、可沿用到新快照的片段类型
+_NODE_FRAGMENT_KINDS = ("problem", "solution", "solution_tokens")
+
+
+class _SnapshotContext:
+    """
+    单个快照的节点索引与已渲染片段
+
+    快照与节点只以弱引用持有，不影响快照存储按LRU与内存上限淘汰快照；片段只包含文本与节点ID
+    """
+
+    __slots__ = ("snapshot_id", "_snapshot_ref", "nodes", "parents", "fragments")
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot_id = snapshot.id
+        self._snapshot_ref = weakref.ref(snapshot)
+        self.nodes: Optional["weakref.WeakValueDictionary[str, Node]"] = None
+        self.parents: Optional[Dict[str, Optional[str]]] = None
+        self.fragments: Dict[Tuple[str, Optional[str]], object] = {}
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot_ref()
+
+    def rebind(self, snapshot: Snapshot) -> None:
+        """快照被淘汰后重新加载为新对象：内容不变，沿用片段，重建节点索引"""
+        self._snapshot_ref = weakref.ref(snapshot)
+        self.nodes = None
+
+    def ensure_index(self) -> None:
+        """一次遍历建立 节点ID -> 节点 / 父节点ID 的索引"""
+        if self.nodes is not None:
+            return
+        nodes: "weakref.WeakValueDictionary[str, Node]" = weakref.WeakValueDictionary()
+        parents: Dict[str, Optional[str]] = {}
+        stack: List[Tuple[Node, Optional[str]]] = [(r, None) for r in self.snapshot.roots]
+        while stack:
+            node, parent_id = stack.pop()
+            nodes[node.id] = node
+            parents[node.id] = parent_id
+            stack.extend((c, node.id) for c in node.children)
+        self.nodes = nodes
+        self.parents = parents
+
+
+class EnvironmentContextBuilder:
+    """
+    环境信息构建器
+
+    功能：
+    1. 按 (快照ID, 节点ID) 缓存问题详情、解决方案详情等渲染片段，跨问题复用
+    2. 提交新快照时只让被修改节点（及其所在解决方案）的片段失效，其余片段沿用
+    3. 通过一次性建立的节点索引查找祖先、兄弟和后代方案，避免反复全树搜索
+    """
+
+    _shared: "weakref.WeakKeyDictionary[DatabaseManager, EnvironmentContextBuilder]" = weakref.WeakKeyDictionary()
+
+    def __init__(self, database_manager: DatabaseManager, max_cached_snapshots: int = 8):
+        """
+        初始化环境信息构建器
+
+        Args:
+            database_manager: 数据库管理器
+            max_cached_snapshots: 最多保留缓存的快照数量
+        """
+        self.database_manager = database_manager
+        self.max_cached_snapshots = max_cached_snapshots
+        self._contexts: "OrderedDict[str, _SnapshotContext]" = OrderedDict()
+        self.stats = {
+            "fragment_hits": 0,
+            "fragment_misses": 0,
+            "carried_fragments": 0,
+            "invalidated_fragments": 0,
+            "budget_limited_builds": 0,
+        }
+        # 最近一次构建中各段落的预算使用与省略情况
+        self.last_context_report: Dict[str, Dict] = {}
+        database_manager.add_commit_listener(self._on_commit)
+
+    @classmethod
+    def for_database(cls, database_manager: DatabaseManager) -> "EnvironmentContextBuilder":
+        """获取与数据库管理器绑定的共享构建器，使所有智能体复用同一份缓存"""
+        builder = cls._shared.get(database_manager)
+        if builder is None:
+            builder = cls(database_manager)
+            cls._shared[database_manager] = builder
+        return builder
+
+    # ---------------- 缓存管理 ----------------
+    def _get_context(self, snapshot: Optional[Snapshot] = None) -> _SnapshotContext:
+        snapshot = snapshot or self.database_manager.get_current_snapshot()
+        context = self._contexts.get(snapshot.id)
+        if context is not None and context.snapshot is None:
+            context.rebind(snapshot)
+        if context is None or context.snapshot is not snapshot:
+            context = _SnapshotContext(snapshot)
+            self._store_context(context)
+        else:
+            self._contexts.move_to_end(snapshot.id)
+        return context
+
+    def _store_context(self, context: _SnapshotContext) -> None:
+        self._contexts[context.snapshot_id] = context
+        self._contexts.move_to_end(context.snapshot_id)
+        while len(self._contexts) > self.max_cached_snapshots:
+            self._contexts.popitem(last=False)
+
+    def _on_commit(self, change: CommitChange) -> None:
+        """提交新快照时，把未受影响的片段沿用到新快照"""
+        previous = self._contexts.get(change.previous_snapshot_id) if change.previous_snapshot_id else None
+        snapshot = self.database_manager.snapshot_map.get(change.snapshot_id)
+        if previous is None or snapshot is None:
+            return
+
+        # 问题内容变化会影响其所在解决方案的详情（详情中包含子问题列表）
+        invalidated = set(change.changed_node_ids) | set(change.removed_node_ids)
+        if previous.parents is not None:
+            for node_id in list(invalidated):
+                parent_id = previous.parents.get(node_id)
+                if parent_id:
+                    invalidated.add(parent_id)
+
+        context = _SnapshotContext(snapshot)
+        for key, value in previous.fragments.items():
+            kind, node_id = key
+            if kind not in _NODE_FRAGMENT_KINDS:
+                continue
+            if node_id in invalidated:
+                self.stats["invalidated_fragments"] += 1
+                continue
+            context.fragments[key] = value
+            self.stats["carried_fragments"] += 1
+        self._store_context(context)
+
+    def _fragment(self, context: _SnapshotContext, kind: str, node_id: Optional[str], render):
+        key = (kind, node_id)
+        if key in context.fragments:
+            self.stats["fragment_hits"] += 1
+            return context.fragments[key]
+        self.stats["fragment_misses"] += 1
+        value = render()
+        context.fragments[key] = value
+        return value
+
+    def clear(self) -> None:
+        """清空全部缓存（例如切换工程后）"""
+        self._contexts.clear()
+
+    # ---------------- 片段查询 ----------------
+    def get_node(self, node_id: str, snapshot: Optional[Snapshot] = None) -> Optional[Node]:
+        """按ID获取当前快照中的节点"""
+        context = self._get_context(snapshot)
+        context.ensure_index()
+        return context.nodes.get(node_id)
+
+    def get_parent_id(self, node_id: str, snapshot: Optional[Snapshot] = None) -> Optional[str]:
+        """按ID获取父节点ID"""
+        context = self._get_context(snapshot)
+        context.ensure_index()
+        return context.parents.get(node_id)
+
+    def get_tree_entries(self, snapshot: Optional[Snapshot] = None) -> List[Tuple[str, int, str]]:
+        """获取紧凑树的 (节点ID, 深度, 文本行) 列表"""
+        context = self._get_context(snapshot)
+        return self._fragment(context, "tree", None, lambda: render_compact_tree(context.snapshot.roots))
+
+    def get_tree_text(self, snapshot: Optional[Snapshot] = None) -> str:
+        """获取研究树全貌文本"""
+        context = self._get_context(snapshot)
+        return self._fragment(
+            context, "tree_text", None,
+            lambda: "\n".join(line for _, _, line in self.get_tree_entries(context.snapshot))
+        )
+
+    def get_problem_detail(self, problem_id: str, snapshot: Optional[Snapshot] = None) -> str:
+        """获取问题详情文本"""
+        context = self._get_context(snapshot)
+        context.ensure_index()
+        node = context.nodes.get(problem_id)
+        if not isinstance(node, ProblemNode):
+            raise KeyError("Problem node not found")
+        return self._fragment(context, "problem", problem_id, lambda: render_problem_detail(node))
+
+    def get_solution_detail(self, solution_id: str, snapshot: Optional[Snapshot] = None) -> str:
+        """获取解决方案详情文本"""
+        context = self._get_context(snapshot)
+        context.ensure_index()
+        node = context.nodes.get(solution_id)
+        if not isinstance(node, SolutionNode):
+            raise KeyError("Solution node not found")
+        return self._fragment(context, "solution", solution_id, lambda: render_solution_detail(node))
+
+    def get_solution_tokens(self, solution_id: str, snapshot: Optional[Snapshot] = None) -> int:
+        """获取解决方案详情的估算Token数"""
+        context = self._get_context(snapshot)
+        return self._fragment(
+            context, "solution_tokens", solution_id,
+            lambda: estimate_tokens(self.get_solution_detail(solution_id, context.snapshot))
+        )
+
+    def get_root_problem_id(self, node_id: str, snapshot: Optional[Snapshot] = None) -> str:
+        """获取节点所在树的根问题ID"""
+        context = self._get_context(snapshot)
+        context.ensure_index()
+        if node_id not in context.nodes:
+            raise KeyError(f"未找到节点 {node_id} 所在的根问题")
+        current = node_id
+        while context.parents.get(current):
+            current = context.parents[current]
+        return current
+
+    def get_related_solutions(self, problem_id: str, snapshot: Optional[Snapshot] = None) -> RelatedSolutions:
+        """获取祖先、后代和兄弟解决方案ID，语义与 get_related_solutions_query 一致"""
+        context = self._get_context(snapshot)
+        context.ensure_index()
+
+        def compute() -> RelatedSolutions:
+            target = context.nodes.get(problem_id)
+            if not isinstance(target, ProblemNode):
+                raise KeyError("Problem node not found")
+
+            # 祖先：从父解决方案开始逐级向上
+            ancestors: List[str] = []
+            parent_id = context.parents.get(problem_id)
+            while parent_id:
+                parent = context.nodes[parent_id]
+                if not isinstance(parent, SolutionNode):
+                    break
+                ancestors.append(parent.id)
+                grandparent_id = context.parents.get(parent.id)
+                if not grandparent_id:
+                    break
+                parent_id = context.parents.get(grandparent_id)
+
+            # 后代：选中方案下的所有解决方案（先序）
+            solution_id = target.selected_solution_id
+            descendants: List[str] = []
+            selected = next((c for c in target.children if c.id == solution_id), None) if solution_id else None
+            if selected is not None:
+                stack = list(reversed(selected.children))
+                while stack:
+                    n = stack.pop()
+                    if isinstance(n, SolutionNode):
+                        descendants.append(n.id)
+                    stack.extend(reversed(n.children))
+
+            # 兄弟：同一问题下的其它解决方案
+            siblings = [c.id for c in target.children if isinstance(c, SolutionNode) and c.id != solution_id]
+            return RelatedSolutions(ancestors=ancestors, descendants=descendants, siblings=siblings)
+
+        return self._fragment(context, "related", problem_id, compute)
+
+    # ---------------- 环境信息 ----------------
+    def build(self, problem_id: str, user_requirement: Optional[str],
+              budgets: Optional[ContextBudgets] = None) -> Dict[str, str]:
+        """
+        组装环境信息字典，键与提示词模板中的占位符一致
+
+        研究树全貌与祖先/兄弟/后代方案各有Token预算，超出时按相关度保留片段，
+        其余截断或省略，省略情况记录在 last_context_report 中。
+
+        Args:
+            problem_id: 问题ID
+            user_requirement: 用户要求
+            budgets: 各段预算，默认读取配置
+
+        Returns:
+            环境信息字典
+        """
+        budgets = budgets or ContextBudgets.from_settings()
+        snapshot = self.database_manager.get_current_snapshot()
+        context = self._get_context(snapshot)
+        context.ensure_index()
+
+        try:
+            problem_detail = self.get_problem_detail(problem_id, snapshot)
+        except KeyError:
+            problem_detail = "当前研究问题为空"
+        root_problem = self.get_problem_detail(self.get_root_problem_id(problem_id, snapshot), snapshot)
+
+        related = self.get_related_solutions(problem_id, snapshot)
+        entries = self.get_tree_entries(snapshot)
+        depths = {node_id: depth for node_id, depth, _ in entries}
+
+        # 根到当前问题的路径
+        path_ids = set()
+        current: Optional[str] = problem_id
+        while current:
+            path_ids.add(current)
+            current = context.parents.get(current)
+
+        def fragments(solution_ids: List[str], priorities: List[tuple]) -> List[ContextFragment]:
+            return [
+                ContextFragment(
+                    label=context.nodes[sid].title,
+                    text=self.get_solution_detail(sid, snapshot),
+                    priority=priority,
+                    tokens=self.get_solution_tokens(sid, snapshot),
+                )
+                for sid, priority in zip(solution_ids, priorities)
+            ]
+
+        # 祖先按从根到近的顺序输出（使相邻问题的提示词前缀一致），但越近越优先保留；后代由浅到深优先
+        ancestors = list(reversed(related.ancestors))
+        ancestor_priorities = [(len(ancestors) - i,) for i in range(len(ancestors))]
+        sibling_priorities = [(i,) for i in range(len(related.siblings))]
+        descendant_priorities = [(depths.get(sid, 0), i) for i, sid in enumerate(related.descendants)]
+        sections = {
+            "tree": assemble_tree(entries, problem_id, path_ids, budgets.tree),
+            "ancestors": assemble_fragments(fragments(ancestors, ancestor_priorities), budgets.ancestors, "无上级专家解决方案"),
+            "siblings": assemble_fragments(fragments(related.siblings, sibling_priorities), budgets.siblings, "无其他解决方案"),
+            "descendants": assemble_fragments(fragments(related.descendants, descendant_priorities), budgets.descendants, "无后代解决方案"),
+        }
+        self.last_context_report = {name: section.to_report() for name, section in sections.items()}
+        limited = {name: report for name, report in self.last_context_report.items()
+                   if report["dropped"] or report["truncated"]}
+        if limited:
+            self.stats["budget_limited_builds"] += 1
+            logger.info(f"环境信息超出预算，已截断/省略: {limited}")
+
+        return {
+            "current_research_tree_full_text": sections["tree"].text,
+            "current_research_problem": problem_detail,
+            "expert_solutions_of_all_ancestor_problems": sections["ancestors"].text,
+            "other_solutions_of_current_problem": sections["siblings"].text,
+            "root_problem": root_problem,
+            "expert_solutions_of_all_descendant_problems": sections["descendants"].text,
+            "user_prompt": user_requirement or "无要求"
+        }
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        return {**self.stats, "cached_snapshots": len(self._contexts)}
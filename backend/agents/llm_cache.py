@@ -0,0 +1,169 @@
+"""
+LLM响应磁盘缓存
+按 (模型, 提示词, 温度, 最大token数) 的内容哈希缓存流式响应的思考/内容片段序列及其时间，
+支持录制与确定性回放，便于演示、回归检查和前端开发时离线重跑相同流程
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.utils.logger import logger
+
+# 流式事件：("thinking" | "content" | "usage", 数据)
+StreamEvent = Tuple[str, Any]
+
+CACHE_MODES = ("off", "record", "replay")
+
+
+class LLMCacheMissError(Exception):
+    """回放模式下缓存未命中"""
+    pass
+
+
+class LLMCacheRecorder:
+    """录制一次流式响应的事件序列"""
+
+    def __init__(self, key: str, model: str):
+        self.key = key
+        self.model = model
+        self.start_time = time.monotonic()
+        self.events: List[Dict[str, Any]] = []
+
+    def add(self, event_type: str, text: str) -> None:
+        """记录一个片段及其相对开始时间的偏移（秒）"""
+        self.events.append({
+            "t": round(time.monotonic() - self.start_time, 4),
+            "type": event_type,
+            "text": text,
+        })
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "model": self.model,
+            "created_at": time.time(),
+            "events": self.events,
+        }
+
+
+class LLMResponseCache:
+    """
+    内容寻址的LLM响应缓存
+
+    模式：
+    - off: 不使用缓存
+    - record: 命中时回放缓存，未命中时调用API并录制
+    - replay: 只从缓存回放，未命中时直接报错，不访问网络
+    """
+
+    def __init__(self, cache_dir: Path, mode: str = "off", replay_delay_scale: float = 0.0):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            mode: 缓存模式
+            replay_delay_scale: 回放时对录制间隔的缩放，0为全速回放，1为按录制速度回放
+        """
+        if mode not in CACHE_MODES:
+            logger.warning(f"未知的LLM缓存模式 {mode}，已关闭缓存")
+            mode = "off"
+        self.cache_dir = Path(cache_dir)
+        self.mode = mode
+        self.replay_delay_scale = replay_delay_scale
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            logger.info(f"LLM响应缓存已启用 - 模式: {mode}, 目录: {self.cache_dir}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """计算缓存键（SHA-256）"""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        # 按前两位分目录，避免单个目录下文件过多
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存记录，不存在或损坏时返回None"""
+        path = self._path(key)
+        if not path.exists():
+            self.stats["misses"] += 1
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            self.stats["hits"] += 1
+            return record
+        except Exception as e:
+            logger.warning(f"读取LLM缓存失败 {path}: {e}")
+            self.stats["misses"] += 1
+            return None
+
+    def save(self, recorder: LLMCacheRecorder) -> None:
+        """原子写入缓存记录（先写临时文件再替换）"""
+        path = self._path(recorder.key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(recorder.to_record(), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.stats["writes"] += 1
+        except Exception as e:
+            logger.warning(f"写入LLM缓存失败 {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def replay(self, record: Dict[str, Any]) -> AsyncIterator[StreamEvent]:
+        """按录制顺序（可选按录制速度）回放事件"""
+        previous_t = 0.0
+        for event in record.get("events", []):
+            if self.replay_delay_scale > 0:
+                delay = (event["t"] - previous_t) * self.replay_delay_scale
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # 全速回放时仍让出事件循环，避免长时间占用
+                await asyncio.sleep(0)
+            previous_t = event["t"]
+            yield event["type"], event["text"]
+
+    async def record(self, recorder: LLMCacheRecorder, events: AsyncIterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+        """
+        透传事件并录制思考/内容片段
+
+        由调用方在响应被完整接受后调用 save 写入缓存，流式校验中止的响应不会被缓存
+        """
+        try:
+            async for event_type, data in events:
+                if event_type in ("thinking", "content"):
+                    recorder.add(event_type, data)
+                yield event_type, data
+        finally:
+            await events.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, **self.stats}
+
+
+shared_llm_cache = LLMResponseCache(
+    cache_dir=Path(settings.LLM_CACHE_DIR) if settings.LLM_CACHE_DIR else Path(__file__).parent.parent / "data" / "llm_cache",
+    mode=settings.LLM_CACHE_MODE,
+    replay_delay_scale=settings.LLM_CACHE_REPLAY_DELAY_SCALE,
+)
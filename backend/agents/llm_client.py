@@ -3,14 +3,19 @@ DeepSeek LLM客户端
 支持推理模型(reasoner)和普通模型(v3)的流式生成
 """
 import asyncio
-import os
-from typing import Optional, Callable, Dict, Any, List
-from openai import AsyncOpenAI
+from typing import Optional, Callable, Dict, Any, List, AsyncIterator, Tuple
 
 from backend.config import settings
 from backend.utils.logger import logger, log_multiline_text
-from backend.agents.retry_wrapper import NetworkError, TimeoutError, APIError
+from backend.agents.retry_wrapper import LLMError, NetworkError, TimeoutError, APIError, shared_retry_budget
+from backend.agents.llm_transport import LLMTransport, hedged_stream, shared_llm_transport
+from backend.agents.rate_limiter import shared_rate_limiter
+from backend.agents.llm_cache import shared_llm_cache, LLMCacheRecorder, LLMCacheMissError, StreamEvent
 from backend.message.schemas.message_models import Patch
+from backend.utils.xml_parser import XMLValidationError
+from backend.utils.stream_xml_parser import StreamingXMLValidator
+from backend.utils.token_estimator import estimate_tokens
+from backend.utils.metrics import shared_metrics
 
 class DeepSeekClient:
     """
@@ -22,15 +27,20 @@ class DeepSeekClient:
     3. 错误处理和统计信息
     """
     
+    # 流式校验完成后，为等待用量数据块最多再读取的数据块数
+    TRAILING_CHUNK_LIMIT = 8
+    
     def __init__(self, 
                  model_type: str = "reasoner",
-                 publish_callback: Optional[Callable] = None):
+                 publish_callback: Optional[Callable] = None,
+                 transport: Optional[LLMTransport] = None):
         """
         初始化DeepSeek客户端
         
         Args:
             model_type: 模型类型，"reasoner" 或 "v3"
             publish_callback: 发布patch的回调函数
+            transport: HTTP传输层，默认使用进程内共享的连接池
         """
         self.model_type = model_type
         self.publish_callback = publish_callback
@@ -43,23 +53,8 @@ class DeepSeekClient:
             self.model_name = settings.DEEPSEEK_V3_MODEL
             self.supports_reasoning = False
         
-        # 设置代理环境变量（如果配置了代理）
-        proxy_config = settings.get_proxy_config()
-        if proxy_config:
-            # 设置环境变量，让httpx库自动使用代理
-            if "http_proxy" in proxy_config:
-                os.environ["HTTP_PROXY"] = proxy_config["http_proxy"]
-            if "https_proxy" in proxy_config:
-                os.environ["HTTPS_PROXY"] = proxy_config["https_proxy"]
-            if "no_proxy" in proxy_config:
-                os.environ["NO_PROXY"] = proxy_config["no_proxy"]
-            logger.info(f"代理配置已设置: {proxy_config}")
-        
-        # 初始化OpenAI客户端
-        self.client = AsyncOpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL
-        )
+        # 共享的HTTP传输层（连接池、代理在传输层显式配置）
+        self.transport = transport or shared_llm_transport
         
         # 统计信息
         self.stats = {
@@ -69,9 +64,25 @@ class DeepSeekClient:
             "total_tokens": 0,
             "total_thinking_tokens": 0,
             "total_content_tokens": 0,
-            "total_time": 0.0
+            "total_time": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "reasoning_tokens": 0,
+            "prompt_cache_hit_tokens": 0,
+            "prompt_cache_miss_tokens": 0,
+            "cache_hits": 0,
+            "stream_early_completions": 0,
+            "stream_aborts": 0,
+            "hedged_requests": 0,
+            "hedge_wins": 0,
+            "stream_continuations": 0
         }
         
+        # 最近一次调用API返回的用量信息
+        self.last_usage: Optional[Dict[str, int]] = None
+        # 最近一次成功调用的延迟与速率
+        self.last_call: Optional[Dict[str, Any]] = None
+        
         logger.info(f"DeepSeek客户端初始化完成 - 模型: {self.model_name}, 支持推理: {self.supports_reasoning}")
     
     def set_publish_callback(self, callback: Callable) -> None:
@@ -83,7 +94,8 @@ class DeepSeekClient:
                             message_id: str,
                             max_tokens: int = None,
                             temperature: float = None,
-                            publish_content: bool = True) -> str:
+                            publish_content: bool = True,
+                            stream_validator: Optional[StreamingXMLValidator] = None) -> str:
         """
         流式生成响应
         
@@ -92,22 +104,26 @@ class DeepSeekClient:
             message_id: 消息ID
             max_tokens: 最大token数
             temperature: 温度参数
+            stream_validator: 可选的流式XML校验器，输出不可恢复时提前中止，根标签闭合后提前结束
             
         Returns:
-            完整的生成内容
+            完整的生成内容（提前结束时截止到根标签闭合处）
             
         Raises:
             NetworkError, TimeoutError, APIError: 各种错误
+            XMLValidationError: 流式校验发现输出不可恢复
         """
         import time
         start_time = time.time()
+        # 单次调用的计时与用量，由流式处理过程填充
+        call: Dict[str, Any] = {"start": time.monotonic(), "first_thinking": None, "first_content": None, "usage": None}
         
         self.stats["total_calls"] += 1
         
         try:
             # 设置默认参数
-            max_tokens = max_tokens or settings.DEFAULT_MAX_TOKENS
-            temperature = temperature or settings.DEFAULT_TEMPERATURE
+            max_tokens = settings.DEFAULT_MAX_TOKENS if max_tokens is None else max_tokens
+            temperature = settings.DEFAULT_TEMPERATURE if temperature is None else temperature
             
             # 构建消息
             messages = [{"role": "user", "content": prompt}]
@@ -115,26 +131,57 @@ class DeepSeekClient:
             logger.info(f"开始调用{self.model_type}模型生成 - 消息ID: {message_id}")
             logger.info("【提示词内容】:")
             log_multiline_text(prompt)
-            # 调用DeepSeek API
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                stream=True,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+            events, recorder, from_cache = await self._open_event_stream(prompt, messages, max_tokens, temperature, message_id)
             
-            # 处理流式响应
-            full_content = await self._process_stream_response(response, message_id, publish_content)
+            # 处理流式响应；流中途断开且已有部分内容时，以前缀续写方式继续写入同一条消息
+            while True:
+                try:
+                    full_content = await self._process_stream_response(events, message_id, publish_content, stream_validator, call)
+                    break
+                except (NetworkError, TimeoutError) as e:
+                    if from_cache or not self._can_continue(call):
+                        raise
+                    call["continuations"] = call.get("continuations", 0) + 1
+                    self.stats["stream_continuations"] += 1
+                    shared_metrics.inc("llm_stream_continuations_total", 1, "流中断后前缀续写次数", model=self.model_name)
+                    logger.warning(f"流式响应中断，从已输出的{len(call['content'])}个字符处续写"
+                                   f"（第{call['continuations']}次）- 消息ID: {message_id}, 错误: {e}")
+                    # 拼接出的响应不写入缓存
+                    recorder = None
+                    events = self._open_continuation_stream(prompt, messages, call["content"], max_tokens, temperature)
+            
+            # 只缓存完整读取（或校验通过后提前结束）的响应，中止的响应不缓存
+            if recorder is not None:
+                shared_llm_cache.save(recorder)
             
             # 更新统计
             self.stats["successful_calls"] += 1
             self.stats["total_time"] += time.time() - start_time
+            self._record_call_metrics(call, "cache" if from_cache else "api")
             logger.info(f"模型生成完成 - 消息ID: {message_id}, 内容长度: {len(full_content)}")
             return full_content
             
+        except LLMCacheMissError as e:
+            self.stats["failed_calls"] += 1
+            self._count_call("error")
+            logger.error(f"模型生成失败 - 消息ID: {message_id}, 错误: {e}")
+            raise APIError(str(e))
+        except XMLValidationError as e:
+            # 流式校验中止：保持原错误类型，交由重试包装器重试
+            self.stats["failed_calls"] += 1
+            self.stats["stream_aborts"] += 1
+            self._count_call("aborted")
+            logger.warning(f"流式校验中止生成 - 消息ID: {message_id}, 原因: {e}")
+            raise
+        except LLMError as e:
+            # 传输层已转换为标准错误类型（含状态码与Retry-After）
+            self.stats["failed_calls"] += 1
+            self._count_call("error")
+            logger.error(f"模型生成失败 - 消息ID: {message_id}, 错误: {e}")
+            raise
         except Exception as e:
             self.stats["failed_calls"] += 1
+            self._count_call("error")
             logger.error(f"模型生成失败 - 消息ID: {message_id}, 错误: {e}")
             
             # 转换为标准错误类型
@@ -145,36 +192,165 @@ class DeepSeekClient:
             else:
                 raise APIError(f"DeepSeek API错误: {e}")
     
-    async def _process_stream_response(self, response, message_id: str, publish_content: bool) -> str:
+    async def _open_event_stream(self, prompt: str, messages: List[Dict[str, Any]], max_tokens: int,
+                                 temperature: float, message_id: str) -> Tuple[AsyncIterator[StreamEvent], Optional[LLMCacheRecorder], bool]:
+        """
+        打开流式事件源：命中缓存时回放，否则调用API（按缓存模式决定是否录制）
+        
+        Returns:
+            (("thinking" | "content" | "usage", 数据) 事件的异步迭代器, 录制器（未录制时为None）, 是否为缓存回放)
+        """
+        cache = shared_llm_cache
+        cache_key = None
+        if cache.enabled:
+            cache_key = cache.make_key(self.model_name, prompt, temperature, max_tokens)
+            record = cache.load(cache_key)
+            if record is not None:
+                self.stats["cache_hits"] += 1
+                logger.info(f"LLM缓存命中，回放响应 - 消息ID: {message_id}, 键: {cache_key[:12]}")
+                return cache.replay(record), None, True
+            if cache.mode == "replay":
+                raise LLMCacheMissError(f"回放模式下LLM缓存未命中 - 键: {cache_key[:12]}")
+        
+        # 调用DeepSeek API（实际请求在首次读取事件时发出）
+        chunks = self._stream_chunks(self._build_payload(messages, max_tokens, temperature))
+        # 预留提示词估算token + 最大输出token，结束后按真实用量退还
+        events = self._iter_api_events(chunks, estimate_tokens(prompt) + max_tokens)
+        recorder = None
+        if cache_key is not None:
+            recorder = LLMCacheRecorder(cache_key, self.model_name)
+            events = cache.record(recorder, events)
+        return events, recorder, False
+    
+    def _build_payload(self, messages: List[Dict[str, Any]], max_tokens: int, temperature: float) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": True,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            # 让最后一个数据块携带用量信息（含前缀缓存命中情况）
+            "stream_options": {"include_usage": True},
+        }
+    
+    def _stream_chunks(self, payload: Dict[str, Any], prefix_completion: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """发起流式请求，按配置对首个数据块过慢的请求发出对冲请求"""
+        def open_stream():
+            if prefix_completion:
+                return self.transport.stream_chat_completion(payload, prefix_completion=True)
+            return self.transport.stream_chat_completion(payload)
+        
+        if settings.LLM_HEDGE_AFTER_SECONDS > 0:
+            # 对冲请求计入重试预算，与原请求共用一个限流名额
+            return hedged_stream(
+                open_stream,
+                settings.LLM_HEDGE_AFTER_SECONDS,
+                allow_hedge=shared_retry_budget.try_spend,
+                on_hedge=self._on_hedge,
+            )
+        return open_stream()
+    
+    def _can_continue(self, call: Dict[str, Any]) -> bool:
+        """
+        流中断后能否续写：需要已进入内容阶段（仅有思考内容时无法作为前缀续写），且未超过续写次数上限
+        """
+        if call.get("continuations", 0) >= settings.LLM_MAX_CONTINUATIONS:
+            return False
+        return bool(call.get("content"))
+    
+    def _open_continuation_stream(self, prompt: str, messages: List[Dict[str, Any]], partial_content: str,
+                                  max_tokens: int, temperature: float) -> AsyncIterator[StreamEvent]:
+        """
+        以已输出的内容作为assistant前缀重新请求（DeepSeek Chat Prefix Completion），模型从断点处继续输出
+        """
+        prefix_messages = messages + [{"role": "assistant", "content": partial_content, "prefix": True}]
+        chunks = self._stream_chunks(self._build_payload(prefix_messages, max_tokens, temperature), prefix_completion=True)
+        return self._iter_api_events(chunks, estimate_tokens(prompt) + estimate_tokens(partial_content) + max_tokens)
+    
+    def _on_hedge(self, event: str) -> None:
+        """记录对冲请求的发出与胜出次数"""
+        key = "hedged_requests" if event == "started" else "hedge_wins"
+        self.stats[key] += 1
+        shared_metrics.inc(f"llm_{key}_total", 1, "对冲请求发出/胜出次数", model=self.model_name)
+    
+    async def _iter_api_events(self, chunks: AsyncIterator[Dict[str, Any]], reserved_tokens: int = 0) -> AsyncIterator[StreamEvent]:
+        """
+        将OpenAI兼容的流式数据块（字典）转换为通用事件，提前结束时关闭底层连接
+        
+        整个请求期间占用全局限流器的一个名额（缓存回放不经过此处，不占名额）
+        """
+        try:
+            async with shared_rate_limiter.slot(reserved_tokens) as slot:
+                shared_metrics.observe("llm_rate_limit_wait_seconds", slot.wait_time, "限流排队等待时间（秒）", model=self.model_name)
+                async for chunk in chunks:
+                    choices = chunk.get("choices")
+                    if choices:
+                        delta = choices[0].get("delta") or {}
+                        # 推理内容（仅reasoner模型）
+                        if self.supports_reasoning and delta.get("reasoning_content"):
+                            yield "thinking", delta["reasoning_content"]
+                        elif delta.get("content"):
+                            yield "content", delta["content"]
+                    usage = chunk.get("usage")
+                    if usage:
+                        slot.settle(int(usage.get("prompt_tokens") or 0) + int(usage.get("completion_tokens") or 0))
+                        yield "usage", usage
+        finally:
+            await chunks.aclose()
+    
+    async def _process_stream_response(self, events: AsyncIterator[StreamEvent], message_id: str, publish_content: bool,
+                                       stream_validator: Optional[StreamingXMLValidator] = None,
+                                       call: Optional[Dict[str, Any]] = None) -> str:
         """
         处理流式响应
         
         Args:
-            response: 流式响应对象
+            events: 流式事件迭代器
             message_id: 消息ID
+            stream_validator: 可选的流式XML校验器
+            call: 单次调用的计时与用量记录，处理过程中填充首token时间、用量和估算token数
             
         Returns:
             完整内容
         """
-        full_content = ""
-        full_thinking = ""
-        reasoning_phase = True  # 是否在推理阶段
+        import time
+        call = call if call is not None else {}
+        # 续写时从中断前已输出的内容接着累积，续写阶段重新产生的思考内容不再发布到消息中
+        full_content = call.get("content", "")
+        full_thinking = call.get("thinking", "")
+        publish_thinking = not call.get("continuations")
+        reasoning_phase = not full_content  # 是否在推理阶段
+        trailing_chunks = None  # 根标签闭合后读到的多余数据块数，None表示尚未闭合
         
         try:
-            async for chunk in response:
-                if not chunk.choices:
+            async for event_type, data in events:
+                if event_type == "usage":
+                    usage = self._record_usage(data, message_id)
+                    previous = call.get("usage")
+                    # 续写时累加各段请求的用量
+                    call["usage"] = {key: value + previous.get(key, 0) for key, value in usage.items()} if previous else usage
+                    if trailing_chunks is not None:
+                        break
+                    continue
+                
+                # 根标签已闭合：丢弃多余输出，只短暂等待紧随其后的用量数据块
+                if trailing_chunks is not None:
+                    trailing_chunks += 1
+                    if trailing_chunks >= self.TRAILING_CHUNK_LIMIT:
+                        logger.info(f"<{stream_validator.root_tag}> 闭合后仍在输出，提前结束流式读取 - 消息ID: {message_id}")
+                        break
                     continue
-                    
-                delta = chunk.choices[0].delta
                 
                 # 处理推理内容（仅reasoner模型）
-                if self.supports_reasoning and delta.reasoning_content:
-                    reasoning_content = delta.reasoning_content
+                if event_type == "thinking":
+                    reasoning_content = data
                     full_thinking += reasoning_content
-                    self.stats["total_thinking_tokens"] += len(reasoning_content.split())
+                    call["thinking"] = full_thinking
+                    if call.get("first_thinking") is None:
+                        call["first_thinking"] = time.monotonic()
                     
                     # 发布思考增量patch
-                    if self.publish_callback:
+                    if self.publish_callback and publish_thinking:
                         thinking_patch = Patch(
                             message_id=message_id,
                             thinking_delta=reasoning_content
@@ -182,7 +358,7 @@ class DeepSeekClient:
                         await self.publish_callback(thinking_patch)
                 
                 # 处理普通内容
-                elif delta.content:
+                elif event_type == "content":
                     if reasoning_phase:
                         # 思考阶段结束，进入内容阶段
                         reasoning_phase = False
@@ -190,9 +366,11 @@ class DeepSeekClient:
                         log_multiline_text(full_thinking)
                         logger.debug(f"思考阶段结束，开始生成内容 - 消息ID: {message_id}")
                     
-                    content = delta.content
+                    content = data
                     full_content += content
-                    self.stats["total_content_tokens"] += len(content.split())
+                    call["content"] = full_content
+                    if call.get("first_content") is None:
+                        call["first_content"] = time.monotonic()
                     
                     # 发布内容增量patch
                     if self.publish_callback and publish_content:
@@ -201,6 +379,11 @@ class DeepSeekClient:
                             content_delta=content
                         )
                         await self.publish_callback(content_patch)
+                    
+                    # 根标签闭合后不再处理剩余输出
+                    if stream_validator is not None and stream_validator.feed(content):
+                        self.stats["stream_early_completions"] += 1
+                        trailing_chunks = 0
             
             # 发布完成patch
             if self.publish_callback:
@@ -210,16 +393,107 @@ class DeepSeekClient:
                 )
                 await self.publish_callback(finish_patch)
             
-            # 更新总token统计
-            self.stats["total_tokens"] += len(full_content.split()) + len(full_thinking.split())
+            # 无用量信息时（如缓存回放）按估算值统计token
+            call["end"] = time.monotonic()
+            call["estimated_thinking_tokens"] = estimate_tokens(full_thinking)
+            call["estimated_content_tokens"] = estimate_tokens(full_content)
             logger.info("【输出内容】:")
             log_multiline_text(full_content)
             logger.debug(f"流式处理完成 - 消息ID: {message_id}, 思考长度: {len(full_thinking)}, 内容长度: {len(full_content)}")
             return full_content
             
+        except (XMLValidationError, LLMError):
+            raise
         except Exception as e:
             logger.error(f"处理流式响应失败 - 消息ID: {message_id}, 错误: {e}")
             raise APIError(f"处理流式响应失败: {e}")
+        finally:
+            # 提前结束或中止时关闭事件源，释放底层HTTP连接
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+    
+    def _record_usage(self, usage: Any, message_id: str) -> Dict[str, int]:
+        """
+        记录API返回的用量信息
+
+        DeepSeek在usage中额外返回prompt_cache_hit_tokens/prompt_cache_miss_tokens，
+        表示提示词前缀命中/未命中硬盘缓存的token数；推理token数位于completion_tokens_details中
+        """
+        def field(source: Any, name: str) -> int:
+            if source is None:
+                return 0
+            if isinstance(source, dict):
+                return int(source.get(name) or 0)
+            value = getattr(source, name, None)
+            if value is None and getattr(source, "model_extra", None):
+                value = source.model_extra.get(name)
+            return int(value or 0)
+
+        details = usage.get("completion_tokens_details") if isinstance(usage, dict) else getattr(usage, "completion_tokens_details", None)
+        self.last_usage = {
+            "prompt_tokens": field(usage, "prompt_tokens"),
+            "completion_tokens": field(usage, "completion_tokens"),
+            "reasoning_tokens": field(details, "reasoning_tokens"),
+            "prompt_cache_hit_tokens": field(usage, "prompt_cache_hit_tokens"),
+            "prompt_cache_miss_tokens": field(usage, "prompt_cache_miss_tokens"),
+        }
+        for key, value in self.last_usage.items():
+            self.stats[key] += value
+        logger.info(f"用量统计 - 消息ID: {message_id}, {self.last_usage}")
+        return self.last_usage
+    
+    def _count_call(self, status: str, source: str = "api") -> None:
+        shared_metrics.inc("llm_calls_total", 1, "LLM调用次数", model=self.model_name, status=status, source=source)
+    
+    def _record_call_metrics(self, call: Dict[str, Any], source: str) -> None:
+        """
+        记录一次成功调用的token用量与延迟指标
+        
+        有API用量信息时使用真实token数（推理token + 内容token = completion_tokens），
+        否则使用离线估算值；缓存回放的时间不代表服务端性能，不计入延迟指标
+        """
+        usage = call.get("usage")
+        if usage:
+            thinking_tokens = usage["reasoning_tokens"]
+            content_tokens = max(0, usage["completion_tokens"] - thinking_tokens)
+        else:
+            thinking_tokens = call.get("estimated_thinking_tokens", 0)
+            content_tokens = call.get("estimated_content_tokens", 0)
+        self.stats["total_thinking_tokens"] += thinking_tokens
+        self.stats["total_content_tokens"] += content_tokens
+        self.stats["total_tokens"] += thinking_tokens + content_tokens
+        
+        start, end = call["start"], call.get("end", call["start"])
+        first_token = min((t for t in (call.get("first_thinking"), call.get("first_content")) if t is not None), default=None)
+        output_tokens = thinking_tokens + content_tokens
+        self.last_call = {
+            "source": source,
+            "duration": round(end - start, 4),
+            "time_to_first_thinking": round(call["first_thinking"] - start, 4) if call.get("first_thinking") else None,
+            "time_to_first_content": round(call["first_content"] - start, 4) if call.get("first_content") else None,
+            "tokens_per_second": round(output_tokens / (end - first_token), 2) if first_token and end > first_token else None,
+            "thinking_tokens": thinking_tokens,
+            "content_tokens": content_tokens,
+            "usage_reported": bool(usage),
+        }
+        
+        labels = {"model": self.model_name}
+        self._count_call("success", source)
+        shared_metrics.inc("llm_reasoning_tokens_total", thinking_tokens, "推理token数", **labels)
+        shared_metrics.inc("llm_content_tokens_total", content_tokens, "内容token数", **labels)
+        if usage:
+            shared_metrics.inc("llm_prompt_tokens_total", usage["prompt_tokens"], "提示词token数", **labels)
+            shared_metrics.inc("llm_prompt_cache_hit_tokens_total", usage["prompt_cache_hit_tokens"], "命中前缀缓存的提示词token数", **labels)
+            shared_metrics.inc("llm_completion_tokens_total", usage["completion_tokens"], "输出token数", **labels)
+            shared_metrics.observe("llm_call_prompt_tokens", usage["prompt_tokens"], "单次调用提示词token数", **labels)
+            shared_metrics.observe("llm_call_completion_tokens", usage["completion_tokens"], "单次调用输出token数", **labels)
+        if source != "api":
+            return
+        shared_metrics.observe("llm_call_duration_seconds", self.last_call["duration"], "单次调用总耗时（秒）", **labels)
+        shared_metrics.observe("llm_time_to_first_thinking_seconds", self.last_call["time_to_first_thinking"], "首个推理token延迟（秒）", **labels)
+        shared_metrics.observe("llm_time_to_first_content_seconds", self.last_call["time_to_first_content"], "首个内容token延迟（秒）", **labels)
+        shared_metrics.observe("llm_output_tokens_per_second", self.last_call["tokens_per_second"], "输出速率（token/秒，从首个token起算）", **labels)
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -236,6 +510,11 @@ class DeepSeekClient:
         if self.stats["successful_calls"] > 0:
             avg_time = self.stats["total_time"] / self.stats["successful_calls"]
         
+        cache_hit_rate = 0.0
+        cached_total = self.stats["prompt_cache_hit_tokens"] + self.stats["prompt_cache_miss_tokens"]
+        if cached_total > 0:
+            cache_hit_rate = self.stats["prompt_cache_hit_tokens"] / cached_total
+        
         return {
             "model_type": self.model_type,
             "model_name": self.model_name,
@@ -247,7 +526,24 @@ class DeepSeekClient:
             "total_tokens": self.stats["total_tokens"],
             "total_thinking_tokens": self.stats["total_thinking_tokens"],
             "total_content_tokens": self.stats["total_content_tokens"],
-            "average_time_per_call": avg_time
+            "average_time_per_call": avg_time,
+            "prompt_tokens": self.stats["prompt_tokens"],
+            "completion_tokens": self.stats["completion_tokens"],
+            "reasoning_tokens": self.stats["reasoning_tokens"],
+            "prompt_cache_hit_tokens": self.stats["prompt_cache_hit_tokens"],
+            "prompt_cache_miss_tokens": self.stats["prompt_cache_miss_tokens"],
+            "prompt_cache_hit_rate": cache_hit_rate,
+            "last_usage": self.last_usage,
+            "last_call": self.last_call,
+            "cache_hits": self.stats["cache_hits"],
+            "stream_early_completions": self.stats["stream_early_completions"],
+            "stream_aborts": self.stats["stream_aborts"],
+            "hedged_requests": self.stats["hedged_requests"],
+            "hedge_wins": self.stats["hedge_wins"],
+            "stream_continuations": self.stats["stream_continuations"],
+            "response_cache": shared_llm_cache.get_stats(),
+            "transport": self.transport.get_stats(),
+            "rate_limiter": shared_rate_limiter.get_stats()
         }
     
     def reset_stats(self) -> None:
@@ -259,7 +555,18 @@ class DeepSeekClient:
             "total_tokens": 0,
             "total_thinking_tokens": 0,
             "total_content_tokens": 0,
-            "total_time": 0.0
+            "total_time": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "reasoning_tokens": 0,
+            "prompt_cache_hit_tokens": 0,
+            "prompt_cache_miss_tokens": 0,
+            "cache_hits": 0,
+            "stream_early_completions": 0,
+            "stream_aborts": 0,
+            "hedged_requests": 0,
+            "hedge_wins": 0,
+            "stream_continuations": 0
         }
         logger.info(f"重置{self.model_type}模型统计信息")
 
@@ -267,12 +574,12 @@ class DeepSeekClient:
 class DeepSeekReasonerClient(DeepSeekClient):
     """DeepSeek推理模型客户端（带思考过程）"""
     
-    def __init__(self, publish_callback: Optional[Callable] = None):
-        super().__init__(model_type="reasoner", publish_callback=publish_callback)
+    def __init__(self, publish_callback: Optional[Callable] = None, transport: Optional[LLMTransport] = None):
+        super().__init__(model_type="reasoner", publish_callback=publish_callback, transport=transport)
 
 
 class DeepSeekV3Client(DeepSeekClient):
     """DeepSeek V3模型客户端（仅内容，无思考过程）"""
     
-    def __init__(self, publish_callback: Optional[Callable] = None):
-        super().__init__(model_type="v3", publish_callback=publish_callback)
+    def __init__(self, publish_callback: Optional[Callable] = None, transport: Optional[LLMTransport] = None):
+        super().__init__(model_type="v3", publish_callback=publish_callback, transport=transport)
@@ -0,0 +1,296 @@
+"""
+LLM HTTP传输层
+进程内所有智能体与模型共享同一个连接池化的 httpx.AsyncClient：
+1. 连接复用（keep-alive）与连接数限制，可选HTTP/2
+2. 显式代理配置，不修改进程环境变量
+3. 轻量SSE解析，直接产出字典形式的数据块，避免逐块构造SDK对象
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+import httpx
+
+from backend.config import settings
+from backend.utils.logger import logger
+from backend.agents.retry_wrapper import NetworkError, TimeoutError, APIError
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（仅支持秒数形式）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+async def iter_sse_data(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    从SSE文本行中提取每个事件的data字段
+
+    多行data按换行拼接；注释行（如 ": keep-alive"）与其他字段直接忽略
+    """
+    data_lines = []
+    async for line in lines:
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith("data:"):
+            value = line[5:]
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+async def hedged_stream(make_stream: Callable[[], AsyncIterator[Any]],
+                        hedge_after: float,
+                        allow_hedge: Optional[Callable[[], bool]] = None,
+                        on_hedge: Optional[Callable[[str], None]] = None) -> AsyncIterator[Any]:
+    """
+    对冲请求：首个数据块超过 hedge_after 秒仍未到达时，并行发出第二个相同请求，
+    采用先产出首个数据块的流，关闭另一个流（释放连接）
+
+    Args:
+        make_stream: 创建一个新流的函数
+        hedge_after: 发出对冲请求前等待首个数据块的秒数
+        allow_hedge: 是否允许发出对冲请求（如检查重试预算），默认允许
+        on_hedge: 事件回调，发出对冲请求时为 "started"，对冲请求胜出时为 "won"
+    """
+    streams = [make_stream()]
+    tasks = {asyncio.ensure_future(streams[0].__anext__()): streams[0]}
+    winner = None
+    first_chunk = None
+    exhausted = False
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done and (allow_hedge is None or allow_hedge()):
+            backup = make_stream()
+            streams.append(backup)
+            tasks[asyncio.ensure_future(backup.__anext__())] = backup
+            pending = set(tasks)
+            logger.info(f"首个数据块{hedge_after}秒未到达，发出对冲请求")
+            if on_hedge:
+                on_hedge("started")
+        else:
+            pending = set(tasks) - done
+
+        error: Optional[BaseException] = None
+        while winner is None and (done or pending):
+            if not done:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                exception = task.exception()
+                if exception is None or isinstance(exception, StopAsyncIteration):
+                    winner = tasks[task]
+                    exhausted = exception is not None
+                    first_chunk = None if exhausted else task.result()
+                    break
+                error = error or exception
+            done = set()
+        if winner is None:
+            raise error
+    finally:
+        # 取消并关闭未胜出的流（先等待取消完成，才能安全关闭生成器）
+        for task, stream in tasks.items():
+            if stream is not winner:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await stream.aclose()
+
+    if winner is not streams[0] and on_hedge:
+        on_hedge("won")
+    try:
+        if exhausted:
+            return
+        yield first_chunk
+        async for chunk in winner:
+            yield chunk
+    finally:
+        await winner.aclose()
+
+
+class LLMTransport:
+    """
+    共享的LLM HTTP传输
+
+    客户端在首次请求时按当前事件循环创建；事件循环变化时（如测试中多次 asyncio.run）重新创建，
+    避免复用绑定在已关闭事件循环上的连接
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 api_key: str,
+                 max_connections: int = 20,
+                 max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0,
+                 connect_timeout: float = 10.0,
+                 read_timeout: float = 300.0,
+                 http2: bool = False,
+                 proxies: Optional[Dict[str, str]] = None,
+                 no_proxy: Optional[Iterable[str]] = None,
+                 prefix_completion_url: Optional[str] = None):
+        """
+        初始化传输层
+
+        Args:
+            base_url: API基础地址
+            api_key: API密钥
+            max_connections: 最大连接数
+            max_keepalive_connections: 最大空闲保活连接数
+            keepalive_expiry: 空闲连接保活时间（秒）
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 两次读取之间的最大间隔（秒），推理模型首token前可能较长
+            http2: 是否启用HTTP/2（需要安装h2）
+            proxies: {"http": 代理地址, "https": 代理地址}
+            no_proxy: 不走代理的主机列表
+            prefix_completion_url: 前缀续写（Chat Prefix Completion）接口地址，默认把基础地址的 /v1 换成 /beta
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.prefix_completion_url = prefix_completion_url or self._default_prefix_completion_url(self.base_url)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout, write=30.0, pool=30.0)
+        self.http2 = http2 and self._h2_available()
+        self.proxies = {k: v for k, v in (proxies or {}).items() if v}
+        self.no_proxy = [host.strip() for host in (no_proxy or []) if host.strip()]
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            "clients_created": 0,
+            "requests": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def _default_prefix_completion_url(base_url: str) -> str:
+        root = base_url[:-3] if base_url.endswith("/v1") else base_url
+        return f"{root}/beta/chat/completions"
+
+    @staticmethod
+    def _h2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("未安装h2，HTTP/2不可用，已回退到HTTP/1.1")
+            return False
+
+    @classmethod
+    def from_settings(cls) -> "LLMTransport":
+        return cls(
+            base_url=settings.DEEPSEEK_BASE_URL,
+            api_key=settings.DEEPSEEK_API_KEY,
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+            connect_timeout=settings.LLM_HTTP_CONNECT_TIMEOUT,
+            read_timeout=settings.LLM_HTTP_READ_TIMEOUT,
+            http2=settings.LLM_HTTP2,
+            proxies={"http": settings.HTTP_PROXY, "https": settings.HTTPS_PROXY},
+            no_proxy=(settings.NO_PROXY or "").split(","),
+            prefix_completion_url=settings.LLM_PREFIX_COMPLETION_URL or None,
+        )
+
+    def _make_transport(self, proxy: Optional[str] = None) -> httpx.AsyncHTTPTransport:
+        # httpx 0.25 的传输层只接受 httpx.Proxy（读取 proxy.url），不接受字符串地址
+        return httpx.AsyncHTTPTransport(
+            limits=self.limits,
+            http2=self.http2,
+            proxy=httpx.Proxy(proxy) if proxy else None,
+            trust_env=False,
+        )
+
+    def _create_client(self) -> httpx.AsyncClient:
+        # 代理通过mounts显式配置，NO_PROXY中的主机直连
+        mounts: Dict[str, httpx.AsyncHTTPTransport] = {}
+        for scheme, proxy in self.proxies.items():
+            mounts[f"{scheme}://"] = self._make_transport(proxy)
+        if mounts:
+            for host in self.no_proxy:
+                mounts[f"all://{host}"] = self._make_transport()
+        self.stats["clients_created"] += 1
+        logger.info(f"创建共享LLM HTTP客户端 - 地址: {self.base_url}, HTTP/2: {self.http2}, 代理: {self.proxies or '无'}")
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}", "Accept": "text/event-stream"},
+            timeout=self.timeout,
+            transport=self._make_transport(),
+            mounts=mounts or None,
+            trust_env=False,
+        )
+
+    def get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环下的共享客户端"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._create_client()
+            self._loop = loop
+        return self._client
+
+    async def stream_chat_completion(self, payload: Dict[str, Any], prefix_completion: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        发起流式对话补全请求，逐个产出解析后的数据块
+
+        Args:
+            payload: 请求体
+            prefix_completion: 是否走前缀续写接口（最后一条assistant消息带 "prefix": true）
+
+        Raises:
+            TimeoutError: 连接或读取超时
+            NetworkError: 连接失败或流中断
+            APIError: 服务端返回错误（带状态码与Retry-After）
+        """
+        client = self.get_client()
+        self.stats["requests"] += 1
+        url = self.prefix_completion_url if prefix_completion else "/chat/completions"
+        try:
+            async with client.stream("POST", url, json=payload) as response:
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise APIError(
+                        f"HTTP {response.status_code}: {body[:500]}",
+                        status_code=response.status_code,
+                        retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                    )
+                async for data in iter_sse_data(response.aiter_lines()):
+                    if data == "[DONE]":
+                        return
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError as e:
+                        raise APIError(f"无法解析流式数据块: {e}")
+                    if "error" in chunk:
+                        raise APIError(f"流式响应错误: {chunk['error']}")
+                    yield chunk
+        except httpx.TimeoutException as e:
+            self.stats["errors"] += 1
+            raise TimeoutError(f"DeepSeek API超时: {type(e).__name__} {e}")
+        except httpx.TransportError as e:
+            self.stats["errors"] += 1
+            raise NetworkError(f"DeepSeek API网络错误: {type(e).__name__} {e}")
+        except APIError:
+            self.stats["errors"] += 1
+            raise
+
+    async def aclose(self) -> None:
+        """关闭共享客户端（应用关闭时调用）"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("共享LLM HTTP客户端已关闭")
+        self._client = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, "prefix_completion_url": self.prefix_completion_url, "http2": self.http2, **self.stats}
+
+
+# 全局共享传输层
+shared_llm_transport = LLMTransport.from_settings()
@@ -0,0 +1,120 @@
+"""
+模型路由
+按智能体步骤（或验证器）选择模型、最大输出token数、温度与超时：
+1. 需要深度推理的步骤（创建/修改方案）使用reasoner，简单决策（接受/回复修改请求）使用v3
+2. 路由表可通过 LLM_ROUTES（JSON）按步骤名或验证器类名覆盖
+3. 按路由记录延迟与失败率，便于调整路由表
+"""
+import json
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional, Tuple, Type
+
+from backend.config import settings
+from backend.utils.logger import logger
+from backend.utils.metrics import shared_metrics
+
+DEFAULT_ROUTE_KEY = "default"
+
+
+@dataclass
+class ModelRoute:
+    """单个步骤的模型配置；max_tokens/temperature 为None时使用全局默认值，timeout为None时不限制整体耗时"""
+    model: str = "reasoner"
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], base: Optional["ModelRoute"] = None) -> "ModelRoute":
+        """从配置字典构建，未给出的字段沿用base"""
+        allowed = {f.name for f in fields(cls)}
+        unknown = set(data) - allowed
+        if unknown:
+            logger.warning(f"模型路由配置包含未知字段，已忽略: {sorted(unknown)}")
+        merged = {**(asdict(base) if base else {}), **{k: v for k, v in data.items() if k in allowed}}
+        route = cls(**merged)
+        if route.model not in ("reasoner", "v3"):
+            raise ValueError(f"模型路由的model必须是reasoner或v3: {route.model}")
+        return route
+
+
+# 默认路由表：键为步骤名（也可以是验证器类名）
+DEFAULT_ROUTES: Dict[str, ModelRoute] = {
+    DEFAULT_ROUTE_KEY: ModelRoute("reasoner"),
+    "create_solution": ModelRoute("reasoner"),
+    "modify_solution": ModelRoute("reasoner"),
+    "handle_and_modify_solution": ModelRoute("reasoner"),
+    # 接受/回复修改请求只需输出不超过400字的决策，不需要深度推理
+    "handle_modification_requests": ModelRoute("v3", max_tokens=1500, timeout=120),
+}
+
+
+class ModelRouter:
+    """
+    模型路由表
+
+    查找顺序：步骤名 → 验证器类名 → default
+    """
+
+    def __init__(self, routes: Optional[Dict[str, ModelRoute]] = None):
+        self.routes: Dict[str, ModelRoute] = dict(routes or DEFAULT_ROUTES)
+        self.routes.setdefault(DEFAULT_ROUTE_KEY, ModelRoute())
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        """默认路由表叠加 LLM_ROUTES 中的覆盖项，配置无效时使用默认路由表"""
+        routes = dict(DEFAULT_ROUTES)
+        if settings.LLM_ROUTES:
+            try:
+                overrides = json.loads(settings.LLM_ROUTES)
+                for key, value in overrides.items():
+                    routes[key] = ModelRoute.from_dict(value, routes.get(key))
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"LLM_ROUTES配置无效，使用默认路由表: {e}")
+                routes = dict(DEFAULT_ROUTES)
+        return cls(routes)
+
+    def resolve(self, step: Optional[str] = None, validator: Optional[Type] = None) -> Tuple[str, ModelRoute]:
+        """
+        查找路由
+
+        Returns:
+            (路由键, 路由配置)
+        """
+        for key in (step, validator.__name__ if validator is not None else None):
+            if key and key in self.routes:
+                return key, self.routes[key]
+        return DEFAULT_ROUTE_KEY, self.routes[DEFAULT_ROUTE_KEY]
+
+    def record(self, key: str, route: ModelRoute, duration: float, success: bool) -> None:
+        """记录一次步骤调用（含重试）的耗时与结果"""
+        stats = self.stats.setdefault(key, {"calls": 0, "failures": 0, "total_time": 0.0})
+        stats["calls"] += 1
+        stats["total_time"] += duration
+        if not success:
+            stats["failures"] += 1
+        shared_metrics.inc("llm_route_calls_total", 1, "按路由统计的步骤调用次数",
+                           route=key, model=route.model, status="success" if success else "failure")
+        shared_metrics.observe("llm_route_duration_seconds", duration, "按路由统计的步骤耗时（秒，含重试）",
+                               route=key, model=route.model)
+
+    def get_stats(self) -> Dict[str, Any]:
+        result = {}
+        for key, route in self.routes.items():
+            stats = self.stats.get(key, {"calls": 0, "failures": 0, "total_time": 0.0})
+            calls = stats["calls"]
+            result[key] = {
+                **asdict(route),
+                **stats,
+                "average_time": stats["total_time"] / calls if calls else 0.0,
+                "failure_rate": stats["failures"] / calls if calls else 0.0,
+            }
+        return result
+
+    def reset_stats(self) -> None:
+        self.stats = {}
+
+
+# 全局共享路由表
+shared_model_router = ModelRouter.from_settings()
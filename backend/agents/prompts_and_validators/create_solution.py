@@ -1,12 +1,6 @@
 from .global_prompt import (
-    ROLE_AND_RULES, 
-    CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION, 
-    CURRENT_RESEARCH_PROBLEM_EXPLANATION, 
-    EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION, 
-    ROOT_PROBLEM_EXPLANATION, 
-    OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION, 
-    XML_FORMAT_RULE,
-    CURRENT_SOLUTION_EXPLANATION,
+    GLOBAL_PROMPT_PREFIX,
+    build_environment_block,
     TOP_LEVEL_THOUGHTS_SPECIFICATIONS,
 )
 from backend.database.schemas.request_models import (
@@ -140,7 +134,7 @@ class CreateSolutionResponse(BaseModel):
 
 # 更新创建解决方案
 CREATING_THE_SOLUTION_PROMPT = f"""
-{ROLE_AND_RULES}
+{GLOBAL_PROMPT_PREFIX}
 <task>
 现在，你需要为解决当前问题设计方案，大致包括如下几步。
 1. 接收信息：理解当前的完整研究；了解已经进行过的思考和求证，并掌握其中得到的所有事实结论；理解用户当前要解决的问题
@@ -245,50 +239,7 @@ CREATING_THE_SOLUTION_PROMPT = f"""
 <plan_justification>方案论证内容</plan_justification>
 </response>
 </output_format>
-<xml_format_rule>
-{XML_FORMAT_RULE}
-</xml_format_rule>
-<environment_information>
-<current_research_tree_full_text>
-<content>
-{{current_research_tree_full_text}}
-</content>
-<explanation>
-{CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION}
-</explanation>
-</current_research_tree_full_text>
-<current_research_problem>
-<content>
-{{current_research_problem}}
-</content>
-<explanation>
-{CURRENT_RESEARCH_PROBLEM_EXPLANATION}
-</explanation>
-</current_research_problem>
-<expert_solutions_of_all_ancestor_problems>
-<content>
-{{expert_solutions_of_all_ancestor_problems}}
-</content>
-<explanation>
-{EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION}
-</explanation>
-</expert_solutions_of_all_ancestor_problems>
-<other_solutions_of_current_problem>
-<content>
-{{other_solutions_of_current_problem}}
-</content>
-<explanation>
-{OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION}
-</explanation>
-</other_solutions_of_current_problem>
-<root_problem>
-<content>
-{{root_problem}}
-</content>
-<explanation>
-{ROOT_PROBLEM_EXPLANATION}
-</explanation>
-</root_problem>
+{build_environment_block(["root_problem", "expert_solutions_of_all_ancestor_problems", "current_research_problem", "other_solutions_of_current_problem", "current_research_tree_full_text"])}
 <user_prompt>
 <content>
 {{user_prompt}}
@@ -297,6 +248,5 @@ CREATING_THE_SOLUTION_PROMPT = f"""
 对于你当前问题的研究，作为你领导的用户提供了如下提示，你需要仔细阅读并理解，并在你的工作中充分考虑这些提示。
 </explanation>
 </user_prompt>
-</environment_information>
 """
 
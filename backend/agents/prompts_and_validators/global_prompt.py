@@ -56,7 +56,7 @@ CURRENT_RESEARCH_PROBLEM_EXPLANATION = """你当前所处的研究问题是你
 这些信息是提出该问题的上级专家或用户提供的（如果该问题是根研究问题，则为用户提供，否则为该研究问题所处的解决方案的负责专家提供）。
 你在理解自己的工作目标时，可以参考这些信息，但你必须有自己独立的思考，不能完全依赖这些信息。"""
 
-EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION = """这里按照从你的上级问题、上级问题的上级问题一直到根研究问题的顺序，列出所有上级专家的解决方案。具体个数因当前问题在研究树中所处的位置而异。
+EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION = """这里按照从根研究问题、根研究问题的下级问题一直到你的上级问题的顺序，列出所有上级专家的解决方案。具体个数因当前问题在研究树中所处的位置而异。
 你需要对照研究树全貌，找到这些专家解决方案及其对应研究问题的位置，来理解他们研究工作的意义。
 由于你的研究问题是它们研究问题的子问题，因此充分理解它们的研究工作和研究意义，是你思考当前问题意义的必要前提。"""
 
@@ -101,4 +101,47 @@ CURRENT_SOLUTION_EXPLANATION = "这是你当前设计的解决方案。"
 EXPERT_SOLUTIONS_OF_ALL_DESCENDANT_PROBLEMS_EXPLANATION = """这是在你的解决方案提出之后，团队中其他专家对你方案中的子研究问题及其派生问题设计的专家解决方案。
 你需要结合他们的研究，重新思考你的解决方案的价值和困难。"""
 
-MESSAGE_LIST_EXPLANATION = """这是与你相关的历史消息列表，包括你和其它专家或用户的对话，以及与你相关的事件。"""
\ No newline at end of file
+MESSAGE_LIST_EXPLANATION = """这是与你相关的历史消息列表，包括你和其它专家或用户的对话，以及与你相关的事件。"""
+
+
+# 各项环境信息按稳定性从高到低排列：越靠前的段落在相邻两次调用之间越不容易变化，
+# 使提示词前缀尽可能保持一致，以命中DeepSeek的前缀缓存（研究树全貌每次提交都会变化，因此放在最后）
+ENVIRONMENT_SECTION_ORDER = [
+    ("root_problem", ROOT_PROBLEM_EXPLANATION),
+    ("expert_solutions_of_all_ancestor_problems", EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION),
+    ("current_research_problem", CURRENT_RESEARCH_PROBLEM_EXPLANATION),
+    ("other_solutions_of_current_problem", OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION),
+    ("expert_solutions_of_all_descendant_problems", EXPERT_SOLUTIONS_OF_ALL_DESCENDANT_PROBLEMS_EXPLANATION),
+    ("current_solution", CURRENT_SOLUTION_EXPLANATION),
+    ("current_research_tree_full_text", CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION),
+]
+
+# 所有提示词共享的静态前缀：角色与规则、XML规范、各项环境信息的解释
+GLOBAL_PROMPT_PREFIX = "\n".join([
+    ROLE_AND_RULES,
+    "<xml_format_rule>",
+    XML_FORMAT_RULE,
+    "</xml_format_rule>",
+    "<environment_information_explanation>",
+    *[f"<{name}>\n{explanation}\n</{name}>" for name, explanation in ENVIRONMENT_SECTION_ORDER],
+    f"<message_list>\n{MESSAGE_LIST_EXPLANATION}\n</message_list>",
+    "</environment_information_explanation>",
+])
+
+
+def build_environment_block(sections: list) -> str:
+    """
+    按稳定性顺序生成环境信息模板片段
+
+    Args:
+        sections: 需要包含的环境信息段落名称
+
+    Returns:
+        含 {段落名} 占位符的模板文本，供 format_map 填充
+    """
+    lines = ["<environment_information>"]
+    for name, _ in ENVIRONMENT_SECTION_ORDER:
+        if name in sections:
+            lines.append(f"<{name}>\n{{{name}}}\n</{name}>")
+    lines.append("</environment_information>")
+    return "\n".join(lines)
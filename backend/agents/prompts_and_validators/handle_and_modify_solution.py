@@ -0,0 +1,111 @@
+from .global_prompt import (
+    GLOBAL_PROMPT_PREFIX,
+    build_environment_block,
+)
+from .handle_modification_requests import (
+    HANDLE_MODIFICATION_REQUESTS_TASK,
+    HANDLE_MODIFICATION_DECISION_SPECIFICATIONS,
+    HANDLE_MODIFICATION_DECISION_FORMAT,
+    HandleModificationRequestsResponse,
+)
+from .modify_solution import (
+    MODIFY_SOLUTION_SPECIFICATIONS,
+    MODIFY_SOLUTION_OUTPUT_FIELDS,
+    ModifySolutionResponse,
+)
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional
+
+
+# 验证器模型
+class HandleAndModifySolutionResponse(BaseModel):
+    """单次调用处理修改请求的响应验证器：决策 + 同意修改时的修改后方案"""
+    decision: HandleModificationRequestsResponse = Field(description="对修改请求的决策")
+    modified_solution: Optional[ModifySolutionResponse] = Field(default=None, description="修改后的解决方案，仅在decision为accept时提供")
+
+    @model_validator(mode='before')
+    @classmethod
+    def split_decision_and_solution(cls, data):
+        """
+        XML解析后的结构为 {'decision': {..., '_attributes': {'type': ...}}, 'modified_solution': {...}}，
+        决策部分交给 HandleModificationRequestsResponse 按原有方式解析
+        """
+        if isinstance(data, dict) and isinstance(data.get('decision'), dict) and '_attributes' in data['decision']:
+            modified_solution = data.get('modified_solution')
+            return {
+                'decision': {'decision': data['decision']},
+                'modified_solution': modified_solution if isinstance(modified_solution, dict) else None,
+            }
+        return data
+
+    @model_validator(mode='after')
+    def validate_modified_solution(self):
+        """同意修改时必须提供修改后的方案；回复时忽略多余的方案"""
+        if self.decision.decision == "accept":
+            if self.modified_solution is None:
+                raise ValueError('当决策为accept时，必须在modified_solution中提供修改后的解决方案')
+        else:
+            self.modified_solution = None
+        return self
+
+    def to_content(self) -> str:
+        content = self.decision.to_content()
+        if self.modified_solution is not None:
+            content += "\n" + self.modified_solution.to_content()
+        return content
+
+
+HANDLE_AND_MODIFY_SOLUTION_PROMPT = f"""
+{GLOBAL_PROMPT_PREFIX}
+<task>
+{HANDLE_MODIFICATION_REQUESTS_TASK}
+3. 如果你决定接受修改，你需要在同一次回复中按你的修改计划直接完成修改，在<modified_solution>中输出修改后的完整解决方案：
+    1. 按相关解释和要求修改顶层思考、研究方案（增删改子问题）、实施方案和方案论证，按<incremental_output>的要求只输出发生变化的部分
+    2. 为你修改后的整体思路起一个一目了然的名字，点明核心洞见和基本方案，且不能与当前研究方案或其它节点的名称相同。
+    3. 进行全面仔细的检查和完善，确保你撰写的所有内容符合要求，且输出符合XML规范要求。
+4. 如果你决定回复对方，不要输出<modified_solution>。
+</task>
+<specifications>
+{HANDLE_MODIFICATION_DECISION_SPECIFICATIONS}
+<modified_solution>
+{MODIFY_SOLUTION_SPECIFICATIONS}
+</modified_solution>
+</specifications>
+<output_format>
+你需要严格按以下XML格式输出，不要输出任何多余内容
+{HANDLE_MODIFICATION_DECISION_FORMAT.replace("</response>", "")}<if decision="accept">
+<modified_solution>
+{MODIFY_SOLUTION_OUTPUT_FIELDS}
+</modified_solution>
+</if>
+</response>
+</output_format>
+{build_environment_block(["root_problem", "expert_solutions_of_all_ancestor_problems", "current_research_problem", "other_solutions_of_current_problem", "expert_solutions_of_all_descendant_problems", "current_solution", "current_research_tree_full_text"])}
+<message_list>
+{{message_list}}
+</message_list>
+<supervisor_name>
+<content>
+{{supervisor_name}}
+</content>
+<explanation>
+向你发送信息、提出修改要求的一方，即任务说明中的“对方”。
+</explanation>
+</supervisor_name>
+<current_solution_sub_problem_list>
+<content>
+{{current_solution_sub_problem_list}}
+</content>
+<explanation>
+这是你当前解决方案的子研究问题列表。你可以根据自己的需要，继承其中的问题，成为新研究方案的一部分。
+</explanation>
+</current_solution_sub_problem_list>
+<modification_request>
+<content>
+{{modification_request}}
+</content>
+<explanation>
+对方对你提出的修改要求。
+</explanation>
+</modification_request>
+"""
@@ -1,14 +1,6 @@
 from .global_prompt import (
-    ROLE_AND_RULES, 
-    CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION, 
-    CURRENT_RESEARCH_PROBLEM_EXPLANATION, 
-    EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION, 
-    ROOT_PROBLEM_EXPLANATION, 
-    OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION, 
-    XML_FORMAT_RULE, 
-    CURRENT_SOLUTION_EXPLANATION, 
-    EXPERT_SOLUTIONS_OF_ALL_DESCENDANT_PROBLEMS_EXPLANATION,
-    MESSAGE_LIST_EXPLANATION,
+    GLOBAL_PROMPT_PREFIX,
+    build_environment_block,
 )
 from backend.database.schemas.request_models import (
     ProblemRequest,
@@ -127,10 +119,8 @@ class HandleModificationRequestsResponse(BaseModel):
                    f"【回复信息】: {self.response_to_user}\n"
 
 
-HANDLE_MODIFICATION_REQUESTS_PROMPT = f"""
-{ROLE_AND_RULES}
-<task>
-现在{{supervisor_name}}就你的解决方案向你发送了信息，你需要根据他的消息中是否包含“请修改”，并且根据他要求的合理性回复他或者按他的要求修改你的解决方案，大致包含以下几步。
+# 处理修改请求的任务步骤、决策说明与输出格式（单独决策与单次调用修改共用）
+HANDLE_MODIFICATION_REQUESTS_TASK = """现在对方（见<supervisor_name>）就你的解决方案向你发送了信息，你需要根据他的消息中是否包含“请修改”，并且根据他要求的合理性回复他或者按他的要求修改你的解决方案，大致包含以下几步。
 1. 接收信息：
     1. 理解当前的完整研究过程，了解团队的研究目标和已经进行过的思考和求证，并掌握其中得到的所有事实结论
     2. 理解你自己的研究方案，这代表着你之前的工作思路
@@ -143,10 +133,9 @@ HANDLE_MODIFICATION_REQUESTS_PROMPT = f"""
         2. 如果修改后表达不准确，或与方案的其它部分不保持思维统一，你需要回复他，确认是否有更好的表达，或者是否要连同其他方案计划等部分一起修改。
     3. 如果包含，且对方希望你修改实际的方案计划，你需要分析对方的修改要求是否合理，是否存在问题
         1. 站在你之前的思路上，思考你当时没有考虑这种选择的原因，是因为这种选择确实很好只是你当时没有考虑到，还是因为你考虑到了但认为这种选择本身存在问题
-        2. 如果按要求进行修改，是否比当前的解决方案更容易实施或能实现更大的研究价值
-</task>
-<specifications>
-<descion>
+        2. 如果按要求进行修改，是否比当前的解决方案更容易实施或能实现更大的研究价值"""
+
+HANDLE_MODIFICATION_DECISION_SPECIFICATIONS = """<descion>
 <what>
 你的决定。accept表示同意修改，reply表示回复对方。
 <reasoning>
@@ -167,11 +156,9 @@ HANDLE_MODIFICATION_REQUESTS_PROMPT = f"""
 <constraints>
 1. 如果对方的要求中明确希望得到你的回复，你必须选择回复他。
 2. 如果你选择接受修改，你必须仔细思考确保修改后的方案更好，并制定修改计划。
-</constraint>
-</specifications>
-<output_format>
-你需要严格按以下XML格式输出，不要输出任何多余内容
-<response>
+</constraint>"""
+
+HANDLE_MODIFICATION_DECISION_FORMAT = """<response>
 <decision type="accept" | "reply">
 <reasoning>决策理由</reasoning>
 <if type="accept">
@@ -181,83 +168,39 @@ HANDLE_MODIFICATION_REQUESTS_PROMPT = f"""
 <response_to_user>对对方的回复</response_to_user>
 </if>
 </decision>
-</response>
+</response>"""
+
+
+HANDLE_MODIFICATION_REQUESTS_PROMPT = f"""
+{GLOBAL_PROMPT_PREFIX}
+<task>
+{HANDLE_MODIFICATION_REQUESTS_TASK}
+</task>
+<specifications>
+{HANDLE_MODIFICATION_DECISION_SPECIFICATIONS}
+</specifications>
+<output_format>
+你需要严格按以下XML格式输出，不要输出任何多余内容
+{HANDLE_MODIFICATION_DECISION_FORMAT}
 </output_format>
-<xml_format_rule>
-{XML_FORMAT_RULE}
-</xml_format_rule>
-<environment_information>
-<current_research_tree_full_text>
-<content>
-{{current_research_tree_full_text}}
-</content>
-<explanation>
-{CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION}
-</explanation>
-</current_research_tree_full_text>
-<current_research_problem>
-<content>
-{{current_research_problem}}
-</content>
-<explanation>
-{CURRENT_RESEARCH_PROBLEM_EXPLANATION}
-</explanation>
-</current_research_problem>
-<current_solution>
-<content>
-{{current_solution}}
-</content>
-<explanation>
-{CURRENT_SOLUTION_EXPLANATION}
-</explanation>
-</current_solution>
-<expert_solutions_of_all_ancestor_problems>
-<content>
-{{expert_solutions_of_all_ancestor_problems}}
-</content>
-<explanation>
-{EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION}
-</explanation>
-</expert_solutions_of_all_ancestor_problems>
-<other_solutions_of_current_problem>
-<content>
-{{other_solutions_of_current_problem}}
-</content>
-<explanation>
-{OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION}
-</explanation>
-</other_solutions_of_current_problem>
-<expert_solutions_of_all_descendant_problems>
-<content>
-{{expert_solutions_of_all_descendant_problems}}
-</content>
-<explanation>
-{EXPERT_SOLUTIONS_OF_ALL_DESCENDANT_PROBLEMS_EXPLANATION}
-</explanation>
-</expert_solutions_of_all_descendant_problems>
-<root_problem>
-<content>
-{{root_problem}}
-</content>
-<explanation>
-{ROOT_PROBLEM_EXPLANATION}
-</explanation>
-</root_problem>
+{build_environment_block(["root_problem", "expert_solutions_of_all_ancestor_problems", "current_research_problem", "other_solutions_of_current_problem", "expert_solutions_of_all_descendant_problems", "current_solution", "current_research_tree_full_text"])}
 <message_list>
-<content>
 {{message_list}}
+</message_list>
+<supervisor_name>
+<content>
+{{supervisor_name}}
 </content>
 <explanation>
-{MESSAGE_LIST_EXPLANATION}
+向你发送信息、提出修改要求的一方，即任务说明中的“对方”。
 </explanation>
-</message_list>
+</supervisor_name>
 <modification_request>
 <content>
 {{modification_request}}
 </content>
 <explanation>
-{{supervisor_name}}对你提出的修改要求。
+对方对你提出的修改要求。
 </explanation>
 </modification_request>
-</environment_information>
 """
\ No newline at end of file
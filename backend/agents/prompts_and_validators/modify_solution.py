@@ -1,21 +1,13 @@
 from .global_prompt import (
-    ROLE_AND_RULES, 
+    GLOBAL_PROMPT_PREFIX,
+    build_environment_block,
     TOP_LEVEL_THOUGHTS_SPECIFICATIONS,
-    CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION, 
-    CURRENT_RESEARCH_PROBLEM_EXPLANATION, 
-    EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION, 
-    ROOT_PROBLEM_EXPLANATION, 
-    OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION, 
-    XML_FORMAT_RULE,
-    CURRENT_SOLUTION_EXPLANATION,
-    EXPERT_SOLUTIONS_OF_ALL_DESCENDANT_PROBLEMS_EXPLANATION,
-    MESSAGE_LIST_EXPLANATION,
 )
 from backend.database.schemas.request_models import (
     SolutionRequest,
     ProblemRequest,
 )
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Literal, Optional, Dict, Any, Tuple
 from enum import Enum
 from backend.utils.logger import logger
@@ -83,13 +75,168 @@ class ModifyResearchSubProblem(BaseModel):
             problem_type=self.type
         )
 
+def _as_list(value: Any) -> List[Any]:
+    """XML解析后重复标签为列表、单个标签为字典、空标签为None，统一为列表"""
+    if value is None or value == "":
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _with_attributes(data: Any) -> Any:
+    """把_attributes中的属性（type、after）展开为普通字段"""
+    if isinstance(data, dict) and '_attributes' in data:
+        data = {**data['_attributes'], **{k: v for k, v in data.items() if k != '_attributes'}}
+    return data
+
+
+class SubProblemEdit(BaseModel):
+    """修改原方案中的某个子问题：省略的字段沿用原问题"""
+    name: str = Field(description="被修改的原问题名称")
+    type: Optional[ModifyProblemType] = Field(default=None, description="新的问题类型")
+    new_name: Optional[str] = Field(default=None, description="新的问题名称")
+    significance: Optional[str] = Field(default=None, description="新的问题意义")
+    criteria: Optional[str] = Field(default=None, description="新的评判标准")
+
+    @model_validator(mode='before')
+    @classmethod
+    def extract_attributes(cls, data):
+        return _with_attributes(data)
+
+    @field_validator('type')
+    @classmethod
+    def validate_type(cls, v):
+        if v == ModifyProblemType.INHERIT:
+            raise ValueError('edit的type只能是conditional或implementation')
+        return v
+
+    def is_noop(self) -> bool:
+        return self.type is None and self.new_name is None and self.significance is None and self.criteria is None
+
+    def apply(self, original: ProblemRequest) -> ProblemRequest:
+        """修改后的问题是新问题（不带id），原问题下已完成的研究工作将被丢弃"""
+        return ProblemRequest(
+            title=self.new_name or original.title,
+            significance=self.significance if self.significance is not None else original.significance,
+            criteria=self.criteria if self.criteria is not None else original.criteria,
+            problem_type=self.type or original.problem_type,
+        )
+
+
+class SubProblemAdd(BaseModel):
+    """新增子问题，after为插入位置之前的问题名称，省略时追加到末尾"""
+    type: ModifyProblemType = Field(default=ModifyProblemType.IMPLEMENTATION, description="问题类型")
+    name: str = Field(description="问题名称")
+    significance: str = Field(default="", description="问题意义")
+    criteria: str = Field(default="", description="评判标准")
+    after: Optional[str] = Field(default=None, description="插入到该问题之后")
+
+    @model_validator(mode='before')
+    @classmethod
+    def extract_attributes(cls, data):
+        return _with_attributes(data)
+
+    @field_validator('type')
+    @classmethod
+    def validate_type(cls, v):
+        if v == ModifyProblemType.INHERIT:
+            raise ValueError('add的type只能是conditional或implementation')
+        return v
+
+    def to_request(self) -> ProblemRequest:
+        return ProblemRequest(title=self.name, significance=self.significance, criteria=self.criteria, problem_type=self.type)
+
+
+class SubProblemChanges(BaseModel):
+    """子问题列表的增量修改：未提及的原问题原样继承"""
+    remove: List[str] = Field(default_factory=list, description="删除的原问题名称")
+    edit: List[SubProblemEdit] = Field(default_factory=list, description="修改的原问题")
+    add: List[SubProblemAdd] = Field(default_factory=list, description="新增的问题")
+
+    @model_validator(mode='before')
+    @classmethod
+    def normalize_xml_structure(cls, data):
+        """把XML解析后的 {'remove': {'name': ...} | [...], 'edit': ..., 'add': ...} 统一为列表"""
+        if not isinstance(data, dict):
+            return data
+        return {
+            'remove': [item.get('name', '') if isinstance(item, dict) else item for item in _as_list(data.get('remove'))],
+            'edit': _as_list(data.get('edit')),
+            'add': _as_list(data.get('add')),
+        }
+
+    def is_empty(self) -> bool:
+        return not self.remove and not any(not e.is_noop() for e in self.edit) and not self.add
+
+    def apply(self, org_problem_map: Dict[str, ProblemRequest]) -> List[ProblemRequest]:
+        """
+        按 删除 → 修改 → 新增 的顺序应用到原子问题列表
+
+        引用了不存在的原问题时：删除与修改被忽略，插入位置退化为末尾
+        """
+        entries: List[Tuple[str, ProblemRequest]] = list(org_problem_map.items())
+        for name in self.remove:
+            if name not in org_problem_map:
+                logger.warning(f"删除的子问题不存在，已忽略: {name}")
+            entries = [(org_name, request) for org_name, request in entries if org_name != name]
+        edits = {edit.name: edit for edit in self.edit if not edit.is_noop()}
+        for name in edits.keys() - {org_name for org_name, _ in entries}:
+            logger.warning(f"修改的子问题不存在或已删除，已忽略: {name}")
+        entries = [(org_name, edits[org_name].apply(request) if org_name in edits else request)
+                   for org_name, request in entries]
+        for add in self.add:
+            position = len(entries)
+            if add.after:
+                matched = [i for i, (org_name, request) in enumerate(entries) if add.after in (org_name, request.title)]
+                if matched:
+                    position = matched[-1] + 1
+                else:
+                    logger.warning(f"新增子问题的插入位置不存在，追加到末尾: {add.after}")
+            entries.insert(position, (add.name, add.to_request()))
+        return [request for _, request in entries]
+
+    def to_content(self) -> str:
+        lines = [f"[删除问题]: {name}" for name in self.remove]
+        for edit in self.edit:
+            if edit.is_noop():
+                continue
+            lines.append(f"[修改问题]: {edit.name}")
+            if edit.type:
+                lines.append(f"[问题类型]: {edit.type}")
+            if edit.new_name:
+                lines.append(f"[问题名称]: {edit.new_name}")
+            if edit.significance is not None:
+                lines.append(f"[问题意义]: \n{edit.significance}")
+            if edit.criteria is not None:
+                lines.append(f"[评判标准]: \n{edit.criteria}")
+        for add in self.add:
+            lines.append(f"[新增问题]: {add.name}" + (f"（位于 {add.after} 之后）" if add.after else ""))
+            lines.append(f"[问题类型]: {add.type}")
+            lines.append(f"[问题意义]: \n{add.significance}")
+            lines.append(f"[评判标准]: \n{add.criteria}")
+        return "\n".join(lines) if lines else "（子问题未修改）"
+
+
 class ModifySolutionResponse(BaseModel):
-    """修改解决方案响应模型"""
+    """
+    修改解决方案响应模型
+
+    支持两种输出：
+    1. 增量输出：只给出修改的字段与<sub_problem_changes>，省略的字段沿用当前方案
+    2. 完整输出：给出完整的<research_plan>，按原有方式继承或重新设计子问题
+    """
     name: str = Field(description="整体思路的名称")
-    top_level_thoughts: str = Field(description="顶层思考内容")
-    research_plan: List[ModifyResearchSubProblem] = Field(default_factory=list, description="子研究问题列表")
-    implementation_plan: str = Field(description="实施方案内容")
-    plan_justification: str = Field(description="方案论证内容")
+    top_level_thoughts: Optional[str] = Field(default=None, description="顶层思考内容，None表示不修改")
+    research_plan: Optional[List[ModifyResearchSubProblem]] = Field(default=None, description="完整的子研究问题列表，None表示未整体重新设计")
+    sub_problem_changes: Optional[SubProblemChanges] = Field(default=None, description="子问题的增量修改")
+    implementation_plan: Optional[str] = Field(default=None, description="实施方案内容，None表示不修改")
+    plan_justification: Optional[str] = Field(default=None, description="方案论证内容，None表示不修改")
+
+    @model_validator(mode='after')
+    def validate_research_plan_and_changes(self):
+        """完整研究方案与增量修改只能二选一"""
+        if self.research_plan is not None and self.sub_problem_changes is not None:
+            raise ValueError('research_plan与sub_problem_changes不能同时输出：整体重新设计子问题时输出research_plan，否则输出sub_problem_changes')
+        return self
     
     @field_validator('research_plan', mode='before')
     @classmethod
@@ -123,72 +270,77 @@ class ModifySolutionResponse(BaseModel):
         
         return []
 
-    def to_request(self, org_problem_map) -> Tuple[str, SolutionRequest]:
+    def _resolve_children(self, org_problem_map: Dict[str, ProblemRequest]) -> List[ProblemRequest]:
+        if self.research_plan is not None:
+            return [sub_problem.to_request(org_problem_map) for sub_problem in self.research_plan]
+        if self.sub_problem_changes is not None:
+            return self.sub_problem_changes.apply(org_problem_map)
+        return list(org_problem_map.values())
+
+    def to_request(self, org_problem_map: Dict[str, ProblemRequest],
+                   current_solution: Optional[SolutionRequest] = None) -> Tuple[str, SolutionRequest]:
+        """
+        把修改应用到当前方案
+
+        Args:
+            org_problem_map: 原方案子问题标题到请求的映射（保持原顺序）
+            current_solution: 当前方案的内容，增量输出需要新建方案时用于补全未修改的字段
+
+        Returns:
+            ("update", 请求)：子问题原样保留，原地更新输出的字段
+            ("create", 请求)：子问题有变化，新建包含完整内容的方案
+        """
         logger.info(f"原方案问题标题列表: {org_problem_map}")
-        org_problem_titles = list(org_problem_map.keys())
-        if len(self.research_plan) == len(org_problem_map):
-            flag = True
-            for i in range(len(self.research_plan)):
-                if self.research_plan[i].type != ModifyProblemType.INHERIT:
-                    flag = False
-                    break
-                if self.research_plan[i].name != org_problem_titles[i]:
-                    flag = False
-                    break
-            if flag: # 更新模式
-                return "update", SolutionRequest(
-                    title=self.name,
-                    top_level_thoughts=self.top_level_thoughts,
-                    implementation_plan=self.implementation_plan,
-                    plan_justification=self.plan_justification,
-                )
-        return "create", SolutionRequest(
-            title=self.name,
-            top_level_thoughts=self.top_level_thoughts,
-            implementation_plan=self.implementation_plan,
-            plan_justification=self.plan_justification,
-            children=[sub_problem.to_request(org_problem_map) for sub_problem in self.research_plan],
-        )
+        children = self._resolve_children(org_problem_map)
+        original = list(org_problem_map.values())
+        if len(children) == len(original) and all(a is b for a, b in zip(children, original)):
+            # 更新模式：未输出的字段为None，数据库保留原值
+            return "update", SolutionRequest(
+                title=self.name,
+                top_level_thoughts=self.top_level_thoughts,
+                implementation_plan=self.implementation_plan,
+                plan_justification=self.plan_justification,
+            )
+        fields = {
+            "top_level_thoughts": self.top_level_thoughts,
+            "implementation_plan": self.implementation_plan,
+            "plan_justification": self.plan_justification,
+        }
+        missing = [key for key, value in fields.items() if value is None]
+        if missing:
+            if current_solution is None:
+                raise ValueError(f"新建方案需要当前方案内容来补全未修改的字段: {missing}")
+            for key in missing:
+                fields[key] = getattr(current_solution, key)
+        return "create", SolutionRequest(title=self.name, children=children, **fields)
 
 
     def to_content(self) -> str:
-        # 构建实施方案文本
-        research_plan_text = ""
-        for sub_problem in self.research_plan:
-            research_plan_text += f"[问题类型]: {sub_problem.type}\n"
-            if sub_problem.type != ModifyProblemType.INHERIT:
-                research_plan_text += f"[问题名称]: {sub_problem.name}\n"
-                research_plan_text += f"[问题意义]: \n{sub_problem.significance}\n"
-                research_plan_text += f"[评判标准]: \n{sub_problem.criteria}\n\n"
-            else:
-                research_plan_text += f"[继承自问题]: {sub_problem.name}\n"
+        unchanged = "（未修改）"
+        if self.research_plan is not None:
+            # 构建研究方案文本
+            research_plan_text = ""
+            for sub_problem in self.research_plan:
+                research_plan_text += f"[问题类型]: {sub_problem.type}\n"
+                if sub_problem.type != ModifyProblemType.INHERIT:
+                    research_plan_text += f"[问题名称]: {sub_problem.name}\n"
+                    research_plan_text += f"[问题意义]: \n{sub_problem.significance}\n"
+                    research_plan_text += f"[评判标准]: \n{sub_problem.criteria}\n\n"
+                else:
+                    research_plan_text += f"[继承自问题]: {sub_problem.name}\n"
+        elif self.sub_problem_changes is not None:
+            research_plan_text = self.sub_problem_changes.to_content()
+        else:
+            research_plan_text = unchanged
         
         return f"【解决方案名称】: {self.name}\n\n" \
-               f"【顶层思考】: \n{self.top_level_thoughts}\n\n" \
+               f"【顶层思考】: \n{self.top_level_thoughts if self.top_level_thoughts is not None else unchanged}\n\n" \
                f"【研究方案】: \n{research_plan_text}\n\n" \
-               f"【实施方案】: \n{self.implementation_plan}\n\n" \
-               f"【方案论证】: \n{self.plan_justification}"
+               f"【实施方案】: \n{self.implementation_plan if self.implementation_plan is not None else unchanged}\n\n" \
+               f"【方案论证】: \n{self.plan_justification if self.plan_justification is not None else unchanged}"
 
-# 更新创建解决方案
-MODIFY_THE_SOLUTION_PROMPT = f"""
-{ROLE_AND_RULES}
-<task>
-现在{{supervisor_name}}对你的解决方案提出了修改要求, 经过你们的讨论，你最终决定对你的解决方案作出修改。
-现在，你需要在当前方案的基础上为解决当前问题设计新的方案，大致包括如下几步。
-1. 接收信息：
-    1. 理解当前的完整研究过程，了解团队的研究目标和已经进行过的思考和求证，并掌握其中得到的所有事实结论
-    2. 理解你自己的研究方案，这代表着你之前的工作思路
-    3. 理解你和用户间的对话，了解用户修改要求背后的思考
-2. 撰写新的解决方案
-    1. 按相关解释和要求撰写顶层思考
-    2. 按相关解释和要求撰写研究方案（设计子问题列表）
-    3. 按相关解释和要求撰写实施方案
-    4. 按相关解释和要求撰写方案论证
-3. 为你修改后的整体思路起一个一目了然的名字，点明核心洞见和基本方案，且不能与当前研究方案或其它节点的名称相同。
-4. 进行全面仔细的检查和完善，确保你撰写的所有内容符合要求，且输出符合XML规范要求。
-</task>
-<specifications>
-<top_level_thoughts>
+# 修改后解决方案各部分的说明与要求（单独修改与单次调用修改共用）
+MODIFY_SOLUTION_SPECIFICATIONS = f"""<top_level_thoughts>
 {TOP_LEVEL_THOUGHTS_SPECIFICATIONS}
 </top_level_thoughts>
 
@@ -202,8 +354,7 @@ MODIFY_THE_SOLUTION_PROMPT = f"""
 - 如果面对的问题难度非常小，且足够具体清晰，无需进一步研究和论证便显然可以解决，则你的研究方案应该为空，解决当前问题的所有工作均在实施方案中计划。
     - 选择不定义子研究问题时，必须慎之又慎，仔细规划实施计划，分析任何可能出现困难的环节，只有不存在任何困难时，才能选择不定义子研究问题。
 
-{{current_solution_sub_problem_list}}
-以上是你当前解决方案的子研究问题列表。你可以根据自己的需要，继承其中的问题，成为新研究方案的一部分。
+你当前解决方案的子研究问题列表见<current_solution_sub_problem_list>，你可以根据自己的需要，继承其中的问题，成为新研究方案的一部分。
 <condition>
 条件问题是你的实施方案如果能取得成功，必须被证明的一些假设。这一般包括你在顶层思考中产生的洞见是否成立、为问题设置的边界条件是否合理、理论模型的数据测试等。证明条件问题的过程同时也是提升认知、收获启发的过程，因此不要害怕提出条件问题，反而要尽可能全面、完整的提出条件问题。如果方案因条件问题被证伪而失败，要远远好于因实施问题和行动无法解决而失败，因为前者更容易收获新的洞见形成更好的思路和方案。
 你的条件问题被其它专家证明或证伪后，将以一份论证/实验报告的形式向你提交。
@@ -281,93 +432,87 @@ MODIFY_THE_SOLUTION_PROMPT = f"""
 一篇文章，纯文本格式，排版自由。
 </format>
 </plan_justification>
+<incremental_output>
+<what>
+修改通常只涉及方案的一小部分。为了尽快完成修改，你只需要输出发生变化的部分，未输出的部分将原样沿用当前方案的内容。
+- 顶层思考、实施方案、方案论证：需要修改时输出修改后的完整内容，不需要修改时省略该标签。
+- 子研究问题：用<sub_problem_changes>描述对当前子问题列表的删除、修改与新增，未提及的子问题将被原样继承（等同于inherit）。
+- 只有当研究方案需要整体重新设计时，才改为输出完整的<research_plan>，此时不要输出<sub_problem_changes>。
+</what>
+<constraints>
+1. 整体思路的名称必须输出。
+2. 被修改的子问题视为新问题，负责原问题的专家团队已完成的工作将被丢弃；只有确实需要调整定义时才修改子问题。
+3. <remove>与<edit>中的名称必须与<current_solution_sub_problem_list>中的原问题名称完全相同。
+4. <edit>中只需输出需要修改的字段；<add>的after属性为插入位置之前的问题名称，省略时追加到末尾，需保证条件问题在实施问题之前。
+</constraints>
+</incremental_output>"""
+
+# 修改后解决方案的输出字段（单独修改与单次调用修改共用）
+MODIFY_SOLUTION_OUTPUT_FIELDS = """<name>整体思路的名称</name>
+<top_level_thoughts>修改后的顶层思考（不修改时省略）</top_level_thoughts>
+<sub_problem_changes>
+<remove><name>删除的原问题名称</name></remove>
+<edit type="conditional|implementation（不修改类型时省略）"><name>修改的原问题名称</name><new_name>新名称（不修改时省略）</new_name><significance>新的问题意义（不修改时省略）</significance><criteria>新的评判标准（不修改时省略）</criteria></edit>
+<add type="conditional|implementation" after="插入位置之前的问题名称（省略时追加到末尾）"><name>新问题名称</name><significance>问题意义</significance><criteria>评判标准</criteria></add>
+<!-- remove、edit、add均可出现0次或多次；子问题不修改时省略整个sub_problem_changes标签 -->
+</sub_problem_changes>
+<implementation_plan>修改后的实施方案（不修改时省略）</implementation_plan>
+<plan_justification>修改后的方案论证（不修改时省略）</plan_justification>"""
+
+# 更新创建解决方案
+MODIFY_THE_SOLUTION_PROMPT = f"""
+{GLOBAL_PROMPT_PREFIX}
+<task>
+现在对方（见<supervisor_name>）对你的解决方案提出了修改要求, 经过你们的讨论，你最终决定对你的解决方案作出修改。
+现在，你需要在当前方案的基础上为解决当前问题设计新的方案，大致包括如下几步。
+1. 接收信息：
+    1. 理解当前的完整研究过程，了解团队的研究目标和已经进行过的思考和求证，并掌握其中得到的所有事实结论
+    2. 理解你自己的研究方案，这代表着你之前的工作思路
+    3. 理解你和用户间的对话，了解用户修改要求背后的思考
+2. 撰写新的解决方案，按<incremental_output>的要求只输出发生变化的部分
+    1. 按相关解释和要求修改顶层思考
+    2. 按相关解释和要求修改研究方案（增删改子问题）
+    3. 按相关解释和要求修改实施方案
+    4. 按相关解释和要求修改方案论证
+3. 为你修改后的整体思路起一个一目了然的名字，点明核心洞见和基本方案，且不能与当前研究方案或其它节点的名称相同。
+4. 进行全面仔细的检查和完善，确保你撰写的所有内容符合要求，且输出符合XML规范要求。
+</task>
+<specifications>
+{MODIFY_SOLUTION_SPECIFICATIONS}
 </specifications>
 <output_format>
 你需要严格按以下XML格式输出，不要输出任何多余内容
 <response>
-<name>整体思路的名称</name>
-<top_level_thoughts>顶层思考内容</top_level_thoughts>
-<research_plan>研究方案内容（如果不设计任何子问题，则保留空的research_plan标签即可）</research_plan>
-<implementation_plan>实施方案内容</implementation_plan>
-<plan_justification>方案论证内容</plan_justification>
+{MODIFY_SOLUTION_OUTPUT_FIELDS}
 </response>
 </output_format>
-<xml_format_rule>
-{XML_FORMAT_RULE}
-</xml_format_rule>
-<environment_information>
-<current_research_tree_full_text>
-<content>
-{{current_research_tree_full_text}}
-</content>
-<explanation>
-{CURRENT_RESEARCH_TREE_FULL_TEXT_EXPLANATION}
-</explanation>
-</current_research_tree_full_text>
-<current_research_problem>
-<content>
-{{current_research_problem}}
-</content>
-<explanation>
-{CURRENT_RESEARCH_PROBLEM_EXPLANATION}
-</explanation>
-</current_research_problem>
-<current_solution>
-<content>
-{{current_solution}}
-</content>
-<explanation>
-{CURRENT_SOLUTION_EXPLANATION}
-</explanation>
-</current_solution>
-<expert_solutions_of_all_ancestor_problems>
-<content>
-{{expert_solutions_of_all_ancestor_problems}}
-</content>
-<explanation>
-{EXPERT_SOLUTIONS_OF_ALL_ANCESTOR_PROBLEMS_EXPLANATION}
-</explanation>
-</expert_solutions_of_all_ancestor_problems>
-<other_solutions_of_current_problem>
-<content>
-{{other_solutions_of_current_problem}}
-</content>
-<explanation>
-{OTHER_SOLUTIONS_OF_CURRENT_PROBLEM_EXPLANATION}
-</explanation>
-</other_solutions_of_current_problem>
-<expert_solutions_of_all_descendant_problems>
-<content>
-{{expert_solutions_of_all_descendant_problems}}
-</content>
-<explanation>
-{EXPERT_SOLUTIONS_OF_ALL_DESCENDANT_PROBLEMS_EXPLANATION}
-</explanation>
-</expert_solutions_of_all_descendant_problems>
-<root_problem>
+{build_environment_block(["root_problem", "expert_solutions_of_all_ancestor_problems", "current_research_problem", "other_solutions_of_current_problem", "expert_solutions_of_all_descendant_problems", "current_solution", "current_research_tree_full_text"])}
+<message_list>
+{{message_list}}
+</message_list>
+<supervisor_name>
 <content>
-{{root_problem}}
+{{supervisor_name}}
 </content>
 <explanation>
-{ROOT_PROBLEM_EXPLANATION}
+对你的解决方案提出修改要求的一方，即任务说明中的“对方”。
 </explanation>
-</root_problem>
-<message_list>
+</supervisor_name>
+<current_solution_sub_problem_list>
 <content>
-{{message_list}}
+{{current_solution_sub_problem_list}}
 </content>
 <explanation>
-{MESSAGE_LIST_EXPLANATION}
+这是你当前解决方案的子研究问题列表。你可以根据自己的需要，继承其中的问题，成为新研究方案的一部分。
 </explanation>
-</message_list>
+</current_solution_sub_problem_list>
 <modify_plan>
 <content>
 {{modify_plan}}
 </content>
 <explanation>
-在与用户讨论之后，你最终决定对当前方案进行修改，并给出了以上的修改计划。
+在与对方讨论之后，你最终决定对当前方案进行修改，并给出了以上的修改计划。
 你可以参考你当时的计划，如果你发现该计划有不完善的地方，也可以任意地做出调整。
 </explanation>
 </modify_plan>
-</environment_information>
 """
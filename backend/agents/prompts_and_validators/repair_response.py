@@ -0,0 +1,54 @@
+from .global_prompt import XML_FORMAT_RULE
+import re
+from typing import Optional
+
+
+# 从原提示词中提取输出格式说明，修复时只需要格式而不需要完整的环境信息
+OUTPUT_FORMAT_PATTERN = re.compile(r"<output_format>.*?</output_format>", re.DOTALL)
+
+
+REPAIR_RESPONSE_PROMPT = """
+<role>
+你是一个XML格式修复工具。
+</role>
+<task>
+下面的<faulty_output>是另一位专家按<output_format>要求输出的内容，但它没有通过程序的解析或校验，具体错误见<error>。
+你需要根据错误信息修正格式问题，输出一个完整、合法的<response>。
+1. 只修正格式与结构问题：补全或闭合标签、修正嵌套、用CDATA包裹纯文本、补充缺失的属性、删除重复或多余的标签等。
+2. 必须完整保留原输出中的文字内容，不要改写、删减、总结或补充任何观点；只有当错误信息明确指出某个字段缺失或不合法时，才根据原输出中已有的内容最小限度地补齐该字段。
+3. 只输出修正后的<response>，不要输出任何解释或多余内容。
+</task>
+<xml_format_rule>
+{xml_format_rule}
+</xml_format_rule>
+{output_format}
+<error>
+{error}
+</error>
+<faulty_output>
+{faulty_output}
+</faulty_output>
+"""
+
+
+def extract_output_format(prompt: str) -> Optional[str]:
+    """从原提示词中提取<output_format>段落"""
+    match = OUTPUT_FORMAT_PATTERN.search(prompt)
+    return match.group(0) if match else None
+
+
+def build_repair_prompt(original_prompt: str, faulty_output: str, error: str) -> str:
+    """
+    构建格式修复提示词
+
+    Args:
+        original_prompt: 原始提示词（用于提取输出格式要求）
+        faulty_output: 未通过解析或校验的原始输出
+        error: 解析器或验证器给出的错误信息
+    """
+    return REPAIR_RESPONSE_PROMPT.format(
+        xml_format_rule=XML_FORMAT_RULE,
+        output_format=extract_output_format(original_prompt) or "",
+        error=error,
+        faulty_output=faulty_output,
+    )
@@ -0,0 +1,248 @@
+"""
+全局LLM限流与自适应并发控制
+所有智能体共享同一个限流器，位于实际API请求之前：
+1. 令牌桶限制每分钟请求数（RPM）与估算token数（TPM），请求结束后按真实用量退还多预留的token
+2. AIMD自适应并发：成功时加性增加并发上限，遇到429/503/超时时乘性减少
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from backend.config import settings
+from backend.utils.logger import logger
+from backend.agents.retry_wrapper import APIError, TimeoutError
+
+# 表示服务端过载的状态码
+OVERLOAD_STATUS_CODES = (429, 503)
+
+
+class TokenBucket:
+    """令牌桶：按每分钟速率匀速补充，容量为一分钟的配额"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.per_minute / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """取得amount个令牌还需等待的秒数（0表示可以立即取得）"""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        # 单次请求超过容量时按容量计算，避免永远无法满足
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.per_minute
+
+    def consume(self, amount: float) -> None:
+        if self.enabled:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        if self.enabled and amount > 0:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimitSlot:
+    """一次LLM请求占用的限流名额，用作异步上下文管理器"""
+
+    def __init__(self, limiter: "LLMRateLimiter", reserved_tokens: int):
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+        self.actual_tokens: Optional[int] = None
+        self.wait_time = 0.0
+
+    def settle(self, actual_tokens: int) -> None:
+        """记录真实用量，结束时退还多预留的token"""
+        self.actual_tokens = actual_tokens
+
+    async def __aenter__(self) -> "RateLimitSlot":
+        self.wait_time = await self.limiter.acquire(self.reserved_tokens)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self.limiter.release(self, exc)
+        return False
+
+
+class LLMRateLimiter:
+    """
+    LLM全局限流器
+
+    功能：
+    1. RPM/TPM令牌桶，限额小于等于0表示不限制
+    2. AIMD并发上限：成功一次增加 1/上限，过载时减半（冷却期内只减一次）
+    3. 统计排队等待、过载次数与当前并发
+    """
+
+    def __init__(self,
+                 requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0,
+                 initial_concurrency: int = 4,
+                 min_concurrency: int = 1,
+                 max_concurrency: int = 16,
+                 decrease_cooldown: float = 5.0):
+        """
+        初始化限流器
+
+        Args:
+            requests_per_minute: 每分钟请求数上限
+            tokens_per_minute: 每分钟token数上限（按提示词估算值+最大输出预留）
+            initial_concurrency: 初始并发上限
+            min_concurrency: 并发上限的下限
+            max_concurrency: 并发上限的上限
+            decrease_cooldown: 两次乘性减少之间的最短间隔（秒），避免同一波过载被重复惩罚
+        """
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.concurrency_limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats = {
+            "requests": 0,
+            "queued": 0,
+            "total_wait_time": 0.0,
+            "overloads": 0,
+            "decreases": 0,
+            "refunded_tokens": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> "LLMRateLimiter":
+        return cls(
+            requests_per_minute=settings.LLM_RATE_LIMIT_RPM,
+            tokens_per_minute=settings.LLM_RATE_LIMIT_TPM,
+            initial_concurrency=settings.LLM_CONCURRENCY_INITIAL,
+            min_concurrency=settings.LLM_CONCURRENCY_MIN,
+            max_concurrency=settings.LLM_CONCURRENCY_MAX,
+        )
+
+    def slot(self, reserved_tokens: int) -> RateLimitSlot:
+        """为一次请求申请名额：async with limiter.slot(估算token数) as slot"""
+        return RateLimitSlot(self, reserved_tokens)
+
+    async def acquire(self, reserved_tokens: int) -> float:
+        """
+        等待并发名额与RPM/TPM令牌
+
+        Returns:
+            排队等待的秒数
+        """
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        queued = False
+        while self.in_flight >= int(self.concurrency_limit):
+            queued = True
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+        try:
+            while True:
+                delay = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(reserved_tokens))
+                if delay <= 0:
+                    break
+                queued = True
+                await asyncio.sleep(delay)
+        except BaseException:
+            # 等待令牌时被取消，归还并发名额
+            self.in_flight -= 1
+            self._wake_waiters()
+            raise
+        self.request_bucket.consume(1)
+        self.token_bucket.consume(reserved_tokens)
+
+        waited = time.monotonic() - start
+        self.stats["requests"] += 1
+        self.stats["total_wait_time"] += waited
+        if queued:
+            self.stats["queued"] += 1
+            logger.info(f"LLM请求排队 {waited:.2f} 秒 - 并发上限: {int(self.concurrency_limit)}, 进行中: {self.in_flight}")
+        return waited
+
+    def release(self, slot: RateLimitSlot, error: Optional[BaseException] = None) -> None:
+        """归还名额，按请求结果调整并发上限，并退还多预留的token"""
+        self.in_flight = max(0, self.in_flight - 1)
+        if slot.actual_tokens is not None and slot.actual_tokens < slot.reserved_tokens:
+            refund = slot.reserved_tokens - slot.actual_tokens
+            self.token_bucket.refund(refund)
+            self.stats["refunded_tokens"] += refund
+
+        if self.is_overload(error):
+            self._on_overload()
+        elif error is None or isinstance(error, GeneratorExit):
+            # 提前结束读取也视为成功
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+        self._wake_waiters()
+
+    @staticmethod
+    def is_overload(error: Optional[BaseException]) -> bool:
+        if isinstance(error, TimeoutError):
+            return True
+        return isinstance(error, APIError) and error.status_code in OVERLOAD_STATUS_CODES
+
+    def _on_overload(self) -> None:
+        self.stats["overloads"] += 1
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        previous = self.concurrency_limit
+        self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+        self.stats["decreases"] += 1
+        logger.warning(f"LLM服务过载，并发上限 {previous:.1f} -> {self.concurrency_limit:.1f}")
+
+    def _wake_waiters(self) -> None:
+        available = int(self.concurrency_limit) - self.in_flight
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.concurrency_limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "rpm_limit": self.request_bucket.per_minute,
+            "tpm_limit": self.token_bucket.per_minute,
+            **self.stats,
+        }
+
+    def reset_stats(self) -> None:
+        self.stats = {
+            "requests": 0,
+            "queued": 0,
+            "total_wait_time": 0.0,
+            "overloads": 0,
+            "decreases": 0,
+            "refunded_tokens": 0,
+        }
+
+
+# 全局共享限流器
+shared_rate_limiter = LLMRateLimiter.from_settings()
@@ -1,18 +1,35 @@
 """
 重试包装器
-实现对智能体调用和数据库操作的错误重试机制，使用指数回退策略
+实现对智能体调用和数据库操作的错误重试机制：
+1. 带随机抖动的指数回退，优先遵循服务端的Retry-After
+2. 进程级重试预算，限制重试请求占总请求的比例，避免故障期间重试放大流量
+3. 熔断器：服务端连续失败后短时间内直接失败，到期后放行一次试探请求
 """
 import asyncio
-from typing import Callable, Any, Optional, Dict
+import random
+import time
+from collections import deque
+from typing import Callable, Any, Deque, Optional, Dict
 import traceback
 
+from backend.config import settings
 from backend.message.schemas.message_models import Patch
 from backend.utils.logger import logger
 from backend.utils.xml_parser import XMLValidationError
 
 class LLMError(Exception):
     """LLM相关错误基类"""
-    pass
+    
+    def __init__(self, message: str = "", status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Args:
+            message: 错误信息
+            status_code: HTTP状态码（如有）
+            retry_after: 服务端建议的重试等待时间（秒，来自Retry-After响应头）
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
 
 
 class NetworkError(LLMError):
@@ -30,18 +47,217 @@ class APIError(LLMError):
     pass
 
 
+class CircuitOpenError(LLMError):
+    """熔断器打开，请求未发出直接失败"""
+    pass
+
+
+# 限流与服务端临时故障，可以重试
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+def is_provider_error(exception: BaseException) -> bool:
+    """是否为服务端或网络侧的临时故障（计入重试预算与熔断器；XML格式错误等不计入）"""
+    if isinstance(exception, CircuitOpenError):
+        return False
+    if isinstance(exception, APIError):
+        return exception.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exception, (NetworkError, TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+class RetryBudget:
+    """
+    重试预算（进程内共享）
+
+    在滑动时间窗口内，重试次数不超过 max(最少重试次数, 比例 × 请求次数)。
+    服务端整体故障时所有请求都会失败，预算耗尽后不再重试，把额外流量限制在固定比例内
+    """
+
+    def __init__(self, ratio: float = 0.1, min_retries: int = 3, window_seconds: float = 60.0):
+        """
+        Args:
+            ratio: 重试次数占请求次数的最大比例，小于等于0表示不限制
+            min_retries: 窗口内始终允许的重试次数（低流量时不至于完全无法重试）
+            window_seconds: 滑动窗口长度（秒）
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.stats = {"calls": 0, "retries": 0, "exhausted": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ratio > 0
+
+    def _trim(self, now: float) -> None:
+        for timestamps in (self._calls, self._retries):
+            while timestamps and now - timestamps[0] > self.window_seconds:
+                timestamps.popleft()
+
+    def record_call(self) -> None:
+        """记录一次请求（含重试），同时移除窗口外的记录，没有重试时队列也不会无限增长"""
+        now = time.monotonic()
+        self._trim(now)
+        self._calls.append(now)
+        self.stats["calls"] += 1
+
+    def allowance(self) -> float:
+        """当前窗口内允许的重试次数"""
+        self._trim(time.monotonic())
+        return max(self.min_retries, self.ratio * len(self._calls))
+
+    def try_spend(self) -> bool:
+        """申请一次重试，预算不足时返回False"""
+        now = time.monotonic()
+        self._trim(now)
+        if self.enabled and len(self._retries) >= self.allowance():
+            self.stats["exhausted"] += 1
+            return False
+        self._retries.append(now)
+        self.stats["retries"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "ratio": self.ratio,
+            "window_calls": len(self._calls),
+            "window_retries": len(self._retries),
+            "window_allowance": round(self.allowance(), 2),
+            **self.stats,
+        }
+
+    def reset_stats(self) -> None:
+        self.stats = {"calls": 0, "retries": 0, "exhausted": 0}
+
+
+class CircuitBreaker:
+    """
+    熔断器（进程内共享）
+
+    closed：正常放行；连续 failure_threshold 次服务端故障后进入 open
+    open：直接抛出 CircuitOpenError，open_seconds 秒后进入 half_open
+    half_open：只放行一个试探请求，成功则关闭，失败则重新打开，被取消则释放名额由下一个请求试探
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0):
+        """
+        Args:
+            failure_threshold: 触发熔断的连续失败次数，小于等于0表示关闭熔断
+            open_seconds: 熔断持续时间（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def remaining_open_time(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def before_call(self) -> bool:
+        """
+        请求前检查，熔断期间抛出 CircuitOpenError
+
+        Returns:
+            本次请求是否为半开状态下的试探请求
+        """
+        if not self.enabled or self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and self.remaining_open_time() <= 0:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+            logger.info("熔断器进入半开状态，放行试探请求")
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(
+            f"LLM服务连续失败，熔断中（剩余{self.remaining_open_time():.1f}秒）",
+            retry_after=self.remaining_open_time() or None,
+        )
+
+    def record(self, exception: Optional[BaseException] = None) -> None:
+        """记录请求结果：服务端故障计为失败，其他结果（含XML格式错误）说明服务可用，计为成功"""
+        if not self.enabled or isinstance(exception, CircuitOpenError):
+            return
+        if exception is not None and is_provider_error(exception):
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open()
+            return
+        if self.state != self.CLOSED:
+            logger.info("试探请求成功，熔断器关闭")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """试探请求没有得出结果（如任务被取消）：释放试探名额，否则熔断器将一直拒绝请求"""
+        if self.state == self.HALF_OPEN and self._trial_in_flight:
+            self._trial_in_flight = False
+            logger.info("试探请求被中断，等待下一个试探请求")
+
+    def _open(self) -> None:
+        if self.state != self.OPEN:
+            self.stats["opened"] += 1
+            logger.warning(f"LLM服务连续失败{self.consecutive_failures}次，熔断{self.open_seconds}秒")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "remaining_open_time": round(self.remaining_open_time(), 2),
+            **self.stats,
+        }
+
+    def reset_stats(self) -> None:
+        self.stats = {"opened": 0, "rejected": 0}
+
+
+# 全局共享的重试预算与熔断器（所有智能体的重试包装器共用）
+shared_retry_budget = RetryBudget(
+    ratio=settings.RETRY_BUDGET_RATIO,
+    min_retries=settings.RETRY_BUDGET_MIN_RETRIES,
+)
+shared_circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+)
+
+
 class RetryWrapper:
     """
     重试包装器
     
     功能：
     1. 对智能体调用和数据库操作实现重试机制
-    2. 使用指数回退延迟算法
+    2. 使用带随机抖动的指数回退延迟算法，遵循Retry-After
     3. 区分可重试和不可重试错误
-    4. 通过回调函数发布重试状态
+    4. 服务端故障的重试受共享重试预算与熔断器约束
+    5. 通过回调函数发布重试状态
     """
     
-    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0):
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0,
+                 retry_budget: Optional[RetryBudget] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
         """
         初始化重试包装器
         
@@ -49,15 +265,21 @@ class RetryWrapper:
             max_retries: 最大重试次数
             base_delay: 基础延迟时间（秒）
             max_delay: 最大延迟时间（秒）
+            retry_budget: 重试预算，默认使用全局共享预算
+            circuit_breaker: 熔断器，默认使用全局共享熔断器
         """
         self.max_retries = max_retries
         self.base_delay = base_delay
         self.max_delay = max_delay
+        self.retry_budget = retry_budget or shared_retry_budget
+        self.circuit_breaker = circuit_breaker or shared_circuit_breaker
         self.retry_stats = {
             "total_attempts": 0,
             "successful_attempts": 0,
             "failed_attempts": 0,
-            "total_delay": 0.0
+            "total_delay": 0.0,
+            "budget_exhausted": 0,
+            "circuit_rejected": 0
         }
         
         logger.info(f"重试包装器初始化: 最大重试{max_retries}次")
@@ -85,30 +307,40 @@ class RetryWrapper:
         
         for attempt in range(self.max_retries + 1):
             self.retry_stats["total_attempts"] += 1
+            trial = False
             
             try:
                 logger.info(f"开始第{attempt + 1}次尝试 (共{self.max_retries + 1}次)")
                 
+                # 熔断期间直接失败，不发出请求
+                trial = self.circuit_breaker.before_call()
+                self.retry_budget.record_call()
+                
                 # 执行函数
                 result = await func(*args, **kwargs)
                 
                 # 成功完成
+                self.circuit_breaker.record(None)
                 self.retry_stats["successful_attempts"] += 1
                 logger.info("函数执行成功完成")
                 return result
                 
             except Exception as e:
+                self.circuit_breaker.record(e)
+                if isinstance(e, CircuitOpenError):
+                    self.retry_stats["circuit_rejected"] += 1
+                
                 # 检查是否为可重试的错误
                 if self._should_retry(e):
                     logger.warning(f"第{attempt + 1}次尝试失败（可重试错误）: {e}")
                     
-                    if attempt < self.max_retries:
+                    if attempt < self.max_retries and self._can_retry(e):
                         # 回溯消息列表到重试前状态
                         if rollback_message_id:
                             await self._rollback_messages(publish_callback, rollback_message_id)
                         
                         # 计算延迟时间
-                        delay = self._calculate_delay(attempt)
+                        delay = self._calculate_delay(attempt, e)
                         self.retry_stats["total_delay"] += delay
                                                 
                         logger.info(f"等待{delay:.1f}秒后重试")
@@ -133,6 +365,11 @@ class RetryWrapper:
                     logger.error(f"发生不可重试错误: {e}")
                     logger.debug(f"错误堆栈: {traceback.format_exc()}")
                     raise
+            except BaseException:
+                # 任务被取消（如停止处理）等情况不计入熔断结果，但必须释放试探名额
+                if trial:
+                    self.circuit_breaker.release_trial()
+                raise
     
     def _should_retry(self, exception: Exception) -> bool:
         """
@@ -144,29 +381,52 @@ class RetryWrapper:
         Returns:
             是否可重试
         """
-        # 可重试的错误类型
-        retryable_errors = (
-            NetworkError,
-            TimeoutError,
-            ConnectionError,
-            OSError,
-            asyncio.TimeoutError,
-            XMLValidationError
-        )
+        # 服务端临时故障（网络、超时、429/5xx）与模型输出格式错误可以重试；
+        # 其他OSError（如文件不存在、权限错误）重试也无法恢复
+        return is_provider_error(exception) or isinstance(exception, XMLValidationError)
+    
+    def _can_retry(self, exception: Exception) -> bool:
+        """
+        检查服务端故障的重试是否被熔断器或重试预算禁止（格式错误的重试不受限制）
         
-        return isinstance(exception, retryable_errors)
+        Args:
+            exception: 本次尝试的异常
+            
+        Returns:
+            是否继续重试
+        """
+        if not is_provider_error(exception):
+            return True
+        if self.circuit_breaker.state == CircuitBreaker.OPEN:
+            logger.warning("熔断器已打开，放弃重试")
+            return False
+        retry_after = exception.retry_after if isinstance(exception, LLMError) else None
+        if retry_after is not None and retry_after > self.max_delay:
+            logger.warning(f"服务端要求等待{retry_after:.1f}秒，超过最大延迟{self.max_delay:.1f}秒，放弃重试")
+            return False
+        if not self.retry_budget.try_spend():
+            self.retry_stats["budget_exhausted"] += 1
+            logger.warning("重试预算已耗尽，放弃重试")
+            return False
+        return True
     
-    def _calculate_delay(self, attempt: int) -> float:
+    def _calculate_delay(self, attempt: int, exception: Optional[Exception] = None) -> float:
         """
-        计算延迟时间（指数回退）
+        计算延迟时间（指数回退 + 全抖动），服务端给出Retry-After时至少等待该时间
+        
+        全抖动在 [0, 指数回退上限] 内均匀取值，避免多个智能体在同一时刻集中重试
         
         Args:
             attempt: 当前尝试次数（从0开始）
+            exception: 本次尝试的异常
             
         Returns:
             延迟时间（秒）
         """
-        delay = self.base_delay * (2 ** attempt)
+        delay = random.uniform(0, min(self.base_delay * (2 ** attempt), self.max_delay))
+        retry_after = exception.retry_after if isinstance(exception, LLMError) else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
         return min(delay, self.max_delay)
     
     async def _rollback_messages(self, publish_callback: Callable, rollback_message_id: str) -> None:
@@ -239,7 +499,11 @@ class RetryWrapper:
             "average_delay": avg_delay,
             "max_retries": self.max_retries,
             "base_delay": self.base_delay,
-            "max_delay": self.max_delay
+            "max_delay": self.max_delay,
+            "budget_exhausted": self.retry_stats["budget_exhausted"],
+            "circuit_rejected": self.retry_stats["circuit_rejected"],
+            "retry_budget": self.retry_budget.get_stats(),
+            "circuit_breaker": self.circuit_breaker.get_stats()
         }
     
     def reset_stats(self) -> None:
@@ -248,6 +512,8 @@ class RetryWrapper:
             "total_attempts": 0,
             "successful_attempts": 0,
             "failed_attempts": 0,
-            "total_delay": 0.0
+            "total_delay": 0.0,
+            "budget_exhausted": 0,
+            "circuit_rejected": 0
         }
         logger.info("重试统计信息已重置")
@@ -14,9 +14,14 @@ from .prompts_and_validators.modify_solution import (
     MODIFY_THE_SOLUTION_PROMPT,
     ModifySolutionResponse
 )
+from .prompts_and_validators.handle_and_modify_solution import (
+    HANDLE_AND_MODIFY_SOLUTION_PROMPT,
+    HandleAndModifySolutionResponse
+)
 from backend.database.schemas.research_tree import ProblemNode, SolutionNode, NodeType, ProblemType
 from backend.utils.logger import logger
 from backend.database.database_manager import DatabaseManager
+from backend.config import settings
 
 class UserChatAgent(AgentBase):
     """
@@ -61,6 +66,17 @@ class UserChatAgent(AgentBase):
             await self._validate_solution_node(solution_id)
             
             problem_id = self.database_manager.get_parent_node_id_query(solution_id)["data"]["parent_node_id"]
+            
+            # 单次调用模式：一次调用同时给出决策与修改后的方案，失败时回退为两步流程
+            if settings.USER_CHAT_FUSED_MODE:
+                try:
+                    fused_response = await self._handle_and_modify_solution(problem_id, solution_id, user_content)
+                except Exception as e:
+                    logger.warning(f"单次调用处理修改请求失败，回退为两步流程: {e}")
+                else:
+                    if fused_response.modified_solution is not None:
+                        await self._apply_modified_solution(problem_id, solution_id, fused_response.modified_solution)
+                    return
                         
             # 决定是否修改解决方案
             modification_decision = await self._handle_modification_requests(problem_id, solution_id, user_content)
@@ -108,7 +124,7 @@ class UserChatAgent(AgentBase):
         try:
             # 获取环境信息
             message_list = self._get_visible_messages_string(solution_id, NodeType.SOLUTION)
-            current_solution = self.database_manager.get_solution_detail_query(solution_id)["data"]["detail"]
+            current_solution = self.environment_builder.get_solution_detail(solution_id)
             env_info = await self._get_environment_info(problem_id, modification_request)
 
             info = {**env_info, "supervisor_name": "用户", "modification_request": env_info["user_prompt"], 
@@ -119,7 +135,8 @@ class UserChatAgent(AgentBase):
                 title="处理修改请求",
                 publisher=solution_id,
                 visible_node_ids=[solution_id],
-                validator=HandleModificationRequestsResponse
+                validator=HandleModificationRequestsResponse,
+                step="handle_modification_requests"
             )
             
             return modification_decision
@@ -138,7 +155,7 @@ class UserChatAgent(AgentBase):
         """
         try:
             env_info = await self._get_environment_info(problem_id, solution_id)
-            current_solution = self.database_manager.get_solution_detail_query(solution_id)["data"]["detail"]
+            current_solution = self.environment_builder.get_solution_detail(solution_id)
             message_list = self._get_visible_messages_string(solution_id, NodeType.SOLUTION)
             current_solution_children_request_map = self.database_manager.get_solution_children_request_map_by_id_query(solution_id)["data"]["children_request_map"]
             current_solution_sub_problem_list = str(list(current_solution_children_request_map.keys()))
@@ -152,14 +169,62 @@ class UserChatAgent(AgentBase):
                 title="处理修改请求",
                 publisher=solution_id,
                 visible_node_ids=[solution_id],
-                validator=ModifySolutionResponse
+                validator=ModifySolutionResponse,
+                step="modify_solution"
             )
-            action, modify_solution_request = modify_solution_response.to_request(current_solution_children_request_map)
-            if action == "update":
-                await self._execute_action(self.database_manager.update_solution, solution_id, solution_id, modify_solution_request)
-            elif action == "create":
-                await self._execute_action(self.database_manager.create_solution, solution_id, problem_id, modify_solution_request)
+            await self._apply_modified_solution(problem_id, solution_id, modify_solution_response, current_solution_children_request_map)
         except Exception as e:
             logger.error(f"修改解决方案失败: {e}")
             await self._publish_error_patch(f"修改解决方案失败: {str(e)}")
+    
+    async def _handle_and_modify_solution(self, problem_id: str, solution_id: str, modification_request: str) -> HandleAndModifySolutionResponse:
+        """
+        单次调用处理修改请求：同一个提示词内完成决策，同意修改时直接给出修改后的方案
+        
+        Args:
+            problem_id: 问题ID
+            solution_id: 解决方案ID
+            modification_request: 修改请求
+            
+        Returns:
+            决策与修改后的方案（仅同意修改时）
+        """
+        # 环境信息与可见消息只构建一次
+        env_info = await self._get_environment_info(problem_id, modification_request)
+        current_solution = self.environment_builder.get_solution_detail(solution_id)
+        message_list = self._get_visible_messages_string(solution_id, NodeType.SOLUTION)
+        children_request_map = self.database_manager.get_solution_children_request_map_by_id_query(solution_id)["data"]["children_request_map"]
+        
+        info = {**env_info, "supervisor_name": "用户", "modification_request": env_info["user_prompt"],
+            "current_solution_sub_problem_list": str(list(children_request_map.keys())),
+            "current_solution": current_solution, "message_list": message_list}
+        return await self._call_llm_with_retry(
+            prompt=HANDLE_AND_MODIFY_SOLUTION_PROMPT.format_map(info),
+            title="处理修改请求",
+            publisher=solution_id,
+            visible_node_ids=[solution_id],
+            validator=HandleAndModifySolutionResponse,
+            step="handle_and_modify_solution"
+        )
+    
+    async def _apply_modified_solution(self, problem_id: str, solution_id: str, modify_solution_response: ModifySolutionResponse,
+                                       children_request_map: Optional[Dict[str, Any]] = None) -> None:
+        """
+        将修改后的方案写入研究树：子问题全部原样继承时原地更新，否则创建新方案
+        增量输出中省略的字段沿用当前方案的内容
+        
+        Args:
+            problem_id: 问题ID
+            solution_id: 原解决方案ID
+            modify_solution_response: 修改后的方案
+            children_request_map: 原方案子问题标题到请求的映射（未提供时查询）
+        """
+        if children_request_map is None:
+            children_request_map = self.database_manager.get_solution_children_request_map_by_id_query(solution_id)["data"]["children_request_map"]
+        current_solution = self.database_manager.get_solution_request_by_id_query(solution_id)["data"]["solution_request"]
+        action, modify_solution_request = modify_solution_response.to_request(children_request_map, current_solution)
+        if action == "update":
+            await self._execute_action(self.database_manager.update_solution, solution_id, solution_id, modify_solution_request)
+        elif action == "create":
+            await self._execute_action(self.database_manager.create_solution, solution_id, problem_id, modify_solution_request)
     
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+本地模拟DeepSeek服务
+提供OpenAI兼容的 /chat/completions 流式接口，用于在不调用真实API的情况下压测后端
+
+功能：
+1. 可配置的思考/内容长度与输出速率（token/秒）
+2. 按提示词类型返回合法的XML响应（创建方案、处理修改请求、修改方案），节点名称全局唯一
+3. 错误注入：请求级错误（429/500）与流中断
+4. 前缀续写（/beta/chat/completions，最后一条assistant消息带 "prefix": true）：从中断处继续输出
+5. 限制生成的解决方案总数，使自动研究在有限步数内结束
+
+启动：
+python -m backend.benchmarks.mock_deepseek_server --port 9009 --tokens-per-second 200
+然后设置 DEEPSEEK_BASE_URL=http://127.0.0.1:9009/v1 启动后端
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockConfig:
+    """模拟服务配置"""
+    reasoning_tokens: int = 300          # 每次响应的思考token数（仅reasoner模型）
+    content_filler_tokens: int = 200     # 内容中每个长文本字段的填充token数
+    tokens_per_second: float = 0.0       # 输出速率，0表示不限速
+    tokens_per_chunk: int = 4            # 每个数据块包含的token数
+    first_token_latency: float = 0.0     # 首个数据块前的延迟（秒）
+    sub_problems_per_solution: int = 2   # 每个方案包含的子实施问题数
+    max_solutions: int = 20              # 生成方案总数上限，达到后方案不再包含子问题
+    error_rate: float = 0.0              # 请求级错误概率（返回 error_status）
+    error_status: int = 500
+    disconnect_rate: float = 0.0         # 流中途断开的概率
+    seed: Optional[int] = None
+
+
+class MockDeepSeekState:
+    """模拟服务的运行状态与统计"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self._names = itertools.count(1)
+        self.solutions_created = 0
+        # 被中断的响应内容（按提示词），用于前缀续写
+        self.interrupted: Dict[str, str] = {}
+        self.stats = {
+            "requests": 0,
+            "streamed_chunks": 0,
+            "injected_errors": 0,
+            "injected_disconnects": 0,
+            "prefix_completions": 0,
+            "by_prompt_type": {},
+        }
+
+    def next_name(self, prefix: str) -> str:
+        return f"{prefix}{next(self._names)}"
+
+    def reset(self) -> None:
+        self.solutions_created = 0
+        self._names = itertools.count(1)
+        self.interrupted = {}
+        self.stats = {
+            "requests": 0,
+            "streamed_chunks": 0,
+            "injected_errors": 0,
+            "injected_disconnects": 0,
+            "prefix_completions": 0,
+            "by_prompt_type": {},
+        }
+
+
+def _filler(tokens: int, seed_text: str) -> str:
+    """生成指定token数左右的中文填充文本（约0.6 token/字）"""
+    chars = max(1, int(tokens / 0.6))
+    base = f"关于{seed_text}的模拟论述。"
+    return (base * (chars // len(base) + 1))[:chars]
+
+
+def detect_prompt_type(prompt: str) -> str:
+    """根据提示词中特有的段落判断请求类型"""
+    if "<modified_solution>" in prompt:
+        return "handle_and_modify_solution"
+    if "<modification_request>" in prompt:
+        return "handle_modification_requests"
+    if "<modify_plan>" in prompt:
+        return "modify_solution"
+    return "create_solution"
+
+
+def _cdata(text: str) -> str:
+    return f"<![CDATA[{text}]]>"
+
+
+def build_solution_xml(state: MockDeepSeekState) -> str:
+    """生成一个合法的解决方案XML，名称全局唯一"""
+    config = state.config
+    state.solutions_created += 1
+    sub_count = config.sub_problems_per_solution if state.solutions_created < config.max_solutions else 0
+    name = state.next_name("模拟方案")
+    sub_problems = []
+    for _ in range(sub_count):
+        sub_name = state.next_name("如何完成模拟子问题")
+        sub_problems.append(
+            f'<sub_problem type="implementation">\n'
+            f"<name>{_cdata(sub_name + '？')}</name>\n"
+            f"<significance>{_cdata(_filler(config.content_filler_tokens // 4, sub_name))}</significance>\n"
+            f"<criteria>{_cdata(_filler(config.content_filler_tokens // 4, sub_name))}</criteria>\n"
+            f"</sub_problem>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        "<response>\n"
+        f"<name>{_cdata(name)}</name>\n"
+        f"<top_level_thoughts>{_cdata(_filler(config.content_filler_tokens, name))}</top_level_thoughts>\n"
+        f"<research_plan>\n" + "\n".join(sub_problems) + "\n</research_plan>\n"
+        f"<implementation_plan>{_cdata(_filler(config.content_filler_tokens, name))}</implementation_plan>\n"
+        f"<plan_justification>{_cdata(_filler(config.content_filler_tokens, name))}</plan_justification>\n"
+        "</response>"
+    )
+
+
+def build_modification_fields(state: MockDeepSeekState) -> str:
+    """生成增量修改的方案字段：新名称、修改后的实施方案，并新增一个子问题"""
+    config = state.config
+    state.solutions_created += 1
+    name = state.next_name("模拟修改方案")
+    sub_name = state.next_name("如何完成模拟新增子问题")
+    return (
+        f"<name>{_cdata(name)}</name>\n"
+        "<sub_problem_changes>\n"
+        f'<add type="implementation">\n'
+        f"<name>{_cdata(sub_name + '？')}</name>\n"
+        f"<significance>{_cdata(_filler(config.content_filler_tokens // 4, sub_name))}</significance>\n"
+        f"<criteria>{_cdata(_filler(config.content_filler_tokens // 4, sub_name))}</criteria>\n"
+        "</add>\n"
+        "</sub_problem_changes>\n"
+        f"<implementation_plan>{_cdata(_filler(config.content_filler_tokens, name))}</implementation_plan>\n"
+    )
+
+
+def build_response_xml(state: MockDeepSeekState, prompt_type: str) -> str:
+    """按请求类型生成XML响应"""
+    decision = (
+        '<decision type="accept">\n'
+        f"<reasoning>{_cdata('模拟决策：接受修改')}</reasoning>\n"
+        f"<modification_plan>{_cdata(_filler(state.config.content_filler_tokens // 2, '修改计划'))}</modification_plan>\n"
+        "</decision>\n"
+    )
+    if prompt_type == "handle_modification_requests":
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<response>\n' + decision + "</response>"
+    if prompt_type == "handle_and_modify_solution":
+        # 单次调用模式：决策与修改后的方案放在同一个response中
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<response>\n' + decision +
+                "<modified_solution>\n" + build_modification_fields(state) + "</modified_solution>\n</response>")
+    if prompt_type == "modify_solution":
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<response>\n' + build_modification_fields(state) + "</response>"
+    return build_solution_xml(state)
+
+
+def _split_tokens(text: str, tokens_per_chunk: int) -> List[str]:
+    """按估算的token数把文本切成数据块（中文约1.7字/token）"""
+    chars_per_chunk = max(1, int(tokens_per_chunk / 0.6))
+    return [text[i:i + chars_per_chunk] for i in range(0, len(text), chars_per_chunk)]
+
+
+def _chunk_json(model: str, completion_id: str, delta: Dict[str, Any], finish_reason: Optional[str] = None,
+                usage: Optional[Dict[str, int]] = None) -> str:
+    payload: Dict[str, Any] = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    """创建模拟服务应用"""
+    state = MockDeepSeekState(config or MockConfig())
+    app = FastAPI(title="Mock DeepSeek API")
+    app.state.mock = state
+
+    async def stream_response(body: Dict[str, Any], prompt_type: str) -> AsyncIterator[str]:
+        config = state.config
+        model = body.get("model", "deepseek-chat")
+        completion_id = f"mock-{state.stats['requests']}"
+        messages = body.get("messages", [])
+        prefix = messages[-1].get("content", "") if messages and messages[-1].get("prefix") else None
+        prompt = "".join(m.get("content", "") for m in messages if not m.get("prefix"))
+        original = state.interrupted.pop(prompt, None) if prefix is not None else None
+        if original is not None and original.startswith(prefix):
+            # 前缀续写：只输出前缀之后的部分
+            state.stats["prefix_completions"] += 1
+            content = original[len(prefix):]
+            reasoning = ""
+        else:
+            content = build_response_xml(state, prompt_type)
+            reasoning = _filler(config.reasoning_tokens, "思考") if "reasoner" in model else ""
+
+        delay = config.tokens_per_chunk / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        if config.first_token_latency > 0:
+            await asyncio.sleep(config.first_token_latency)
+
+        pieces = [("reasoning_content", p) for p in _split_tokens(reasoning, config.tokens_per_chunk)] + \
+                 [("content", p) for p in _split_tokens(content, config.tokens_per_chunk)]
+        disconnect_at = None
+        if state.random.random() < config.disconnect_rate and pieces:
+            disconnect_at = state.random.randrange(len(pieces))
+
+        yield _chunk_json(model, completion_id, {"role": "assistant", "content": ""})
+        for index, (field, text) in enumerate(pieces):
+            if index == disconnect_at:
+                state.stats["injected_disconnects"] += 1
+                state.interrupted[prompt] = (prefix or "") + content
+                # 直接结束响应体而不发送 [DONE]，模拟连接中断
+                raise ConnectionResetError("模拟流中断")
+            if delay:
+                await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+            state.stats["streamed_chunks"] += 1
+            delta = {"content": None, "reasoning_content": None}
+            delta[field] = text
+            yield _chunk_json(model, completion_id, delta)
+
+        prompt_tokens = int(len(prompt) * 0.6)
+        completion_tokens = int((len(reasoning) + len(content)) * 0.6)
+        yield _chunk_json(model, completion_id, {}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_cache_hit_tokens": 0,
+                "prompt_cache_miss_tokens": prompt_tokens,
+                "completion_tokens_details": {"reasoning_tokens": int(len(reasoning) * 0.6)},
+            }
+            yield _chunk_json(model, completion_id, None, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    @app.post("/{prefix:path}chat/completions")
+    async def chat_completions(request: Request, prefix: str = ""):
+        body = await request.json()
+        state.stats["requests"] += 1
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []) if not m.get("prefix"))
+        prompt_type = detect_prompt_type(prompt)
+        state.stats["by_prompt_type"][prompt_type] = state.stats["by_prompt_type"].get(prompt_type, 0) + 1
+
+        if state.random.random() < state.config.error_rate:
+            state.stats["injected_errors"] += 1
+            headers = {"Retry-After": "1"} if state.config.error_status == 429 else {}
+            return JSONResponse(
+                status_code=state.config.error_status,
+                content={"error": {"message": "模拟错误", "type": "mock_error"}},
+                headers=headers,
+            )
+
+        if not body.get("stream"):
+            content = build_response_xml(state, prompt_type)
+            return {
+                "id": f"mock-{state.stats['requests']}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            }
+        return StreamingResponse(stream_response(body, prompt_type), media_type="text/event-stream")
+
+    @app.get("/mock/stats")
+    async def get_mock_stats():
+        return {"config": asdict(state.config), "solutions_created": state.solutions_created, **state.stats}
+
+    @app.post("/mock/reset")
+    async def reset_mock():
+        state.reset()
+        return {"success": True}
+
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="本地模拟DeepSeek流式服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9009)
+    for field_name, default in asdict(MockConfig()).items():
+        arg_type = type(default) if default is not None else int
+        parser.add_argument(f"--{field_name.replace('_', '-')}", type=arg_type, default=default)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(**{k: getattr(args, k) for k in asdict(MockConfig()).keys()})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,244 @@
+"""
+端到端吞吐量基准测试
+在同一进程内启动模拟DeepSeek服务（独立线程）与后端服务，通过HTTP/SSE驱动
+/agents/messages 的自动研究与用户修改流程，报告：
+1. patch吞吐（个/秒）与SSE事件数
+2. 事件循环延迟（后端所在事件循环的调度滞后，P50/P95/最大值）
+3. 内存增长（RSS起止与峰值）
+4. 随研究树增长的每个节点耗时
+
+运行：
+python -m backend.benchmarks.run_benchmark --max-solutions 30 --tokens-per-second 0 --chat-rounds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from backend.benchmarks.mock_deepseek_server import MockConfig, create_app, parse_args as parse_mock_args, config_from_args
+
+
+def read_rss_mb() -> float:
+    """读取当前进程常驻内存（MB）"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # 非Linux平台只能取峰值（macOS单位为字节，Linux为KB）
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if rss > 10 ** 7 else rss / 1024
+
+
+class LoopLagProbe:
+    """事件循环延迟探针：周期性睡眠，记录实际唤醒相对预期的滞后"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.lags_ms: List[float] = []
+        self.rss_samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags_ms.append(max(0.0, (loop.time() - start - self.interval) * 1000))
+            if len(self.lags_ms) % 25 == 0:
+                self.rss_samples.append(read_rss_mb())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, float]:
+        if not self.lags_ms:
+            return {}
+        ordered = sorted(self.lags_ms)
+        return {
+            "samples": len(ordered),
+            "p50_ms": round(statistics.median(ordered), 2),
+            "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+
+def start_mock_server(config: MockConfig, port: int) -> uvicorn.Server:
+    """在独立线程中启动模拟服务，避免其开销计入后端事件循环延迟"""
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def consume_sse(client: httpx.AsyncClient, payload: Dict[str, Any], on_patch=None) -> Dict[str, Any]:
+    """发送消息并消费SSE流直到finished/error事件"""
+    patches = 0
+    event = None
+    result: Dict[str, Any] = {}
+    async with client.stream("POST", "/agents/messages", json=payload, timeout=None) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "patch":
+                    patches += 1
+                    if on_patch:
+                        on_patch(data)
+                elif event in ("finished", "error"):
+                    result = {"event": event, "data": data}
+                    break
+    result["patches"] = patches
+    return result
+
+
+async def run_auto_research(client: httpx.AsyncClient) -> Dict[str, Any]:
+    """自动研究场景：从根问题开始BFS生成方案直到模拟服务不再返回子问题"""
+    response = await client.post("/research-tree/problems/root", json={
+        "title": f"基准测试根问题{int(time.time())}", "significance": "基准测试", "criteria": "基准测试",
+    })
+    response.raise_for_status()
+    problem_id = response.json()["data"]["roots"][-1]["id"]
+
+    node_times: List[float] = []
+    start = time.perf_counter()
+
+    def on_patch(patch: Dict[str, Any]) -> None:
+        if patch.get("action_title") == "create_solution" and patch.get("snapshot_id"):
+            node_times.append(time.perf_counter() - start)
+
+    result = await consume_sse(client, {
+        "content": "", "title": "自动生成解决方案", "agent_name": "auto_research_agent",
+        "other_params": {"problem_id": problem_id},
+    }, on_patch)
+    elapsed = time.perf_counter() - start
+
+    # 每个节点耗时随树规模的变化：按每5个方案分桶
+    per_node = [b - a for a, b in zip([0.0] + node_times[:-1], node_times)]
+    buckets = [
+        {"solutions": f"{i + 1}-{min(i + 5, len(per_node))}", "avg_seconds": round(statistics.mean(per_node[i:i + 5]), 4)}
+        for i in range(0, len(per_node), 5)
+    ]
+    return {
+        "problem_id": problem_id,
+        "result": result.get("event"),
+        "elapsed_seconds": round(elapsed, 3),
+        "patches": result["patches"],
+        "patches_per_second": round(result["patches"] / elapsed, 1) if elapsed else 0.0,
+        "solutions_created": len(node_times),
+        "time_per_node": buckets,
+    }
+
+
+async def run_chat_rounds(client: httpx.AsyncClient, problem_id: str, rounds: int) -> Dict[str, Any]:
+    """用户修改场景：对根问题的选中方案连续提出修改要求"""
+    latencies: List[float] = []
+    patches = 0
+    for i in range(rounds):
+        response = await client.get("/research-tree/snapshots/current-id")
+        snapshot_id = response.json()["data"]["current_snapshot_id"]
+        snapshot = (await client.get(f"/research-tree/snapshots/{snapshot_id}")).json()["data"]
+        root = next(r for r in snapshot["roots"] if r["id"] == problem_id)
+        solution_id = root.get("selected_solution_id") or root["children"][0]["id"]
+        start = time.perf_counter()
+        result = await consume_sse(client, {
+            "content": f"请修改：第{i + 1}轮基准测试修改要求", "title": "用户消息", "agent_name": "user_chat_agent",
+            "other_params": {"problem_id": problem_id, "solution_id": solution_id},
+        })
+        latencies.append(time.perf_counter() - start)
+        patches += result["patches"]
+    total = sum(latencies)
+    return {
+        "rounds": rounds,
+        "patches": patches,
+        "patches_per_second": round(patches / total, 1) if total else 0.0,
+        "avg_round_seconds": round(statistics.mean(latencies), 4) if latencies else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace, mock_config: MockConfig) -> Dict[str, Any]:
+    mock_server = start_mock_server(mock_config, args.mock_port)
+
+    # 必须在导入后端之前设置，使配置指向模拟服务
+    os.environ["DEEPSEEK_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    os.environ["LLM_CACHE_MODE"] = "off"
+    # 工程文件（含预写日志）写入临时目录，不影响仓库中的示例工程
+    os.environ.setdefault("PROJECTS_DIR", tempfile.mkdtemp(prefix="resviz-benchmark-"))
+    from backend.main import app
+
+    backend_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.backend_port, log_level="warning"))
+    serve_task = asyncio.create_task(backend_server.serve())
+    while not backend_server.started:
+        await asyncio.sleep(0.05)
+
+    probe = LoopLagProbe()
+    rss_start = read_rss_mb()
+    probe.start()
+    report: Dict[str, Any] = {"mock_config": asdict(mock_config)}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.backend_port}", timeout=60) as client:
+            await client.post("/projects", params={"project_name": f"benchmark-{int(time.time())}"})
+            report["auto_research"] = await run_auto_research(client)
+            if args.chat_rounds > 0:
+                report["chat"] = await run_chat_rounds(client, report["auto_research"]["problem_id"], args.chat_rounds)
+            report["mock_stats"] = (await client.get(f"http://127.0.0.1:{args.mock_port}/mock/stats")).json()
+            report["agent_status"] = (await client.get("/agents/status")).json().get("agent_details")
+    finally:
+        await probe.stop()
+        backend_server.should_exit = True
+        await serve_task
+        mock_server.should_exit = True
+
+    report["event_loop_lag"] = probe.summary()
+    report["memory_mb"] = {
+        "rss_start": round(rss_start, 1),
+        "rss_end": round(read_rss_mb(), 1),
+        "rss_peak_sampled": round(max(probe.rss_samples + [rss_start]), 1),
+    }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ResVizCopilot 后端端到端基准测试", add_help=False)
+    parser.add_argument("--backend-port", type=int, default=18008)
+    parser.add_argument("--mock-port", type=int, default=19009)
+    parser.add_argument("--chat-rounds", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None, help="把报告写入JSON文件")
+    args, remaining = parser.parse_known_args()
+    mock_config = config_from_args(parse_mock_args(remaining))
+
+    report = asyncio.run(run(args, mock_config))
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
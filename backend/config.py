@@ -38,6 +38,87 @@ class Settings:
     DEFAULT_MAX_TOKENS: int = int(os.getenv("DEFAULT_MAX_TOKENS", "4000"))
     DEFAULT_TEMPERATURE: float = float(os.getenv("DEFAULT_TEMPERATURE", "0.7"))
     
+    # 提示词上下文预算（估算Token数，小于等于0表示不限制）
+    PROMPT_BUDGET_TREE_TOKENS: int = int(os.getenv("PROMPT_BUDGET_TREE_TOKENS", "3000"))
+    PROMPT_BUDGET_ANCESTOR_TOKENS: int = int(os.getenv("PROMPT_BUDGET_ANCESTOR_TOKENS", "8000"))
+    PROMPT_BUDGET_SIBLING_TOKENS: int = int(os.getenv("PROMPT_BUDGET_SIBLING_TOKENS", "4000"))
+    PROMPT_BUDGET_DESCENDANT_TOKENS: int = int(os.getenv("PROMPT_BUDGET_DESCENDANT_TOKENS", "6000"))
+    
+    # LLM响应缓存配置：off 关闭 / record 命中回放、未命中录制 / replay 仅回放（不访问网络）
+    LLM_CACHE_MODE: str = os.getenv("LLM_CACHE_MODE", "off").lower()
+    LLM_CACHE_DIR: Optional[str] = os.getenv("LLM_CACHE_DIR", None)
+    # 回放速度：0为全速回放，1为按录制时的速度回放
+    LLM_CACHE_REPLAY_DELAY_SCALE: float = float(os.getenv("LLM_CACHE_REPLAY_DELAY_SCALE", "0"))
+    
+    # LLM HTTP连接池配置（所有智能体与模型共享）
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+    LLM_HTTP_CONNECT_TIMEOUT: float = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+    # 两次读取之间的最大间隔（秒），推理模型首token前可能较长
+    LLM_HTTP_READ_TIMEOUT: float = float(os.getenv("LLM_HTTP_READ_TIMEOUT", "300"))
+    # 启用HTTP/2需要安装h2（pip install httpx[http2]），未安装时自动回退HTTP/1.1
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "false").lower() in ("1", "true", "yes")
+    
+    # LLM全局限流（所有智能体共享，小于等于0表示不限制）与AIMD自适应并发
+    LLM_RATE_LIMIT_RPM: int = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+    LLM_RATE_LIMIT_TPM: int = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+    LLM_CONCURRENCY_INITIAL: int = int(os.getenv("LLM_CONCURRENCY_INITIAL", "4"))
+    LLM_CONCURRENCY_MIN: int = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+    LLM_CONCURRENCY_MAX: int = int(os.getenv("LLM_CONCURRENCY_MAX", "16"))
+    
+    # 用户修改请求单次调用模式：一次调用同时完成决策与方案修改，失败时回退为两步流程
+    USER_CHAT_FUSED_MODE: bool = os.getenv("USER_CHAT_FUSED_MODE", "false").lower() in ("1", "true", "yes")
+    
+    # 模型路由覆盖（JSON，键为步骤名或验证器类名），例如：
+    # {"handle_modification_requests": {"model": "reasoner"}, "create_solution": {"max_tokens": 6000, "timeout": 600}}
+    LLM_ROUTES: Optional[str] = os.getenv("LLM_ROUTES", None)
+    
+    # 重试预算（滑动窗口内重试次数 ≤ max(最少次数, 比例 × 请求数)，比例小于等于0表示不限制）
+    RETRY_BUDGET_RATIO: float = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+    RETRY_BUDGET_MIN_RETRIES: int = int(os.getenv("RETRY_BUDGET_MIN_RETRIES", "3"))
+    # 熔断器：连续失败次数阈值（小于等于0表示关闭）与熔断持续时间（秒）
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+    # 对冲请求：首个数据块超过该秒数仍未到达时并行发出第二个请求，取先到者（小于等于0表示关闭）
+    LLM_HEDGE_AFTER_SECONDS: float = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+    
+    # 流中断续写：已有部分内容时以前缀续写方式继续生成，最多续写次数（0表示关闭，直接整体重试）
+    LLM_MAX_CONTINUATIONS: int = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+    # 前缀续写接口地址，默认把 DEEPSEEK_BASE_URL 的 /v1 换成 /beta
+    LLM_PREFIX_COMPLETION_URL: Optional[str] = os.getenv("LLM_PREFIX_COMPLETION_URL", None)
+    
+    # 流式XML校验：输出不可恢复时提前中止并重试（开启格式修复时语法错误改为交给修复模型），</response>闭合后提前结束
+    XML_STREAM_VALIDATION: bool = os.getenv("XML_STREAM_VALIDATION", "true").lower() in ("1", "true", "yes")
+    # <response>出现之前允许的最大字符数，小于等于0表示不限制
+    XML_STREAM_MAX_PREAMBLE_CHARS: int = int(os.getenv("XML_STREAM_MAX_PREAMBLE_CHARS", "2000"))
+    
+    # XML格式修复：输出未通过解析或校验时，先用v3模型根据错误信息修复，失败后再整体重新生成
+    XML_REPAIR_ENABLED: bool = os.getenv("XML_REPAIR_ENABLED", "true").lower() in ("1", "true", "yes")
+    XML_REPAIR_MAX_TOKENS: int = int(os.getenv("XML_REPAIR_MAX_TOKENS", "4000"))
+    
+    # 工程存储目录（默认 backend/data/projects）
+    PROJECTS_DIR: Optional[str] = os.getenv("PROJECTS_DIR", None)
+    # 工程存储：json（每个工程一个JSON文件）或 sqlite（<工程目录>/projects.sqlite3，按快照懒加载，首次启用时导入已有JSON工程）
+    PROJECT_STORAGE_BACKEND: str = os.getenv("PROJECT_STORAGE_BACKEND", "json").lower()
+    # 工程预写日志：两次保存之间的每次提交与完成的消息追加写入 <工程名>.journal，加载时重放
+    PROJECT_JOURNAL_ENABLED: bool = os.getenv("PROJECT_JOURNAL_ENABLED", "true").lower() in ("1", "true", "yes")
+    # 批量写入的聚合时间（毫秒），一批记录只fsync一次
+    PROJECT_JOURNAL_FLUSH_MS: float = float(os.getenv("PROJECT_JOURNAL_FLUSH_MS", "50"))
+    # 加载时重放的日志超过该大小（MB）则立即写入新的检查点
+    PROJECT_JOURNAL_COMPACT_MB: float = float(os.getenv("PROJECT_JOURNAL_COMPACT_MB", "16"))
+    # 自动保存：提交快照或完成消息后防抖保存，序列化与写文件在后台线程执行
+    AUTOSAVE_ENABLED: bool = os.getenv("AUTOSAVE_ENABLED", "true").lower() in ("1", "true", "yes")
+    # 最后一次变更后等待的时间（毫秒）
+    AUTOSAVE_DEBOUNCE_MS: float = float(os.getenv("AUTOSAVE_DEBOUNCE_MS", "2000"))
+    # 持续变更时第一次变更后最长等待的时间（毫秒）
+    AUTOSAVE_MAX_DELAY_MS: float = float(os.getenv("AUTOSAVE_MAX_DELAY_MS", "30000"))
+    # 快照常驻内存上限：当前快照与最近访问的快照按LRU常驻，超出个数或估算内存（MB）时溢出到临时文件，访问时重新加载
+    SNAPSHOT_LRU_SIZE: int = int(os.getenv("SNAPSHOT_LRU_SIZE", "32"))
+    SNAPSHOT_MEMORY_CAP_MB: float = float(os.getenv("SNAPSHOT_MEMORY_CAP_MB", "256"))
+    # 按ID读取快照接口的响应体缓存容量（MB），序列化结果在请求之间共享
+    SNAPSHOT_RESPONSE_CACHE_MB: float = float(os.getenv("SNAPSHOT_RESPONSE_CACHE_MB", "64"))
+    
     @classmethod
     def validate(cls) -> None:
         """验证配置"""
@@ -51,7 +132,6 @@ class Settings:
         """获取代理配置字典"""
         proxy_config = {}
         
-        # 设置环境变量，让httpx库自动使用
         if cls.HTTP_PROXY:
             proxy_config["http_proxy"] = cls.HTTP_PROXY
         if cls.HTTPS_PROXY:
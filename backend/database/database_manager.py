@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Callable, Any, Union
+from typing import Dict, List, Optional, Callable, Any, Union, Set, Tuple, MutableMapping
 from uuid import uuid4
 from functools import wraps
 import inspect
 from backend.utils.logger import logger
 from backend.message.schemas.message_models import Patch
+from backend.storage.snapshot_store import SnapshotStore
 
 from .schemas.research_tree import (
     Snapshot,
@@ -24,6 +25,43 @@ from backend.database.schemas.request_models import (
 )
 
 
+# 快照视图可选的节点字段（id 与 children 始终返回），节点类型没有的字段不返回
+NODE_VIEW_FIELDS: Set[str] = (set(ProblemNode.model_fields) | set(SolutionNode.model_fields)) - {"children"}
+
+
+def project_tree(
+    nodes: List[Node],
+    max_depth: Optional[int] = None,
+    fields: Optional[Set[str]] = None,
+    selected_path: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    按视图参数序列化节点树
+
+    Args:
+        nodes: 视图的根节点列表（深度为0）
+        max_depth: 最大深度，该深度的节点不展开子节点，只返回 child_count
+        fields: 返回的节点字段，None 表示全部字段
+        selected_path: 问题节点只保留选中的解决方案
+    """
+    def project(node: Node, depth: int) -> Dict[str, Any]:
+        if fields is None:
+            data = node.model_dump(exclude={"children"})
+        else:
+            data = {name: getattr(node, name) for name in ("id", *sorted(fields)) if hasattr(node, name)}
+        children = node.children
+        if selected_path and isinstance(node, ProblemNode):
+            children = [c for c in children if c.id == node.selected_solution_id]
+        if max_depth is not None and depth >= max_depth:
+            data["children"] = []
+            data["child_count"] = len(children)
+        else:
+            data["children"] = [project(c, depth + 1) for c in children]
+        return data
+
+    return [project(n, 0) for n in nodes]
+
+
 @dataclass
 class RelatedSolutions:
     ancestors: List[str]
@@ -31,6 +69,93 @@ class RelatedSolutions:
     siblings: List[str]
 
 
+@dataclass
+class CommitChange:
+    """一次提交相对上一快照的变更摘要（不比较created_at）"""
+    previous_snapshot_id: Optional[str]
+    snapshot_id: str
+    changed_node_ids: Set[str]
+    removed_node_ids: Set[str]
+
+
+def render_problem_detail(node: ProblemNode) -> str:
+    """将问题节点渲染为提示词使用的XML文本"""
+    return f"<name>{node.title}</name>\n<significance>\n{node.significance}\n</significance>\n<criteria>\n{node.criteria}\n</criteria>"
+
+
+def render_solution_detail(node: SolutionNode) -> str:
+    """将解决方案节点（含直接子问题）渲染为提示词使用的XML文本"""
+    sub_problems = []
+    for c in node.children:
+        if isinstance(c, ProblemNode):
+            sub_problem_lines = [
+                f"<step type={c.problem_type.value}>",
+                f"<name>{c.title}</name>",
+                f"<significance>",
+                c.significance,
+                f"</significance>",
+                f"<criteria>",
+                c.criteria,
+                f"</criteria>",
+                f"</step>",
+            ]
+            sub_problems.append("\n".join(sub_problem_lines))
+    sub_problems_text = "\n".join(sub_problems)
+
+    result_lines = [
+        f"<solution>",
+        f"<name>{node.title}</name>",
+        f"<top_level_thoughts>",
+        node.top_level_thoughts,
+        f"</top_level_thoughts>",
+        f"<research_plan>",
+        sub_problems_text,
+        f"</research_plan>",
+        f"<implementation_plan>",
+        node.implementation_plan,
+        f"</implementation_plan>",
+        f"<plan_justification>",
+        node.plan_justification,
+        f"</plan_justification>",
+        f"<implementation_plan>",
+        node.implementation_plan,
+        f"</implementation_plan>",
+        f"<final_report>",
+        f"{node.final_report if node.final_report else '暂无'}",
+        f"</final_report>",
+        f"</solution>",
+    ]
+    return "\n".join(result_lines)
+
+
+def render_compact_tree(roots: List[Node]) -> List[Tuple[str, int, str]]:
+    """按先序遍历渲染仅包含标题与状态的树，返回 (节点ID, 深度, 文本行) 列表"""
+    entries: List[Tuple[str, int, str]] = []
+
+    def render(node: Node, depth: int, parent_problem: Optional[ProblemNode] = None) -> None:
+        indent = "  " * depth
+        if isinstance(node, ProblemNode):
+            entries.append((node.id, depth, f"{indent}- [P] {node.title} ({node.problem_type.value})"))
+            for c in node.children:
+                render(c, depth + 1, node)
+        else:
+            assert isinstance(node, SolutionNode)
+            # 查找父问题节点的选中方案id
+            status_flag = ""
+            if parent_problem is not None:
+                if parent_problem.selected_solution_id == node.id:
+                    status_flag = "(正启用)"
+                else:
+                    status_flag = "(已弃用)"
+            entries.append((node.id, depth, f"{indent}- [S] {node.title} {status_flag} [{node.state.value}]"))
+            for c in node.children:
+                render(c, depth + 1, None)
+
+    for r in roots:
+        render(r, 0, None)
+    return entries
+
+
 def action_decorator(func):
     """动作装饰器，添加publish_message_callback参数并在执行后自动发布消息"""
     @wraps(func)
@@ -113,10 +238,26 @@ class DatabaseManager:
         每次修改（增删改）都会在当前快照的深拷贝上进行，随后提交为新的快照，
         从而保证历史快照不受后续修改影响。
         """
-        self.snapshot_map: Dict[str, Snapshot] = {}
-        self.current_snapshot_id: Optional[str] = None
+        self.snapshot_map: MutableMapping[str, Snapshot] = SnapshotStore()
+        self._current_snapshot_id: Optional[str] = None
+        self._commit_listeners: List[Callable[[CommitChange], None]] = []
         self._init_empty_snapshot()
 
+    @property
+    def current_snapshot_id(self) -> Optional[str]:
+        return self._current_snapshot_id
+
+    @current_snapshot_id.setter
+    def current_snapshot_id(self, snapshot_id: Optional[str]) -> None:
+        """切换当前快照，快照存储始终保留当前快照常驻内存。"""
+        self._current_snapshot_id = snapshot_id
+        if snapshot_id is not None and isinstance(self.snapshot_map, SnapshotStore):
+            self.snapshot_map.pin(snapshot_id)
+
+    def add_commit_listener(self, listener: Callable[[CommitChange], None]) -> None:
+        """注册提交监听器，每次提交新快照后以CommitChange回调。"""
+        self._commit_listeners.append(listener)
+
     def _init_empty_snapshot(self) -> None:
         """初始化空快照。"""
         snapshot_id = str(uuid4())
@@ -133,13 +274,14 @@ class DatabaseManager:
     def _clone_node(self, node: Node, new_id = None) -> Node:
         """深拷贝任意节点（Problem/Solution），递归复制 children，生成新ID的克隆或保留原ID？
 
-        注意：为保持"快照版本之间可以对比同一节点"的能力，这里保留原ID。
-        只有在业务上需要"派生新节点"（如 fork 子树）时才创建新ID。
+        注意：为保持"快照版本之间可以对比同一节点"的能力，这里保留原ID与创建时间。
+        只有在业务上需要"派生新节点"（如 fork 子树）时才创建新ID（创建时间也随之更新）。
         """
         if isinstance(node, ProblemNode):
             if new_id is None:
                 cloned = ProblemNode(
                     id=node.id,
+                    created_at=node.created_at,
                     title=node.title,
                     problem_type=node.problem_type,
                     significance=node.significance,
@@ -179,6 +321,7 @@ class DatabaseManager:
                 children=[],
             )
             if new_id is None:
+                cloned.created_at = node.created_at
                 cloned.children = [self._clone_node(c) for c in node.children]
             else:
                 cloned.children = [self._clone_node(c, str(uuid4())) for c in node.children]
@@ -210,12 +353,63 @@ class DatabaseManager:
                 return parent
         return None
 
+    @staticmethod
+    def _index_nodes(roots: List[Node]) -> Dict[str, Node]:
+        index: Dict[str, Node] = {}
+        stack = list(roots)
+        while stack:
+            n = stack.pop()
+            index[n.id] = n
+            stack.extend(n.children)
+        return index
+
+    @staticmethod
+    def _node_differs(old: Node, new: Node) -> bool:
+        """比较节点自身字段与子节点ID列表（忽略created_at与子树内容）。"""
+        if type(old) is not type(new):
+            return True
+        if [c.id for c in old.children] != [c.id for c in new.children]:
+            return True
+        for key, value in new.__dict__.items():
+            if key in ("children", "created_at"):
+                continue
+            if old.__dict__.get(key) != value:
+                return True
+        return False
+
+    def _diff_roots(self, old_roots: List[Node], new_roots: List[Node]) -> Tuple[Set[str], Set[str]]:
+        """计算新旧根节点列表之间新增/修改的节点ID与被删除的节点ID。"""
+        old_index = self._index_nodes(old_roots)
+        new_index = self._index_nodes(new_roots)
+        changed = {
+            node_id for node_id, node in new_index.items()
+            if node_id not in old_index or self._node_differs(old_index[node_id], node)
+        }
+        removed = set(old_index) - set(new_index)
+        return changed, removed
+
     def _commit(self, roots: List[Node]) -> Snapshot:
         """写入新快照，传入的 roots 必须是深拷贝后的可独立修改树。"""
+        previous_id = self.current_snapshot_id
+        previous = self.snapshot_map.get(previous_id) if previous_id else None
         new_id = str(uuid4())
         new_snapshot = Snapshot(id=new_id, roots=roots)
         self.snapshot_map[new_id] = new_snapshot
         self.current_snapshot_id = new_id
+
+        if self._commit_listeners:
+            changed, removed = self._diff_roots(previous.roots if previous else [], roots)
+            change = CommitChange(
+                previous_snapshot_id=previous_id,
+                snapshot_id=new_id,
+                changed_node_ids=changed,
+                removed_node_ids=removed,
+            )
+            for listener in self._commit_listeners:
+                try:
+                    listener(change)
+                except Exception as e:
+                    logger.error(f"提交监听器执行失败: {e}")
         return new_snapshot
 
     # ---------- CRUD for research tree ----------
@@ -389,6 +583,44 @@ class DatabaseManager:
             return snapshot.model_dump()
         return {"error": "Snapshot not found"}
 
+    @query_decorator
+    def get_snapshot_view_query(
+        self,
+        snapshot_id: str,
+        root_id: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        fields: Optional[Set[str]] = None,
+        selected_path: bool = False,
+    ) -> Dict:
+        """获取指定快照的子树/限深/部分字段视图查询，参数见 project_tree"""
+        snapshot = self.snapshot_map.get(snapshot_id)
+        if not snapshot:
+            return {"error": "Snapshot not found"}
+        roots = snapshot.roots
+        if root_id is not None:
+            node = self._find_node_in(roots, root_id)
+            if node is None:
+                return {"error": "Node not found"}
+            roots = [node]
+        return {
+            "id": snapshot.id,
+            "created_at": snapshot.created_at,
+            "roots": project_tree(roots, max_depth, fields, selected_path),
+        }
+
+    @query_decorator
+    def get_snapshot_node_query(self, snapshot_id: str, node_id: str) -> Dict:
+        """获取指定快照中单个节点的全部字段（含长文本）查询，子节点只返回ID"""
+        snapshot = self.snapshot_map.get(snapshot_id)
+        if not snapshot:
+            return {"error": "Snapshot not found"}
+        node = self._find_node_in(snapshot.roots, node_id)
+        if node is None:
+            return {"error": "Node not found"}
+        result = node.model_dump(exclude={"children"})
+        result["child_ids"] = [c.id for c in node.children]
+        return {"node": result}
+
     @query_decorator
     def get_current_snapshot_id_query(self) -> Dict:
         """获取当前快照ID查询"""
@@ -398,33 +630,7 @@ class DatabaseManager:
     def get_compact_text_tree_query(self) -> Dict:
         """返回仅包含标题与状态的树状文本查询"""
         current = self.get_current_snapshot()
-
-        def render(node: Node, depth: int, parent_problem: Optional[ProblemNode] = None) -> List[str]:
-            indent = "  " * depth
-            if isinstance(node, ProblemNode):
-                line = f"{indent}- [P] {node.title} ({node.problem_type.value})"
-                lines = [line]
-                for c in node.children:
-                    lines.extend(render(c, depth + 1, node))
-                return lines
-            else:
-                assert isinstance(node, SolutionNode)
-                # 查找父问题节点的选中方案id
-                status_flag = ""
-                if parent_problem is not None:
-                    if parent_problem.selected_solution_id == node.id:
-                        status_flag = "(正启用)"
-                    else:
-                        status_flag = "(已弃用)"
-                line = f"{indent}- [S] {node.title} {status_flag} [{node.state.value}]"
-                lines = [line]
-                for c in node.children:
-                    lines.extend(render(c, depth + 1, None))
-                return lines
-
-        lines: List[str] = []
-        for r in current.roots:
-            lines.extend(render(r, 0, None))
+        lines = [line for _, _, line in render_compact_tree(current.roots)]
         return {"tree_text": "\n".join(lines)}
 
     @query_decorator
@@ -479,7 +685,7 @@ class DatabaseManager:
         node = self._find_node_in(self.get_current_snapshot().roots, problem_id)
         if not isinstance(node, ProblemNode):
             raise KeyError("Problem node not found")
-        return {"detail": f"<name>{node.title}</name>\n<significance>\n{node.significance}\n</significance>\n<criteria>\n{node.criteria}\n</criteria>"}
+        return {"detail": render_problem_detail(node)}
 
     @query_decorator
     def get_node_children_ids_query(self, node_id: str, only_implementation: bool = False) -> Dict:
@@ -510,6 +716,19 @@ class DatabaseManager:
                 )
         return {"children_request_map": problem_request_map}
 
+    @query_decorator
+    def get_solution_request_by_id_query(self, solution_id: str) -> Dict:
+        """获取解决方案自身内容（不含子问题）的请求形式，用于增量修改时补全未修改的字段"""
+        node = self._find_node_in(self.get_current_snapshot().roots, solution_id)
+        if not isinstance(node, SolutionNode):
+            raise KeyError("Solution node not found")
+        return {"solution_request": SolutionRequest(
+            title=node.title,
+            top_level_thoughts=node.top_level_thoughts,
+            implementation_plan=node.implementation_plan,
+            plan_justification=node.plan_justification,
+        )}
+
     @query_decorator
     def get_selected_solution_id_query(self, problem_id: str) -> Dict:
         """获取选中解决方案ID查询"""
@@ -540,47 +759,7 @@ class DatabaseManager:
         if not isinstance(node, SolutionNode):
             raise KeyError("Solution node not found")
         # 组织为XML文档文本
-        sub_problems = []
-        for c in node.children:
-            if isinstance(c, ProblemNode):
-                sub_problem_lines = [
-                    f"<step type={c.problem_type.value}>",
-                    f"<name>{c.title}</name>",
-                    f"<significance>",
-                    c.significance,
-                    f"</significance>",
-                    f"<criteria>",
-                    c.criteria,
-                    f"</criteria>",
-                    f"</step>",
-                ]
-                sub_problems.append("\n".join(sub_problem_lines))
-        sub_problems_text = "\n".join(sub_problems)
-
-        result_lines = [
-            f"<solution>",
-            f"<name>{node.title}</name>",
-            f"<top_level_thoughts>",
-            node.top_level_thoughts,
-            f"</top_level_thoughts>",
-            f"<research_plan>",
-            sub_problems_text,
-            f"</research_plan>",
-            f"<implementation_plan>",
-            node.implementation_plan,
-            f"</implementation_plan>",
-            f"<plan_justification>",
-            node.plan_justification,
-            f"</plan_justification>",
-            f"<implementation_plan>",
-            node.implementation_plan,
-            f"</implementation_plan>",
-            f"<final_report>",
-            f"{node.final_report if node.final_report else '暂无'}",
-            f"</final_report>",
-            f"</solution>",
-        ]
-        return {"detail": "\n".join(result_lines)}
+        return {"detail": render_solution_detail(node)}
 
     @query_decorator
     def get_related_solutions_query(self, problem_id: str) -> Dict:
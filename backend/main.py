@@ -7,12 +7,16 @@ disown
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from backend.routers.research_tree import router as research_tree_router
 from backend.routers.agents import router as agents_router
 from backend.routers.projects import router as projects_router
 from backend.config import settings
 from backend.utils.logger import logger
+from backend.utils.metrics import shared_metrics
+from backend.agents.llm_transport import shared_llm_transport
+from backend.project_manager import shared_project_manager
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -48,6 +52,9 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理"""
+    await shared_llm_transport.aclose()
+    await shared_project_manager.autosave.flush()
+    shared_project_manager.close()
     logger.info("ResVizCopilot 2.0 后端服务关闭")
 
 @app.get("/")
@@ -67,7 +74,8 @@ async def root():
         "endpoints": {
             "research_tree": "/research-tree/*",
             "agents": "/agents/*",
-            "health": "/healthz"
+            "health": "/healthz",
+            "metrics": "/metrics"
         }
     }
 
@@ -80,5 +88,7 @@ def healthz():
         "version": "2.0.0"
     }
 
-
-
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus文本格式的运行指标（LLM调用次数、token用量、首token延迟、输出速率等）"""
+    return PlainTextResponse(shared_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
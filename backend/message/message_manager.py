@@ -3,6 +3,7 @@
 负责一切与用户交互的接口，按需调用相应的智能体，统一消息操作接口
 """
 import asyncio
+from dataclasses import dataclass
 from typing import Dict, List, Optional, AsyncGenerator, Callable, Any
 from uuid import uuid4
 import json
@@ -19,6 +20,23 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+@dataclass
+class MessageChange:
+    """
+    需要持久化的消息变更
+    
+    kind:
+    - finished: 消息已完成（message为完成后的消息）
+    - truncated: 删除message_id之后的所有消息，include_target为真时连同该消息一起删除（回溯后该消息将重新生成）
+    - snapshot_rollback: 用户回退时当前快照切换为snapshot_id
+    """
+    kind: str
+    message: Optional[Message] = None
+    message_id: Optional[str] = None
+    include_target: bool = False
+    snapshot_id: Optional[str] = None
+
+
 class MessageManager:
     """
     消息管理器
@@ -42,9 +60,22 @@ class MessageManager:
         self.database_manager = database_manager or DatabaseManager()  # 数据库管理器
         self._subscribers: List[asyncio.Queue] = []  # 订阅者队列列表
         self._agents: Dict[str, object] = {}  # 智能体实例字典
+        self._change_listeners: List[Callable[[MessageChange], None]] = []  # 消息变更监听器
+        self.revision = 0  # 消息修订号，每次创建、更新、回溯消息时递增（用于HTTP缓存校验）
         
         logger.info("消息管理器初始化完成")
     
+    def add_change_listener(self, listener: Callable[[MessageChange], None]) -> None:
+        """注册消息变更监听器，消息完成、删除与快照回退时回调"""
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, change: MessageChange) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                logger.error(f"消息变更监听器执行失败: {e}")
+    
     def register_agent(self, name: str, agent_instance: object) -> None:
         """
         注册智能体实例
@@ -86,6 +117,8 @@ class MessageManager:
             await self._distribute_patch(patch)
             return
 
+        self.revision += 1
+
         # 处理回溯操作
         if patch.rollback:
             if not patch.message_id:
@@ -179,6 +212,8 @@ class MessageManager:
         # 存储消息
         self.messages[message.id] = message
         self.message_order.append(message.id)
+        if message.status == "completed":
+            self._notify_change(MessageChange(kind="finished", message=message))
         
         # 分发给订阅者
         await self._distribute_patch(patch)
@@ -193,6 +228,8 @@ class MessageManager:
         for message in self.messages.values():
             if message.status == "generating":
                 patch.apply_to_message(message)
+                if message.status == "completed":
+                    self._notify_change(MessageChange(kind="finished", message=message))
         await self._distribute_patch(patch)
         return self.message_order[-1] if self.message_order else ""
     
@@ -210,6 +247,8 @@ class MessageManager:
         
         # 应用补丁
         patch.apply_to_message(message)
+        if message.status == "completed":
+            self._notify_change(MessageChange(kind="finished", message=message))
         
         # 分发给订阅者
         await self._distribute_patch(patch)
@@ -251,6 +290,7 @@ class MessageManager:
         target_message.content = ""
         target_message.thinking = ""
         target_message.updated_at = datetime.now()
+        self._notify_change(MessageChange(kind="truncated", message_id=patch.message_id, include_target=True))
 
         # 分发回溯通知
         await self._distribute_patch(patch)
@@ -295,6 +335,7 @@ class MessageManager:
             }
         
         # 删除该消息之后的所有消息（不包括该消息本身）
+        self.revision += 1
         messages_to_remove = self.message_order[rollback_index + 1:]
         for msg_id in messages_to_remove:
             if msg_id in self.messages:
@@ -302,6 +343,7 @@ class MessageManager:
         
         # 更新消息顺序
         self.message_order = self.message_order[:rollback_index + 1]
+        self._notify_change(MessageChange(kind="truncated", message_id=message_id))
         
         # 查找该消息及之前消息中最新的快照ID
         target_snapshot_id = None
@@ -318,6 +360,7 @@ class MessageManager:
             # 检查快照是否存在
             if target_snapshot_id in self.database_manager.snapshot_map:
                 self.database_manager.current_snapshot_id = target_snapshot_id
+                self._notify_change(MessageChange(kind="snapshot_rollback", snapshot_id=target_snapshot_id))
                 logger.info(f"数据库快照已回退到: {target_snapshot_id}")
             else:
                 logger.warning(f"目标快照不存在: {target_snapshot_id}")
@@ -3,22 +3,45 @@
 负责数据持久化，管理工程的保存、加载、版本控制等
 """
 import os
-import json
 import glob
+import hashlib
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Any, BinaryIO, Dict, List, Optional
 from pathlib import Path
+from uuid import uuid4
 
-from backend.database.database_manager import DatabaseManager
-from backend.message.message_manager import MessageManager
+from backend.config import settings
+from backend.database.database_manager import CommitChange, DatabaseManager
+from backend.database.schemas.research_tree import Snapshot
+from backend.message.message_manager import MessageChange, MessageManager
+from backend.storage.autosave import AutosaveService
+from backend.storage.journal import (
+    BASE_CHECKPOINT,
+    BASE_EMPTY,
+    JOURNAL_SUFFIX,
+    ProjectJournal,
+    commit_record,
+    message_change_record,
+    read_journal,
+    replay_records,
+    select_replay_records,
+)
+from backend.storage.project_export import read_project_export
+from backend.storage.project_store import ProjectRecord, create_project_store
+from backend.storage.snapshot_store import SnapshotStore
+from backend.utils.http_cache import shared_snapshot_response_cache
 from backend.utils.logger import logger
 
-class DateTimeEncoder(json.JSONEncoder):
-    """自定义JSON编码器，处理datetime对象"""
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+@dataclass
+class _PendingSave:
+    """已捕获、等待写入的一次保存"""
+    record: ProjectRecord
+    journal: Optional[ProjectJournal]
+    generation: int
 
 class ProjectManager:
     """
@@ -29,12 +52,19 @@ class ProjectManager:
     2. 在程序启动时自动恢复数据
     3. 提供工程级别的管理接口
     4. 确保数据一致性
+    5. 通过预写日志持久化两次保存之间的每次提交与完成的消息，崩溃后加载时重放
+    
+    工程的读写由存储对象完成（JSON文件或SQLite，见 backend.storage.project_store）
+    
+    保存分两步：事件循环中捕获当前状态（快照提交后不再修改，只复制映射与消息），
+    序列化与写入在单独的保存线程中按顺序执行；提交与完成的消息触发防抖的自动保存
     """
     
-    def __init__(self):
+    def __init__(self, projects_dir: Optional[Path] = None, storage_backend: Optional[str] = None):
         """初始化项目管理器"""
-        self.projects_dir = Path(__file__).parent / "data" / "projects"
+        self.projects_dir = Path(projects_dir or settings.PROJECTS_DIR or Path(__file__).parent / "data" / "projects")
         self.projects_dir.mkdir(parents=True, exist_ok=True)
+        self.store = create_project_store(self.projects_dir, storage_backend or settings.PROJECT_STORAGE_BACKEND)
         
         # 当前工程信息
         self.current_project_name: Optional[str] = None
@@ -45,6 +75,21 @@ class ProjectManager:
         self.database_manager = DatabaseManager()
         self.message_manager = MessageManager(self.database_manager)
         
+        # 当前工程的预写日志：记录自上次保存以来的变更
+        self.journal: Optional[ProjectJournal] = None
+        self.database_manager.add_commit_listener(self._on_commit)
+        self.message_manager.add_change_listener(self._on_message_change)
+        
+        # 保存线程（单线程，保证写入顺序与捕获顺序一致）与自动保存
+        self._save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="project-save")
+        self._project_generation = 0  # 切换工程时递增，切换前开始的保存完成后不再修改当前工程信息
+        self.autosave = AutosaveService(
+            self._autosave,
+            debounce=settings.AUTOSAVE_DEBOUNCE_MS / 1000,
+            max_delay=settings.AUTOSAVE_MAX_DELAY_MS / 1000,
+            enabled=settings.AUTOSAVE_ENABLED,
+        )
+        
         # 自动恢复数据
         self._auto_restore()
     
@@ -69,121 +114,236 @@ class ProjectManager:
             self.create_new_project("未命名")
     
     def _find_latest_project(self) -> Optional[str]:
-        """查找更新时间最新的工程"""
-        project_files = glob.glob(str(self.projects_dir / "*.json"))
+        """查找更新时间最新的工程（尚未保存过、只有日志的工程也包括在内）"""
+        mtimes = self.store.project_mtimes()
+        for journal_file in glob.glob(str(self.projects_dir / f"*{JOURNAL_SUFFIX}")):
+            project_name = Path(journal_file).stem
+            mtimes[project_name] = max(mtimes.get(project_name, 0.0), os.path.getmtime(journal_file))
         
-        if not project_files:
+        if not mtimes:
             return None
         
-        latest_file = max(project_files, key=os.path.getmtime)
-        return Path(latest_file).stem
+        return max(mtimes, key=mtimes.get)
+    
+    # ---------------- 预写日志 ----------------
+    def _get_journal_path(self, project_name: str) -> Path:
+        return self.projects_dir / f"{project_name}{JOURNAL_SUFFIX}"
+    
+    def _open_journal(self, project_name: str, header: Dict[str, Any], resume_at: Optional[int] = None) -> None:
+        """为当前工程打开新的预写日志（关闭旧日志）"""
+        self._close_journal()
+        if not settings.PROJECT_JOURNAL_ENABLED:
+            return
+        self.journal = ProjectJournal(
+            self._get_journal_path(project_name), header, resume_at=resume_at,
+            flush_interval=settings.PROJECT_JOURNAL_FLUSH_MS / 1000,
+        )
+    
+    def _open_empty_journal(self, project_name: str) -> None:
+        """尚未保存的工程：日志在空工程之上重放，需要记录初始快照ID"""
+        initial_snapshot = self.database_manager.get_current_snapshot()
+        self._open_journal(project_name, {
+            "base": BASE_EMPTY,
+            "initial_snapshot_id": initial_snapshot.id,
+            "initial_snapshot_created_at": initial_snapshot.created_at.isoformat(),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        })
     
-    def _get_project_file_path(self, project_name: str, check_file_name_conflict: bool = True) -> Path:
-        """获取工程文件路径，自动处理文件名冲突"""
-        base_path = self.projects_dir / f"{project_name}.json"
+    def _close_journal(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+    
+    def _on_commit(self, change: CommitChange) -> None:
+        if self.journal is not None:
+            snapshot = self.database_manager.snapshot_map[change.snapshot_id]
+            self.journal.append(commit_record(change, snapshot))
+        self.autosave.mark_dirty()
+    
+    def _on_message_change(self, change: MessageChange) -> None:
+        if self.journal is not None:
+            self.journal.append(message_change_record(change))
+        self.autosave.mark_dirty()
+    
+    def _replay_journal(self, project_name: str, checkpoint_id: Optional[str]) -> bool:
+        """
+        重放与检查点匹配的日志，并在原日志末尾继续追加
         
-        if not base_path.exists() or not check_file_name_conflict:
-            return base_path
+        Args:
+            checkpoint_id: 已加载的工程JSON的检查点ID，None表示从空工程开始
+            
+        Returns:
+            是否重放了日志
+        """
+        journal_path = self._get_journal_path(project_name)
+        header, records, valid_bytes = read_journal(journal_path)
+        records = select_replay_records(header, records, checkpoint_id)
+        if records is None:
+            if header is not None:
+                # 检查点之前的日志，其内容已包含在工程文件中
+                logger.info(f"忽略与检查点不匹配的日志: {journal_path}")
+            self._open_journal(project_name, {"base": BASE_CHECKPOINT, "checkpoint_id": checkpoint_id})
+            return False
+        replayed = replay_records(records, self.database_manager, self.message_manager)
+        header = {key: value for key, value in header.items() if key not in ("op", "version")}
+        self._open_journal(project_name, header, resume_at=valid_bytes)
+        logger.info(f"重放工程日志: {project_name}, 共 {replayed} 条记录")
+        return replayed > 0
+    
+    def close(self) -> None:
+        """等待进行中的保存完成，落盘并关闭预写日志（服务关闭时调用）"""
+        self.autosave.cancel()
+        self._save_executor.shutdown(wait=True)
+        self._close_journal()
+        self.store.close()
+    
+    def _begin_project_switch(self) -> None:
+        """切换/清空当前工程前调用：取消待触发的自动保存，进行中的保存完成后不再修改当前工程信息"""
+        self._project_generation += 1
+        self.autosave.cancel()
+    
+    def _resolve_project_name(self, project_name: str, check_file_name_conflict: bool = True) -> str:
+        """获取实际保存的工程名，自动处理重名"""
+        if not self.store.project_exists(project_name) or not check_file_name_conflict:
+            return project_name
         
-        # 处理文件名冲突，添加(1)、(2)等后缀
+        # 处理重名，添加(1)、(2)等后缀
         counter = 1
         while True:
-            new_path = self.projects_dir / f"{project_name}({counter}).json"
-            if not new_path.exists():
-                return new_path
+            new_name = f"{project_name}({counter})"
+            if not self.store.project_exists(new_name):
+                return new_name
             counter += 1
     
-    def _save_project_data(self, project_name: str, check_file_name_conflict: bool = True) -> str:
-        """保存工程数据到文件，返回实际保存的文件名（不含扩展名）"""
-        try:
-            # 获取文件路径（处理冲突）
-            file_path = self._get_project_file_path(project_name, check_file_name_conflict)
-            
-            # 获取实际的文件名（不含扩展名）
-            actual_project_name = file_path.stem
-            
-            # 准备保存数据，使用实际的文件名
-            project_data = {
-                "project_name": actual_project_name,
-                "created_at": self.created_at.isoformat() if self.created_at else None,
-                "updated_at": datetime.now().isoformat(),
-                "messages": {msg_id: msg.model_dump() for msg_id, msg in self.message_manager.messages.items()},
-                "message_order": self.message_manager.message_order,
-                "snapshot_map": {snapshot_id: snapshot.model_dump() for snapshot_id, snapshot in self.database_manager.snapshot_map.items()},
-                "current_snapshot_id": self.database_manager.current_snapshot_id
-            }
-            
-            # 保存到文件，使用自定义编码器
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=2, cls=DateTimeEncoder)
-            
-            # 更新当前工程信息，使用实际的文件名
-            self.current_project_name = actual_project_name
+    def _capture_project(self, project_name: str, check_file_name_conflict: bool = True) -> _PendingSave:
+        """
+        在事件循环中捕获当前状态，之后的变更不影响本次保存
+        
+        快照提交后不再修改，只复制快照映射；消息复制一层（生成中的消息仍在追加内容）。
+        同时在预写日志中写入检查点标记，写入成功后日志从标记处轮转
+        """
+        actual_project_name = self._resolve_project_name(project_name, check_file_name_conflict)
+        checkpoint_id = uuid4().hex
+        if self.journal is not None:
+            self.journal.checkpoint(checkpoint_id)
+        # 本次保存已包含此前的全部变更
+        self.autosave.cancel()
+        record = self._current_record(actual_project_name, checkpoint_id, datetime.now())
+        return _PendingSave(record=record, journal=self.journal, generation=self._project_generation)
+
+    def _current_record(self, project_name: str, checkpoint_id: Optional[str], updated_at: Optional[datetime]) -> ProjectRecord:
+        """捕获当前状态：快照提交后不再修改，只复制快照映射；消息复制一层"""
+        return ProjectRecord(
+            project_name=project_name,
+            checkpoint_id=checkpoint_id,
+            created_at=self.created_at,
+            updated_at=updated_at,
+            messages={msg_id: msg.model_copy() for msg_id, msg in self.message_manager.messages.items()},
+            message_order=list(self.message_manager.message_order),
+            snapshot_map=self.database_manager.snapshot_map.copy(),
+            current_snapshot_id=self.database_manager.current_snapshot_id,
+        )
+    
+    def _finish_save(self, pending: _PendingSave) -> str:
+        """写入成功后轮转预写日志并更新当前工程信息，返回实际保存的工程名"""
+        record = pending.record
+        if pending.generation == self._project_generation:
+            if pending.journal is not None and pending.journal is self.journal:
+                # 另存为时日志随工程改名，原工程保持其上次保存的内容
+                self.journal.rotate(record.checkpoint_id, self._get_journal_path(record.project_name))
+            self.current_project_name = record.project_name
             if not self.created_at:
                 self.created_at = datetime.now()
-            self.updated_at = datetime.now()
-            
-            logger.info(f"工程保存成功: {file_path}")
+            self.updated_at = record.updated_at
+        logger.info(f"工程保存成功: {record.project_name}（{self.store.backend_name}）")
+        return record.project_name
+    
+    def _save_project_data(self, project_name: str, check_file_name_conflict: bool = True) -> str:
+        """保存工程数据并等待写入完成（切换工程前使用），返回实际保存的工程名"""
+        try:
+            pending = self._capture_project(project_name, check_file_name_conflict)
+            self._save_executor.submit(self.store.save_project, pending.record).result()
+            return self._finish_save(pending)
             
-            return actual_project_name
+        except Exception as e:
+            logger.error(f"保存工程失败: {e}")
+            raise
+    
+    async def _save_project_data_async(self, project_name: str, check_file_name_conflict: bool = True) -> str:
+        """保存工程数据，序列化与写入在保存线程中执行，不阻塞事件循环"""
+        try:
+            pending = self._capture_project(project_name, check_file_name_conflict)
+            await asyncio.wrap_future(self._save_executor.submit(self.store.save_project, pending.record))
+            return self._finish_save(pending)
             
         except Exception as e:
             logger.error(f"保存工程失败: {e}")
             raise
     
+    async def _autosave(self) -> None:
+        if self.current_project_name and self._has_data():
+            await self._save_project_data_async(self.current_project_name, check_file_name_conflict=False)
+    
     def _load_project_data(self, project_name: str) -> None:
-        """从文件加载工程数据"""
+        """从存储加载工程数据"""
         try:
-            file_path = self.projects_dir / f"{project_name}.json"
-            
-            if not file_path.exists():
-                raise FileNotFoundError(f"工程文件不存在: {file_path}")
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
+            start_time = time.perf_counter()
+            if not self.store.project_exists(project_name):
+                header, _, _ = read_journal(self._get_journal_path(project_name))
+                if header is not None and header.get("base") == BASE_EMPTY:
+                    # 尚未保存过的工程：从空工程开始重放日志
+                    self._load_empty_project(project_name, header)
+                    return
             
-            # 验证必要字段
-            required_fields = ["messages", "message_order", "snapshot_map", "current_snapshot_id"]
-            for field in required_fields:
-                if field not in project_data:
-                    raise ValueError(f"工程文件缺少必要字段: {field}")
+            record = self.store.load_project(project_name)
+            self._begin_project_switch()
             
             # 恢复消息管理器状态
             self.message_manager.messages.clear()
-            self.message_manager.message_order.clear()
-            
-            # 恢复消息
-            for msg_id, msg_data in project_data["messages"].items():
-                from backend.message.schemas.message_models import Message
-                msg = Message(**msg_data)
-                self.message_manager.messages[msg_id] = msg
-            
-            # 恢复消息顺序
-            self.message_manager.message_order = project_data["message_order"]
-            
-            # 恢复数据库管理器状态
-            self.database_manager.snapshot_map.clear()
-            
-            # 恢复快照
-            for snapshot_id, snapshot_data in project_data["snapshot_map"].items():
-                from backend.database.schemas.research_tree import Snapshot
-                snapshot = Snapshot.from_dict(snapshot_data)
-                self.database_manager.snapshot_map[snapshot_id] = snapshot
+            self.message_manager.messages.update(record.messages)
+            self.message_manager.message_order = record.message_order
             
-            # 设置当前快照
-            self.database_manager.current_snapshot_id = project_data["current_snapshot_id"]
+            # 恢复数据库管理器状态（快照存储只加载当前快照，其余快照按需加载）
+            self.database_manager.snapshot_map = record.snapshot_map
+            self.database_manager.current_snapshot_id = record.current_snapshot_id
             
             # 更新工程信息
             self.current_project_name = project_name
-            self.created_at = datetime.fromisoformat(project_data["created_at"]) if project_data["created_at"] else None
-            self.updated_at = datetime.fromisoformat(project_data["updated_at"]) if project_data["updated_at"] else None
+            self.created_at = record.created_at
+            self.updated_at = record.updated_at
             
-            logger.info(f"工程加载成功: {project_name}")
+            # 重放上次保存之后的日志，日志过大时写入新的检查点
+            if self._replay_journal(project_name, record.checkpoint_id):
+                if self.journal is not None and self.journal.size_bytes() > settings.PROJECT_JOURNAL_COMPACT_MB * 1024 * 1024:
+                    self._save_project_data(project_name, check_file_name_conflict=False)
+            
+            logger.info(f"工程加载成功: {project_name}，耗时 {(time.perf_counter() - start_time) * 1000:.1f}ms")
             
         except Exception as e:
             logger.error(f"加载工程失败: {e}")
             raise
     
+    def _load_empty_project(self, project_name: str, header: Dict[str, Any]) -> None:
+        """从空工程开始重放日志，随后立即保存为检查点，使工程出现在工程列表中"""
+        self._begin_project_switch()
+        self.message_manager.messages.clear()
+        self.message_manager.message_order.clear()
+        # 替换而非清空：快照存储与其来源工程及溢出文件绑定，保存线程可能仍在读取旧的副本
+        self.database_manager.snapshot_map = SnapshotStore()
+        initial_snapshot_id = header.get("initial_snapshot_id") or str(uuid4())
+        initial_snapshot = Snapshot(id=initial_snapshot_id, roots=[])
+        if header.get("initial_snapshot_created_at"):
+            initial_snapshot.created_at = datetime.fromisoformat(header["initial_snapshot_created_at"])
+        self.database_manager.snapshot_map[initial_snapshot_id] = initial_snapshot
+        self.database_manager.current_snapshot_id = initial_snapshot_id
+        
+        self.current_project_name = project_name
+        self.created_at = datetime.fromisoformat(header["created_at"]) if header.get("created_at") else datetime.now()
+        self.updated_at = self.created_at
+        self._replay_journal(project_name, None)
+        self._save_project_data(project_name, check_file_name_conflict=False)
+        logger.info(f"工程从日志恢复成功: {project_name}")
+    
     def create_new_project(self, project_name: str) -> Dict[str, Any]:
         """创建新工程"""
         try:
@@ -192,12 +352,15 @@ class ProjectManager:
                 self.save_current_project()
             
             # 清空当前数据
+            self._begin_project_switch()
             self._clear_current_data()
             
             # 创建新工程
             self.current_project_name = project_name
             self.created_at = datetime.now()
             self.updated_at = datetime.now()
+            self._get_journal_path(project_name).unlink(missing_ok=True)
+            self._open_empty_journal(project_name)
             
             return {
                 "success": True,
@@ -266,6 +429,57 @@ class ProjectManager:
                 "message": f"另存为工程失败: {str(e)}"
             }
     
+    async def save_current_project_async(self) -> Dict[str, Any]:
+        """保存当前工程（供接口调用，写入期间不阻塞事件循环）"""
+        try:
+            if not self.current_project_name:
+                return {
+                    "success": False,
+                    "message": "没有当前工程可保存"
+                }
+            
+            saved_project_name = await self._save_project_data_async(self.current_project_name, check_file_name_conflict=False)
+            
+            return {
+                "success": True,
+                "message": f"工程保存成功: {saved_project_name}",
+                "project_name": saved_project_name,
+                "updated_at": self.updated_at.isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"保存当前工程失败: {e}")
+            return {
+                "success": False,
+                "message": f"保存当前工程失败: {str(e)}"
+            }
+    
+    async def save_as_current_project_async(self, new_project_name: str) -> Dict[str, Any]:
+        """将当前工程另存为（供接口调用，写入期间不阻塞事件循环）"""
+        try:
+            if not self.current_project_name:
+                return {
+                    "success": False,
+                    "message": "没有当前工程可另存为"
+                }
+            
+            saved_project_name = await self._save_project_data_async(new_project_name)
+            
+            return {
+                "success": True,
+                "message": f"工程另存为成功: {new_project_name}",
+                "project_name": saved_project_name,
+                "created_at": self.created_at.isoformat(),
+                "updated_at": self.updated_at.isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"另存为工程失败: {e}")
+            return {
+                "success": False,
+                "message": f"另存为工程失败: {str(e)}"
+            }
+    
     def load_project(self, project_name: str) -> Dict[str, Any]:
         """加载指定工程"""
         try:
@@ -293,23 +507,7 @@ class ProjectManager:
     def list_projects(self) -> Dict[str, Any]:
         """获取工程列表"""
         try:
-            project_files = glob.glob(str(self.projects_dir / "*.json"))
-            projects = []
-            
-            for file_path in project_files:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        project_data = json.load(f)
-                    
-                    projects.append({
-                        "project_name": Path(file_path).stem,
-                        "created_at": project_data.get("created_at"),
-                        "updated_at": project_data.get("updated_at"),
-                        "file_path": file_path
-                    })
-                except Exception as e:
-                    logger.warning(f"读取工程文件失败: {file_path}, 错误: {e}")
-                    continue
+            projects = self.store.list_projects()
             
             # 按更新时间排序
             projects.sort(key=lambda x: x["updated_at"] or "", reverse=True)
@@ -330,9 +528,7 @@ class ProjectManager:
     def delete_project(self, project_name: str) -> Dict[str, Any]:
         """删除指定工程"""
         try:
-            file_path = self.projects_dir / f"{project_name}.json"
-            
-            if not file_path.exists():
+            if not self.store.project_exists(project_name):
                 return {
                     "success": False,
                     "message": f"工程不存在: {project_name}"
@@ -340,10 +536,15 @@ class ProjectManager:
             
             # 如果删除的是当前工程，清空当前状态
             if self.current_project_name == project_name:
+                self._begin_project_switch()
+                self._close_journal()
                 self._clear_current_data()
             
-            # 删除文件
-            file_path.unlink()
+            # 删除存储中的工程
+            self.store.delete_project(project_name)
+            self._get_journal_path(project_name).unlink(missing_ok=True)
+            if self.current_project_name == project_name:
+                self._open_empty_journal(project_name)
             
             return {
                 "success": True,
@@ -357,6 +558,59 @@ class ProjectManager:
                 "message": f"删除工程失败: {str(e)}"
             }
     
+    async def export_project_async(self, project_name: str) -> ProjectRecord:
+        """
+        获取待导出的工程记录
+
+        当前工程导出内存中的最新状态（包含尚未保存的变更），其余工程在保存线程中从存储读取
+        """
+        if project_name == self.current_project_name:
+            return self._current_record(project_name, None, self.updated_at)
+        if not self.store.project_exists(project_name):
+            raise FileNotFoundError(f"工程不存在: {project_name}")
+        return await asyncio.wrap_future(self._save_executor.submit(self.store.load_project, project_name))
+
+    async def import_project_async(self, file: BinaryIO, project_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        导入工程导出文件，解析与写入在保存线程中执行，不切换当前工程
+
+        Args:
+            file: 导出数据（gzip压缩的NDJSON）
+            project_name: 导入后的工程名，默认沿用导出时的工程名，重名时自动添加后缀
+        """
+        try:
+            record = await asyncio.wrap_future(self._save_executor.submit(self._import_project, file, project_name))
+            return {
+                "success": True,
+                "message": f"工程导入成功: {record.project_name}",
+                "project_name": record.project_name,
+                "message_count": len(record.message_order),
+                "snapshot_count": len(record.snapshot_map),
+            }
+
+        except Exception as e:
+            logger.error(f"导入工程失败: {e}")
+            return {
+                "success": False,
+                "message": f"导入工程失败: {str(e)}"
+            }
+
+    def _import_project(self, file: BinaryIO, project_name: Optional[str]) -> ProjectRecord:
+        start_time = time.perf_counter()
+        record = read_project_export(file, project_name)
+        if not record.project_name or any(sep in record.project_name for sep in ("/", "\\")) or record.project_name.startswith("."):
+            raise ValueError(f"工程名不合法: {record.project_name}")
+        # 不覆盖已有工程、当前工程与尚未保存的工程（只有预写日志）
+        base_name = record.project_name
+        counter = 1
+        while (self.store.project_exists(record.project_name) or record.project_name == self.current_project_name
+               or self._get_journal_path(record.project_name).exists()):
+            record.project_name = f"{base_name}({counter})"
+            counter += 1
+        self.store.save_project(record)
+        logger.info(f"工程导入成功: {record.project_name}，耗时 {(time.perf_counter() - start_time) * 1000:.1f}ms")
+        return record
+
     def _has_data(self) -> bool:
         """检查当前是否有数据"""
         return (len(self.message_manager.messages) > 0 or 
@@ -366,29 +620,58 @@ class ProjectManager:
         """清空当前数据"""
         self.message_manager.messages.clear()
         self.message_manager.message_order.clear()
-        self.database_manager.snapshot_map.clear()
+        # 替换而非清空：快照存储与其来源工程及溢出文件绑定，保存线程可能仍在读取旧的副本
+        self.database_manager.snapshot_map = SnapshotStore()
         self.database_manager._init_empty_snapshot()
     
     def get_current_project_info(self) -> Dict[str, Any]:
         """获取当前工程信息"""
+        snapshot_map = self.database_manager.snapshot_map
         return {
             "project_name": self.current_project_name,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "message_count": len(self.message_manager.messages),
-            "snapshot_count": len(self.database_manager.snapshot_map)
+            "snapshot_count": len(self.database_manager.snapshot_map),
+            "snapshots": snapshot_map.get_stats() if isinstance(snapshot_map, SnapshotStore) else None,
+            "journal": self.journal.get_stats() if self.journal is not None else None,
+            "autosave": self.autosave.get_stats(),
+            "snapshot_response_cache": shared_snapshot_response_cache.get_stats()
         }
     
-    def get_current_project_full_data(self) -> Dict[str, Any]:
+    def get_current_project_full_data(
+        self,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+        include_thinking: bool = True,
+        include_action_params: bool = True,
+    ) -> Dict[str, Any]:
         """
         获取当前工程的完整数据，包括消息历史和工程信息
         完全保留 /agents/messages/history 的数据格式，并添加工程相关信息
         
+        Args:
+            limit: 每页消息数，从最新的消息开始分页；为空时返回全部消息
+            before: 游标，只返回序号小于该值的消息（上一页返回的 next_before）
+            include_thinking: 是否包含消息的 thinking
+            include_action_params: 是否包含消息的 action_params
+        
         Returns:
-            包含消息历史和工程信息的完整数据
+            包含消息历史和工程信息的完整数据，页内消息按时间正序
         """
-        # 获取消息历史（完全保留原有格式）
-        messages = self.message_manager.get_message_history()
+        message_order = self.message_manager.message_order
+        end = len(message_order) if before is None else max(0, min(before, len(message_order)))
+        start = 0 if limit is None else max(0, end - limit)
+        exclude = set()
+        if not include_thinking:
+            exclude.add("thinking")
+        if not include_action_params:
+            exclude.add("action_params")
+        messages = [
+            self.message_manager.messages[msg_id].model_dump(exclude=exclude)
+            for msg_id in message_order[start:end]
+            if msg_id in self.message_manager.messages
+        ]
         incomplete_msg = self.message_manager.get_incomplete_message()
         
         # 获取工程信息
@@ -404,9 +687,38 @@ class ProjectManager:
             
             # 可以在这里添加其他工程相关的数据
             "current_snapshot_id": self.database_manager.current_snapshot_id,
-            "has_data": self._has_data()
+            "has_data": self._has_data(),
+
+            # 分页信息：next_before 为下一页（更早的消息）的游标，没有更早的消息时为空
+            "pagination": {
+                "total": len(message_order),
+                "start": start,
+                "end": end,
+                "next_before": start if start > 0 else None,
+            }
         }
 
+    def get_current_project_etag(self, *variant: Any) -> str:
+        """
+        当前工程数据版本的ETag
+
+        由工程切换次数、消息修订号与最后一条消息的序号、当前快照ID和保存时间派生，数据未变化时保持不变；
+        工程信息中的日志、自动保存等统计字段不参与
+
+        Args:
+            variant: 影响响应内容的请求参数（分页、字段过滤）
+        """
+        version = (
+            self._project_generation,
+            self.current_project_name,
+            self.message_manager.revision,
+            len(self.message_manager.message_order),
+            self.database_manager.current_snapshot_id,
+            self.updated_at.isoformat() if self.updated_at else None,
+            *variant,
+        )
+        return f'"{hashlib.sha1(repr(version).encode("utf-8")).hexdigest()[:20]}"'
+
 # 创建全局唯一的项目管理器实例
 shared_project_manager = ProjectManager()
 
@@ -13,8 +13,10 @@ from backend.message.schemas.request_models import (
 )
 from backend.agents.auto_research_agent import AutoResearchAgent
 from backend.agents.user_chat_agent import UserChatAgent
+from backend.agents.model_routing import shared_model_router
 from backend.project_manager import shared_database_manager, shared_message_manager
 from backend.utils.logger import logger
+from backend.utils.metrics import shared_metrics
 
 
 # 创建路由器
@@ -289,6 +291,10 @@ async def get_agent_status():
         agent_details[agent_name] = agent.get_stats()
     
     status["agent_details"] = agent_details
+    # LLM调用指标（滚动窗口分位数）
+    status["metrics"] = shared_metrics.to_dict()
+    # 模型路由表及各路由的延迟与失败率
+    status["model_routes"] = shared_model_router.get_stats()
     
     return status
 
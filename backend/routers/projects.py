@@ -2,10 +2,15 @@
 工程管理路由
 提供工程级别的管理功能，支持工程的保存、加载、版本控制等
 """
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+import tempfile
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional
+from urllib.parse import quote
 
 from backend.project_manager import shared_project_manager
+from backend.storage.project_export import EXPORT_FILE_SUFFIX, iter_project_export
+from backend.utils.http_cache import REVALIDATE_CACHE_CONTROL, etag_matches
 from backend.utils.logger import logger
 
 router = APIRouter(prefix="/projects", tags=["projects"])
@@ -45,7 +50,7 @@ async def save_current_project():
         保存结果
     """
     try:
-        result = pm.save_current_project()
+        result = await pm.save_current_project_async()
         
         if result["success"]:
             return result
@@ -68,7 +73,7 @@ async def save_as_current_project(new_project_name: str):
         另存为结果
     """
     try:
-        result = pm.save_as_current_project(new_project_name)
+        result = await pm.save_as_current_project_async(new_project_name)
         
         if result["success"]:
             return result
@@ -79,6 +84,64 @@ async def save_as_current_project(new_project_name: str):
         logger.error(f"另存为工程失败: {e}")
         raise HTTPException(status_code=500, detail=f"另存为工程失败: {str(e)}")
 
+@router.post("/import")
+async def import_project(request: Request, project_name: Optional[str] = None):
+    """
+    导入工程导出文件（请求体为 GET /projects/{project_name}/export 下载的gzip压缩NDJSON）
+
+    请求体边接收边写入临时文件（较大时落盘），随后在保存线程中逐行解析并写入存储，不切换当前工程
+
+    Args:
+        project_name: 导入后的工程名，默认沿用导出时的工程名，重名时自动添加后缀
+
+    Returns:
+        导入结果
+    """
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+            async for chunk in request.stream():
+                upload.write(chunk)
+            upload.seek(0)
+            result = await pm.import_project_async(upload, project_name)
+
+    except Exception as e:
+        logger.error(f"导入工程失败: {e}")
+        raise HTTPException(status_code=500, detail=f"导入工程失败: {str(e)}")
+
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+@router.get("/{project_name}/export")
+async def export_project(project_name: str):
+    """
+    流式导出工程：gzip压缩的NDJSON（头部、每条消息、每个节点版本与快照各一行），边生成边发送
+
+    当前工程导出内存中的最新状态（包含尚未保存的变更）
+
+    Args:
+        project_name: 工程名称
+
+    Returns:
+        导出文件下载
+    """
+    try:
+        record = await pm.export_project_async(project_name)
+
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"导出工程失败: {e}")
+        raise HTTPException(status_code=500, detail=f"导出工程失败: {str(e)}")
+
+    file_name = quote(f"{record.project_name}{EXPORT_FILE_SUFFIX}")
+    # 同步生成器由Starlette在线程池中迭代，编码与压缩不阻塞事件循环
+    return StreamingResponse(
+        iter_project_export(record),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{file_name}"},
+    )
+
 @router.get("/{project_name}")
 async def load_project(project_name: str):
     """
@@ -161,17 +224,32 @@ async def get_current_project_info():
         raise HTTPException(status_code=500, detail=f"获取当前工程信息失败: {str(e)}")
 
 @router.get("/current/full-data")
-async def get_current_project_full_data():
+async def get_current_project_full_data(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="每页消息数，从最新的消息开始分页；为空时返回全部消息"),
+    before: Optional[int] = Query(None, ge=0, description="游标：上一页返回的 pagination.next_before"),
+    include_thinking: bool = Query(True, description="是否包含消息的 thinking"),
+    include_action_params: bool = Query(True, description="是否包含消息的 action_params"),
+):
     """
     获取当前工程的完整数据，包括消息历史和工程信息
     这个接口完全保留 /agents/messages/history 的数据格式，并添加工程相关信息
+
+    支持从最新消息开始的游标分页与字段过滤；响应带ETag，数据未变化时对 If-None-Match 返回304
     
     Returns:
         包含消息历史和工程信息的完整数据
     """
     try:
-        result = pm.get_current_project_full_data()
+        etag = pm.get_current_project_etag(limit, before, include_thinking, include_action_params)
+        cache_headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=cache_headers)
+
+        result = pm.get_current_project_full_data(limit, before, include_thinking, include_action_params)
         logger.info(f"返回工程完整数据: {result['project_info']['project_name']}, {len(result['messages'])}条消息")
+        response.headers.update(cache_headers)
         return {
             "success": True,
             "data": result
@@ -1,6 +1,18 @@
-from fastapi import APIRouter, HTTPException
+import hashlib
+from typing import Any, Callable, Dict, Optional, Tuple
 
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.database.database_manager import NODE_VIEW_FIELDS
 from backend.project_manager import shared_database_manager, shared_message_manager
+from backend.utils.http_cache import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    etag_matches,
+    shared_snapshot_response_cache,
+)
 from backend.utils.logger import logger
 
 router = APIRouter(prefix="/research-tree", tags=["research-tree"])
@@ -16,12 +28,77 @@ from backend.database.schemas.request_models import (
 )
 
 @router.get("/snapshots/current-id")
-def get_current_snapshot_id():
-    return db.get_current_snapshot_id_query()
+async def get_current_snapshot_id(request: Request):
+    """当前快照ID：响应带ETag，当前快照未变化时对 If-None-Match 返回304"""
+    etag = f'"current-{db.current_snapshot_id}"'
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=db.get_current_snapshot_id_query(), headers=headers)
+
+def _immutable_response(request: Request, etag: str, cache_key: Tuple, build: Callable[[], Dict[str, Any]]) -> Response:
+    """
+    快照内容的响应：快照提交后不再修改，带强ETag与 immutable 缓存头；
+    序列化后的响应体进入共享的LRU缓存，重复读取不再序列化。查询失败（如节点不存在）时不缓存
+    """
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = shared_snapshot_response_cache.get(cache_key)
+    if body is None:
+        result = build()
+        if not result.get("success") or "error" in result["data"]:
+            return JSONResponse(content=jsonable_encoder(result))
+        body = JSONResponse(content=jsonable_encoder(result)).body
+        shared_snapshot_response_cache.put(cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/snapshots/{snapshot_id}")
-def get_snapshot(snapshot_id: str):
-    return db.get_snapshot_query(snapshot_id)
+async def get_snapshot(
+    snapshot_id: str,
+    request: Request,
+    root_id: Optional[str] = Query(None, description="只返回以该节点为根的子树"),
+    depth: Optional[int] = Query(None, ge=0, description="最大深度，根为0；该深度的节点不展开子节点，只返回 child_count"),
+    fields: Optional[str] = Query(None, description="逗号分隔的节点字段，如 id,title,type,state,selected_solution_id"),
+    selected_path: bool = Query(False, description="问题节点只保留选中的解决方案"),
+):
+    """
+    按ID读取快照，不带参数时返回完整快照
+
+    树视图只需要标题、状态等短字段时使用 fields 与 depth，长文本字段通过节点详情接口按需读取
+    """
+    field_set = None
+    if fields is not None:
+        field_set = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = field_set - NODE_VIEW_FIELDS - {"id", "children"}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知的节点字段: {', '.join(sorted(unknown))}")
+        field_set -= {"id", "children"}
+    if snapshot_id not in db.snapshot_map:
+        return db.get_snapshot_query(snapshot_id)
+
+    variant = (root_id, depth, tuple(sorted(field_set)) if field_set is not None else None, selected_path)
+    if variant == (None, None, None, False):
+        return _immutable_response(request, f'"snapshot-{snapshot_id}"', (snapshot_id,), lambda: db.get_snapshot_query(snapshot_id))
+    digest = hashlib.sha1(repr(variant).encode("utf-8")).hexdigest()[:16]
+    return _immutable_response(
+        request,
+        f'"snapshot-{snapshot_id}-{digest}"',
+        (snapshot_id, *variant),
+        lambda: db.get_snapshot_view_query(snapshot_id, root_id, depth, field_set, selected_path),
+    )
+
+@router.get("/snapshots/{snapshot_id}/nodes/{node_id}")
+async def get_snapshot_node(snapshot_id: str, node_id: str, request: Request):
+    """读取快照中单个节点的全部字段（含方案计划、论证与最终报告等长文本），子节点只返回ID"""
+    if snapshot_id not in db.snapshot_map:
+        return db.get_snapshot_node_query(snapshot_id, node_id)
+    return _immutable_response(
+        request,
+        f'"snapshot-{snapshot_id}-node-{node_id}"',
+        (snapshot_id, "node", node_id),
+        lambda: db.get_snapshot_node_query(snapshot_id, node_id),
+    )
 
 @router.post("/problems/root")
 async def create_root_problem(body: ProblemRequest):
@@ -0,0 +1,4 @@
+"""
+存储模块
+工程数据的持久化格式与写入机制
+"""
@@ -0,0 +1,97 @@
+"""
+工程自动保存
+提交快照与完成消息后标记为待保存，防抖一段时间后在事件循环中触发一次保存；
+保存在事件循环中只做状态捕获，序列化与写文件由 ProjectManager 交给后台线程完成
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.utils.logger import logger
+
+
+class AutosaveService:
+    """
+    防抖的自动保存
+
+    1. mark_dirty() 在最后一次变更后 debounce 秒触发保存；持续变更时最多延迟 max_delay 秒
+    2. 同一时间最多一次保存，保存期间的新变更在保存完成后重新计时
+    3. 没有运行中的事件循环时（同步调用）不调度，由预写日志保证数据不丢失
+    """
+
+    def __init__(self, save: Callable[[], Awaitable[Any]], debounce: float = 2.0, max_delay: float = 30.0, enabled: bool = True):
+        """
+        Args:
+            save: 执行一次保存的协程函数
+            debounce: 最后一次变更后等待的秒数
+            max_delay: 第一次变更后最长等待的秒数
+        """
+        self._save = save
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.enabled = enabled
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._first_dirty_at: Optional[float] = None
+        self._dirty_during_save = False
+        self.stats = {"scheduled": 0, "saves": 0, "errors": 0, "last_save_ms": 0.0}
+
+    def mark_dirty(self) -> None:
+        """记录一次变更并（重新）计时"""
+        if not self.enabled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is not None:
+            self._dirty_during_save = True
+            return
+        now = time.monotonic()
+        if self._first_dirty_at is None:
+            self._first_dirty_at = now
+            self.stats["scheduled"] += 1
+        delay = max(0.0, min(self.debounce, self._first_dirty_at + self.max_delay - now))
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, self._fire)
+
+    def cancel(self) -> None:
+        """取消尚未触发的保存（工程已切换或已手动保存）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._first_dirty_at = None
+        self._dirty_during_save = False
+
+    async def flush(self) -> None:
+        """立即执行待触发的保存，并等待进行中的保存完成"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._fire()
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+    def _fire(self) -> None:
+        self._timer = None
+        self._first_dirty_at = None
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        start_time = time.perf_counter()
+        try:
+            await self._save()
+            self.stats["saves"] += 1
+            self.stats["last_save_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"自动保存失败: {e}")
+        finally:
+            self._task = None
+            if self._dirty_during_save:
+                self._dirty_during_save = False
+                self.mark_dirty()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "enabled": self.enabled, "pending": self._timer is not None, "saving": self._task is not None}
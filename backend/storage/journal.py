@@ -0,0 +1,380 @@
+"""
+工程预写日志（write-ahead journal）
+每个工程一个只追加的NDJSON文件，记录自上次保存（检查点）以来的全部变更：
+1. 每次提交的快照只记录相对上一快照新增/修改的节点（不含子树）与子节点ID列表，写入量与变更大小成正比
+2. 每条完成的消息、消息删除与快照回退
+3. 写入由后台线程批量完成，一批记录只fsync一次（group commit），不阻塞事件循环
+加载时先读取检查点（工程JSON），再按顺序重放日志中的记录
+
+保存工程时先在日志中写入检查点标记，工程文件写入成功后再把日志轮转为"检查点 + 标记之后的记录"；
+两步之间崩溃时，加载时从与工程文件检查点ID一致的标记之后开始重放
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.database.database_manager import CommitChange, DatabaseManager
+from backend.database.schemas.research_tree import Node, Snapshot
+from backend.message.message_manager import MessageChange, MessageManager
+from backend.message.schemas.message_models import Message
+from backend.storage.node_codec import decode_node, encode_node_fields, json_default, parse_datetime
+from backend.utils.logger import logger
+
+JOURNAL_SUFFIX = ".journal"
+
+# 写入线程内部的轮转指令，不写入文件
+_ROTATE_OP = "_rotate"
+
+# 日志的基准：checkpoint 表示在检查点ID一致的工程JSON之上重放，empty 表示在空工程之上重放（新工程尚未保存）
+BASE_CHECKPOINT = "checkpoint"
+BASE_EMPTY = "empty"
+
+
+# ---------------- 记录编码 ----------------
+def encode_node(node: Node) -> Dict[str, Any]:
+    """节点自身字段 + 子节点ID列表（不含子树内容）"""
+    fields = encode_node_fields(node)
+    fields["children"] = [child.id for child in node.children]
+    return fields
+
+
+def commit_record(change: CommitChange, snapshot: Snapshot) -> Dict[str, Any]:
+    """一次提交的增量记录：根节点ID列表 + 新增/修改的节点 + 删除的节点ID"""
+    index = DatabaseManager._index_nodes(snapshot.roots)
+    return {
+        "op": "commit",
+        "snapshot_id": change.snapshot_id,
+        "previous_snapshot_id": change.previous_snapshot_id,
+        "created_at": snapshot.created_at,
+        "roots": [root.id for root in snapshot.roots],
+        "nodes": {node_id: encode_node(index[node_id]) for node_id in change.changed_node_ids},
+        "removed": sorted(change.removed_node_ids),
+    }
+
+
+def message_change_record(change: MessageChange) -> Dict[str, Any]:
+    if change.kind == "finished":
+        return {"op": "message", "message": change.message.model_dump()}
+    if change.kind == "truncated":
+        return {"op": "truncate", "message_id": change.message_id, "include_target": change.include_target}
+    if change.kind == "snapshot_rollback":
+        return {"op": "set_current", "snapshot_id": change.snapshot_id}
+    raise ValueError(f"未知的消息变更类型: {change.kind}")
+
+
+# ---------------- 重放 ----------------
+def _replay_commit(record: Dict[str, Any], database_manager: DatabaseManager) -> None:
+    previous = database_manager.snapshot_map.get(record["previous_snapshot_id"]) if record["previous_snapshot_id"] else None
+    base_index = DatabaseManager._index_nodes(previous.roots) if previous else {}
+    changed = record["nodes"]
+
+    def build(node_id: str) -> Node:
+        fields = changed.get(node_id)
+        base = base_index.get(node_id)
+        if fields is None and base is None:
+            raise ValueError(f"日志引用了不存在的节点: {node_id}")
+        child_ids = fields["children"] if fields is not None else [child.id for child in base.children]
+        children = [build(child_id) for child_id in child_ids]
+        if fields is None and all(a is b for a, b in zip(children, base.children)):
+            # 子树未变化，与上一快照共享节点对象（提交前总会深拷贝，历史快照不会被修改）
+            return base
+        return decode_node(fields if fields is not None else encode_node(base), children)
+
+    snapshot = Snapshot(
+        id=record["snapshot_id"],
+        created_at=parse_datetime(record["created_at"]),
+        roots=[build(root_id) for root_id in record["roots"]],
+    )
+    database_manager.snapshot_map[snapshot.id] = snapshot
+    database_manager.current_snapshot_id = snapshot.id
+
+
+def _replay_truncate(record: Dict[str, Any], message_manager: MessageManager) -> None:
+    order = message_manager.message_order
+    if record["message_id"] not in order:
+        return
+    keep = order.index(record["message_id"]) + (0 if record["include_target"] else 1)
+    for message_id in order[keep:]:
+        message_manager.messages.pop(message_id, None)
+    message_manager.message_order = order[:keep]
+
+
+def replay_records(records: List[Dict[str, Any]], database_manager: DatabaseManager, message_manager: MessageManager) -> int:
+    """按顺序把日志记录应用到数据库与消息管理器，返回应用的记录数"""
+    for record in records:
+        op = record.get("op")
+        if op == "commit":
+            _replay_commit(record, database_manager)
+        elif op == "message":
+            message = Message(**record["message"])
+            if message.id not in message_manager.messages:
+                message_manager.message_order.append(message.id)
+            message_manager.messages[message.id] = message
+        elif op == "truncate":
+            _replay_truncate(record, message_manager)
+        elif op == "set_current":
+            if record["snapshot_id"] in database_manager.snapshot_map:
+                database_manager.current_snapshot_id = record["snapshot_id"]
+        elif op == "checkpoint":
+            continue
+        else:
+            logger.warning(f"忽略未知的日志记录: {op}")
+    return len(records)
+
+
+def select_replay_records(header: Optional[Dict[str, Any]], records: List[Dict[str, Any]],
+                          checkpoint_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    选出需要在检查点之上重放的记录
+
+    Args:
+        checkpoint_id: 已加载的工程文件的检查点ID，None表示从空工程开始
+
+    Returns:
+        需要重放的记录；日志与检查点不匹配（其内容已包含在工程文件中，或属于其它工程）时返回None
+    """
+    if header is None:
+        return None
+    if checkpoint_id is None:
+        return records if header.get("base") == BASE_EMPTY else None
+    if header.get("base") == BASE_CHECKPOINT and header.get("checkpoint_id") == checkpoint_id:
+        return records
+    # 工程文件已写入但日志尚未轮转：从对应的检查点标记之后开始
+    for index, record in enumerate(records):
+        if record.get("op") == "checkpoint" and record.get("checkpoint_id") == checkpoint_id:
+            return records[index + 1:]
+    return None
+
+
+def read_journal(path: Path) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """
+    读取日志文件
+
+    Returns:
+        (头记录, 变更记录列表, 完整记录的字节数)；文件不存在时头记录为None。
+        崩溃可能留下写了一半的最后一行，解析失败的行及其之后的内容被丢弃
+    """
+    if not path.exists():
+        return None, [], 0
+    header: Optional[Dict[str, Any]] = None
+    records: List[Dict[str, Any]] = []
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                logger.warning(f"日志第{line_number}行不完整，已丢弃: {path}")
+                break
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logger.warning(f"日志第{line_number}行无法解析，丢弃其后的内容: {path}")
+                    break
+                if header is None:
+                    header = record
+                else:
+                    records.append(record)
+            valid_bytes += len(line)
+    return header, records, valid_bytes
+
+
+class ProjectJournal:
+    """
+    单个工程的预写日志
+
+    文件第一行为头记录（基准与检查点ID），之后每行一条变更记录。
+    头记录在第一次追加时才写入，没有变更的工程不会产生日志文件。
+    保存工程时先 checkpoint() 写入标记，写入成功后 rotate() 丢弃标记之前的记录。
+    """
+
+    def __init__(self, path: Path, header: Dict[str, Any], resume_at: Optional[int] = None,
+                 flush_interval: float = 0.05, fsync: bool = True):
+        """
+        Args:
+            path: 日志文件路径
+            header: 头记录
+            resume_at: 在已有文件的该字节位置之后继续追加（截掉崩溃留下的不完整记录），None表示第一次写入时覆盖旧文件
+            flush_interval: 批量写入的聚合时间（秒），越大每次fsync覆盖的记录越多
+            fsync: 是否在每批写入后fsync
+        """
+        self.path = path
+        self.header = {"op": "header", "version": 1, **header}
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._resume_at = resume_at if resume_at and path.exists() else None
+        self._file = None
+        self._pending: List[Dict[str, Any]] = []
+        self._appended = 0
+        self._written = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        # 检查点ID -> 标记之后的文件偏移，只由写入线程访问
+        self._checkpoint_offsets: Dict[str, int] = {}
+        self.stats = {"records": 0, "batches": 0, "fsyncs": 0, "bytes": 0, "write_errors": 0, "rotations": 0}
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """追加一条记录（立即返回，由后台线程批量落盘）"""
+        with self._condition:
+            if self._closed:
+                logger.warning(f"日志已关闭，丢弃记录: {record.get('op')}")
+                return
+            self._pending.append(record)
+            self._appended += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"journal-{self.path.stem}", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def checkpoint(self, checkpoint_id: str) -> None:
+        """写入检查点标记：其之前的全部记录将包含在以该ID保存的工程文件中"""
+        self.append({"op": "checkpoint", "checkpoint_id": checkpoint_id})
+
+    def rotate(self, checkpoint_id: str, path: Optional[Path] = None) -> None:
+        """
+        工程文件以该检查点ID保存成功后调用：日志改写为以该检查点为基准、只含标记之后的记录
+
+        Args:
+            path: 新的日志路径（另存为），旧路径的日志随之删除
+        """
+        self.append({"op": _ROTATE_OP, "checkpoint_id": checkpoint_id, "path": str(path or self.path)})
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """阻塞直到此前追加的记录全部落盘，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            target = self._appended
+            while self._written < target and self._thread is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        """落盘全部记录后停止后台线程并关闭文件"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        """关闭并删除日志文件（变更已写入新的检查点，或工程被删除）"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def size_bytes(self) -> int:
+        with self._condition:
+            path = self.path
+        return path.stat().st_size if path.exists() else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            pending = self._appended - self._written
+        return {**self.stats, "pending": pending, "path": str(self.path)}
+
+    # ---------------- 后台写入 ----------------
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        return (json.dumps(record, ensure_ascii=False, default=json_default) + "\n").encode("utf-8")
+
+    def _open_file(self):
+        if self._file is None:
+            if self._resume_at is not None:
+                self._file = open(self.path, "r+b")
+                self._file.truncate(self._resume_at)
+                self._file.seek(self._resume_at)
+            else:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "w+b")
+                self._file.write(self._encode(self.header))
+        return self._file
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        f = self._open_file()
+        offset = f.tell()
+        chunks = []
+        for record in batch:
+            data = self._encode(record)
+            chunks.append(data)
+            offset += len(data)
+            if record.get("op") == "checkpoint":
+                self._checkpoint_offsets[record["checkpoint_id"]] = offset
+        data = b"".join(chunks)
+        f.write(data)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+            self.stats["fsyncs"] += 1
+        self.stats["batches"] += 1
+        self.stats["records"] += len(batch)
+        self.stats["bytes"] += len(data)
+
+    def _rotate(self, checkpoint_id: str, path: Path) -> None:
+        """以"新头记录 + 标记之后的记录"原子替换日志文件"""
+        offset = self._checkpoint_offsets.get(checkpoint_id)
+        if offset is None:
+            # 标记已被更新的检查点轮转掉（多个保存交错完成），保留当前日志
+            logger.info(f"日志中没有检查点标记，跳过轮转: {checkpoint_id}")
+            return
+        f = self._open_file()
+        f.seek(offset)
+        tail = f.read()
+        header = {**self.header, "base": BASE_CHECKPOINT, "checkpoint_id": checkpoint_id}
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "wb") as tmp:
+            tmp.write(self._encode(header) + tail)
+            tmp.flush()
+            if self.fsync:
+                os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+        f.close()
+        if path != self.path:
+            self.path.unlink(missing_ok=True)
+        self._file = open(path, "r+b")
+        self._file.seek(0, os.SEEK_END)
+        with self._condition:
+            self.path = path
+            self.header = header
+        self._checkpoint_offsets.clear()
+        self.stats["rotations"] += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+            # 聚合一小段时间内的记录，一批只fsync一次
+            if self.flush_interval > 0:
+                time.sleep(self.flush_interval)
+            with self._condition:
+                batch, self._pending = self._pending, []
+            try:
+                # 轮转指令把一批记录分成前后两段，分别写入轮转前后的文件
+                records: List[Dict[str, Any]] = []
+                for record in batch:
+                    if record.get("op") == _ROTATE_OP:
+                        self._write_batch(records)
+                        records = []
+                        self._rotate(record["checkpoint_id"], Path(record["path"]))
+                    else:
+                        records.append(record)
+                self._write_batch(records)
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"写入工程日志失败: {self.path} - {e}")
+            with self._condition:
+                self._written += len(batch)
+                self._condition.notify_all()
@@ -0,0 +1,113 @@
+"""
+研究树节点编解码
+节点按"自身字段 + 子节点引用"扁平编码，供预写日志与工程存储共用
+"""
+import hashlib
+import json
+import weakref
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, MutableMapping, Set, Tuple
+
+from backend.database.schemas.research_tree import Node, NodeType, ProblemNode, SolutionNode
+
+
+def json_default(obj: Any) -> Any:
+    """json.dumps 的 default：datetime 序列化为ISO字符串"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def parse_datetime(value: Any) -> Any:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def encode_node_fields(node: Node) -> Dict[str, Any]:
+    """节点自身字段（不含子节点）"""
+    return {key: value for key, value in node.__dict__.items() if key != "children"}
+
+
+def decode_node(fields: Dict[str, Any], children: List[Node]) -> Node:
+    """由自身字段与已解码的子节点重建节点，忽略字段中的子节点引用"""
+    data = {key: value for key, value in fields.items() if key != "children"}
+    data["created_at"] = parse_datetime(data.get("created_at"))
+    node_class = ProblemNode if data.get("type") == NodeType.PROBLEM else SolutionNode
+    return node_class(**data, children=children)
+
+
+# ---------------- 内容寻址的节点版本 ----------------
+def dumps_node_fields(fields: Dict[str, Any]) -> str:
+    """节点版本的规范JSON，其SHA-1即节点版本哈希"""
+    return json.dumps(fields, ensure_ascii=False, default=json_default, sort_keys=True)
+
+
+# 节点对象id -> (节点弱引用, 版本哈希)
+NodeHashMemo = Dict[int, Tuple["weakref.ref[Node]", str]]
+
+
+def encode_tree(roots: List[Node], memo: NodeHashMemo, sink: Callable[[str, Dict[str, Any], str], None]) -> List[str]:
+    """
+    把一棵树编码为节点版本：每个节点以"自身字段 + 子节点版本哈希"的JSON内容哈希为键
+
+    Args:
+        memo: 节点对象id -> (弱引用, 哈希)，同一次保存内共享，已编码过的节点对象（共享的子树）直接复用。
+            以弱引用校验对象身份：编码期间按需加载又释放的快照，其节点id可能被之后的节点复用；
+            memo 也不延长节点的生命周期，节点释放时条目随之删除
+        sink: 每个编码的节点回调 (哈希, 字段, 规范JSON)，内容相同的不同节点对象会以同一哈希多次回调，由调用方去重
+
+    Returns:
+        根节点的版本哈希列表
+    """
+    def visit(node: Node) -> str:
+        key = id(node)
+        entry = memo.get(key)
+        if entry is not None and entry[0]() is node:
+            return entry[1]
+        fields = encode_node_fields(node)
+        fields["children"] = [visit(child) for child in node.children]
+        data = dumps_node_fields(fields)
+        node_hash = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        memo[key] = (weakref.ref(node, lambda _, key=key: memo.pop(key, None)), node_hash)
+        sink(node_hash, fields, data)
+        return node_hash
+
+    return [visit(root) for root in roots]
+
+
+class TreeEncoder:
+    """
+    一次保存内共享的节点版本编码器：同一节点对象只编码一次，同一哈希只回调一次 sink
+
+    已输出的哈希意味着其整棵子树都已输出，直接读取已编码节点版本的调用方（如快照溢出文件）据此跳过子树
+    """
+
+    def __init__(self, sink: Callable[[str, Dict[str, Any], str], None]):
+        self.memo: NodeHashMemo = {}
+        self.emitted: Set[str] = set()
+        self._sink = sink
+
+    def emit(self, node_hash: str, fields: Dict[str, Any], data: str) -> None:
+        if node_hash not in self.emitted:
+            self.emitted.add(node_hash)
+            self._sink(node_hash, fields, data)
+
+    def encode(self, roots: List[Node]) -> List[str]:
+        return encode_tree(roots, self.memo, self.emit)
+
+
+def decode_tree(root_hashes: List[str], fields_by_hash: Mapping[str, Dict[str, Any]], cache: MutableMapping[str, Node]) -> List[Node]:
+    """
+    由节点版本重建树，每个版本只解码一次，相同版本在多个快照之间共享同一节点对象
+
+    Args:
+        fields_by_hash: 版本哈希 -> 节点字段，也可以是按需读取的对象（快照溢出文件）
+        cache: 版本哈希 -> 已解码节点，在同一工程的多个快照之间共享
+    """
+    def build(node_hash: str) -> Node:
+        node = cache.get(node_hash)
+        if node is None:
+            fields = fields_by_hash[node_hash]
+            node = cache[node_hash] = decode_node(fields, [build(child) for child in fields["children"]])
+        return node
+
+    return [build(node_hash) for node_hash in root_hashes]
@@ -0,0 +1,180 @@
+"""
+工程导出/导入
+导出格式为gzip压缩的NDJSON，每行一条记录，导出与导入都逐条处理，内存占用与工程大小无关：
+1. header：格式标识、工程元数据与当前快照ID
+2. message：按顺序每条消息一行
+3. node：节点版本（自身字段 + 子节点版本哈希，以内容哈希为键），每个版本只出现一次且先于引用它的快照
+4. snapshot：快照ID、创建时间与根节点哈希列表
+5. end：各类记录的数量，导入时据此发现被截断的文件
+"""
+import gzip
+import hashlib
+import json
+import zlib
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set
+from uuid import uuid4
+
+from backend.message.schemas.message_models import Message
+from backend.storage.node_codec import TreeEncoder, dumps_node_fields, json_default, parse_datetime
+from backend.storage.project_store import ProjectRecord
+from backend.storage.snapshot_store import SnapshotStore, encode_snapshot
+
+EXPORT_FORMAT = "resviz-project"
+EXPORT_VERSION = 1
+EXPORT_FILE_SUFFIX = ".resviz.ndjson.gz"
+
+# 压缩输出累积到该大小后交给响应流
+_CHUNK_BYTES = 64 * 1024
+# 导入时每批写入快照存储溢出文件的节点版本数
+_NODE_BATCH = 1000
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, default=json_default, separators=(",", ":"), sort_keys=True) + "\n").encode("utf-8")
+
+
+def iter_project_export(record: ProjectRecord) -> Iterator[bytes]:
+    """
+    逐块生成工程的压缩导出数据
+
+    快照逐个编码，已溢出的快照直接读取节点版本；同一时间只有一个快照新增的节点版本在内存中
+    """
+    def lines() -> Iterator[bytes]:
+        snapshot_map = record.snapshot_map
+        yield _line({
+            "type": "header",
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "project_name": record.project_name,
+            "created_at": record.created_at,
+            "updated_at": record.updated_at,
+            "current_snapshot_id": record.current_snapshot_id,
+            "message_count": len(record.message_order),
+            "snapshot_count": len(snapshot_map),
+        })
+        for message_id in record.message_order:
+            yield _line({"type": "message", "data": record.messages[message_id].model_dump()})
+
+        pending: List[bytes] = []
+        encoder = TreeEncoder(lambda node_hash, fields, data: pending.append(
+            _line({"type": "node", "hash": node_hash, "fields": fields})
+        ))
+        for snapshot_id in snapshot_map:
+            created_at, roots = encode_snapshot(snapshot_map, snapshot_id, encoder)
+            yield from pending
+            pending.clear()
+            yield _line({"type": "snapshot", "id": snapshot_id, "created_at": created_at, "roots": roots})
+
+        yield _line({
+            "type": "end",
+            "message_count": len(record.message_order),
+            "snapshot_count": len(snapshot_map),
+            "node_count": len(encoder.emitted),
+        })
+
+    # wbits=31：gzip容器，可直接用 gzip/zcat 解压
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer: List[bytes] = []
+    buffered = 0
+    for line in lines():
+        compressed = compressor.compress(line)
+        if compressed:
+            buffer.append(compressed)
+            buffered += len(compressed)
+        if buffered >= _CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer.clear()
+            buffered = 0
+    buffer.append(compressor.flush())
+    yield b"".join(buffer)
+
+
+def read_project_export(file: BinaryIO, project_name: Optional[str] = None) -> ProjectRecord:
+    """
+    逐行读取压缩导出数据，构造待保存的工程记录
+
+    节点版本校验内容哈希后分批写入快照存储的溢出文件，不解码节点
+
+    Args:
+        file: 导出数据（gzip）
+        project_name: 导入后的工程名，默认沿用导出时的工程名
+
+    Raises:
+        ValueError: 文件格式错误、哈希不符、引用的节点版本缺失或文件被截断
+    """
+    snapshot_map = SnapshotStore()
+    messages: Dict[str, Message] = {}
+    header: Optional[Dict[str, Any]] = None
+    end: Optional[Dict[str, Any]] = None
+    nodes: Dict[str, Dict[str, Any]] = {}
+    known: Set[str] = set()
+    missing: Set[str] = set()
+    snapshots = []
+
+    def flush_nodes() -> None:
+        snapshot_map.add_encoded(nodes, snapshots)
+        nodes.clear()
+        snapshots.clear()
+
+    def reference(node_hashes: List[str]) -> None:
+        missing.update(node_hash for node_hash in node_hashes if node_hash not in known)
+
+    try:
+        with gzip.GzipFile(fileobj=file, mode="rb") as lines:
+            for line_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record_type = record.get("type")
+                if header is None:
+                    if record_type != "header" or record.get("format") != EXPORT_FORMAT:
+                        raise ValueError("不是有效的工程导出文件")
+                    if record.get("version", 0) > EXPORT_VERSION:
+                        raise ValueError(f"不支持的导出格式版本: {record.get('version')}")
+                    header = record
+                elif end is not None:
+                    raise ValueError(f"第{line_number}行: 结束标记之后还有数据")
+                elif record_type == "message":
+                    message = Message(**record["data"])
+                    messages[message.id] = message
+                elif record_type == "node":
+                    fields = record["fields"]
+                    data = dumps_node_fields(fields)
+                    if hashlib.sha1(data.encode("utf-8")).hexdigest() != record["hash"]:
+                        raise ValueError(f"第{line_number}行: 节点版本哈希不符")
+                    nodes[record["hash"]] = fields
+                    known.add(record["hash"])
+                    missing.discard(record["hash"])
+                    reference(fields["children"])
+                    if len(nodes) >= _NODE_BATCH:
+                        flush_nodes()
+                elif record_type == "snapshot":
+                    reference(record["roots"])
+                    snapshots.append((record["id"], parse_datetime(record["created_at"]), record["roots"]))
+                elif record_type == "end":
+                    end = record
+                else:
+                    raise ValueError(f"第{line_number}行: 未知的记录类型 {record_type}")
+    except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+        raise ValueError(f"导出文件解压失败: {e}") from e
+    flush_nodes()
+
+    if header is None:
+        raise ValueError("导出文件为空")
+    if end is None or end.get("message_count") != len(messages) or end.get("snapshot_count") != len(snapshot_map):
+        raise ValueError("导出文件不完整")
+    if missing:
+        raise ValueError(f"导出文件缺少 {len(missing)} 个节点版本")
+    if header.get("current_snapshot_id") not in snapshot_map:
+        raise ValueError("导出文件缺少当前快照")
+
+    return ProjectRecord(
+        project_name=project_name or header["project_name"],
+        checkpoint_id=uuid4().hex,
+        created_at=parse_datetime(header.get("created_at")),
+        updated_at=parse_datetime(header.get("updated_at")),
+        messages=messages,
+        message_order=list(messages),
+        snapshot_map=snapshot_map,
+        current_snapshot_id=header["current_snapshot_id"],
+    )
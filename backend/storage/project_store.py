@@ -0,0 +1,342 @@
+"""
+工程存储
+ProjectManager 通过存储对象读写工程，存储格式与ProjectManager的工程管理逻辑解耦：
+1. JsonProjectStore：每个工程一个 <工程名>.json 文件（默认），节点版本按内容哈希去重
+2. SQLiteProjectStore：所有工程存放在同一个SQLite数据库中，按快照懒加载（见 sqlite_store）
+"""
+import glob
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, MutableMapping, Optional, Union
+
+from backend.database.database_manager import DatabaseManager
+from backend.database.schemas.research_tree import Snapshot
+from backend.message.schemas.message_models import Message
+from backend.storage.node_codec import TreeEncoder, parse_datetime
+from backend.storage.snapshot_store import SnapshotStore, encode_snapshot
+from backend.utils.logger import logger
+
+
+# 分块写入工程文件时的缓冲区大小
+_WRITE_BUFFER_BYTES = 256 * 1024
+
+
+class DateTimeEncoder(json.JSONEncoder):
+    """自定义JSON编码器，处理datetime对象"""
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def write_file_atomic(path: Path, data: Union[bytes, Iterable[bytes]]) -> None:
+    """
+    先写入同目录的临时文件并fsync，再原子替换目标文件，崩溃时目标文件保持旧内容或新内容之一
+
+    Args:
+        data: 文件内容，或逐块生成的内容（边生成边写入，不在内存中拼接）
+    """
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        with open(tmp_path, "wb", buffering=_WRITE_BUFFER_BYTES) as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                for chunk in data:
+                    f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def count_project_nodes(project_data: Dict[str, Any]) -> int:
+    """由工程JSON数据统计当前快照的节点数（不解码节点）"""
+    current_snapshot_id = project_data.get("current_snapshot_id")
+    if "snapshots" in project_data:
+        snapshot = project_data["snapshots"].get(current_snapshot_id)
+        nodes = project_data.get("nodes", {})
+        pending = list(snapshot["roots"]) if snapshot else []
+        count = 0
+        while pending:
+            count += 1
+            pending.extend(nodes[pending.pop()]["children"])
+        return count
+    snapshot = project_data.get("snapshot_map", {}).get(current_snapshot_id)
+    pending = list(snapshot["roots"]) if snapshot else []
+    count = 0
+    while pending:
+        count += 1
+        pending.extend(pending.pop().get("children", []))
+    return count
+
+
+@dataclass
+class ProjectRecord:
+    """一个工程的完整状态，保存时由ProjectManager构造，加载时由存储返回"""
+    project_name: str
+    checkpoint_id: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    messages: Dict[str, Message]
+    message_order: List[str]
+    snapshot_map: MutableMapping[str, Snapshot]
+    current_snapshot_id: Optional[str]
+
+
+# 工程清单文件：以点开头，不会被 *.json 匹配为工程
+MANIFEST_FILE = ".manifest.json"
+
+# JSON工程文件格式版本：1 为每个快照一棵完整的树（snapshot_map），2 为内容寻址的节点版本（nodes + snapshots）
+JSON_FORMAT_VERSION = 2
+
+
+class JsonProjectStore:
+    """
+    每个工程一个JSON文件，加载时完整解析全部消息与快照
+
+    快照之间大部分节点不变，文件中每个不同的节点版本只存一次（nodes，以内容哈希为键，子节点为哈希引用），
+    快照只记录根节点哈希列表（snapshots）；加载时节点版本直接进入快照存储的溢出文件，
+    快照在访问时才解码，每个节点版本在常驻快照之间共享
+
+    保存时逐块写入文件（节点版本边编码边写出），内存占用与工程大小无关；
+    加载时需要完整解析文件，很大的工程建议使用 SQLiteProjectStore
+
+    工程列表与启动时查找最新工程读取工程清单（.manifest.json，记录各工程的时间、大小与数量统计），
+    不再逐个解析工程文件；清单在每次保存/删除后原子更新，丢失或与目录不一致时由工程文件重建
+    """
+
+    backend_name = "json"
+
+    def __init__(self, projects_dir: Path):
+        self.projects_dir = projects_dir
+        self.manifest_path = projects_dir / MANIFEST_FILE
+        self._manifest_lock = threading.Lock()
+        self._manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def get_project_path(self, project_name: str) -> Path:
+        return self.projects_dir / f"{project_name}.json"
+
+    def project_exists(self, project_name: str) -> bool:
+        return self.get_project_path(project_name).exists()
+
+    def project_mtimes(self) -> Dict[str, float]:
+        """各工程的最后修改时间（时间戳），用于启动时恢复最新的工程"""
+        with self._manifest_lock:
+            return {project_name: entry["mtime"] for project_name, entry in self._manifest.items()}
+
+    def save_project(self, record: ProjectRecord) -> None:
+        project_data = {
+            "format_version": JSON_FORMAT_VERSION,
+            "project_name": record.project_name,
+            "journal_checkpoint_id": record.checkpoint_id,
+            "created_at": record.created_at.isoformat() if record.created_at else None,
+            "updated_at": record.updated_at.isoformat() if record.updated_at else None,
+            "message_order": record.message_order,
+            "current_snapshot_id": record.current_snapshot_id,
+            "snapshots": {},
+        }
+
+        # 原子写入：崩溃时工程文件保持旧内容或新内容之一，不会被截断
+        file_path = self.get_project_path(record.project_name)
+        write_file_atomic(file_path, self._iter_project_file(record, project_data))
+
+        current_snapshot = record.snapshot_map.get(record.current_snapshot_id)
+        self._update_manifest(record.project_name, self._manifest_entry(
+            file_path,
+            project_data,
+            node_count=len(DatabaseManager._index_nodes(current_snapshot.roots)) if current_snapshot else 0,
+        ))
+
+    @staticmethod
+    def _iter_project_file(record: ProjectRecord, project_data: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        逐块生成工程文件：消息逐条序列化，节点版本在编码时直接写出（沿用其规范JSON），
+        溢出的快照从溢出文件读取节点版本，内存中只保留各快照的根节点哈希列表（写入 project_data["snapshots"]）
+        """
+        def dumps(value: Any) -> bytes:
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":"), cls=DateTimeEncoder).encode("utf-8")
+
+        header = {key: value for key, value in project_data.items() if key != "snapshots"}
+        yield dumps(header)[:-1]
+
+        yield b',"messages":{'
+        for i, (msg_id, msg) in enumerate(record.messages.items()):
+            yield (b"," if i else b"") + dumps(msg_id) + b":" + dumps(msg.model_dump())
+
+        yield b'},"nodes":{'
+        pending: List[bytes] = []
+        written = 0
+
+        def write_node(node_hash: str, fields: Dict[str, Any], data: str) -> None:
+            nonlocal written
+            pending.append((b"," if written else b"") + dumps(node_hash) + b":" + data.encode("utf-8"))
+            written += 1
+
+        encoder = TreeEncoder(write_node)
+        snapshots = project_data["snapshots"]
+        for snapshot_id in record.snapshot_map:
+            created_at, roots = encode_snapshot(record.snapshot_map, snapshot_id, encoder)
+            snapshots[snapshot_id] = {"created_at": created_at.isoformat(), "roots": roots}
+            yield b"".join(pending)
+            pending.clear()
+
+        yield b'},"snapshots":' + dumps(snapshots) + b"}"
+
+    def load_project(self, project_name: str) -> ProjectRecord:
+        file_path = self.get_project_path(project_name)
+        if not file_path.exists():
+            raise FileNotFoundError(f"工程文件不存在: {file_path}")
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            project_data = json.load(f)
+
+        # 验证必要字段
+        format_version = project_data.get("format_version", 1)
+        snapshot_fields = ["nodes", "snapshots"] if format_version >= 2 else ["snapshot_map"]
+        required_fields = ["messages", "message_order", *snapshot_fields, "current_snapshot_id"]
+        for field in required_fields:
+            if field not in project_data:
+                raise ValueError(f"工程文件缺少必要字段: {field}")
+
+        return ProjectRecord(
+            project_name=project_name,
+            # 旧版文件没有检查点ID时由更新时间派生
+            checkpoint_id=project_data.get("journal_checkpoint_id") or f"legacy:{project_data.get('updated_at')}",
+            created_at=datetime.fromisoformat(project_data["created_at"]) if project_data.get("created_at") else None,
+            updated_at=datetime.fromisoformat(project_data["updated_at"]) if project_data.get("updated_at") else None,
+            messages={msg_id: Message(**msg_data) for msg_id, msg_data in project_data["messages"].items()},
+            message_order=project_data["message_order"],
+            snapshot_map=self._load_snapshots(project_data, format_version, project_data["current_snapshot_id"]),
+            current_snapshot_id=project_data["current_snapshot_id"],
+        )
+
+    @staticmethod
+    def _load_snapshots(project_data: Dict[str, Any], format_version: int, current_snapshot_id: Optional[str]) -> SnapshotStore:
+        """
+        载入快照存储：新格式的节点版本直接写入溢出文件，只解码当前快照，其余快照在访问时按需解码；
+        旧格式逐个解码，超出常驻上限的快照依次溢出
+        """
+        snapshot_map = SnapshotStore()
+        if format_version < 2:
+            for snapshot_id, snapshot_data in project_data["snapshot_map"].items():
+                snapshot_map[snapshot_id] = Snapshot.from_dict(snapshot_data)
+            return snapshot_map
+        snapshot_map.add_encoded(project_data["nodes"], (
+            (snapshot_id, parse_datetime(snapshot_data["created_at"]), snapshot_data["roots"])
+            for snapshot_id, snapshot_data in project_data["snapshots"].items()
+        ), resident_ids=[current_snapshot_id])
+        return snapshot_map
+
+    def list_projects(self) -> List[Dict[str, Any]]:
+        with self._manifest_lock:
+            entries = list(self._manifest.items())
+        return [
+            {
+                "project_name": project_name,
+                "created_at": entry["created_at"],
+                "updated_at": entry["updated_at"],
+                "file_path": str(self.get_project_path(project_name)),
+                "size_bytes": entry["size_bytes"],
+                "node_count": entry["node_count"],
+                "message_count": entry["message_count"],
+                "snapshot_count": entry["snapshot_count"],
+            }
+            for project_name, entry in entries
+        ]
+
+    def delete_project(self, project_name: str) -> bool:
+        file_path = self.get_project_path(project_name)
+        if not file_path.exists():
+            return False
+        file_path.unlink()
+        self._update_manifest(project_name, None)
+        return True
+
+    # ---------------- 工程清单 ----------------
+    @staticmethod
+    def _manifest_entry(file_path: Path, project_data: Dict[str, Any], node_count: Optional[int] = None) -> Dict[str, Any]:
+        stat = file_path.stat()
+        snapshots = project_data.get("snapshots", project_data.get("snapshot_map", {}))
+        return {
+            "created_at": project_data.get("created_at"),
+            "updated_at": project_data.get("updated_at"),
+            "mtime": stat.st_mtime,
+            "size_bytes": stat.st_size,
+            "node_count": count_project_nodes(project_data) if node_count is None else node_count,
+            "message_count": len(project_data.get("message_order", [])),
+            "snapshot_count": len(snapshots),
+        }
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """读取工程清单，并与目录中的工程文件对齐：只解析清单中缺少的工程，移除文件已不存在的条目"""
+        manifest: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)["projects"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"工程清单损坏，将由工程文件重建: {self.manifest_path}, 错误: {e}")
+
+        project_names = {Path(path).stem for path in glob.glob(str(self.projects_dir / "*.json"))}
+        changed = False
+        for project_name in set(manifest) - project_names:
+            del manifest[project_name]
+            changed = True
+        for project_name in sorted(project_names - set(manifest)):
+            file_path = self.get_project_path(project_name)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    manifest[project_name] = self._manifest_entry(file_path, json.load(f))
+            except Exception as e:
+                logger.warning(f"读取工程文件失败: {file_path}, 错误: {e}")
+                continue
+            changed = True
+        if changed or not self.manifest_path.exists():
+            self._write_manifest(manifest)
+        return manifest
+
+    def rebuild_manifest(self) -> None:
+        """丢弃现有清单，由工程文件重新生成"""
+        with self._manifest_lock:
+            self.manifest_path.unlink(missing_ok=True)
+            self._manifest = self._load_manifest()
+
+    def _update_manifest(self, project_name: str, entry: Optional[Dict[str, Any]]) -> None:
+        with self._manifest_lock:
+            if entry is None:
+                self._manifest.pop(project_name, None)
+            else:
+                self._manifest[project_name] = entry
+            self._write_manifest(self._manifest)
+
+    def _write_manifest(self, manifest: Dict[str, Dict[str, Any]]) -> None:
+        data = json.dumps({"version": 1, "projects": manifest}, ensure_ascii=False, indent=2)
+        try:
+            write_file_atomic(self.manifest_path, data.encode("utf-8"))
+        except OSError as e:
+            # 清单只是索引，写入失败不影响工程本身，下次启动时重建
+            logger.warning(f"写入工程清单失败: {self.manifest_path}, 错误: {e}")
+
+    def close(self) -> None:
+        pass
+
+
+def create_project_store(projects_dir: Path, backend: str = "json"):
+    """按配置创建工程存储，backend 为 json 或 sqlite"""
+    if backend == "sqlite":
+        from backend.storage.sqlite_store import SQLiteProjectStore, migrate_json_projects
+
+        store = SQLiteProjectStore(projects_dir / "projects.sqlite3")
+        migrate_json_projects(JsonProjectStore(projects_dir), store)
+        return store
+    if backend != "json":
+        raise ValueError(f"未知的工程存储类型: {backend}")
+    return JsonProjectStore(projects_dir)
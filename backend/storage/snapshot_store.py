@@ -0,0 +1,349 @@
+"""
+快照存储
+替代 DatabaseManager.snapshot_map 的普通字典，常驻内存的快照数量与估算内存有上限：
+1. 当前快照与最近访问的快照按LRU常驻内存
+2. 超出上限时淘汰最久未访问的快照：已有持久副本（SQLite）的直接丢弃，
+   其余按内容寻址的节点版本溢出到临时文件，只保留根节点哈希
+3. 被淘汰的快照在下次访问时（查询历史快照、回退等）重新解码，同一节点版本在常驻快照之间共享
+"""
+import json
+import sys
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, MutableMapping, Optional, Tuple
+
+from backend.config import settings
+from backend.database.schemas.research_tree import Node, Snapshot
+from backend.storage.node_codec import TreeEncoder, decode_tree, dumps_node_fields, encode_tree
+
+# 每个节点对象除字段值以外的估算开销（pydantic实例、__dict__ 与子节点列表）
+_NODE_OVERHEAD = 400
+
+
+def estimate_node_bytes(node: Node) -> int:
+    """估算单个节点（不含子节点）占用的内存"""
+    size = _NODE_OVERHEAD
+    for key, value in node.__dict__.items():
+        if key != "children":
+            size += sys.getsizeof(value)
+    return size
+
+
+class SpillFile:
+    """
+    快照溢出文件：追加写入的节点版本（规范JSON），内存中只保留 哈希 -> (偏移, 长度) 索引
+
+    临时文件在关闭或进程退出时删除；读写由锁串行化，保存线程可以与事件循环同时读取
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(prefix="snapshots-", suffix=".spill")
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, node_hash: object) -> bool:
+        return node_hash in self._index
+
+    def write(self, node_hash: str, data: str) -> None:
+        """写入一个节点版本，已存在的哈希忽略"""
+        self.write_many([(node_hash, data)])
+
+    def write_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """批量写入节点版本（一次文件写入），已存在的哈希忽略"""
+        with self._lock:
+            chunks = []
+            offset = self._size
+            for node_hash, data in items:
+                if node_hash in self._index:
+                    continue
+                encoded = data.encode("utf-8")
+                chunks.append(encoded)
+                self._index[node_hash] = (offset, len(encoded))
+                offset += len(encoded)
+            if chunks:
+                self._file.seek(self._size)
+                self._file.write(b"".join(chunks))
+                self._size = offset
+
+    def read(self, node_hash: str) -> str:
+        with self._lock:
+            offset, length = self._index[node_hash]
+            self._file.seek(offset)
+            return self._file.read(length).decode("utf-8")
+
+    def __getitem__(self, node_hash: str) -> Dict[str, Any]:
+        """按哈希读取节点字段，供 decode_tree 使用"""
+        return json.loads(self.read(node_hash))
+
+    def size_bytes(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class SnapshotStore(MutableMapping[str, Snapshot]):
+    """
+    内存有上限的快照映射
+
+    持有工程全部快照ID（保持提交顺序），ID判断与计数不触发加载；读取时按需加载并放入LRU，
+    写入与读取之后淘汰超出 max_resident 个数或 memory_cap_bytes 估算内存的快照，当前快照（pin）不会被淘汰
+
+    估算内存按节点对象计数：常驻快照之间共享的节点只计一次
+    """
+
+    def __init__(
+        self,
+        snapshot_ids: Iterable[str] = (),
+        loader: Optional[Callable[[str, MutableMapping[str, Node]], Snapshot]] = None,
+        source_project: Optional[str] = None,
+        max_resident: Optional[int] = None,
+        memory_cap_bytes: Optional[int] = None,
+    ):
+        """
+        Args:
+            snapshot_ids: 已持久化、可由 loader 加载的快照ID
+            loader: (快照ID, 节点版本缓存) -> 快照，从持久存储加载（SQLite）
+            source_project: loader 所属的工程名，另存为时据此在存储内复制
+        """
+        self.source_project = source_project
+        self.max_resident = max(1, settings.SNAPSHOT_LRU_SIZE if max_resident is None else max_resident)
+        self.memory_cap_bytes = (
+            int(settings.SNAPSHOT_MEMORY_CAP_MB * 1024 * 1024) if memory_cap_bytes is None else memory_cap_bytes
+        )
+        self._loader = loader
+        self._ids: Dict[str, None] = dict.fromkeys(snapshot_ids)
+        self._external = set(self._ids) if loader is not None else set()
+        self._spilled: Dict[str, Tuple[datetime, List[str]]] = {}
+        self._spill: Optional[SpillFile] = None
+        self._resident: "OrderedDict[str, Snapshot]" = OrderedDict()
+        # 节点版本哈希 -> 已解码节点（弱引用），重新加载的快照与仍常驻的快照共享未变化的子树
+        self._node_cache: MutableMapping[str, Node] = weakref.WeakValueDictionary()
+        # 节点对象id -> [引用计数, 估算字节数]，引用来自常驻快照的根节点与已计数的父节点
+        self._node_refs: Dict[int, List[int]] = {}
+        self._resident_bytes = 0
+        self._pinned: Optional[str] = None
+        self._frozen = False
+        self.stats = {"materialized": 0, "spilled": 0, "evicted": 0}
+
+    # ---------------- 映射接口 ----------------
+    def __getitem__(self, snapshot_id: str) -> Snapshot:
+        snapshot = self._resident.get(snapshot_id)
+        if snapshot is not None:
+            if not self._frozen:
+                self._resident.move_to_end(snapshot_id)
+            return snapshot
+        snapshot = self._materialize(snapshot_id)
+        if not self._frozen:
+            self._add_resident(snapshot_id, snapshot)
+            self._enforce(keep=snapshot_id)
+        return snapshot
+
+    def __setitem__(self, snapshot_id: str, snapshot: Snapshot) -> None:
+        if self._frozen:
+            raise TypeError("保存时捕获的快照映射是只读的")
+        self._discard(snapshot_id)
+        self._ids[snapshot_id] = None
+        self._add_resident(snapshot_id, snapshot)
+        self._enforce(keep=snapshot_id)
+
+    def __delitem__(self, snapshot_id: str) -> None:
+        if self._frozen:
+            raise TypeError("保存时捕获的快照映射是只读的")
+        del self._ids[snapshot_id]
+        self._discard(snapshot_id)
+
+    def __contains__(self, snapshot_id: object) -> bool:
+        return snapshot_id in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._ids))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def clear(self) -> None:
+        """清空全部快照（不逐个加载）"""
+        self._ids.clear()
+        self._external.clear()
+        self._spilled.clear()
+        self._resident.clear()
+        self._node_refs.clear()
+        self._resident_bytes = 0
+        self._pinned = None
+        self._spill = None
+
+    def copy(self) -> "SnapshotStore":
+        """
+        只读副本（保存时捕获状态）：共享溢出文件与常驻快照对象，不加载未常驻的快照
+
+        副本在保存线程中读取时按需解码但不缓存，也不淘汰或溢出
+        """
+        copied = SnapshotStore(
+            loader=self._loader,
+            source_project=self.source_project,
+            max_resident=self.max_resident,
+            memory_cap_bytes=self.memory_cap_bytes,
+        )
+        copied._ids = dict(self._ids)
+        copied._external = set(self._external)
+        copied._spilled = dict(self._spilled)
+        copied._spill = self._spill
+        copied._resident = OrderedDict(self._resident)
+        copied._frozen = True
+        return copied
+
+    def pin(self, snapshot_id: str) -> None:
+        """标记当前快照，当前快照始终常驻"""
+        self._pinned = snapshot_id
+        self._enforce()
+
+    # ---------------- 加载 ----------------
+    def add_encoded(
+        self,
+        nodes: Dict[str, Dict[str, Any]],
+        snapshots: Iterable[Tuple[str, datetime, List[str]]],
+        resident_ids: Iterable[str] = (),
+    ) -> None:
+        """
+        直接登记已编码的快照（JSON工程文件中的节点版本与根节点哈希），节点版本写入溢出文件
+
+        Args:
+            nodes: 节点版本哈希 -> 字段（子节点为哈希引用）
+            snapshots: (快照ID, 创建时间, 根节点哈希列表)
+            resident_ids: 由 nodes 直接解码并常驻的快照（例如当前快照），其余快照在访问时才解码
+        """
+        self._ensure_spill().write_many((node_hash, dumps_node_fields(fields)) for node_hash, fields in nodes.items())
+        for snapshot_id, created_at, root_hashes in snapshots:
+            self._discard(snapshot_id)
+            self._ids[snapshot_id] = None
+            self._spilled[snapshot_id] = (created_at, list(root_hashes))
+        for snapshot_id in resident_ids:
+            if snapshot_id in self._spilled and snapshot_id not in self._resident:
+                created_at, root_hashes = self._spilled[snapshot_id]
+                snapshot = Snapshot(id=snapshot_id, created_at=created_at, roots=decode_tree(root_hashes, nodes, self._node_cache))
+                self._add_resident(snapshot_id, snapshot)
+        self._enforce()
+
+    def _materialize(self, snapshot_id: str) -> Snapshot:
+        spilled = self._spilled.get(snapshot_id)
+        if spilled is not None:
+            created_at, root_hashes = spilled
+            snapshot = Snapshot(id=snapshot_id, created_at=created_at, roots=decode_tree(root_hashes, self._spill, self._node_cache))
+        elif snapshot_id in self._external:
+            snapshot = self._loader(snapshot_id, self._node_cache)
+        else:
+            raise KeyError(snapshot_id)
+        self.stats["materialized"] += 1
+        return snapshot
+
+    def _ensure_spill(self) -> SpillFile:
+        if self._spill is None:
+            self._spill = SpillFile()
+        return self._spill
+
+    # ---------------- 常驻与淘汰 ----------------
+    def _add_resident(self, snapshot_id: str, snapshot: Snapshot) -> None:
+        self._resident[snapshot_id] = snapshot
+        stack = list(snapshot.roots)
+        while stack:
+            node = stack.pop()
+            entry = self._node_refs.get(id(node))
+            if entry is not None:
+                entry[0] += 1
+                continue
+            size = estimate_node_bytes(node)
+            self._node_refs[id(node)] = [1, size]
+            self._resident_bytes += size
+            stack.extend(node.children)
+
+    def _remove_resident(self, snapshot_id: str) -> None:
+        snapshot = self._resident.pop(snapshot_id)
+        stack = list(snapshot.roots)
+        while stack:
+            node = stack.pop()
+            entry = self._node_refs.get(id(node))
+            if entry is None:
+                continue
+            entry[0] -= 1
+            if entry[0] == 0:
+                del self._node_refs[id(node)]
+                self._resident_bytes -= entry[1]
+                stack.extend(node.children)
+
+    def _discard(self, snapshot_id: str) -> None:
+        if snapshot_id in self._resident:
+            self._remove_resident(snapshot_id)
+        self._spilled.pop(snapshot_id, None)
+        self._external.discard(snapshot_id)
+
+    def _enforce(self, keep: Optional[str] = None) -> None:
+        """淘汰最久未访问的快照直到满足上限，跳过当前快照与刚访问的快照"""
+        if self._frozen:
+            return
+        while len(self._resident) > self.max_resident or self._resident_bytes > self.memory_cap_bytes:
+            victim = next((snapshot_id for snapshot_id in self._resident if snapshot_id not in (self._pinned, keep)), None)
+            if victim is None:
+                break
+            self._evict(victim)
+
+    def _evict(self, snapshot_id: str) -> None:
+        if snapshot_id not in self._spilled and snapshot_id not in self._external:
+            snapshot = self._resident[snapshot_id]
+            spill = self._ensure_spill()
+            root_hashes = encode_tree(snapshot.roots, {}, lambda node_hash, fields, data: spill.write(node_hash, data))
+            self._spilled[snapshot_id] = (snapshot.created_at, root_hashes)
+            self.stats["spilled"] += 1
+        self._remove_resident(snapshot_id)
+        self.stats["evicted"] += 1
+
+    # ---------------- 保存 ----------------
+    def encode_snapshot(self, snapshot_id: str, encoder: TreeEncoder) -> Tuple[datetime, List[str]]:
+        """编码快照用于保存：已溢出的快照直接读取溢出文件中的节点版本，不解码节点"""
+        spilled = self._spilled.get(snapshot_id) if snapshot_id not in self._resident else None
+        if spilled is None:
+            snapshot = self[snapshot_id]
+            return snapshot.created_at, encoder.encode(snapshot.roots)
+        created_at, root_hashes = spilled
+        # 与 encode_tree 相同的后序（子节点先于父节点）输出
+        loaded: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        stack = [(node_hash, False) for node_hash in reversed(root_hashes)]
+        while stack:
+            node_hash, expanded = stack.pop()
+            if node_hash in encoder.emitted:
+                continue
+            if expanded:
+                fields, data = loaded.pop(node_hash)
+                encoder.emit(node_hash, fields, data)
+                continue
+            data = self._spill.read(node_hash)
+            fields = json.loads(data)
+            loaded[node_hash] = (fields, data)
+            stack.append((node_hash, True))
+            stack.extend((child_hash, False) for child_hash in reversed(fields["children"]))
+        return created_at, root_hashes
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "snapshots": len(self._ids),
+            "resident": len(self._resident),
+            "resident_bytes": self._resident_bytes,
+            "max_resident": self.max_resident,
+            "memory_cap_bytes": self.memory_cap_bytes,
+            "spilled_snapshots": len(self._spilled),
+            "spill_bytes": self._spill.size_bytes() if self._spill is not None else 0,
+        }
+
+
+def encode_snapshot(snapshot_map: MutableMapping[str, Snapshot], snapshot_id: str, encoder: TreeEncoder) -> Tuple[datetime, List[str]]:
+    """编码快照映射中的一个快照，返回 (创建时间, 根节点哈希列表)"""
+    if isinstance(snapshot_map, SnapshotStore):
+        return snapshot_map.encode_snapshot(snapshot_id, encoder)
+    snapshot = snapshot_map[snapshot_id]
+    return snapshot.created_at, encoder.encode(snapshot.roots)
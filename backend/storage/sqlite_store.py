@@ -0,0 +1,359 @@
+"""
+SQLite工程存储
+所有工程存放在同一个SQLite数据库（标准库 sqlite3）中：
+1. projects：工程元数据与当前快照ID
+2. messages：按工程内序号存放的消息，支持分页读取
+3. snapshots：快照元数据与根节点版本哈希列表
+4. node_versions：节点版本，以"自身字段 + 子节点版本哈希"的内容哈希为键，未变化的子树在快照之间只存一份
+加载工程时只读取快照ID列表与当前快照，其余快照在第一次访问时按需加载
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple
+
+from backend.database.database_manager import DatabaseManager
+from backend.database.schemas.research_tree import Node, Snapshot
+from backend.message.schemas.message_models import Message
+from backend.storage.node_codec import TreeEncoder, decode_tree, json_default, parse_datetime
+from backend.storage.project_store import JsonProjectStore, ProjectRecord
+from backend.storage.snapshot_store import SnapshotStore, encode_snapshot
+from backend.utils.logger import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    checkpoint_id TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    current_snapshot_id TEXT,
+    node_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project, id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_seq ON messages (project, seq);
+CREATE TABLE IF NOT EXISTS snapshots (
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created_at TEXT,
+    roots TEXT NOT NULL,
+    PRIMARY KEY (project, id)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_seq ON snapshots (project, seq);
+CREATE TABLE IF NOT EXISTS node_versions (
+    project TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project, hash)
+);
+CREATE INDEX IF NOT EXISTS idx_node_versions_node ON node_versions (project, node_id);
+CREATE TABLE IF NOT EXISTS imported_files (
+    file_name TEXT PRIMARY KEY,
+    imported_at TEXT
+);
+"""
+
+# IN (...) 查询每批的参数个数，低于SQLite默认的变量上限
+_IN_CHUNK = 500
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=json_default, sort_keys=True)
+
+
+class SQLiteProjectStore:
+    """SQLite工程存储，接口与 JsonProjectStore 一致"""
+
+    backend_name = "sqlite"
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 连接可能被事件循环之外的线程使用，由锁串行化访问
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate_schema()
+        self._lock = threading.RLock()
+
+    def _migrate_schema(self) -> None:
+        """为旧版数据库补充新增的列"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(projects)")}
+        if "node_count" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE projects ADD COLUMN node_count INTEGER NOT NULL DEFAULT 0")
+
+    # ---------------- 工程 ----------------
+    def project_exists(self, project_name: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM projects WHERE name = ?", (project_name,)).fetchone()
+        return row is not None
+
+    def project_mtimes(self) -> Dict[str, float]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, updated_at FROM projects").fetchall()
+        return {name: datetime.fromisoformat(updated_at).timestamp() if updated_at else 0.0 for name, updated_at in rows}
+
+    def list_projects(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, created_at, updated_at, node_count, "
+                "(SELECT COUNT(*) FROM messages WHERE project = name), "
+                "(SELECT COUNT(*) FROM snapshots WHERE project = name) "
+                "FROM projects"
+            ).fetchall()
+        return [
+            {
+                "project_name": name,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "file_path": str(self.db_path),
+                "size_bytes": None,
+                "node_count": node_count,
+                "message_count": message_count,
+                "snapshot_count": snapshot_count,
+            }
+            for name, created_at, updated_at, node_count, message_count, snapshot_count in rows
+        ]
+
+    def delete_project(self, project_name: str) -> bool:
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM projects WHERE name = ?", (project_name,)).rowcount
+            self._delete_project_rows(project_name)
+        return deleted > 0
+
+    def _delete_project_rows(self, project_name: str) -> None:
+        for table in ("messages", "snapshots", "node_versions"):
+            self._conn.execute(f"DELETE FROM {table} WHERE project = ?", (project_name,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---------------- 保存 ----------------
+    def save_project(self, record: ProjectRecord) -> None:
+        """
+        保存工程：只写入数据库中尚不存在的快照（快照提交后不再修改），消息按当前顺序重写
+
+        snapshot_map 由另一个工程加载（另存为）时，先在数据库内复制其快照与节点版本，未加载的快照无需读出
+        """
+        name = record.project_name
+        snapshot_map = record.snapshot_map
+        snapshot_ids = list(snapshot_map)
+        with self._lock, self._conn:
+            existing = self._snapshot_ids(name)
+            if not set(existing) <= set(snapshot_ids):
+                # 同名的其它工程（例如新建同名工程后保存）：整体覆盖
+                self._delete_project_rows(name)
+            source_project = getattr(snapshot_map, "source_project", None)
+            if source_project is not None and source_project != name:
+                self._copy_snapshots(source_project, name)
+            existing = set(self._snapshot_ids(name))
+
+            encoder = TreeEncoder(lambda node_hash, fields, data: self._conn.execute(
+                "INSERT OR IGNORE INTO node_versions (project, hash, node_id, data) VALUES (?, ?, ?, ?)",
+                (name, node_hash, fields["id"], data),
+            ))
+            for seq, snapshot_id in enumerate(snapshot_ids):
+                if snapshot_id in existing:
+                    continue
+                created_at, roots = encode_snapshot(snapshot_map, snapshot_id, encoder)
+                self._conn.execute(
+                    "INSERT INTO snapshots (project, id, seq, created_at, roots) VALUES (?, ?, ?, ?, ?)",
+                    (name, snapshot_id, seq, created_at.isoformat(), json.dumps(roots)),
+                )
+
+            # 消息可能被回退删除，按当前顺序整体重写
+            self._conn.execute("DELETE FROM messages WHERE project = ?", (name,))
+            self._conn.executemany(
+                "INSERT INTO messages (project, id, seq, data) VALUES (?, ?, ?, ?)",
+                [
+                    (name, message_id, seq, _dumps(record.messages[message_id].model_dump()))
+                    for seq, message_id in enumerate(record.message_order)
+                ],
+            )
+
+            current_snapshot = snapshot_map.get(record.current_snapshot_id)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO projects (name, checkpoint_id, created_at, updated_at, current_snapshot_id, node_count) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    record.checkpoint_id,
+                    record.created_at.isoformat() if record.created_at else None,
+                    record.updated_at.isoformat() if record.updated_at else None,
+                    record.current_snapshot_id,
+                    len(DatabaseManager._index_nodes(current_snapshot.roots)) if current_snapshot else 0,
+                ),
+            )
+
+    def _snapshot_ids(self, project_name: str) -> List[str]:
+        rows = self._conn.execute("SELECT id FROM snapshots WHERE project = ? ORDER BY seq", (project_name,)).fetchall()
+        return [row[0] for row in rows]
+
+    def _copy_snapshots(self, source: str, target: str) -> None:
+        self._conn.execute(
+            "INSERT OR IGNORE INTO snapshots (project, id, seq, created_at, roots) "
+            "SELECT ?, id, seq, created_at, roots FROM snapshots WHERE project = ?",
+            (target, source),
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO node_versions (project, hash, node_id, data) "
+            "SELECT ?, hash, node_id, data FROM node_versions WHERE project = ?",
+            (target, source),
+        )
+
+    # ---------------- 加载 ----------------
+    def load_project(self, project_name: str) -> ProjectRecord:
+        """读取工程元数据、全部消息与快照ID列表；只加载当前快照"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checkpoint_id, created_at, updated_at, current_snapshot_id FROM projects WHERE name = ?",
+                (project_name,),
+            ).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"工程不存在: {project_name}")
+            checkpoint_id, created_at, updated_at, current_snapshot_id = row
+            message_rows = self._conn.execute(
+                "SELECT id, data FROM messages WHERE project = ? ORDER BY seq", (project_name,)
+            ).fetchall()
+            snapshot_ids = self._snapshot_ids(project_name)
+
+        # 按需加载的快照之间通过快照存储的节点缓存共享未变化的子树（历史快照不会被修改）
+        snapshot_map = SnapshotStore(
+            snapshot_ids,
+            loader=lambda snapshot_id, node_cache: self.load_snapshot(project_name, snapshot_id, node_cache),
+            source_project=project_name,
+        )
+        if current_snapshot_id in snapshot_map:
+            snapshot_map[current_snapshot_id]
+
+        return ProjectRecord(
+            project_name=project_name,
+            checkpoint_id=checkpoint_id,
+            created_at=datetime.fromisoformat(created_at) if created_at else None,
+            updated_at=datetime.fromisoformat(updated_at) if updated_at else None,
+            messages={message_id: Message(**json.loads(data)) for message_id, data in message_rows},
+            message_order=[message_id for message_id, _ in message_rows],
+            snapshot_map=snapshot_map,
+            current_snapshot_id=current_snapshot_id,
+        )
+
+    def load_snapshot(self, project_name: str, snapshot_id: str, node_cache: Optional[MutableMapping[str, Node]] = None) -> Snapshot:
+        """
+        加载单个快照，逐层批量查询节点版本
+
+        Args:
+            node_cache: 节点版本哈希 -> 已解码节点，同一工程的多次加载之间共享
+        """
+        node_cache = {} if node_cache is None else node_cache
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, roots FROM snapshots WHERE project = ? AND id = ?", (project_name, snapshot_id)
+            ).fetchone()
+            if row is None:
+                raise KeyError(snapshot_id)
+            created_at, roots = row
+            root_hashes = json.loads(roots)
+
+            fields_by_hash: Dict[str, Dict[str, Any]] = {}
+            level = [node_hash for node_hash in root_hashes if node_hash not in node_cache]
+            while level:
+                rows = self._fetch_node_versions(project_name, level)
+                fields_by_hash.update(rows)
+                level = list(dict.fromkeys(
+                    child_hash
+                    for fields in rows.values()
+                    for child_hash in fields["children"]
+                    if child_hash not in node_cache and child_hash not in fields_by_hash
+                ))
+
+        return Snapshot(id=snapshot_id, created_at=parse_datetime(created_at), roots=decode_tree(root_hashes, fields_by_hash, node_cache))
+
+    def _fetch_node_versions(self, project_name: str, hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(hashes), _IN_CHUNK):
+            chunk = hashes[start:start + _IN_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT hash, data FROM node_versions WHERE project = ? AND hash IN ({','.join('?' * len(chunk))})",
+                (project_name, *chunk),
+            ).fetchall()
+            result.update((node_hash, json.loads(data)) for node_hash, data in rows)
+        missing = set(hashes) - set(result)
+        if missing:
+            raise ValueError(f"快照引用了不存在的节点版本: {sorted(missing)[:3]}")
+        return result
+
+    # ---------------- 索引查询 ----------------
+    def get_message_page(self, project_name: str, limit: int, before_seq: Optional[int] = None) -> Tuple[List[Message], Optional[int]]:
+        """
+        按序号倒序分页读取消息
+
+        Returns:
+            (按时间正序排列的一页消息, 下一页的 before_seq；没有更早的消息时为None)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, data FROM messages WHERE project = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (project_name, before_seq if before_seq is not None else 2 ** 62, limit),
+            ).fetchall()
+        rows.reverse()
+        next_before = rows[0][0] if rows and rows[0][0] > 0 else None
+        return [Message(**json.loads(data)) for _, data in rows], next_before
+
+    def get_node_versions(self, project_name: str, node_id: str) -> List[Dict[str, Any]]:
+        """节点在该工程历史中出现过的全部版本（自身字段，子节点为版本哈希）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM node_versions WHERE project = ? AND node_id = ?", (project_name, node_id)
+            ).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    # ---------------- 迁移 ----------------
+    def is_file_imported(self, file_name: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM imported_files WHERE file_name = ?", (file_name,)).fetchone()
+        return row is not None
+
+    def mark_file_imported(self, file_name: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO imported_files (file_name, imported_at) VALUES (?, ?)",
+                (file_name, datetime.now().isoformat()),
+            )
+
+
+def migrate_json_projects(json_store: JsonProjectStore, sqlite_store: SQLiteProjectStore) -> List[str]:
+    """
+    把目录下尚未导入的JSON工程导入SQLite（保留检查点ID，原有预写日志继续有效），JSON文件保持不变
+
+    每个文件只导入一次，之后在SQLite中删除的工程不会被重新导入
+
+    Returns:
+        本次导入的工程名列表
+    """
+    imported = []
+    for project_name in sorted(json_store.project_mtimes()):
+        file_name = json_store.get_project_path(project_name).name
+        if sqlite_store.is_file_imported(file_name):
+            continue
+        try:
+            if not sqlite_store.project_exists(project_name):
+                sqlite_store.save_project(json_store.load_project(project_name))
+                imported.append(project_name)
+            sqlite_store.mark_file_imported(file_name)
+        except Exception as e:
+            logger.warning(f"导入JSON工程失败: {file_name}, 错误: {e}")
+    if imported:
+        logger.info(f"已将 {len(imported)} 个JSON工程导入SQLite: {imported}")
+    return imported
@@ -0,0 +1,110 @@
+"""
+自动保存测试
+测试防抖合并多次变更、写入在后台线程进行且只包含捕获时的状态、
+工程文件写入后日志轮转前崩溃的恢复，以及写入失败时原文件保持完整
+"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from backend.database.schemas.request_models import SolutionRequest
+from backend.project_manager import ProjectManager
+from backend.storage import project_store
+from backend.tests.test_journal import build_history, dump_state
+
+
+class TestAutosave:
+    """自动保存测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始自动保存测试 ===")
+
+    def test_debounced_autosave(self, tmp_path):
+        """测试短时间内的多次变更只触发一次保存"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.debounce = 0.05
+        solution_id = build_history(pm)
+
+        async def run():
+            for i in range(5):
+                await pm.database_manager.update_solution(solution_id, SolutionRequest(title=f"方案v{i + 3}"))
+            await asyncio.sleep(0.3)
+
+        asyncio.run(run())
+        print(f"自动保存统计: {pm.autosave.get_stats()}")
+        assert pm.autosave.stats["saves"] == 1
+        pm.journal.flush()
+        expected = dump_state(pm)
+        assert dump_state(ProjectManager(projects_dir=tmp_path)) == expected
+
+    def test_save_runs_off_event_loop_with_captured_state(self, tmp_path, monkeypatch):
+        """测试写入在保存线程执行，期间事件循环继续处理新的提交，且新提交不进入本次保存"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        solution_id = build_history(pm)
+        save_project = pm.store.save_project
+        save_threads = []
+
+        def slow_save(record):
+            save_threads.append(threading.current_thread().name)
+            time.sleep(0.2)
+            save_project(record)
+
+        monkeypatch.setattr(pm.store, "save_project", slow_save)
+
+        async def run():
+            save = asyncio.create_task(pm.save_current_project_async())
+            await asyncio.sleep(0.05)
+            start_time = time.perf_counter()
+            await pm.database_manager.update_solution(solution_id, SolutionRequest(title="保存期间的修改"))
+            commit_ms = (time.perf_counter() - start_time) * 1000
+            result = await save
+            return commit_ms, result
+
+        commit_ms, result = asyncio.run(run())
+        print(f"保存期间提交耗时: {commit_ms:.1f}ms, 保存线程: {save_threads}")
+        assert result["success"] and commit_ms < 100
+        assert save_threads[0].startswith("project-save")
+
+        with open(tmp_path / "未命名.json", encoding="utf-8") as f:
+            saved_titles = {fields["title"] for fields in json.load(f)["nodes"].values()}
+        assert "保存期间的修改" not in saved_titles
+
+        # 保存期间的修改保留在轮转后的日志中，崩溃后可以恢复
+        pm.journal.flush()
+        expected = dump_state(pm)
+        assert dump_state(ProjectManager(projects_dir=tmp_path)) == expected
+
+    def test_crash_between_write_and_rotation(self, tmp_path):
+        """测试工程文件已写入、日志尚未轮转时崩溃，从检查点标记之后重放"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        solution_id = build_history(pm)
+        pending = pm._capture_project("未命名", check_file_name_conflict=False)
+        asyncio.run(pm.database_manager.update_solution(solution_id, SolutionRequest(title="标记之后的修改")))
+        pm.store.save_project(pending.record)
+        pm.journal.flush()
+        expected = dump_state(pm)
+
+        restored = ProjectManager(projects_dir=tmp_path)
+        assert dump_state(restored) == expected
+
+    def test_failed_write_keeps_previous_file(self, tmp_path, monkeypatch):
+        """测试写入中途失败时原工程文件保持完整"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_history(pm)
+        pm.save_current_project()
+        previous = (tmp_path / "未命名.json").read_bytes()
+
+        def failing_fsync(fd):
+            raise OSError("磁盘已满")
+
+        monkeypatch.setattr(project_store.os, "fsync", failing_fsync)
+        with pytest.raises(OSError):
+            pm._save_project_data("未命名", check_file_name_conflict=False)
+        assert (tmp_path / "未命名.json").read_bytes() == previous
+        json.loads(previous)
@@ -0,0 +1,88 @@
+"""
+上下文装配器测试
+测试Token估算、按预算截断/省略片段以及研究树文本的裁剪
+"""
+from backend.utils.token_estimator import estimate_tokens, truncate_to_tokens
+from backend.agents.context_assembler import (
+    ContextBudgets,
+    ContextFragment,
+    assemble_fragments,
+    assemble_tree,
+)
+
+
+class TestTokenEstimator:
+    """Token估算测试类"""
+
+    def test_estimate_cjk_and_ascii(self):
+        """测试中英文按不同比例估算"""
+        print(f"中文10字: {estimate_tokens('研' * 10)}, 英文10字符: {estimate_tokens('a' * 10)}")
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("研" * 10) == 6
+        assert estimate_tokens("a" * 10) == 3
+
+    def test_truncate_within_budget(self):
+        """测试截断后不超过预算"""
+        text = "\n".join(f"第{i}行内容" for i in range(200))
+        truncated = truncate_to_tokens(text, 50)
+        print(f"截断后Token数: {estimate_tokens(truncated)}")
+        assert estimate_tokens(truncated) <= 50
+        assert truncated.endswith("（因长度限制已截断）")
+        assert truncate_to_tokens("短文本", 50) == "短文本"
+
+
+class TestContextAssembler:
+    """上下文装配测试类"""
+
+    def test_priority_and_report(self):
+        """测试优先保留高优先级片段，并报告省略项"""
+        fragments = [
+            ContextFragment(label=f"方案{i}", text="内容" * 100, priority=(i,))
+            for i in range(5)
+        ]
+        result = assemble_fragments(fragments, budget=300, empty_text="无")
+        print(f"保留: {result.kept}, 截断: {result.truncated}, 省略: {result.dropped}")
+        assert result.text.startswith("内容")
+        assert "方案0" not in result.dropped
+        assert result.dropped and result.dropped[-1] == "方案4"
+        assert "省略了" in result.text
+
+    def test_large_section_within_budget(self):
+        """测试片段数量很大时，含省略标记在内的段落仍不超过预算，省略标记只列出前几项"""
+        fragments = [
+            ContextFragment(label=f"很长的方案标题{i}" * 3, text="方案内容" * (20 + i % 50), priority=(i,))
+            for i in range(2000)
+        ]
+        result = assemble_fragments(fragments, budget=6000, empty_text="无")
+        print(f"使用Token: {result.used_tokens}, 保留: {result.kept}, 省略: {len(result.dropped)}")
+        assert result.used_tokens <= 6000 and result.used_tokens == estimate_tokens(result.text)
+        assert len(result.dropped) > 1000 and f"省略了{len(result.dropped)}项" in result.text
+        assert result.dropped[-1] not in result.text
+
+        tiny = assemble_fragments(fragments, budget=20, empty_text="无")
+        assert tiny.used_tokens <= 20
+
+    def test_unlimited_budget(self):
+        """测试预算小于等于0时不做限制"""
+        fragments = [ContextFragment(label="a", text="x" * 1000, priority=(0,))]
+        result = assemble_fragments(fragments, budget=0, empty_text="无")
+        assert result.text == "x" * 1000
+        assert assemble_fragments([], budget=10, empty_text="无").text == "无"
+
+    def test_tree_keeps_focus_path(self):
+        """测试研究树裁剪保留当前问题所在路径，且总长度有界"""
+        entries = [("root", 0, "- [P] 根问题")]
+        for i in range(500):
+            entries.append((f"s{i}", 1, f"  - [S] 方案{i} (已弃用) [in_progress]"))
+        entries.append(("focus_s", 1, "  - [S] 当前方案 (正启用) [in_progress]"))
+        entries.append(("focus", 2, "    - [P] 当前问题 (implementation)"))
+        result = assemble_tree(entries, "focus", {"root", "focus_s", "focus"}, budget=200)
+        print(f"裁剪后Token数: {result.used_tokens}, 保留行: {result.kept}")
+        assert "当前问题" in result.text and "根问题" in result.text
+        assert "省略" in result.text
+        assert result.used_tokens <= 200
+
+    def test_budgets_from_settings(self):
+        """测试从配置读取预算"""
+        budgets = ContextBudgets.from_settings()
+        assert budgets.tree > 0 and budgets.ancestors > 0
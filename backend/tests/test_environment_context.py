@@ -0,0 +1,127 @@
+"""
+环境信息构建器测试
+测试片段缓存结果与原查询一致，以及提交新快照后的选择性失效
+"""
+import asyncio
+import gc
+import weakref
+
+from backend.database.database_manager import DatabaseManager
+from backend.database.schemas.request_models import ProblemRequest, SolutionRequest
+from backend.database.schemas.research_tree import ProblemType
+from backend.agents.environment_context import EnvironmentContextBuilder
+
+
+def legacy_environment_info(db: DatabaseManager, problem_id: str, user_requirement):
+    """按原有查询逐项组装环境信息，作为对照（祖先方案按从根到近的顺序排列）"""
+    tree_result = db.get_compact_text_tree_query()
+    problem_result = db.get_problem_detail_query(problem_id)
+    root_problem_id = db.get_root_problem_id_query(problem_id)["data"]["root_problem_id"]
+    related = db.get_related_solutions_query(problem_id)["data"]
+
+    def join(ids, empty_text):
+        return "\n".join(db.get_solution_detail_query(i)["data"]["detail"] for i in ids) if ids else empty_text
+
+    return {
+        "current_research_tree_full_text": tree_result["data"]["tree_text"],
+        "current_research_problem": problem_result["data"]["detail"],
+        "expert_solutions_of_all_ancestor_problems": join(list(reversed(related["ancestors"])), "无上级专家解决方案"),
+        "other_solutions_of_current_problem": join(related["siblings"], "无其他解决方案"),
+        "root_problem": db.get_problem_detail_query(root_problem_id)["data"]["detail"],
+        "expert_solutions_of_all_descendant_problems": join(related["descendants"], "无后代解决方案"),
+        "user_prompt": user_requirement or "无要求"
+    }
+
+
+def problem(title: str) -> ProblemRequest:
+    return ProblemRequest(title=title, significance=f"{title}的意义", criteria=f"{title}的标准",
+                          problem_type=ProblemType.IMPLEMENTATION)
+
+
+def solution(title: str, children=None) -> SolutionRequest:
+    return SolutionRequest(title=title, top_level_thoughts="思路", implementation_plan="计划",
+                           plan_justification="理由", children=children or [])
+
+
+class TestEnvironmentContextBuilder:
+    """环境信息构建器测试类"""
+
+    def setup_method(self):
+        """构建一棵三层研究树"""
+        print("\n=== 开始环境信息构建器测试 ===")
+        self.db = DatabaseManager()
+        self.builder = EnvironmentContextBuilder(self.db)
+
+        async def build_tree():
+            result = await self.db.add_root_problem(problem("根问题"))
+            root_id = result["data"]["roots"][0]["id"]
+            result = await self.db.create_solution(root_id, solution("根方案", [problem("子问题A"), problem("子问题B")]))
+            root_solution = result["data"]["roots"][0]["children"][0]
+            sub_a, sub_b = (c["id"] for c in root_solution["children"])
+            await self.db.create_solution(root_id, solution("备选方案"))
+            await self.db.set_selected_solution(root_id, root_solution["id"])
+            await self.db.create_solution(sub_a, solution("A的方案", [problem("孙问题")]))
+            grandchild = self.db.get_node_children_ids_query(
+                self.db.get_node_children_ids_query(sub_a)["data"]["children_ids"][0])["data"]["children_ids"][0]
+            return root_id, root_solution["id"], sub_a, sub_b, grandchild
+
+        self.root_id, self.root_solution_id, self.sub_a, self.sub_b, self.grandchild = asyncio.run(build_tree())
+
+    def test_build_matches_legacy_queries(self):
+        """测试构建结果与原查询逐项组装的结果一致"""
+        for problem_id in (self.root_id, self.sub_a, self.sub_b, self.grandchild):
+            expected = legacy_environment_info(self.db, problem_id, "要求")
+            actual = self.builder.build(problem_id, "要求")
+            print(f"问题 {problem_id} 环境信息一致: {expected == actual}")
+            assert actual == expected
+
+    def test_fragments_reused_within_snapshot(self):
+        """测试同一快照下的重复构建命中缓存"""
+        self.builder.build(self.sub_a, None)
+        misses = self.builder.stats["fragment_misses"]
+        self.builder.build(self.sub_a, None)
+        print(f"统计: {self.builder.get_stats()}")
+        assert self.builder.stats["fragment_misses"] == misses
+        assert self.builder.stats["fragment_hits"] > 0
+
+    def test_selective_invalidation_on_commit(self):
+        """测试提交新快照后只有受影响的片段失效"""
+        self.builder.build(self.sub_a, None)
+        self.builder.build(self.sub_b, None)
+
+        asyncio.run(self.db.update_problem(self.sub_b, problem("子问题B（修订）")))
+        print(f"提交后统计: {self.builder.get_stats()}")
+        assert self.builder.stats["carried_fragments"] > 0
+        assert self.builder.stats["invalidated_fragments"] > 0
+
+        # 根问题详情未修改，应直接命中
+        misses = self.builder.stats["fragment_misses"]
+        self.builder.get_problem_detail(self.root_id)
+        assert self.builder.stats["fragment_misses"] == misses
+
+        # 子问题B及其所在方案重新渲染，结果与原查询一致
+        for problem_id in (self.sub_a, self.sub_b):
+            assert self.builder.build(problem_id, None) == legacy_environment_info(self.db, problem_id, None)
+        assert "子问题B（修订）" in self.builder.get_solution_detail(self.root_solution_id)
+
+    def test_evicted_snapshots_not_pinned(self):
+        """测试缓存不持有快照：快照存储淘汰后可被回收，重新加载后沿用已渲染的片段"""
+        self.db.snapshot_map.max_resident = 1
+        old_id = self.db.current_snapshot_id
+        old_ref = weakref.ref(self.db.get_current_snapshot())
+        self.builder.build(self.sub_a, None)
+        asyncio.run(self.db.update_problem(self.sub_b, problem("子问题B（修订）")))
+        asyncio.run(self.db.update_problem(self.sub_b, problem("子问题B（再修订）")))
+        gc.collect()
+        print(f"快照存储: {self.db.snapshot_map.get_stats()}, 构建器: {self.builder.get_stats()}")
+        assert old_ref() is None
+
+        misses = self.builder.stats["fragment_misses"]
+        reloaded = self.db.snapshot_map[old_id]
+        assert "子问题A的意义" in self.builder.get_problem_detail(self.sub_a, reloaded)
+        assert self.builder.stats["fragment_misses"] == misses
+
+    def test_shared_builder_per_database(self):
+        """测试同一数据库管理器共享同一构建器"""
+        assert EnvironmentContextBuilder.for_database(self.db) is EnvironmentContextBuilder.for_database(self.db)
+        assert EnvironmentContextBuilder.for_database(self.db) is not EnvironmentContextBuilder.for_database(DatabaseManager())
@@ -0,0 +1,85 @@
+"""
+工程完整数据接口测试
+测试从最新消息开始的游标分页、字段过滤，以及ETag：数据未变化时返回304，消息或快照变化后ETag改变
+"""
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.database.schemas.request_models import SolutionRequest
+from backend.message.schemas.message_models import Patch
+from backend.project_manager import ProjectManager
+from backend.routers import projects
+from backend.tests.test_journal import build_history
+
+
+def build_client(pm: ProjectManager, monkeypatch) -> TestClient:
+    monkeypatch.setattr(projects, "pm", pm)
+    app = FastAPI()
+    app.include_router(projects.router)
+    return TestClient(app)
+
+
+class TestFullData:
+    """工程完整数据接口测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始工程完整数据接口测试 ===")
+
+    def test_cursor_pagination_and_field_filter(self, tmp_path, monkeypatch):
+        """测试按页从最新消息向前翻页覆盖全部消息，且可以去掉 thinking 与 action_params"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_history(pm)
+        for i in range(6):
+            asyncio.run(pm.message_manager.publish_patch(Patch(
+                role="assistant", title=f"回答{i}", thinking_delta="很长的思考" * 20, content_delta="回答",
+                action_params={"参数": i}, finished=True,
+            )))
+        client = build_client(pm, monkeypatch)
+
+        pages = []
+        params = {"limit": 3, "include_thinking": False, "include_action_params": False}
+        while True:
+            data = client.get("/projects/current/full-data", params=params).json()["data"]
+            pages.append([message["id"] for message in data["messages"]])
+            assert all("thinking" not in message and "action_params" not in message for message in data["messages"])
+            if data["pagination"]["next_before"] is None:
+                break
+            params["before"] = data["pagination"]["next_before"]
+        print(f"分页结果: {[len(page) for page in pages]}")
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [message_id for page in reversed(pages) for message_id in page] == pm.message_manager.message_order
+
+        # 不带参数时返回全部消息（与原格式一致）
+        full = client.get("/projects/current/full-data").json()["data"]
+        assert len(full["messages"]) == 7 and full["messages"][-1]["thinking"] == "很长的思考" * 20
+
+    def test_etag_not_modified(self, tmp_path, monkeypatch):
+        """测试数据未变化时返回304，新消息、消息内容更新与快照提交都会改变ETag"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        solution_id = build_history(pm)
+        client = build_client(pm, monkeypatch)
+
+        def fetch(etag=None, **params):
+            headers = {"If-None-Match": etag} if etag else {}
+            return client.get("/projects/current/full-data", params={"limit": 20, **params}, headers=headers)
+
+        first = fetch()
+        etag = first.headers["etag"]
+        not_modified = fetch(etag)
+        assert not_modified.status_code == 304 and not_modified.content == b""
+        # 查询参数不同时ETag不同
+        assert fetch(etag, include_thinking=False).status_code == 200
+
+        message_id = asyncio.run(pm.message_manager.publish_patch(Patch(role="assistant", title="生成中", content_delta="第一段")))
+        etags = [etag, fetch().headers["etag"]]
+        asyncio.run(pm.message_manager.publish_patch(Patch(message_id=message_id, content_delta="第二段")))
+        etags.append(fetch().headers["etag"])
+        asyncio.run(pm.database_manager.update_solution(solution_id, SolutionRequest(title="方案v3")))
+        etags.append(fetch().headers["etag"])
+        print(f"ETag序列: {etags}")
+        assert len(set(etags)) == 4
+        assert fetch(etags[-1]).status_code == 304
@@ -0,0 +1,128 @@
+"""
+工程预写日志测试
+测试提交与完成的消息以增量记录写入日志、批量fsync，以及崩溃后从检查点重放恢复
+"""
+import asyncio
+import json
+
+from backend.database.schemas.request_models import ProblemRequest, SolutionRequest
+from backend.message.schemas.message_models import Patch
+from backend.project_manager import ProjectManager
+from backend.storage.journal import ProjectJournal, read_journal
+
+
+def build_history(pm: ProjectManager) -> str:
+    """添加根问题、创建并修改解决方案、发布一条用户消息，返回解决方案ID"""
+    db = pm.database_manager
+
+    async def run():
+        result = await db.add_root_problem(ProblemRequest(title="根问题", significance="意义", criteria="标准"))
+        problem_id = result["data"]["roots"][0]["id"]
+        await db.create_solution(problem_id, SolutionRequest(
+            title="方案", top_level_thoughts="思考", implementation_plan="实施", plan_justification="论证",
+            children=[ProblemRequest(title="子问题", significance="子意义", criteria="子标准")],
+        ))
+        solution_id = db.get_current_snapshot().roots[0].children[0].id
+        await db.update_solution(solution_id, SolutionRequest(title="方案v2", implementation_plan="新的实施"))
+        await pm.message_manager.publish_patch(Patch(role="user", title="提问", content_delta="请修改", finished=True))
+        return solution_id
+
+    return asyncio.run(run())
+
+
+def dump_state(pm: ProjectManager):
+    db = pm.database_manager
+    return (
+        db.current_snapshot_id,
+        {snapshot_id: snapshot.model_dump() for snapshot_id, snapshot in db.snapshot_map.items()},
+        [pm.message_manager.messages[message_id].model_dump() for message_id in pm.message_manager.message_order],
+    )
+
+
+class TestProjectJournal:
+    """工程预写日志测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始工程预写日志测试 ===")
+
+    def test_replay_unsaved_project_after_crash(self, tmp_path):
+        """测试从未保存过的工程在崩溃后由日志完整恢复"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        build_history(pm)
+        pm.journal.flush()
+        expected = dump_state(pm)
+        # 模拟崩溃：不保存、不关闭日志，直接用新的管理器加载
+        restored = ProjectManager(projects_dir=tmp_path)
+        print(f"恢复的工程: {restored.current_project_name}, 快照数: {len(restored.database_manager.snapshot_map)}")
+        assert restored.current_project_name == "未命名"
+        assert dump_state(restored) == expected
+        # 恢复后立即写入检查点
+        assert (tmp_path / "未命名.json").exists()
+
+    def test_records_are_incremental(self, tmp_path):
+        """测试修改解决方案只记录被修改的节点"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        solution_id = build_history(pm)
+        pm.journal.flush()
+        _, records, _ = read_journal(pm.journal.path)
+        commits = [record for record in records if record["op"] == "commit"]
+        print(f"各次提交记录的节点数: {[len(record['nodes']) for record in commits]}")
+        assert len(commits) == 3
+        assert list(commits[-1]["nodes"]) == [solution_id]
+        assert commits[-1]["nodes"][solution_id]["implementation_plan"] == "新的实施"
+        assert [record["op"] for record in records].count("message") == 1
+
+    def test_replay_from_checkpoint(self, tmp_path):
+        """测试保存后日志轮转为以新检查点为基准，之后的变更在检查点之上重放"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        solution_id = build_history(pm)
+        pm.save_current_project()
+        pm.journal.flush()
+        header, records, _ = read_journal(pm.journal.path)
+        assert header["base"] == "checkpoint" and records == []
+
+        asyncio.run(pm.database_manager.update_solution(solution_id, SolutionRequest(title="方案v3")))
+        asyncio.run(pm.message_manager.rollback_to_message(pm.message_manager.message_order[0]))
+        pm.journal.flush()
+        expected = dump_state(pm)
+
+        restored = ProjectManager(projects_dir=tmp_path)
+        assert dump_state(restored) == expected
+        assert restored.database_manager.get_current_snapshot().roots[0].children[0].title == "方案v3"
+
+    def test_mismatched_journal_is_ignored(self, tmp_path):
+        """测试与检查点不匹配且没有对应检查点标记的日志不会被重放"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        build_history(pm)
+        pm.save_current_project()
+        expected = dump_state(pm)
+        stale = ProjectJournal(tmp_path / "未命名.journal", {"base": "checkpoint", "checkpoint_id": "旧检查点"})
+        stale.append({"op": "set_current", "snapshot_id": "不存在"})
+        stale.close()
+
+        restored = ProjectManager(projects_dir=tmp_path)
+        assert dump_state(restored) == expected
+
+    def test_group_commit_and_torn_tail(self, tmp_path):
+        """测试一批记录只fsync一次，以及崩溃留下的不完整末行被截掉后继续追加"""
+        path = tmp_path / "工程.journal"
+        journal = ProjectJournal(path, {"base": "empty"}, flush_interval=0.05)
+        for i in range(100):
+            journal.append({"op": "noop", "index": i})
+        journal.close()
+        print(f"日志统计: {journal.get_stats()}")
+        assert journal.stats["records"] == 100
+        assert journal.stats["fsyncs"] < 10
+
+        with open(path, "ab") as f:
+            f.write(b'{"op": "noop", "ind')
+        header, records, valid_bytes = read_journal(path)
+        assert header["base"] == "empty" and len(records) == 100
+
+        resumed = ProjectJournal(path, header, resume_at=valid_bytes)
+        resumed.append({"op": "noop", "index": 100})
+        resumed.close()
+        _, records, _ = read_journal(path)
+        assert [record["index"] for record in records] == list(range(101))
+        with open(path, "rb") as f:
+            assert all(json.loads(line) for line in f)
@@ -0,0 +1,86 @@
+"""
+JSON工程存储测试
+测试节点版本按内容哈希去重写入、加载时在快照之间共享、旧版（每个快照一棵完整的树）工程文件的兼容，以及工程清单
+"""
+import json
+import shutil
+from pathlib import Path
+
+from backend.project_manager import ProjectManager
+from backend.storage.project_store import JSON_FORMAT_VERSION, MANIFEST_FILE, JsonProjectStore
+from backend.tests.test_journal import build_history, dump_state
+
+SAMPLE_PROJECT = Path(__file__).parent.parent / "data" / "projects" / "测试1.json"
+
+
+class TestJsonProjectStore:
+    """JSON工程存储测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始JSON工程存储测试 ===")
+
+    def test_each_node_version_written_once(self, tmp_path):
+        """测试未变化的节点在文件中只出现一次，快照只记录根节点哈希"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        build_history(pm)
+        pm.save_current_project()
+        expected = dump_state(pm)
+
+        with open(tmp_path / "未命名.json", encoding="utf-8") as f:
+            data = json.load(f)
+        titles = [fields["title"] for fields in data["nodes"].values()]
+        print(f"快照数: {len(data['snapshots'])}, 节点版本: {titles}")
+        assert data["format_version"] == JSON_FORMAT_VERSION and "snapshot_map" not in data
+        # 子问题从未修改只存一份；根问题每次子树变化产生新版本（子节点哈希变化）
+        assert titles.count("子问题") == 1
+        assert titles.count("方案") == 1 and titles.count("方案v2") == 1
+        assert titles.count("根问题") == 3
+
+        restored = ProjectManager(projects_dir=tmp_path)
+        assert dump_state(restored) == expected
+        snapshots = [snapshot for snapshot in restored.database_manager.snapshot_map.values() if snapshot.roots]
+        sub_problems = [snapshot.roots[0].children[0].children[0] for snapshot in snapshots if snapshot.roots[0].children]
+        assert len({id(node) for node in sub_problems}) == 1
+
+    def test_legacy_project_file(self, tmp_path):
+        """测试旧版工程文件可以加载，重新保存为新格式后内容不变且体积更小"""
+        legacy_path = tmp_path / SAMPLE_PROJECT.name
+        shutil.copy(SAMPLE_PROJECT, legacy_path)
+        store = JsonProjectStore(tmp_path)
+        legacy = store.load_project(legacy_path.stem)
+        expected = {snapshot_id: snapshot.model_dump() for snapshot_id, snapshot in legacy.snapshot_map.items()}
+
+        store.save_project(legacy)
+        print(f"旧格式: {SAMPLE_PROJECT.stat().st_size} 字节, 新格式: {legacy_path.stat().st_size} 字节")
+        assert legacy_path.stat().st_size < SAMPLE_PROJECT.stat().st_size
+        reloaded = store.load_project(legacy_path.stem)
+        assert {snapshot_id: snapshot.model_dump() for snapshot_id, snapshot in reloaded.snapshot_map.items()} == expected
+        assert reloaded.message_order == legacy.message_order
+
+    def test_manifest_tracks_saves_and_deletes(self, tmp_path):
+        """测试工程列表来自清单而不解析工程文件，清单随保存/删除更新，丢失后可由工程文件重建"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        build_history(pm)
+        pm.save_as_current_project("工程A")
+        pm.save_as_current_project("工程B")
+        pm.delete_project("工程A")
+
+        projects = {project["project_name"]: project for project in pm.list_projects()["projects"]}
+        print(f"工程列表: {projects}")
+        assert list(projects) == ["工程B"]
+        entry = projects["工程B"]
+        assert entry["message_count"] == 1 and entry["node_count"] == 3
+        assert entry["snapshot_count"] == len(pm.database_manager.snapshot_map)
+        assert entry["size_bytes"] == (tmp_path / "工程B.json").stat().st_size
+
+        # 列表只读清单：工程文件内容损坏不影响列表
+        expected = JsonProjectStore(tmp_path).list_projects()
+        (tmp_path / "工程B.json").write_text("损坏的内容", encoding="utf-8")
+        assert JsonProjectStore(tmp_path).list_projects() == expected
+
+        # 清单丢失时由工程文件重建，新增的工程文件自动加入清单
+        (tmp_path / MANIFEST_FILE).unlink()
+        shutil.copy(SAMPLE_PROJECT, tmp_path / SAMPLE_PROJECT.name)
+        rebuilt = {project["project_name"]: project for project in JsonProjectStore(tmp_path).list_projects()}
+        assert list(rebuilt) == [SAMPLE_PROJECT.stem]
+        assert rebuilt[SAMPLE_PROJECT.stem]["snapshot_count"] == 12 and rebuilt[SAMPLE_PROJECT.stem]["message_count"] == 28
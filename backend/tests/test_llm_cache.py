@@ -0,0 +1,80 @@
+"""
+LLM响应缓存测试
+测试录制后回放相同的思考/内容片段序列，以及回放模式下不访问网络
+"""
+import asyncio
+import pytest
+
+from backend.agents import llm_client as llm_client_module
+from backend.agents.llm_cache import LLMResponseCache
+from backend.agents.llm_client import DeepSeekReasonerClient
+from backend.agents.retry_wrapper import APIError
+
+
+def make_chunk(reasoning=None, content=None):
+    return {"choices": [{"delta": {"reasoning_content": reasoning, "content": content}}]}
+
+
+class FakeTransport:
+    """模拟共享HTTP传输层，记录请求次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def stream_chat_completion(self, payload):
+        self.calls += 1
+        for chunk in (make_chunk(reasoning="思考一"), make_chunk(reasoning="思考二"),
+                      make_chunk(content="<response>"), make_chunk(content="</response>")):
+            yield chunk
+
+    def get_stats(self):
+        return {"requests": self.calls}
+
+
+class TestLLMResponseCache:
+    """LLM响应缓存测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始LLM响应缓存测试 ===")
+        self.patches = []
+
+        async def publish(patch):
+            self.patches.append(patch)
+
+        self.client = DeepSeekReasonerClient(publish)
+        self.transport = FakeTransport()
+        self.client.transport = self.transport
+
+    def test_record_then_replay(self, tmp_path, monkeypatch):
+        """测试录制后再次调用直接回放，且发布的patch一致"""
+        cache = LLMResponseCache(tmp_path, mode="record")
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", cache)
+
+        first = asyncio.run(self.client.stream_generate("提示词", "m1"))
+        first_patches = [(p.thinking_delta, p.content_delta) for p in self.patches]
+        self.patches.clear()
+        second = asyncio.run(self.client.stream_generate("提示词", "m1"))
+        second_patches = [(p.thinking_delta, p.content_delta) for p in self.patches]
+
+        print(f"缓存统计: {cache.get_stats()}, API调用次数: {self.transport.calls}")
+        assert first == second == "<response></response>"
+        assert first_patches == second_patches
+        assert self.transport.calls == 1
+        assert cache.stats["hits"] == 1 and cache.stats["writes"] == 1
+
+    def test_replay_miss_does_not_call_api(self, tmp_path, monkeypatch):
+        """测试回放模式下缓存未命中时报错且不访问网络"""
+        cache = LLMResponseCache(tmp_path, mode="replay")
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", cache)
+
+        with pytest.raises(APIError):
+            asyncio.run(self.client.stream_generate("未录制的提示词", "m2"))
+        assert self.transport.calls == 0
+
+    def test_key_depends_on_parameters(self):
+        """测试缓存键随模型、温度、最大token数变化"""
+        key = LLMResponseCache.make_key("deepseek-reasoner", "p", 0.7, 4000)
+        assert key == LLMResponseCache.make_key("deepseek-reasoner", "p", 0.7, 4000)
+        assert key != LLMResponseCache.make_key("deepseek-chat", "p", 0.7, 4000)
+        assert key != LLMResponseCache.make_key("deepseek-reasoner", "p", 0.5, 4000)
+        assert key != LLMResponseCache.make_key("deepseek-reasoner", "p", 0.7, 2000)
@@ -0,0 +1,111 @@
+"""
+共享LLM传输层测试
+测试SSE解析、错误映射（状态码与Retry-After）、连接复用，以及不修改进程环境变量
+"""
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+from backend.agents.llm_client import DeepSeekV3Client
+from backend.agents.llm_transport import LLMTransport
+from backend.agents.retry_wrapper import APIError, NetworkError
+
+SSE_BODY = (
+    ": keep-alive\n\n"
+    'data: {"choices":[{"delta":{"content":"你好"}}]}\n\n'
+    'data: {"choices":[{"delta":{"content":"世界"}}]}\n\n'
+    'data: {"choices":[],"usage":{"prompt_tokens":5,"completion_tokens":2}}\n\n'
+    "data: [DONE]\n\n"
+)
+
+
+def make_transport(handler, **kwargs) -> LLMTransport:
+    transport = LLMTransport("http://mock/v1", "key", **kwargs)
+    transport._make_transport = lambda proxy=None: httpx.MockTransport(handler)
+    return transport
+
+
+async def collect(transport: LLMTransport, payload=None):
+    return [chunk async for chunk in transport.stream_chat_completion(payload or {"model": "m"})]
+
+
+class TestLLMTransport:
+    """共享LLM传输层测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始共享LLM传输层测试 ===")
+        self.requests = []
+
+    def handler(self, status_code=200, body=SSE_BODY, headers=None):
+        def handle(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return httpx.Response(status_code, text=body, headers=headers or {})
+        return handle
+
+    def test_parse_sse_stream(self):
+        """测试解析SSE数据块，忽略注释行并在[DONE]处结束"""
+        transport = make_transport(self.handler())
+        chunks = asyncio.run(collect(transport, {"model": "m", "stream": True}))
+        print(f"数据块: {chunks}")
+        assert [c["choices"][0]["delta"]["content"] for c in chunks[:2]] == ["你好", "世界"]
+        assert chunks[2]["usage"]["completion_tokens"] == 2
+        request = self.requests[0]
+        assert request.url.path == "/v1/chat/completions"
+        assert request.headers["Authorization"] == "Bearer key"
+        assert json.loads(request.content) == {"model": "m", "stream": True}
+
+    def test_error_mapping(self):
+        """测试HTTP错误携带状态码与Retry-After，连接错误转换为网络错误"""
+        transport = make_transport(self.handler(429, '{"error":"rate limited"}', {"Retry-After": "3"}))
+        with pytest.raises(APIError) as exc_info:
+            asyncio.run(collect(transport))
+        assert exc_info.value.status_code == 429 and exc_info.value.retry_after == 3.0
+
+        def refuse(request):
+            raise httpx.ConnectError("refused", request=request)
+        with pytest.raises(NetworkError):
+            asyncio.run(collect(make_transport(refuse)))
+
+    def test_client_reused_within_loop(self):
+        """测试同一事件循环内复用同一个HTTP客户端"""
+        transport = make_transport(self.handler())
+
+        async def run_twice():
+            await collect(transport)
+            await collect(transport)
+            await transport.aclose()
+
+        asyncio.run(run_twice())
+        print(f"传输层统计: {transport.get_stats()}")
+        assert transport.stats["clients_created"] == 1 and transport.stats["requests"] == 2
+
+    def test_client_with_proxy_does_not_touch_environ(self, monkeypatch):
+        """测试客户端通过共享传输层使用显式代理，不修改环境变量"""
+        monkeypatch.delenv("HTTP_PROXY", raising=False)
+        transport = LLMTransport("http://mock/v1", "key", proxies={"http": "http://proxy:8080"}, no_proxy=["localhost"])
+        client_a = DeepSeekV3Client(transport=transport)
+        client_b = DeepSeekV3Client(transport=transport)
+        assert client_a.transport is client_b.transport
+        assert "HTTP_PROXY" not in os.environ
+
+    def test_proxy_transport_mounts(self, monkeypatch):
+        """测试代理地址以 httpx.Proxy 传给传输层（兼容 httpx 0.25），NO_PROXY 中的主机直连"""
+        created = []
+        original = httpx.AsyncHTTPTransport
+
+        def record(*args, **kwargs):
+            created.append(kwargs.get("proxy"))
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(httpx, "AsyncHTTPTransport", record)
+        transport = LLMTransport("http://mock/v1", "key", proxies={"https": "http://proxy:8080"}, no_proxy=["localhost"])
+        client = transport._create_client()
+        proxies = [proxy for proxy in created if proxy is not None]
+        print(f"创建的传输层代理参数: {created}")
+        assert len(created) == 3 and len(proxies) == 1
+        assert isinstance(proxies[0], httpx.Proxy) and proxies[0].url == httpx.URL("http://proxy:8080")
+        assert type(client._transport_for_url(httpx.URL("https://api.example.com"))._pool).__name__ == "AsyncHTTPProxy"
+        assert type(client._transport_for_url(httpx.URL("https://localhost"))._pool).__name__ != "AsyncHTTPProxy"
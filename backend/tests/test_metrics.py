@@ -0,0 +1,105 @@
+"""
+指标收集测试
+测试滚动直方图、Prometheus文本输出，以及LLM客户端按真实用量记录token与延迟
+"""
+import asyncio
+
+from backend.agents import llm_client as llm_client_module
+from backend.agents.llm_cache import LLMResponseCache
+from backend.agents.llm_client import DeepSeekReasonerClient
+from backend.utils.metrics import MetricsRegistry, RollingHistogram
+
+
+def make_chunk(reasoning=None, content=None, usage=None):
+    if usage is not None:
+        return {"choices": [], "usage": usage}
+    return {"choices": [{"delta": {"reasoning_content": reasoning, "content": content}}]}
+
+
+class TestMetricsRegistry:
+    """指标注册表测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始指标收集测试 ===")
+
+    def test_rolling_histogram_window(self):
+        """测试分位数只基于最近窗口，计数与总和为累计值"""
+        hist = RollingHistogram(window_size=10)
+        for value in range(100):
+            hist.observe(value)
+        summary = hist.summary()
+        print(f"直方图摘要: {summary}")
+        assert summary["count"] == 100 and summary["sum"] == sum(range(100))
+        assert summary["p50"] == 94 and summary["window_max"] == 99
+
+    def test_prometheus_text(self):
+        """测试Prometheus文本格式输出"""
+        registry = MetricsRegistry()
+        registry.inc("llm_calls_total", 2, "LLM调用次数", model="m", status="success")
+        registry.observe("llm_call_duration_seconds", 1.5, "耗时", model="m")
+        registry.observe("llm_call_duration_seconds", None, model="m")
+        text = registry.render_prometheus()
+        print(text)
+        assert "# TYPE llm_calls_total counter" in text
+        assert 'llm_calls_total{model="m",status="success"} 2' in text
+        assert 'llm_call_duration_seconds{model="m",quantile="0.5"} 1.5' in text
+        assert 'llm_call_duration_seconds_count{model="m"} 1' in text
+
+
+class TestClientUsageMetrics:
+    """LLM客户端用量与延迟指标测试类"""
+
+    def setup_method(self, method):
+        print("\n=== 开始LLM客户端指标测试 ===")
+        self.registry = MetricsRegistry()
+
+        async def publish(patch):
+            return None
+
+        self.client = DeepSeekReasonerClient(publish)
+
+    def run_with_chunks(self, monkeypatch, chunks):
+        monkeypatch.setattr(llm_client_module, "shared_metrics", self.registry)
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", LLMResponseCache("unused", mode="off"))
+
+        class FakeTransport:
+            async def stream_chat_completion(self, payload):
+                assert payload["stream_options"] == {"include_usage": True}
+                for chunk in chunks:
+                    await asyncio.sleep(0.01)
+                    yield chunk
+
+            def get_stats(self):
+                return {}
+
+        self.client.transport = FakeTransport()
+        return asyncio.run(self.client.stream_generate("提示词", "m1"))
+
+    def test_usage_reported_by_api(self, monkeypatch):
+        """测试使用API返回的真实用量，推理与内容token分开统计"""
+        usage = {
+            "prompt_tokens": 100, "completion_tokens": 30, "prompt_cache_hit_tokens": 64,
+            "prompt_cache_miss_tokens": 36, "completion_tokens_details": {"reasoning_tokens": 20},
+        }
+        self.run_with_chunks(monkeypatch, [
+            make_chunk(reasoning="思考"), make_chunk(content="内容"), make_chunk(usage=usage),
+        ])
+        stats = self.client.get_stats()
+        print(f"最近调用: {stats['last_call']}")
+        assert stats["total_thinking_tokens"] == 20 and stats["total_content_tokens"] == 10
+        assert stats["reasoning_tokens"] == 20 and stats["prompt_cache_hit_tokens"] == 64
+        last_call = stats["last_call"]
+        assert last_call["usage_reported"]
+        assert 0 < last_call["time_to_first_thinking"] < last_call["time_to_first_content"] <= last_call["duration"]
+        model = self.client.model_name
+        assert self.registry.get_counter("llm_prompt_cache_hit_tokens_total", model=model) == 64
+        assert self.registry.get_histogram("llm_time_to_first_content_seconds", model=model).count == 1
+        assert self.registry.get_histogram("llm_output_tokens_per_second", model=model).count == 1
+
+    def test_estimate_without_usage(self, monkeypatch):
+        """测试没有用量信息时按中文估算，而不是按空格分词"""
+        self.run_with_chunks(monkeypatch, [make_chunk(reasoning="一二三四五六七八九十"), make_chunk(content="甲乙丙丁戊")])
+        stats = self.client.get_stats()
+        print(f"统计: 思考{stats['total_thinking_tokens']}, 内容{stats['total_content_tokens']}")
+        assert stats["total_thinking_tokens"] == 6 and stats["total_content_tokens"] == 3
+        assert not stats["last_call"]["usage_reported"]
@@ -0,0 +1,136 @@
+"""
+模型路由测试
+测试路由查找顺序、LLM_ROUTES覆盖、智能体按路由选择模型与输出配置，以及按路由统计延迟与失败率
+"""
+import asyncio
+
+import pytest
+
+from backend.agents import agent_base as agent_base_module
+from backend.agents import llm_client as llm_client_module
+from backend.agents.llm_cache import LLMResponseCache
+from backend.agents.llm_client import DeepSeekV3Client
+from backend.agents.model_routing import ModelRoute, ModelRouter
+from backend.agents.prompts_and_validators.create_solution import CreateSolutionResponse
+from backend.agents.retry_wrapper import CircuitBreaker, RetryBudget, RetryWrapper, TimeoutError
+from backend.config import settings
+
+from backend.tests.test_stream_xml_parser import FakeTransport
+from backend.tests.test_xml_repair import DummyAgent, ScriptedClient
+
+
+class RecordingClient(ScriptedClient):
+    """记录每次调用的max_tokens与temperature，可模拟慢响应"""
+
+    def __init__(self, outputs, model_type, delay=0.0):
+        super().__init__(outputs)
+        self.model_type = model_type
+        self.delay = delay
+        self.calls = []
+
+    async def stream_generate(self, prompt, message_id, max_tokens=None, temperature=None,
+                              publish_content=True, stream_validator=None):
+        self.calls.append({"max_tokens": max_tokens, "temperature": temperature})
+        await asyncio.sleep(self.delay)
+        return await super().stream_generate(prompt, message_id, max_tokens, temperature, publish_content, stream_validator)
+
+
+class PayloadRecordingTransport(FakeTransport):
+    """记录每次请求的payload"""
+
+    def __init__(self, texts):
+        super().__init__(texts)
+        self.payloads = []
+
+    def stream_chat_completion(self, payload):
+        self.payloads.append(payload)
+        return super().stream_chat_completion(payload)
+
+
+class TestModelRouter:
+    """模型路由表测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始模型路由测试 ===")
+
+    def test_resolve_order(self):
+        """测试按步骤名、验证器类名、default的顺序查找"""
+        router = ModelRouter({
+            "step_a": ModelRoute("v3", max_tokens=100),
+            "CreateSolutionResponse": ModelRoute("reasoner", max_tokens=200),
+        })
+        assert router.resolve("step_a", CreateSolutionResponse)[0] == "step_a"
+        assert router.resolve("unknown", CreateSolutionResponse)[1].max_tokens == 200
+        assert router.resolve(None, None) == ("default", ModelRoute())
+
+    def test_routes_from_settings(self, monkeypatch):
+        """测试LLM_ROUTES只覆盖给出的字段，配置无效时回退默认路由表"""
+        monkeypatch.setattr(settings, "LLM_ROUTES", '{"handle_modification_requests": {"model": "reasoner"}, "x": {"timeout": 5}}')
+        router = ModelRouter.from_settings()
+        route = router.routes["handle_modification_requests"]
+        print(f"覆盖后的路由: {route}")
+        assert route.model == "reasoner" and route.max_tokens == 1500
+        assert router.routes["x"] == ModelRoute("reasoner", timeout=5)
+
+        monkeypatch.setattr(settings, "LLM_ROUTES", '{"create_solution": {"model": "gpt"}}')
+        assert ModelRouter.from_settings().routes["create_solution"].model == "reasoner"
+
+
+class TestAgentRouting:
+    """智能体按路由调用测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始智能体模型路由测试 ===")
+
+        async def publish(patch):
+            return "m1"
+
+        self.publish = publish
+
+    def make_agent(self, monkeypatch, router):
+        monkeypatch.setattr(agent_base_module, "shared_model_router", router)
+        retry_wrapper = RetryWrapper(
+            max_retries=1, base_delay=0.001, max_delay=0.01,
+            retry_budget=RetryBudget(ratio=0), circuit_breaker=CircuitBreaker(failure_threshold=0),
+        )
+        return DummyAgent("测试智能体", self.publish, llm_client=RecordingClient(["推理模型输出"], "reasoner"),
+                          retry_wrapper=retry_wrapper)
+
+    def test_cheap_step_uses_v3(self, monkeypatch):
+        """测试路由到v3的步骤使用v3客户端和路由的输出配置，并记录路由统计"""
+        router = ModelRouter({"cheap": ModelRoute("v3", max_tokens=300, temperature=0.2)})
+        agent = self.make_agent(monkeypatch, router)
+        agent.routed_clients["v3"] = RecordingClient(["快速模型输出"], "v3")
+
+        result = asyncio.run(agent._call_llm_with_retry("提示词", "标题", None, step="cheap"))
+        stats = router.get_stats()
+        print(f"路由统计: {stats['cheap']}")
+        assert result == "快速模型输出" and not agent.llm_client.calls
+        assert agent.routed_clients["v3"].calls == [{"max_tokens": 300, "temperature": 0.2}]
+        assert stats["cheap"]["calls"] == 1 and stats["cheap"]["failure_rate"] == 0.0
+
+    def test_route_timeout(self, monkeypatch):
+        """测试超过路由超时抛出可重试的超时错误，失败计入路由统计"""
+        router = ModelRouter({"slow": ModelRoute("reasoner", timeout=0.01)})
+        agent = self.make_agent(monkeypatch, router)
+        agent.llm_client = RecordingClient(["输出", "输出"], "reasoner", delay=0.5)
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(agent._call_llm_with_retry("提示词", "标题", None, step="slow"))
+        assert len(agent.llm_client.calls) == 2
+        assert router.get_stats()["slow"]["failure_rate"] == 1.0
+
+    def test_zero_temperature_reaches_payload(self, monkeypatch):
+        """测试路由配置的 temperature=0.0 原样进入请求，不被全局默认值替换"""
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", LLMResponseCache("unused", mode="off"))
+        router = ModelRouter({"exact": ModelRoute("v3", max_tokens=300, temperature=0.0)})
+        agent = self.make_agent(monkeypatch, router)
+        transport = PayloadRecordingTransport(["确定性输出"])
+        agent.routed_clients["v3"] = DeepSeekV3Client(self.publish, transport=transport)
+
+        result = asyncio.run(agent._call_llm_with_retry("提示词", "标题", None, step="exact"))
+        payload = transport.payloads[0]
+        print(f"请求参数: temperature={payload['temperature']}, max_tokens={payload['max_tokens']}")
+        assert result == "确定性输出"
+        assert payload["temperature"] == 0.0 and settings.DEFAULT_TEMPERATURE != 0.0
+        assert payload["max_tokens"] == 300
@@ -0,0 +1,96 @@
+"""
+增量修改解决方案测试
+测试只输出变化字段与子问题增删改操作时，to_request能正确应用到当前方案
+"""
+from backend.agents.prompts_and_validators.modify_solution import ModifySolutionResponse
+from backend.database.schemas.request_models import ProblemRequest, SolutionRequest
+from backend.database.schemas.research_tree import ProblemType
+from backend.utils.xml_parser import XMLParser
+
+
+def make_problem(problem_id, title, problem_type=ProblemType.IMPLEMENTATION):
+    return ProblemRequest(id=problem_id, title=title, significance=f"{title}的意义", criteria=f"{title}的标准", problem_type=problem_type)
+
+
+class TestModifySolutionDiff:
+    """增量修改解决方案测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始增量修改解决方案测试 ===")
+        self.parser = XMLParser()
+        self.org_problem_map = {
+            "是否A？": make_problem("p1", "是否A？", ProblemType.CONDITIONAL),
+            "如何B？": make_problem("p2", "如何B？"),
+            "如何C？": make_problem("p3", "如何C？"),
+        }
+        self.current_solution = SolutionRequest(
+            title="原方案", top_level_thoughts="原顶层思考", implementation_plan="原实施方案", plan_justification="原方案论证",
+        )
+
+    def parse(self, body):
+        return self.parser.validate_with_pydantic(self.parser.xml_to_dict(f"<response>{body}</response>"), ModifySolutionResponse)
+
+    def test_text_only_change_updates_in_place(self):
+        """测试只修改实施方案时原地更新，未输出的字段保持为None"""
+        response = self.parse("<name>新方案</name><implementation_plan>新实施方案</implementation_plan>")
+        action, request = response.to_request(self.org_problem_map, self.current_solution)
+        print(f"修改内容: {response.to_content()}")
+        assert action == "update"
+        assert request.title == "新方案" and request.implementation_plan == "新实施方案"
+        assert request.top_level_thoughts is None and request.plan_justification is None
+
+    def test_sub_problem_changes_create_new_solution(self):
+        """测试删除、修改、新增子问题后新建方案，并用当前方案补全未修改的字段"""
+        response = self.parse(
+            "<name>新方案</name>"
+            "<sub_problem_changes>"
+            "<remove><name>如何C？</name></remove>"
+            "<edit><name>如何B？</name><criteria>新的标准</criteria></edit>"
+            '<add type="conditional" after="是否A？"><name>是否D？</name><significance>意义</significance><criteria>标准</criteria></add>'
+            "</sub_problem_changes>"
+        )
+        action, request = response.to_request(self.org_problem_map, self.current_solution)
+        print(f"新子问题列表: {[child.title for child in request.children]}")
+        assert action == "create"
+        assert [child.title for child in request.children] == ["是否A？", "是否D？", "如何B？"]
+        inherited, added, edited = request.children
+        assert inherited.id == "p1"
+        assert added.id is None and added.problem_type == ProblemType.CONDITIONAL
+        assert edited.id is None and edited.criteria == "新的标准" and edited.significance == "如何B？的意义"
+        assert request.top_level_thoughts == "原顶层思考" and request.plan_justification == "原方案论证"
+
+    def test_unknown_references_are_ignored(self):
+        """测试引用不存在的原问题时删除被忽略、新增追加到末尾"""
+        response = self.parse(
+            "<name>新方案</name>"
+            "<sub_problem_changes>"
+            "<remove><name>不存在的问题</name></remove>"
+            '<add type="implementation" after="不存在的问题"><name>如何E？</name><significance>意义</significance><criteria>标准</criteria></add>'
+            "</sub_problem_changes>"
+        )
+        action, request = response.to_request(self.org_problem_map, self.current_solution)
+        assert action == "create"
+        assert [child.title for child in request.children] == ["是否A？", "如何B？", "如何C？", "如何E？"]
+
+    def test_full_research_plan_still_supported(self):
+        """测试完整输出全部继承原子问题时仍为原地更新"""
+        sub_problems = "".join(f'<sub_problem type="inherit"><name>{title}</name></sub_problem>' for title in self.org_problem_map)
+        response = self.parse(
+            "<name>新方案</name><top_level_thoughts>思考</top_level_thoughts>"
+            f"<research_plan>{sub_problems}</research_plan>"
+            "<implementation_plan>实施</implementation_plan><plan_justification>论证</plan_justification>"
+        )
+        action, request = response.to_request(self.org_problem_map)
+        assert action == "update" and request.plan_justification == "论证"
+
+    def test_research_plan_and_changes_conflict(self):
+        """测试同时输出完整研究方案与增量修改时验证失败"""
+        try:
+            self.parse(
+                "<name>新方案</name><research_plan></research_plan>"
+                "<sub_problem_changes><remove><name>如何C？</name></remove></sub_problem_changes>"
+            )
+        except Exception as e:
+            print(f"预期的验证错误: {e}")
+        else:
+            raise AssertionError("research_plan与sub_problem_changes同时出现时应验证失败")
@@ -0,0 +1,147 @@
+"""
+工程导出/导入测试
+测试导出的压缩NDJSON可以导入为内容一致的工程（含溢出的快照、跨存储引擎）、重名处理、
+截断与篡改的文件被拒绝，以及导出/导入接口的流式传输
+"""
+import asyncio
+import gzip
+import io
+import json
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.project_manager import ProjectManager
+from backend.routers import projects
+from backend.database.schemas.request_models import SolutionRequest
+from backend.storage.project_export import iter_project_export, read_project_export
+from backend.storage.snapshot_store import SnapshotStore
+from backend.tests.test_journal import build_history, dump_state
+from backend.tests.test_snapshot_store import build_long_history
+
+
+def export_bytes(pm: ProjectManager, project_name: str) -> bytes:
+    record = asyncio.run(pm.export_project_async(project_name))
+    return b"".join(iter_project_export(record))
+
+
+class TestProjectExport:
+    """工程导出/导入测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始工程导出/导入测试 ===")
+
+    @pytest.mark.parametrize("storage_backend", ["json", "sqlite"])
+    def test_round_trip(self, tmp_path, storage_backend):
+        """测试导出当前工程（含溢出的快照与未保存的变更）后导入到另一个目录，内容一致"""
+        pm = ProjectManager(projects_dir=tmp_path / "源")
+        pm.autosave.enabled = False
+        pm.database_manager.snapshot_map = SnapshotStore(max_resident=2)
+        pm.database_manager._init_empty_snapshot()
+        build_long_history(pm)
+        expected = dump_state(pm)
+        data = export_bytes(pm, "未命名")
+
+        lines = [json.loads(line) for line in gzip.decompress(data).splitlines()]
+        types = [line["type"] for line in lines]
+        raw_size = len(gzip.decompress(data))
+        print(f"导出: 压缩后 {len(data)} 字节, 解压后 {raw_size} 字节, 记录数 {len(lines)}")
+        assert types[0] == "header" and types[-1] == "end" and types.count("snapshot") == len(expected[1])
+        assert len(data) * 3 < raw_size
+
+        target = ProjectManager(projects_dir=tmp_path / "目标", storage_backend=storage_backend)
+        result = asyncio.run(target.import_project_async(io.BytesIO(data), "导入的工程"))
+        assert result["success"] and result["project_name"] == "导入的工程"
+        assert target.current_project_name != "导入的工程"
+        target.load_project("导入的工程")
+        assert dump_state(target) == expected
+
+    def test_round_trip_saved_sqlite_project_with_small_lru(self, tmp_path, monkeypatch):
+        """测试导出非当前的SQLite工程：快照按需加载后即释放，节点对象id被复用时导出内容仍然正确"""
+        monkeypatch.setattr(settings, "SNAPSHOT_LRU_SIZE", 2)
+        pm = ProjectManager(projects_dir=tmp_path / "源", storage_backend="sqlite")
+        pm.autosave.enabled = False
+        build_long_history(pm, updates=40)
+        pm.save_as_current_project("工程A")
+        expected = dump_state(pm)
+        pm.create_new_project("工程B")
+        data = export_bytes(pm, "工程A")
+
+        target = ProjectManager(projects_dir=tmp_path / "目标")
+        assert asyncio.run(target.import_project_async(io.BytesIO(data)))["success"]
+        target.load_project("工程A")
+        actual = dump_state(target)
+        mismatched = [snapshot_id for snapshot_id, snapshot in expected[1].items() if actual[1].get(snapshot_id) != snapshot]
+        print(f"快照数: {len(expected[1])}, 内容不一致: {len(mismatched)}")
+        assert actual == expected
+
+    def test_import_saves_json_incrementally(self, tmp_path):
+        """测试导入后保存为JSON工程时逐块写入：内存峰值远小于工程文件大小"""
+        pm = ProjectManager(projects_dir=tmp_path / "源")
+        pm.autosave.enabled = False
+        solution_id = build_history(pm)
+
+        async def run():
+            for i in range(120):
+                await pm.database_manager.update_solution(solution_id, SolutionRequest(title=f"方案v{i}", top_level_thoughts=f"第{i}版思考" * 2000))
+
+        asyncio.run(run())
+        data = export_bytes(pm, "未命名")
+        target = ProjectManager(projects_dir=tmp_path / "目标")
+        record = read_project_export(io.BytesIO(data), "导入的工程")
+
+        tracemalloc.start()
+        target.store.save_project(record)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = target.store.get_project_path("导入的工程").stat().st_size
+        print(f"工程文件 {size} 字节, 保存时内存峰值 {peak} 字节")
+        assert peak * 4 < size
+        target.load_project("导入的工程")
+        assert dump_state(target)[1:] == dump_state(pm)[1:]
+
+    def test_name_conflict_and_invalid_files(self, tmp_path):
+        """测试导入重名时添加后缀，截断、篡改的文件被拒绝且不产生工程"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_long_history(pm, updates=2)
+        pm.save_as_current_project("工程A")
+        data = export_bytes(pm, "工程A")
+
+        # 非当前工程从存储读取（切换工程前的保存只更新了头部的更新时间）
+        pm.create_new_project("工程B")
+        assert gzip.decompress(export_bytes(pm, "工程A")).splitlines()[1:] == gzip.decompress(data).splitlines()[1:]
+        result = asyncio.run(pm.import_project_async(io.BytesIO(data)))
+        assert result["project_name"] == "工程A(1)"
+
+        truncated = asyncio.run(pm.import_project_async(io.BytesIO(data[: len(data) // 2])))
+        lines = gzip.decompress(data).splitlines()
+        node_index = next(i for i, line in enumerate(lines) if json.loads(line)["type"] == "node" and "子问题".encode("utf-8") in line)
+        lines[node_index] = lines[node_index].replace("子问题".encode("utf-8"), "篡改".encode("utf-8"))
+        tampered = asyncio.run(pm.import_project_async(io.BytesIO(gzip.compress(b"\n".join(lines))), "篡改"))
+        print(f"截断: {truncated['message']}, 篡改: {tampered['message']}")
+        assert not truncated["success"] and not tampered["success"]
+        assert sorted(project["project_name"] for project in pm.list_projects()["projects"]) == ["工程A", "工程A(1)"]
+
+    def test_export_import_endpoints(self, tmp_path, monkeypatch):
+        """测试导出接口流式返回可下载的文件，导入接口接收原始请求体"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_long_history(pm, updates=2)
+        monkeypatch.setattr(projects, "pm", pm)
+        app = FastAPI()
+        app.include_router(projects.router)
+        client = TestClient(app)
+
+        response = client.get("/projects/未命名/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        assert "attachment" in response.headers["content-disposition"]
+        assert client.get("/projects/不存在/export").status_code == 404
+
+        imported = client.post("/projects/import", params={"project_name": "副本"}, content=response.content)
+        assert imported.status_code == 200 and imported.json()["project_name"] == "副本"
+        assert client.post("/projects/import", content=b"not gzip").status_code == 400
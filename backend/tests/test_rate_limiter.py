@@ -0,0 +1,77 @@
+"""
+全局LLM限流器测试
+测试并发上限、AIMD调整、令牌桶等待与按真实用量退还
+"""
+import asyncio
+
+from backend.agents.rate_limiter import LLMRateLimiter, TokenBucket
+from backend.agents.retry_wrapper import APIError, NetworkError, TimeoutError
+
+
+class TestLLMRateLimiter:
+    """全局LLM限流器测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始全局LLM限流器测试 ===")
+
+    def test_concurrency_limit(self):
+        """测试同时进行的请求数不超过并发上限"""
+        limiter = LLMRateLimiter(initial_concurrency=2, max_concurrency=2)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limiter.slot(0):
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.02)
+
+        async def run():
+            await asyncio.gather(*(request() for _ in range(6)))
+
+        asyncio.run(run())
+        print(f"限流统计: {limiter.get_stats()}")
+        assert peak == 2
+        assert limiter.in_flight == 0 and limiter.stats["queued"] >= 4
+
+    def test_aimd_adjustment(self):
+        """测试成功时加性增加，过载时乘性减少且冷却期内只减一次"""
+        limiter = LLMRateLimiter(initial_concurrency=8, min_concurrency=1, max_concurrency=16)
+        limiter.in_flight = 3
+        limiter.release(limiter.slot(0), None)
+        after_success = limiter.concurrency_limit
+        limiter.release(limiter.slot(0), APIError("限流", status_code=429))
+        after_overload = limiter.concurrency_limit
+        limiter.release(limiter.slot(0), TimeoutError("超时"))
+        print(f"成功后: {after_success}, 过载后: {after_overload}, 统计: {limiter.get_stats()}")
+        assert after_success == 8 + 1 / 8
+        assert after_overload == after_success / 2
+        assert limiter.concurrency_limit == after_overload
+        assert limiter.stats["overloads"] == 2 and limiter.stats["decreases"] == 1
+
+        # 普通网络错误不调整并发上限
+        limiter.release(limiter.slot(0), NetworkError("断开"))
+        assert limiter.concurrency_limit == after_overload
+
+    def test_token_bucket_wait_and_refund(self):
+        """测试TPM令牌不足时需要等待，退还后等待时间缩短"""
+        bucket = TokenBucket(per_minute=600)
+        assert bucket.wait_time(600) == 0
+        bucket.consume(600)
+        wait = bucket.wait_time(60)
+        print(f"预留600后取60需等待: {wait:.2f}秒")
+        assert 5.5 < wait <= 6.0
+        bucket.refund(300)
+        assert bucket.wait_time(60) == 0
+
+    def test_refund_on_settle(self):
+        """测试请求结束后按真实用量退还多预留的token"""
+        limiter = LLMRateLimiter(tokens_per_minute=1000)
+
+        async def run():
+            async with limiter.slot(800) as slot:
+                slot.settle(200)
+            return limiter.token_bucket.wait_time(750)
+
+        wait = asyncio.run(run())
+        assert limiter.stats["refunded_tokens"] == 600
+        assert wait == 0
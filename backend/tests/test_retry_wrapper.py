@@ -0,0 +1,238 @@
+"""
+重试包装器测试
+测试抖动回退与Retry-After、可重试错误判断、重试预算、熔断器以及对冲请求
+"""
+import asyncio
+
+import pytest
+
+from backend.agents.llm_transport import hedged_stream
+from backend.agents.retry_wrapper import (
+    APIError, CircuitBreaker, CircuitOpenError, NetworkError, RetryBudget, RetryWrapper,
+)
+from backend.utils.xml_parser import XMLValidationError
+
+
+async def publish(patch):
+    return None
+
+
+def make_wrapper(budget=None, breaker=None, max_retries=3):
+    return RetryWrapper(
+        max_retries=max_retries, base_delay=0.001, max_delay=0.01,
+        retry_budget=budget or RetryBudget(ratio=0),
+        circuit_breaker=breaker or CircuitBreaker(failure_threshold=0),
+    )
+
+
+class TestRetryWrapper:
+    """重试包装器测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始重试包装器测试 ===")
+
+    def test_jitter_and_retry_after(self):
+        """测试延迟在指数上限内随机抖动，且至少等待Retry-After"""
+        wrapper = RetryWrapper(base_delay=1.0, max_delay=60.0)
+        delays = [wrapper._calculate_delay(3) for _ in range(200)]
+        print(f"第4次尝试延迟范围: {min(delays):.2f} ~ {max(delays):.2f}")
+        assert all(0 <= delay <= 8.0 for delay in delays)
+        assert len(set(delays)) > 1
+        error = APIError("限流", status_code=429, retry_after=5.0)
+        assert all(5.0 <= wrapper._calculate_delay(0, error) <= 60.0 for _ in range(20))
+
+    def test_should_retry(self):
+        """测试只重试服务端临时故障与格式错误，普通OSError与4xx不重试"""
+        wrapper = make_wrapper()
+        assert wrapper._should_retry(NetworkError("断开"))
+        assert wrapper._should_retry(APIError("过载", status_code=503))
+        assert wrapper._should_retry(XMLValidationError("格式错误"))
+        assert wrapper._should_retry(ConnectionResetError())
+        assert not wrapper._should_retry(FileNotFoundError("不存在"))
+        assert not wrapper._should_retry(APIError("参数错误", status_code=400))
+        assert not wrapper._should_retry(CircuitOpenError("熔断"))
+
+    def test_retry_budget_limits_retries(self):
+        """测试预算耗尽后不再重试服务端故障，格式错误的重试不受影响"""
+        budget = RetryBudget(ratio=0.1, min_retries=1)
+        wrapper = make_wrapper(budget=budget)
+        calls = 0
+
+        async def always_fail():
+            nonlocal calls
+            calls += 1
+            raise NetworkError("断开")
+
+        with pytest.raises(NetworkError):
+            asyncio.run(wrapper.execute_with_retry(always_fail, publish, None))
+        stats = wrapper.get_retry_stats()
+        print(f"重试统计: {stats}")
+        # 一次原始请求 + 预算允许的一次重试
+        assert calls == 2 and stats["budget_exhausted"] == 1
+        assert stats["retry_budget"]["exhausted"] == 1
+
+        attempts = 0
+
+        async def bad_format_then_ok():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise XMLValidationError("格式错误")
+            return "ok"
+
+        assert asyncio.run(wrapper.execute_with_retry(bad_format_then_ok, publish, None)) == "ok"
+
+    def test_retry_budget_window_trimmed_on_record(self):
+        """测试只有成功请求时，窗口外的请求记录也会被移除，允许的重试次数只按窗口内请求计算"""
+        budget = RetryBudget(ratio=0.5, min_retries=1, window_seconds=0.02)
+        for _ in range(100):
+            budget.record_call()
+        assert budget.allowance() == 50
+        asyncio.run(asyncio.sleep(0.03))
+        assert budget.allowance() == 1
+        budget.record_call()
+        print(f"窗口内请求记录: {len(budget._calls)}")
+        assert len(budget._calls) == 1
+
+    def test_retry_after_beyond_max_delay(self):
+        """测试服务端要求的等待时间超过最大延迟时直接放弃"""
+        wrapper = make_wrapper()
+        calls = 0
+
+        async def rate_limited():
+            nonlocal calls
+            calls += 1
+            raise APIError("限流", status_code=429, retry_after=120)
+
+        with pytest.raises(APIError):
+            asyncio.run(wrapper.execute_with_retry(rate_limited, publish, None))
+        assert calls == 1
+
+
+class TestCircuitBreaker:
+    """熔断器测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始熔断器测试 ===")
+
+    def test_open_half_open_close(self):
+        """测试连续失败后打开，到期后只放行一个试探请求，成功后关闭"""
+        breaker = CircuitBreaker(failure_threshold=2, open_seconds=0.05)
+        breaker.record(XMLValidationError("格式错误"))
+        breaker.record(NetworkError("断开"))
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record(APIError("过载", status_code=503))
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        asyncio.run(asyncio.sleep(0.06))
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record(None)
+        print(f"熔断器统计: {breaker.get_stats()}")
+        assert breaker.state == CircuitBreaker.CLOSED and breaker.stats["opened"] == 1
+        assert breaker.stats["rejected"] == 2
+
+    def test_fail_fast_while_open(self):
+        """测试熔断后重试包装器停止重试，后续调用不发出请求"""
+        breaker = CircuitBreaker(failure_threshold=2, open_seconds=60)
+        wrapper = make_wrapper(breaker=breaker, max_retries=5)
+        calls = 0
+
+        async def outage():
+            nonlocal calls
+            calls += 1
+            raise APIError("服务不可用", status_code=503)
+
+        with pytest.raises(APIError):
+            asyncio.run(wrapper.execute_with_retry(outage, publish, None))
+        assert calls == 2
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(wrapper.execute_with_retry(outage, publish, None))
+        stats = wrapper.get_retry_stats()
+        print(f"重试统计: {stats}")
+        assert calls == 2 and stats["circuit_rejected"] == 1
+        assert stats["circuit_breaker"]["state"] == CircuitBreaker.OPEN
+
+    def test_cancelled_trial_is_released(self):
+        """测试半开状态下的试探请求被取消后释放名额，下一个请求可以试探并关闭熔断器"""
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=0.01)
+        wrapper = make_wrapper(breaker=breaker)
+        breaker.record(APIError("过载", status_code=503))
+
+        async def hang():
+            await asyncio.sleep(60)
+
+        async def succeed():
+            return "ok"
+
+        async def run():
+            await asyncio.sleep(0.02)
+            task = asyncio.create_task(wrapper.execute_with_retry(hang, publish, None))
+            await asyncio.sleep(0.01)
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return await wrapper.execute_with_retry(succeed, publish, None)
+
+        assert asyncio.run(run()) == "ok"
+        print(f"熔断器统计: {breaker.get_stats()}")
+        assert breaker.state == CircuitBreaker.CLOSED and breaker.stats["rejected"] == 0
+
+
+class TestHedgedStream:
+    """对冲请求测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始对冲请求测试 ===")
+
+    def test_backup_wins_and_slow_stream_closed(self):
+        """测试首个数据块过慢时发出对冲请求，采用先到的流并关闭另一个"""
+        delays = [1.0, 0.0]
+        closed = []
+        events = []
+
+        def make_stream():
+            index = len(closed)
+            closed.append(False)
+            delay = delays[index]
+
+            async def stream():
+                try:
+                    await asyncio.sleep(delay)
+                    for i in range(3):
+                        yield f"流{index}-块{i}"
+                finally:
+                    closed[index] = True
+
+            return stream()
+
+        async def run():
+            return [chunk async for chunk in hedged_stream(make_stream, 0.02, on_hedge=events.append)]
+
+        chunks = asyncio.run(run())
+        print(f"数据块: {chunks}, 事件: {events}")
+        assert chunks == ["流1-块0", "流1-块1", "流1-块2"]
+        assert events == ["started", "won"] and closed == [True, True]
+
+    def test_no_hedge_when_not_allowed(self):
+        """测试预算不允许时不发出对冲请求"""
+        created = []
+
+        def make_stream():
+            created.append(1)
+
+            async def stream():
+                await asyncio.sleep(0.03)
+                yield "块"
+
+            return stream()
+
+        async def run():
+            return [chunk async for chunk in hedged_stream(make_stream, 0.01, allow_hedge=lambda: False)]
+
+        assert asyncio.run(run()) == ["块"] and len(created) == 1
@@ -0,0 +1,77 @@
+"""
+快照接口HTTP缓存测试
+测试按ID读取快照返回强ETag与 immutable 缓存头、条件请求返回304、响应体只序列化一次，
+以及当前快照ID接口在提交新快照后ETag改变
+"""
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from backend.database.schemas.request_models import SolutionRequest
+from backend.project_manager import ProjectManager
+from backend.routers import research_tree
+from backend.tests.test_journal import build_history
+from backend.utils.http_cache import BytesLRUCache
+
+
+def build_client(pm: ProjectManager, monkeypatch) -> TestClient:
+    monkeypatch.setattr(research_tree, "db", pm.database_manager)
+    monkeypatch.setattr(research_tree, "shared_snapshot_response_cache", BytesLRUCache(max_bytes=1024 * 1024))
+    app = FastAPI()
+    app.include_router(research_tree.router)
+    return TestClient(app)
+
+
+class TestSnapshotHttpCache:
+    """快照接口HTTP缓存测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始快照接口HTTP缓存测试 ===")
+
+    def test_snapshot_by_id_is_immutable(self, tmp_path, monkeypatch):
+        """测试按ID读取快照：内容与查询结果一致，带 immutable 缓存头，重复读取命中响应体缓存，If-None-Match 返回304"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_history(pm)
+        client = build_client(pm, monkeypatch)
+        cache = research_tree.shared_snapshot_response_cache
+        snapshot_id = pm.database_manager.current_snapshot_id
+
+        first = client.get(f"/research-tree/snapshots/{snapshot_id}")
+        second = client.get(f"/research-tree/snapshots/{snapshot_id}")
+        print(f"ETag: {first.headers['etag']}, 缓存统计: {cache.get_stats()}")
+        assert first.status_code == 200 and first.json()["data"]["id"] == snapshot_id
+        assert first.json() == jsonable_encoder(pm.database_manager.get_snapshot_query(snapshot_id))
+        assert first.content == second.content
+        assert "immutable" in first.headers["cache-control"]
+        assert not first.headers["etag"].startswith("W/")
+        assert cache.get_stats()["hits"] == 1 and cache.get_stats()["entries"] == 1
+
+        not_modified = client.get(f"/research-tree/snapshots/{snapshot_id}", headers={"If-None-Match": first.headers["etag"]})
+        assert not_modified.status_code == 304 and not_modified.content == b""
+
+        # 不存在的快照保持原有的响应格式，且不进入缓存
+        missing = client.get("/research-tree/snapshots/不存在")
+        assert missing.json()["data"] == {"error": "Snapshot not found"}
+        assert "etag" not in missing.headers and cache.get_stats()["entries"] == 1
+
+    def test_current_id_revalidation(self, tmp_path, monkeypatch):
+        """测试当前快照ID接口：未变化时返回304，提交新快照后ETag改变"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        solution_id = build_history(pm)
+        client = build_client(pm, monkeypatch)
+
+        first = client.get("/research-tree/snapshots/current-id")
+        etag = first.headers["etag"]
+        assert first.json()["data"]["current_snapshot_id"] == pm.database_manager.current_snapshot_id
+        assert first.headers["cache-control"] == "no-cache"
+        assert client.get("/research-tree/snapshots/current-id", headers={"If-None-Match": etag}).status_code == 304
+
+        asyncio.run(pm.database_manager.update_solution(solution_id, SolutionRequest(title="方案v3")))
+        changed = client.get("/research-tree/snapshots/current-id", headers={"If-None-Match": etag})
+        print(f"ETag变化: {etag} -> {changed.headers['etag']}")
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+        assert changed.json()["data"]["current_snapshot_id"] == pm.database_manager.current_snapshot_id
@@ -0,0 +1,96 @@
+"""
+快照存储测试
+测试常驻快照个数与估算内存的上限、溢出后按需重新加载、切换到历史快照，以及含溢出快照的工程保存
+"""
+import asyncio
+
+import pytest
+
+from backend.database.schemas.request_models import SolutionRequest
+from backend.project_manager import ProjectManager
+from backend.storage.snapshot_store import SnapshotStore
+from backend.tests.test_journal import build_history, dump_state
+
+
+def build_long_history(pm: ProjectManager, updates: int = 20) -> str:
+    """在 build_history 之上连续修改解决方案，返回解决方案ID"""
+    solution_id = build_history(pm)
+
+    async def run():
+        for i in range(updates):
+            await pm.database_manager.update_solution(solution_id, SolutionRequest(title=f"方案v{i + 3}", top_level_thoughts="思考" * 50))
+
+    asyncio.run(run())
+    return solution_id
+
+
+class TestSnapshotStore:
+    """快照存储测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始快照存储测试 ===")
+
+    def test_resident_count_bounded(self, tmp_path):
+        """测试常驻快照不超过LRU上限，溢出的快照重新加载后内容不变"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        db = pm.database_manager
+        db.snapshot_map = SnapshotStore(max_resident=3)
+        db._init_empty_snapshot()
+        dumps = {}
+        db.add_commit_listener(lambda change: dumps.setdefault(change.snapshot_id, db.snapshot_map[change.snapshot_id].model_dump()))
+        build_long_history(pm)
+
+        stats = db.snapshot_map.get_stats()
+        print(f"快照存储统计: {stats}")
+        assert stats["resident"] <= 3 and stats["spilled_snapshots"] >= len(dumps) - 3
+        # 逐个访问全部快照，常驻个数保持不变
+        for snapshot_id, expected in dumps.items():
+            assert db.get_snapshot_query(snapshot_id)["data"] == expected
+            assert db.snapshot_map.get_stats()["resident"] <= 3
+        assert db.snapshot_map.get_stats()["materialized"] >= len(dumps) - 3
+
+    def test_memory_cap_keeps_current_snapshot(self, tmp_path):
+        """测试估算内存上限：超出上限时只保留当前快照，切换到历史快照后当前快照改为常驻"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        db = pm.database_manager
+        db.snapshot_map = SnapshotStore(memory_cap_bytes=1)
+        db._init_empty_snapshot()
+        build_long_history(pm)
+        snapshot_ids = list(db.snapshot_map)
+        current_id = db.current_snapshot_id
+
+        stats = db.snapshot_map.get_stats()
+        print(f"快照存储统计: {stats}")
+        assert stats["resident"] == 1 and db.snapshot_map._resident.get(current_id) is not None
+
+        # 切换到历史快照（回退），之前的当前快照被淘汰
+        db.current_snapshot_id = snapshot_ids[2]
+        assert db.get_current_snapshot().roots[0].children[0].title == "方案"
+        assert list(db.snapshot_map._resident) == [snapshot_ids[2]]
+        db.current_snapshot_id = current_id
+        assert db.get_current_snapshot().roots[0].children[0].title == "方案v22"
+
+        with pytest.raises(TypeError):
+            db.snapshot_map.copy()["新快照"] = db.get_current_snapshot()
+
+    @pytest.mark.parametrize("storage_backend", ["json", "sqlite"])
+    def test_save_with_spilled_snapshots(self, tmp_path, storage_backend):
+        """测试保存直接写入溢出快照的节点版本，重新加载后内容一致"""
+        pm = ProjectManager(projects_dir=tmp_path, storage_backend=storage_backend)
+        pm.autosave.enabled = False
+        db = pm.database_manager
+        db.snapshot_map = SnapshotStore(max_resident=2)
+        db._init_empty_snapshot()
+        build_long_history(pm)
+        materialized = db.snapshot_map.get_stats()["materialized"]
+        pm.save_current_project()
+        # 保存时不解码溢出的快照
+        assert db.snapshot_map.get_stats()["materialized"] == materialized
+        expected = dump_state(pm)
+
+        restored = ProjectManager(projects_dir=tmp_path, storage_backend=storage_backend)
+        print(f"重新加载后快照存储统计: {restored.database_manager.snapshot_map.get_stats()}")
+        assert restored.database_manager.snapshot_map.get_stats()["resident"] == 1
+        assert dump_state(restored) == expected
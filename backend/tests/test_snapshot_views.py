@@ -0,0 +1,100 @@
+"""
+快照视图测试
+测试按ID读取快照的子树、限深、部分字段与选中路径参数，以及按需读取节点长文本的节点详情接口
+"""
+import asyncio
+
+from backend.database.schemas.request_models import ProblemRequest, SolutionRequest
+from backend.project_manager import ProjectManager
+from backend.tests.test_snapshot_http_cache import build_client
+
+LONG_TEXT = "很长的方案内容" * 400
+
+
+def build_wide_tree(pm: ProjectManager, solutions: int = 3, sub_problems: int = 3) -> str:
+    """构造带长文本的三层研究树：根问题 -> 解决方案 -> 子问题 -> 解决方案，每个问题选中第一个方案，返回根问题ID"""
+    db = pm.database_manager
+
+    async def add_solutions(problem_id: str, children: int) -> None:
+        for i in range(solutions):
+            await db.create_solution(problem_id, SolutionRequest(
+                title=f"方案{i}", top_level_thoughts=LONG_TEXT, implementation_plan=LONG_TEXT,
+                plan_justification=LONG_TEXT,
+                children=[ProblemRequest(title=f"子问题{j}", significance="意义", criteria="标准") for j in range(children)],
+            ))
+        problem = db._find_node_in(db.get_current_snapshot().roots, problem_id)
+        await db.set_selected_solution(problem_id, problem.children[0].id)
+
+    async def run():
+        result = await db.add_root_problem(ProblemRequest(title="根问题", significance="意义", criteria="标准"))
+        root_id = result["data"]["roots"][0]["id"]
+        await add_solutions(root_id, sub_problems)
+        root = db.get_current_snapshot().roots[0]
+        for solution in root.children:
+            for problem in solution.children:
+                await add_solutions(problem.id, 0)
+        return root_id
+
+    return asyncio.run(run())
+
+
+class TestSnapshotViews:
+    """快照视图测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始快照视图测试 ===")
+
+    def test_sparse_depth_limited_view(self, tmp_path, monkeypatch):
+        """测试部分字段与限深视图只传输树结构所需的短字段，长文本通过节点详情接口按需读取"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_wide_tree(pm)
+        client = build_client(pm, monkeypatch)
+        snapshot_id = pm.database_manager.current_snapshot_id
+        url = f"/research-tree/snapshots/{snapshot_id}"
+
+        full = client.get(url)
+        sparse = client.get(url, params={"fields": "id,title,type,state,selected_solution_id", "depth": 2})
+        print(f"完整快照 {len(full.content)} 字节, 部分字段限深视图 {len(sparse.content)} 字节")
+        assert len(sparse.content) * 50 < len(full.content)
+        assert sparse.headers["etag"] != full.headers["etag"] and "immutable" in sparse.headers["cache-control"]
+
+        root = sparse.json()["data"]["roots"][0]
+        solution = root["children"][0]
+        assert set(root) == {"id", "title", "type", "selected_solution_id", "children"}
+        assert set(solution) == {"id", "title", "type", "state", "children"}
+        # 深度2的子问题不展开，只返回子节点数量
+        sub_problem = solution["children"][0]
+        assert sub_problem["children"] == [] and sub_problem["child_count"] == 3
+
+        detail = client.get(f"{url}/nodes/{solution['id']}").json()["data"]["node"]
+        assert detail["implementation_plan"] == LONG_TEXT and detail["plan_justification"] == LONG_TEXT
+        assert detail["child_ids"] == [child["id"] for child in solution["children"]]
+        assert client.get(f"{url}/nodes/不存在").json()["data"] == {"error": "Node not found"}
+        assert client.get(url, params={"fields": "id,不存在"}).status_code == 400
+
+    def test_subtree_and_selected_path(self, tmp_path, monkeypatch):
+        """测试子树视图只包含指定节点及其后代，选中路径视图的问题节点只保留选中的方案"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        pm.autosave.enabled = False
+        build_wide_tree(pm)
+        client = build_client(pm, monkeypatch)
+        snapshot_id = pm.database_manager.current_snapshot_id
+        url = f"/research-tree/snapshots/{snapshot_id}"
+        full_root = client.get(url).json()["data"]["roots"][0]
+
+        subtree = client.get(url, params={"root_id": full_root["children"][1]["id"]}).json()["data"]
+        assert subtree["roots"] == [full_root["children"][1]]
+
+        def walk(node):
+            yield node
+            for child in node["children"]:
+                yield from walk(child)
+
+        selected = client.get(url, params={"selected_path": True, "fields": "title,selected_solution_id"}).json()["data"]
+        problems = [node for node in walk(selected["roots"][0]) if "selected_solution_id" in node]
+        print(f"选中路径: {len(list(walk(selected['roots'][0])))} 个节点, 完整树: {len(list(walk(full_root)))} 个节点")
+        assert len(problems) == 4
+        assert all([child["id"] for child in problem["children"]] == [problem["selected_solution_id"]] for problem in problems)
+
+        assert client.get(url, params={"root_id": "不存在"}).json()["data"] == {"error": "Node not found"}
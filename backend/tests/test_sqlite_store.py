@@ -0,0 +1,91 @@
+"""
+SQLite工程存储测试
+测试保存/加载往返、快照按需加载、另存为、JSON工程迁移、消息分页与节点版本查询
+"""
+import asyncio
+
+from backend.database.schemas.request_models import SolutionRequest
+from backend.message.schemas.message_models import Patch
+from backend.project_manager import ProjectManager
+from backend.storage.snapshot_store import SnapshotStore
+from backend.tests.test_journal import build_history, dump_state
+
+
+class TestSQLiteProjectStore:
+    """SQLite工程存储测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始SQLite工程存储测试 ===")
+
+    def test_round_trip_with_lazy_snapshots(self, tmp_path):
+        """测试保存后重新加载内容一致，且加载时只读取当前快照"""
+        pm = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        build_history(pm)
+        pm.save_current_project()
+        expected = dump_state(pm)
+
+        restored = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        snapshot_map = restored.database_manager.snapshot_map
+        stats = snapshot_map.get_stats()
+        print(f"快照总数: {len(snapshot_map)}, 已加载: {stats['resident']}")
+        assert isinstance(snapshot_map, SnapshotStore)
+        assert stats["resident"] == 1 and stats["materialized"] == 1
+        assert restored.current_project_name == "未命名"
+        assert dump_state(restored) == expected
+
+    def test_incremental_save_and_save_as(self, tmp_path):
+        """测试加载后继续修改并保存，再另存为时未加载的快照在数据库内复制"""
+        pm = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        solution_id = build_history(pm)
+        pm.save_current_project()
+
+        restored = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        asyncio.run(restored.database_manager.update_solution(solution_id, SolutionRequest(title="方案v3")))
+        restored.save_current_project()
+        result = restored.save_as_current_project("副本")
+        assert result["project_name"] == "副本"
+        expected = dump_state(restored)
+
+        copy = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        copy.load_project("副本")
+        assert dump_state(copy) == expected
+        assert copy.database_manager.get_current_snapshot().roots[0].children[0].title == "方案v3"
+        assert sorted(project["project_name"] for project in copy.list_projects()["projects"]) == ["副本", "未命名"]
+
+    def test_migrate_json_projects_once(self, tmp_path):
+        """测试启用SQLite时导入已有JSON工程，删除后不会被重新导入"""
+        pm = ProjectManager(projects_dir=tmp_path)
+        build_history(pm)
+        pm.save_as_current_project("旧工程")
+        pm.close()
+        expected = dump_state(pm)
+
+        migrated = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        migrated.load_project("旧工程")
+        assert dump_state(migrated) == expected
+        assert (tmp_path / "旧工程.json").exists()
+
+        migrated.delete_project("旧工程")
+        migrated.close()
+        reopened = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        assert not reopened.store.project_exists("旧工程")
+
+    def test_message_page_and_node_versions(self, tmp_path):
+        """测试按序号倒序分页读取消息，以及按节点ID查询历史版本"""
+        pm = ProjectManager(projects_dir=tmp_path, storage_backend="sqlite")
+        solution_id = build_history(pm)
+        for i in range(4):
+            asyncio.run(pm.message_manager.publish_patch(Patch(role="user", title=f"追问{i}", content_delta="继续", finished=True)))
+        pm.save_current_project()
+        store = pm.store
+        order = pm.message_manager.message_order
+
+        page, before = store.get_message_page("未命名", limit=2)
+        older, rest = store.get_message_page("未命名", limit=len(order), before_seq=before)
+        print(f"最新一页: {[message.title for message in page]}")
+        assert [message.id for message in page] == order[-2:]
+        assert [message.id for message in older + page] == order and rest is None
+
+        versions = store.get_node_versions("未命名", solution_id)
+        print(f"解决方案历史版本: {[version['title'] for version in versions]}")
+        assert sorted(version["title"] for version in versions) == ["方案", "方案v2"]
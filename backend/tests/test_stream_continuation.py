@@ -0,0 +1,99 @@
+"""
+流中断续写测试
+测试流中途断开后以前缀续写方式继续写入同一条消息，以及无法续写时回退为整体重试
+"""
+import asyncio
+
+import pytest
+
+from backend.agents import llm_client as llm_client_module
+from backend.agents.llm_cache import LLMResponseCache
+from backend.agents.llm_client import DeepSeekReasonerClient
+from backend.agents.prompts_and_validators.create_solution import CreateSolutionResponse
+from backend.agents.retry_wrapper import NetworkError
+from backend.config import settings
+from backend.utils.stream_xml_parser import StreamingXMLValidator
+
+from backend.tests.test_stream_xml_parser import VALID_RESPONSE
+
+
+class InterruptingTransport:
+    """模拟传输层：按脚本依次返回各次请求的数据块，脚本中的异常表示在该处断开"""
+
+    def __init__(self, scripts):
+        self.scripts = list(scripts)
+        self.requests = []
+
+    async def stream_chat_completion(self, payload, prefix_completion=False):
+        self.requests.append((payload, prefix_completion))
+        for field, value in self.scripts.pop(0):
+            if field == "error":
+                raise NetworkError("DeepSeek API网络错误: 连接被重置")
+            if field == "usage":
+                yield {"choices": [], "usage": value}
+            else:
+                yield {"choices": [{"delta": {field: value}}]}
+
+    def get_stats(self):
+        return {}
+
+
+class TestStreamContinuation:
+    """流中断续写测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始流中断续写测试 ===")
+        self.patches = []
+
+        async def publish(patch):
+            self.patches.append(patch)
+
+        self.client = DeepSeekReasonerClient(publish)
+
+    def run(self, monkeypatch, scripts, **kwargs):
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", LLMResponseCache("unused", mode="off"))
+        transport = InterruptingTransport(scripts)
+        self.client.transport = transport
+        result = asyncio.run(self.client.stream_generate("提示词", "m1", **kwargs))
+        return result, transport
+
+    def test_continue_from_partial_content(self, monkeypatch):
+        """测试内容阶段断开后以已输出内容为前缀续写，结果完整且消息不回溯"""
+        split = len(VALID_RESPONSE) // 2
+        validator = StreamingXMLValidator(CreateSolutionResponse)
+        content, transport = self.run(monkeypatch, [
+            [("reasoning_content", "思考"), ("content", VALID_RESPONSE[:split]), ("error", None)],
+            [("reasoning_content", "再次思考"), ("content", VALID_RESPONSE[split:]),
+             ("usage", {"prompt_tokens": 10, "completion_tokens": 5})],
+        ], stream_validator=validator)
+
+        payload, prefix_completion = transport.requests[1]
+        print(f"续写请求最后一条消息: {payload['messages'][-1]['content'][:30]}...")
+        assert prefix_completion
+        assert payload["messages"][-1] == {"role": "assistant", "content": VALID_RESPONSE[:split], "prefix": True}
+        assert validator.completed and content.startswith(VALID_RESPONSE[:split])
+        assert "</response>" in content
+
+        # 同一条消息：无回溯，只有一个完成patch，续写阶段的思考内容不发布
+        assert not any(patch.rollback for patch in self.patches)
+        assert sum(1 for patch in self.patches if patch.finished) == 1
+        assert "".join(patch.thinking_delta or "" for patch in self.patches) == "思考"
+        assert self.client.stats["stream_continuations"] == 1
+        assert self.client.stats["successful_calls"] == 1
+
+    def test_no_continuation_during_thinking(self, monkeypatch):
+        """测试只有思考内容时断开无法续写，抛出错误交由重试包装器整体重试"""
+        with pytest.raises(NetworkError):
+            self.run(monkeypatch, [[("reasoning_content", "思考"), ("error", None)]])
+        assert self.client.stats["stream_continuations"] == 0
+
+    def test_continuation_limit(self, monkeypatch):
+        """测试超过续写次数上限后抛出错误"""
+        monkeypatch.setattr(settings, "LLM_MAX_CONTINUATIONS", 1)
+        with pytest.raises(NetworkError):
+            self.run(monkeypatch, [
+                [("content", "<response>"), ("error", None)],
+                [("content", "<name>"), ("error", None)],
+            ])
+        assert self.client.stats["stream_continuations"] == 1
+        assert self.client.stats["failed_calls"] == 1
@@ -0,0 +1,174 @@
+"""
+流式XML解析测试
+测试增量解析结果与整段解析一致、不可恢复输出的提前中止，以及LLM客户端的提前结束
+"""
+import asyncio
+
+import pytest
+
+from backend.agents import llm_client as llm_client_module
+from backend.agents.llm_cache import LLMResponseCache
+from backend.agents.llm_client import DeepSeekReasonerClient
+from backend.agents.prompts_and_validators.create_solution import CreateSolutionResponse
+from backend.utils.stream_xml_parser import StreamingXMLValidator, XMLStreamAbortError
+from backend.utils.xml_parser import XMLParser, XMLValidationError
+
+VALID_RESPONSE = (
+    "好的，以下是方案：\n```xml\n"
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    "<response>\n"
+    "<name><![CDATA[方案名称]]></name>\n"
+    "<top_level_thoughts><![CDATA[顶层思考 <不是标签> & 符号]]></top_level_thoughts>\n"
+    "<research_plan>\n"
+    '<sub_problem type="implementation">\n'
+    "<name><![CDATA[如何完成子问题？]]></name>\n"
+    "<significance><![CDATA[意义]]></significance>\n"
+    "<criteria><![CDATA[标准]]></criteria>\n"
+    "</sub_problem>\n"
+    "</research_plan>\n"
+    "<implementation_plan><![CDATA[实施方案]]></implementation_plan>\n"
+    "<plan_justification><![CDATA[方案论证]]></plan_justification>\n"
+    "</response>\n```\n以上。"
+)
+
+
+def feed_in_chunks(validator: StreamingXMLValidator, text: str, size: int) -> int:
+    """按固定大小分块送入，返回停止时已送入的块数"""
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    for index, chunk in enumerate(chunks):
+        if validator.feed(chunk):
+            return index + 1
+    return len(chunks)
+
+
+class TestStreamingXMLValidator:
+    """流式XML校验器测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始流式XML解析测试 ===")
+        self.xml_parser = XMLParser()
+
+    def test_matches_full_parse(self):
+        """测试任意分块方式下得到的片段与整段提取一致，且验证通过"""
+        expected = self.xml_parser.extract_xml_from_content(VALID_RESPONSE, "response")
+        for size in (1, 3, 7, 64, len(VALID_RESPONSE)):
+            validator = StreamingXMLValidator(CreateSolutionResponse)
+            feed_in_chunks(validator, VALID_RESPONSE, size)
+            assert validator.completed
+            assert validator.fragment == expected
+        result = self.xml_parser.parse_and_validate(validator.fragment, CreateSolutionResponse)
+        print(f"摘要: {validator.get_summary()}")
+        assert result.research_plan[0].name == "如何完成子问题？"
+
+    def test_completes_at_root_close(self):
+        """测试</response>闭合后立即结束，之后的内容不再读取"""
+        validator = StreamingXMLValidator(CreateSolutionResponse)
+        text = VALID_RESPONSE + "大量多余输出" * 100
+        consumed = feed_in_chunks(validator, text, 10)
+        assert validator.completed
+        assert consumed * 10 < len(VALID_RESPONSE) + 10
+
+    def test_abort_on_syntax_error(self):
+        """测试XML语法错误时在流中途中止"""
+        broken = VALID_RESPONSE.replace("<implementation_plan>", "<implementation_plan a=>")
+        validator = StreamingXMLValidator(CreateSolutionResponse)
+        with pytest.raises(XMLStreamAbortError):
+            feed_in_chunks(validator, broken, 5)
+        assert not validator.completed
+
+    def test_record_syntax_error_without_abort(self):
+        """测试不中止模式下记录首个语法错误，并继续读取到</response>闭合"""
+        broken = VALID_RESPONSE.replace("<implementation_plan>", "<implementation_plan a=>")
+        validator = StreamingXMLValidator(CreateSolutionResponse, abort_on_syntax_error=False)
+        feed_in_chunks(validator, broken, 5)
+        print(f"摘要: {validator.get_summary()}")
+        assert validator.completed and "XML流式解析失败" in validator.syntax_error
+        assert validator.fragment == self.xml_parser.extract_xml_from_content(broken, "response")
+
+    def test_abort_on_long_preamble(self):
+        """测试长时间未出现<response>时中止"""
+        validator = StreamingXMLValidator(CreateSolutionResponse, max_preamble_chars=50)
+        with pytest.raises(XMLStreamAbortError):
+            feed_in_chunks(validator, "闲聊" * 100 + VALID_RESPONSE, 8)
+
+    def test_abort_on_duplicate_scalar_field(self):
+        """测试非列表字段重复出现时中止，未知字段只记录"""
+        duplicated = VALID_RESPONSE.replace(
+            "<implementation_plan>", "<unknown_tag>x</unknown_tag><name>重复</name><implementation_plan>"
+        )
+        validator = StreamingXMLValidator(CreateSolutionResponse)
+        with pytest.raises(XMLStreamAbortError):
+            feed_in_chunks(validator, duplicated, 16)
+        assert validator.unknown_tags == ["unknown_tag"]
+
+
+class FakeTransport:
+    """模拟共享HTTP传输层（字符串为内容块，字典为用量块），记录读取的数据块数与连接是否被关闭"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.consumed = 0
+        self.closed = False
+
+    async def stream_chat_completion(self, payload):
+        try:
+            for item in self.texts:
+                self.consumed += 1
+                if isinstance(item, dict):
+                    yield {"choices": [], "usage": item}
+                else:
+                    yield {"choices": [{"delta": {"reasoning_content": None, "content": item}}]}
+        finally:
+            self.closed = True
+
+    def get_stats(self):
+        return {}
+
+
+class TestStreamingValidationInClient:
+    """LLM客户端流式校验测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始LLM客户端流式校验测试 ===")
+
+        async def publish(patch):
+            return None
+
+        self.client = DeepSeekReasonerClient(publish)
+
+    def use_stream(self, texts):
+        stream = FakeTransport(texts)
+        self.client.transport = stream
+        return stream
+
+    def test_early_completion_closes_stream(self, monkeypatch):
+        """测试根标签闭合后只再读取少量数据块即关闭连接，多余输出不计入内容"""
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", LLMResponseCache("unused", mode="off"))
+        stream = self.use_stream([VALID_RESPONSE] + ["多余输出"] * 50)
+        validator = StreamingXMLValidator(CreateSolutionResponse)
+        content = asyncio.run(self.client.stream_generate("提示词", "m1", stream_validator=validator))
+        print(f"读取数据块: {stream.consumed}, 统计: {self.client.stats['stream_early_completions']}")
+        assert validator.completed and "多余输出" not in content
+        assert stream.consumed == 1 + self.client.TRAILING_CHUNK_LIMIT and stream.closed
+        assert self.client.stats["stream_early_completions"] == 1
+
+    def test_usage_after_completion_is_recorded(self, monkeypatch):
+        """测试根标签闭合后紧随的用量数据块仍被记录"""
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", LLMResponseCache("unused", mode="off"))
+        stream = self.use_stream([VALID_RESPONSE, {"prompt_tokens": 10, "completion_tokens": 5}] + ["多余输出"] * 50)
+        asyncio.run(self.client.stream_generate(
+            "提示词", "m3", stream_validator=StreamingXMLValidator(CreateSolutionResponse)))
+        assert stream.consumed == 2 and stream.closed
+        assert self.client.last_usage["completion_tokens"] == 5
+
+    def test_abort_raises_retryable_error(self, monkeypatch, tmp_path):
+        """测试中止时抛出可重试的XML验证错误，且中止的响应不写入缓存"""
+        cache = LLMResponseCache(tmp_path, mode="record")
+        monkeypatch.setattr(llm_client_module, "shared_llm_cache", cache)
+        stream = self.use_stream(["<response><name>a</name>", "<name>b</name>"] + ["x"] * 50)
+        with pytest.raises(XMLValidationError):
+            asyncio.run(self.client.stream_generate(
+                "提示词", "m2", stream_validator=StreamingXMLValidator(CreateSolutionResponse)))
+        assert stream.consumed == 2 and stream.closed
+        assert self.client.stats["stream_aborts"] == 1
+        assert cache.stats["writes"] == 0
@@ -0,0 +1,111 @@
+"""
+单次调用修改模式测试
+测试决策与修改后方案合并输出的解析，以及单次调用失败时回退为两步流程
+"""
+import asyncio
+
+from backend.agents.prompts_and_validators.handle_and_modify_solution import HandleAndModifySolutionResponse
+from backend.agents.user_chat_agent import UserChatAgent
+from backend.config import settings
+from backend.utils.xml_parser import XMLParser
+
+from backend.tests.test_xml_repair import ScriptedClient
+
+SOLUTION_FIELDS = """<name><![CDATA[修改后的方案]]></name>
+<top_level_thoughts><![CDATA[顶层思考]]></top_level_thoughts>
+<research_plan></research_plan>
+<implementation_plan><![CDATA[实施方案]]></implementation_plan>
+<plan_justification><![CDATA[方案论证]]></plan_justification>
+"""
+
+ACCEPT_RESPONSE = f"""<response>
+<decision type="accept">
+<reasoning><![CDATA[理由]]></reasoning>
+<modification_plan><![CDATA[修改计划]]></modification_plan>
+</decision>
+<modified_solution>
+{SOLUTION_FIELDS}</modified_solution>
+</response>"""
+
+REPLY_RESPONSE = """<response>
+<decision type="reply">
+<reasoning><![CDATA[理由]]></reasoning>
+<response_to_user><![CDATA[暂不修改]]></response_to_user>
+</decision>
+</response>"""
+
+
+class FakeDatabaseManager:
+    def add_commit_listener(self, listener):
+        pass
+
+    def get_parent_node_id_query(self, solution_id):
+        return {"success": True, "data": {"parent_node_id": "p1"}}
+
+
+class TestUserChatFused:
+    """单次调用修改模式测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始单次调用修改模式测试 ===")
+        self.parser = XMLParser()
+
+    def parse(self, xml_text):
+        return self.parser.validate_with_pydantic(self.parser.xml_to_dict(xml_text), HandleAndModifySolutionResponse)
+
+    def test_parse_accept_with_solution(self):
+        """测试accept决策与修改后的方案一起解析"""
+        response = self.parse(ACCEPT_RESPONSE)
+        print(f"解析结果: {response.to_content()[:80]}")
+        assert response.decision.decision == "accept"
+        assert response.decision.modification_plan == "修改计划"
+        assert response.modified_solution.name == "修改后的方案"
+
+    def test_parse_reply_without_solution(self):
+        """测试reply决策不需要修改后的方案"""
+        response = self.parse(REPLY_RESPONSE)
+        assert response.decision.response_to_user == "暂不修改"
+        assert response.modified_solution is None
+
+    def test_accept_requires_solution(self):
+        """测试accept决策缺少修改后的方案时验证失败"""
+        xml_text = ACCEPT_RESPONSE.replace(f"<modified_solution>\n{SOLUTION_FIELDS}</modified_solution>\n", "")
+        try:
+            self.parse(xml_text)
+        except Exception as e:
+            print(f"预期的验证错误: {e}")
+        else:
+            raise AssertionError("缺少modified_solution时应验证失败")
+
+    def test_fallback_to_two_step(self, monkeypatch):
+        """测试单次调用失败时回退为先决策、后修改的两步流程"""
+        monkeypatch.setattr(settings, "USER_CHAT_FUSED_MODE", True)
+        calls = []
+
+        async def publish(patch):
+            return "m1"
+
+        agent = UserChatAgent(publish_callback=publish, llm_client=ScriptedClient([]), database_manager=FakeDatabaseManager())
+
+        async def validate(solution_id):
+            return None
+
+        async def fused(problem_id, solution_id, content):
+            calls.append("fused")
+            raise RuntimeError("模拟单次调用失败")
+
+        async def handle(problem_id, solution_id, content):
+            calls.append("handle")
+            return self.parse(ACCEPT_RESPONSE).decision
+
+        async def modify(problem_id, solution_id, modify_plan):
+            calls.append(("modify", modify_plan))
+
+        monkeypatch.setattr(agent, "_validate_solution_node", validate)
+        monkeypatch.setattr(agent, "_handle_and_modify_solution", fused)
+        monkeypatch.setattr(agent, "_handle_modification_requests", handle)
+        monkeypatch.setattr(agent, "_modify_solution", modify)
+
+        asyncio.run(agent._agent_process("请修改", {"solution_id": "s1"}))
+        print(f"调用顺序: {calls}")
+        assert calls == ["fused", "handle", ("modify", "修改计划")]
@@ -0,0 +1,130 @@
+"""
+XML格式修复测试
+测试输出未通过校验时先用v3模型修复、修复失败再整体重新生成，以及按验证器统计修复成功率
+"""
+import asyncio
+
+from backend.config import settings
+
+from backend.agents.agent_base import AgentBase
+from backend.agents.prompts_and_validators.create_solution import CreateSolutionResponse
+from backend.agents.prompts_and_validators.repair_response import build_repair_prompt
+from backend.agents.retry_wrapper import CircuitBreaker, RetryBudget, RetryWrapper
+
+from backend.tests.test_stream_xml_parser import VALID_RESPONSE
+
+# 缺少必填字段plan_justification，能完整解析但验证失败
+INVALID_RESPONSE = VALID_RESPONSE.replace(
+    "<plan_justification><![CDATA[方案论证]]></plan_justification>\n", ""
+)
+
+
+# 字段文本中出现未转义的 &，流式解析报语法错误
+MALFORMED_RESPONSE = VALID_RESPONSE.replace(
+    "<implementation_plan><![CDATA[实施方案]]></implementation_plan>",
+    "<implementation_plan>实施方案 A & B</implementation_plan>",
+)
+
+
+class ScriptedClient:
+    """按顺序返回预设输出的LLM客户端，记录收到的提示词"""
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.prompts = []
+        self.publish_callback = None
+
+    def set_publish_callback(self, callback):
+        self.publish_callback = callback
+
+    async def stream_generate(self, prompt, message_id, max_tokens=None, temperature=None,
+                              publish_content=True, stream_validator=None):
+        self.prompts.append(prompt)
+        output = self.outputs.pop(0)
+        if stream_validator is not None:
+            stream_validator.feed(output)
+        return output
+
+    def get_stats(self):
+        return {"calls": len(self.prompts)}
+
+
+class DummyAgent(AgentBase):
+    async def _agent_process(self, user_content, other_params=None):
+        return None
+
+
+class TestXMLRepair:
+    """XML格式修复测试类"""
+
+    def setup_method(self):
+        print("\n=== 开始XML格式修复测试 ===")
+        self.patches = []
+
+        async def publish(patch):
+            self.patches.append(patch)
+            return "m1"
+
+        self.publish = publish
+
+    def make_agent(self, outputs, repair_outputs):
+        retry_wrapper = RetryWrapper(
+            base_delay=0.001, max_delay=0.01,
+            retry_budget=RetryBudget(ratio=0), circuit_breaker=CircuitBreaker(failure_threshold=0),
+        )
+        agent = DummyAgent("测试智能体", self.publish, llm_client=ScriptedClient(outputs), retry_wrapper=retry_wrapper)
+        agent.repair_client = ScriptedClient(repair_outputs)
+        return agent
+
+    def call(self, agent):
+        prompt = "<output_format>\n<response>...</response>\n</output_format>\n原始提示词"
+        return asyncio.run(agent._call_llm_with_retry(prompt, "标题", None, validator=CreateSolutionResponse))
+
+    def test_repair_instead_of_regeneration(self):
+        """测试格式错误由一次修复调用解决，不再整体重新生成"""
+        agent = self.make_agent([INVALID_RESPONSE], [VALID_RESPONSE])
+        result = self.call(agent)
+        repair_prompt = agent.repair_client.prompts[0]
+        print(f"修复统计: {agent.get_repair_stats()}")
+        assert result.plan_justification == "方案论证"
+        assert len(agent.llm_client.prompts) == 1
+        assert "plan_justification" in repair_prompt and "<output_format>" in repair_prompt
+        assert "原始提示词" not in repair_prompt
+        assert not any(patch.rollback for patch in self.patches)
+        assert agent.get_repair_stats()["CreateSolutionResponse"] == {"attempts": 1, "successes": 1, "success_rate": 1.0}
+
+    def test_regenerate_when_repair_fails(self):
+        """测试修复失败时回退为整体重新生成"""
+        agent = self.make_agent([INVALID_RESPONSE, VALID_RESPONSE], [INVALID_RESPONSE])
+        result = self.call(agent)
+        print(f"修复统计: {agent.get_repair_stats()}")
+        assert result.name == "方案名称"
+        assert len(agent.llm_client.prompts) == 2
+        assert agent.get_repair_stats()["CreateSolutionResponse"]["success_rate"] == 0.0
+
+    def test_repair_streamed_syntax_error(self, monkeypatch):
+        """测试流式解析遇到语法错误时不中止重试，读取完整输出后连同解析错误交给一次修复调用"""
+        monkeypatch.setattr(settings, "XML_STREAM_VALIDATION", True)
+        monkeypatch.setattr(settings, "XML_REPAIR_ENABLED", True)
+        agent = self.make_agent([MALFORMED_RESPONSE], [VALID_RESPONSE])
+        result = self.call(agent)
+        repair_prompt = agent.repair_client.prompts[0]
+        print(f"修复统计: {agent.get_repair_stats()}")
+        assert result.implementation_plan == "实施方案"
+        assert len(agent.llm_client.prompts) == 1 and len(agent.repair_client.prompts) == 1
+        assert "XML流式解析失败" in repair_prompt and "实施方案 A & B" in repair_prompt
+        assert not any(patch.rollback for patch in self.patches)
+
+    def test_syntax_error_regenerates_without_repair(self, monkeypatch):
+        """测试关闭格式修复时语法错误仍在流中途中止并整体重新生成"""
+        monkeypatch.setattr(settings, "XML_STREAM_VALIDATION", True)
+        monkeypatch.setattr(settings, "XML_REPAIR_ENABLED", False)
+        agent = self.make_agent([MALFORMED_RESPONSE, VALID_RESPONSE], [])
+        result = self.call(agent)
+        assert result.implementation_plan == "实施方案"
+        assert len(agent.llm_client.prompts) == 2 and agent.repair_client.prompts == []
+
+    def test_build_repair_prompt_without_output_format(self):
+        """测试原提示词没有输出格式段落时仍能构建修复提示词"""
+        prompt = build_repair_prompt("无格式说明", "<response>{x}</response>", "缺少字段")
+        assert "</output_format>" not in prompt and "{x}" in prompt and "缺少字段" in prompt
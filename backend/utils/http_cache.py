@@ -0,0 +1,74 @@
+"""
+HTTP响应缓存
+1. 条件请求：解析 If-None-Match，与ETag比较（弱比较）
+2. 序列化后的响应体LRU缓存：按字节数限制容量，不可变资源（按ID读取的快照）只序列化一次
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from fastapi import Request
+
+from backend.config import settings
+
+# 不可变资源（内容由ID唯一确定）：浏览器与反向代理可以直接复用，无需回源校验
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 可变资源：每次使用前回源校验，未变化时返回304
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """请求的 If-None-Match 是否命中ETag（忽略弱标记 W/，支持 *）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
+
+
+class BytesLRUCache:
+    """按总字节数限制容量的LRU缓存，值为序列化后的响应体"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        """写入缓存，超过容量的单个值不缓存"""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._items), "size_bytes": self._size, "max_bytes": self.max_bytes}
+
+
+# 按ID读取的快照响应体（快照提交后不再修改，同一ID的内容在各工程之间一致）
+shared_snapshot_response_cache = BytesLRUCache(max_bytes=int(settings.SNAPSHOT_RESPONSE_CACHE_MB * 1024 * 1024))
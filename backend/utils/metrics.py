@@ -0,0 +1,164 @@
+"""
+进程内指标收集
+提供计数器与滚动直方图（最近N次观测的分位数），可输出为字典或Prometheus文本格式
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# 标签按名称排序后的元组，作为同名指标下的序列键
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = []
+    for name, value in items:
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RollingHistogram:
+    """
+    滚动直方图
+
+    分位数基于最近 window_size 次观测，便于及时发现服务变慢；
+    count/sum 为累计值，与Prometheus summary类型的语义一致
+    """
+
+    def __init__(self, window_size: int = 1000):
+        self.window: Deque[float] = deque(maxlen=window_size)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.window.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """最近窗口内的分位数（最近邻法），无观测时返回NaN"""
+        if not self.window:
+            return float("nan")
+        ordered = sorted(self.window)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"count": self.count, "sum": round(self.sum, 4)}
+        if self.window:
+            for q in quantiles:
+                result[f"p{int(q * 100)}"] = round(self.quantile(q), 4)
+            result["window_mean"] = round(sum(self.window) / len(self.window), 4)
+            result["window_max"] = round(max(self.window), 4)
+        return result
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    功能：
+    1. 计数器（只增）与滚动直方图，均支持标签
+    2. 以字典形式输出（供状态接口使用）
+    3. 以Prometheus文本格式输出（供 /metrics 抓取）
+    """
+
+    def __init__(self, window_size: int = 1000, quantiles: Iterable[float] = DEFAULT_QUANTILES):
+        self.window_size = window_size
+        self.quantiles = tuple(quantiles)
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, RollingHistogram]] = {}
+
+    def inc(self, name: str, value: float = 1, help_text: str = "", **labels: Any) -> None:
+        """计数器增加"""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def observe(self, name: str, value: Optional[float], help_text: str = "", **labels: Any) -> None:
+        """直方图记录一次观测，value为None时忽略"""
+        if value is None:
+            return
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = RollingHistogram(self.window_size)
+            series[key].observe(float(value))
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def get_histogram(self, name: str, **labels: Any) -> Optional[RollingHistogram]:
+        return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """以字典形式输出所有指标，序列键为 "label=value,..." 形式"""
+        def series_name(key: LabelKey) -> str:
+            return ",".join(f"{k}={v}" for k, v in key) or "_"
+
+        with self._lock:
+            return {
+                "counters": {
+                    name: {series_name(key): value for key, value in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {series_name(key): hist.summary(self.quantiles) for key, hist in series.items()}
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """输出Prometheus文本格式（0.0.4），直方图按summary类型输出"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} summary")
+                for key, hist in series.items():
+                    for q in self.quantiles:
+                        lines.append(f"{name}{_format_labels(key, ('quantile', str(q)))} {_format_value(hist.quantile(q))}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(hist.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# 全局指标注册表
+shared_metrics = MetricsRegistry()
@@ -0,0 +1,164 @@
+"""
+流式XML解析工具
+在LLM流式输出的过程中增量解析<response>片段，并按验证器的字段结构实时检查：
+1. 输出已无法解析时立即中止（触发重试），不再为剩余token付费；
+   开启格式修复时只记录首个语法错误，读取到根标签闭合后交给修复模型
+2. </response>闭合后立即结束，丢弃之后的多余输出
+"""
+import re
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Type, get_origin
+
+from pydantic import BaseModel
+
+from .logger import logger
+from .xml_parser import XMLValidationError
+
+
+class XMLStreamAbortError(XMLValidationError):
+    """流式解析过程中发现输出已不可恢复，提前中止"""
+    pass
+
+
+class StreamingXMLValidator:
+    """
+    增量XML校验器
+
+    与 XMLParser.extract_xml_from_content 的语义保持一致：从第一个 <root_tag 开始，
+    到第一个 </root_tag> 结束。每次调用只校验一次流式响应，重试时需创建新实例。
+    """
+
+    def __init__(self,
+                 validator_class: Optional[Type[BaseModel]] = None,
+                 root_tag: str = "response",
+                 max_preamble_chars: int = 2000,
+                 abort_on_syntax_error: bool = True):
+        """
+        初始化校验器
+
+        Args:
+            validator_class: Pydantic验证器类，用于检查<response>下的顶层字段
+            root_tag: 根标签名
+            max_preamble_chars: 根标签出现之前允许的最大字符数，小于等于0表示不限制
+            abort_on_syntax_error: 语法或结构错误时是否中止；为False时记录到 syntax_error 并继续读取到根标签闭合
+        """
+        self.validator_class = validator_class
+        self.root_tag = root_tag
+        self.max_preamble_chars = max_preamble_chars
+        self.abort_on_syntax_error = abort_on_syntax_error
+        self._start_pattern = re.compile(rf"<{re.escape(root_tag)}[\s>/]")
+        self._end_tag = f"</{root_tag}>"
+
+        self._preamble = ""
+        self._fragment_parts: List[str] = []
+        self._tail = ""  # 已送入解析器文本的末尾，用于跨块查找结束标签
+        self._parser: Optional[ET.XMLPullParser] = None
+        self._depth = 0
+        self._seen_fields: Dict[str, int] = {}
+        self.completed = False
+        self.unknown_tags: List[str] = []
+        self.syntax_error: Optional[str] = None
+
+    @property
+    def started(self) -> bool:
+        return self._parser is not None
+
+    @property
+    def fragment(self) -> Optional[str]:
+        """完整的<response>片段，未闭合时返回None"""
+        return "".join(self._fragment_parts) if self.completed else None
+
+    def feed(self, text: str) -> bool:
+        """
+        送入一段内容增量
+
+        Args:
+            text: 内容增量
+
+        Returns:
+            根标签是否已经闭合（闭合后应停止读取流）
+
+        Raises:
+            XMLStreamAbortError: 输出已不可恢复
+        """
+        if self.completed or not text:
+            return self.completed
+
+        if not self.started:
+            self._preamble += text
+            match = self._start_pattern.search(self._preamble)
+            if not match:
+                if 0 < self.max_preamble_chars < len(self._preamble):
+                    raise XMLStreamAbortError(
+                        f"前{len(self._preamble)}个字符内未出现<{self.root_tag}>，已中止生成"
+                    )
+                return False
+            text = self._preamble[match.start():]
+            self._parser = ET.XMLPullParser(events=("start", "end"))
+
+        # 只送入到第一个结束标签为止，之后的内容直接丢弃
+        search_text = self._tail + text
+        end_index = search_text.find(self._end_tag)
+        if end_index >= 0:
+            text = text[:end_index + len(self._end_tag) - len(self._tail)]
+        self._tail = search_text[-len(self._end_tag):]
+
+        self._fragment_parts.append(text)
+        # 已记录语法错误时解析器状态不可用，只收集文本直到根标签闭合
+        if self.syntax_error is None:
+            try:
+                self._parser.feed(text)
+                self._check_events()
+                if end_index >= 0:
+                    self._parser.close()
+                    self._check_events()
+            except ET.ParseError as e:
+                self._on_syntax_error(XMLStreamAbortError(f"XML流式解析失败: {e}"))
+            except XMLStreamAbortError as e:
+                self._on_syntax_error(e)
+
+        if end_index >= 0:
+            self.completed = True
+            logger.debug(f"流式解析完成: <{self.root_tag}> 已闭合")
+        return self.completed
+
+    def _on_syntax_error(self, error: XMLStreamAbortError) -> None:
+        if self.abort_on_syntax_error:
+            raise error
+        self.syntax_error = str(error)
+        logger.warning(f"流式解析发现语法错误，继续读取以便修复: {error}")
+
+    def _check_events(self) -> None:
+        """按验证器字段检查<response>下的顶层标签"""
+        for event, element in self._parser.read_events():
+            if event == "end":
+                self._depth -= 1
+                continue
+            self._depth += 1
+            if self._depth == 1:
+                if element.tag != self.root_tag:
+                    raise XMLStreamAbortError(f"根标签应为<{self.root_tag}>，实际为<{element.tag}>")
+            elif self._depth == 2 and self.validator_class is not None:
+                self._check_field(element.tag)
+
+    def _check_field(self, tag: str) -> None:
+        fields = self.validator_class.model_fields
+        if tag not in fields:
+            # 验证器会忽略未知字段，只记录不中止
+            self.unknown_tags.append(tag)
+            logger.warning(f"流式解析发现未知字段 <{tag}>（{self.validator_class.__name__}）")
+            return
+        self._seen_fields[tag] = self._seen_fields.get(tag, 0) + 1
+        # 非列表字段重复出现时会被解析成列表，验证必然失败
+        if self._seen_fields[tag] > 1 and get_origin(fields[tag].annotation) is not list:
+            raise XMLStreamAbortError(f"字段 <{tag}> 重复出现")
+
+    def get_summary(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "preamble_chars": len(self._preamble) if not self.started else self._preamble.find(f"<{self.root_tag}"),
+            "seen_fields": dict(self._seen_fields),
+            "unknown_tags": list(self.unknown_tags),
+            "syntax_error": self.syntax_error,
+        }
@@ -0,0 +1,66 @@
+"""
+离线Token估算工具
+按DeepSeek官方给出的经验比例估算文本Token数，无需加载分词器
+"""
+import math
+import re
+
+# 中日韩文字及全角标点
+_CJK_PATTERN = re.compile(
+    r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+
+# DeepSeek经验值：1个中文字符约0.6个token，1个英文字符约0.3个token
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的Token数
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        估算的Token数（向上取整）
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + other * OTHER_TOKENS_PER_CHAR)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "\n……（因长度限制已截断）") -> str:
+    """
+    将文本截断到不超过指定Token数（含截断标记）
+
+    Args:
+        text: 文本内容
+        max_tokens: 最大Token数
+        marker: 追加在截断处的标记
+
+    Returns:
+        截断后的文本；未超出预算时原样返回
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(marker)
+    if budget <= 0:
+        return ""
+
+    # 二分查找满足预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+
+    # 尽量在换行处截断，避免留下半行
+    cut = text.rfind("\n", 0, low)
+    if cut > low // 2:
+        low = cut
+    return text[:low] + marker